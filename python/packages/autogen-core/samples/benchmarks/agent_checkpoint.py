@@ -0,0 +1,105 @@
+"""Benchmark for saving the state of many agents.
+
+Activates the given number of agents in a :class:`SingleThreadedAgentRuntime`,
+then compares a full :meth:`save_state` snapshot with the incremental
+:meth:`checkpoint` to a state store, after the given fraction of the agents
+handled a message. Reports the time taken and, in a second run with memory
+tracing enabled, the peak memory allocated while saving.
+
+Usage:
+
+    python agent_checkpoint.py --agents 100000 --changed 0.01 --store sqlite
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Mapping
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application.state import FileStateStore, InMemoryStateStore, SQLiteStateStore, StateStore
+from autogen_core.base import AgentId, BaseAgent, MessageContext
+
+
+class Counter(BaseAgent):
+    def __init__(self) -> None:
+        super().__init__("A counter agent.")
+        self.count = 0
+        self.history = ["x" * 64] * 8
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> None:
+        self.count += 1
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {"count": self.count, "history": self.history}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self.count = state["count"]
+        self.history = list(state["history"])
+
+
+async def measure(operation: Callable[[], Awaitable[Any]], trace_memory: bool) -> str:
+    # Memory tracing slows down allocations, so time and memory are measured in separate runs.
+    if trace_memory:
+        tracemalloc.start()
+        await operation()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return f"peak memory {peak / 2**20:.1f}MiB"
+    start = time.perf_counter()
+    await operation()
+    return f"{(time.perf_counter() - start) * 1000:.0f}ms"
+
+
+def create_store(kind: str, directory: Path) -> StateStore:
+    match kind:
+        case "sqlite":
+            return SQLiteStateStore(directory / "state.db")
+        case "json":
+            return FileStateStore(directory / "state")
+        case "msgpack":
+            return FileStateStore(directory / "state", format="msgpack")
+        case _:
+            return InMemoryStateStore()
+
+
+async def run(num_agents: int, changed: float, store_kind: str, trace_memory: bool) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        store = create_store(store_kind, Path(directory))
+        runtime = SingleThreadedAgentRuntime(agent_state_store=store)
+        await Counter.register(runtime, "counter", Counter)
+        runtime.start()
+        for i in range(num_agents):
+            await runtime.send_message(i, AgentId("counter", str(i)))
+
+        print(f"full snapshot of {num_agents} agents: {await measure(runtime.save_state, trace_memory)}")
+        print(f"first checkpoint of {num_agents} agents: {await measure(runtime.checkpoint, trace_memory)}")
+
+        num_changed = int(num_agents * changed)
+        for i in range(num_changed):
+            await runtime.send_message(i, AgentId("counter", str(i)))
+        print(
+            f"incremental checkpoint of {num_changed} changed agents: {await measure(runtime.checkpoint, trace_memory)}"
+        )
+        await runtime.stop()
+        if isinstance(store, SQLiteStateStore):
+            store.close()
+
+
+async def main(num_agents: int, changed: float, store_kind: str) -> None:
+    await run(num_agents, changed, store_kind, trace_memory=False)
+    await run(num_agents, changed, store_kind, trace_memory=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full snapshots and incremental agent checkpoints.")
+    parser.add_argument("--agents", type=int, default=100000, help="Number of agents.")
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of agents changed between checkpoints.")
+    parser.add_argument(
+        "--store", choices=["memory", "sqlite", "json", "msgpack"], default="sqlite", help="State store to use."
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.agents, args.changed, args.store))
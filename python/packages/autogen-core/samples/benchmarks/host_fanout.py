@@ -0,0 +1,100 @@
+"""Benchmark for fanning out events from the host to many workers.
+
+Starts a :class:`WorkerAgentRuntimeHost`, a number of subscriber workers that
+each register an agent type subscribed to the same topic, and a publisher
+worker. The publisher publishes events with a payload of the given size, and
+the host delivers every event to every subscriber worker. The time the host
+spends processing events is reported per event, along with the delivery
+throughput, for each number of subscriber workers.
+
+Usage:
+
+    python host_fanout.py --subscribers 1 10 50 --events 1000 --payload-bytes 10000
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import MessageContext, TopicId, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, TypeSubscription, message_handler
+
+HOST_ADDRESS = "localhost:50102"
+
+
+@dataclass
+class Blob:
+    data: str
+
+
+class Counter(RoutedAgent):
+    received = 0
+
+    def __init__(self) -> None:
+        super().__init__("An agent that counts the events it receives.")
+
+    @message_handler
+    async def on_blob(self, message: Blob, ctx: MessageContext) -> None:
+        Counter.received += 1
+
+
+async def measure(num_subscribers: int, num_events: int, payload_bytes: int) -> None:
+    host = WorkerAgentRuntimeHost(address=HOST_ADDRESS)
+    servicer: Any = host._servicer  # type: ignore[reportPrivateUsage]
+    process_event = servicer._process_event
+    host_seconds = 0.0
+
+    async def timed_process_event(event: Any) -> None:
+        nonlocal host_seconds
+        start = time.perf_counter()
+        await process_event(event)
+        host_seconds += time.perf_counter() - start
+
+    servicer._process_event = timed_process_event
+    host.start()
+
+    runtimes: List[WorkerAgentRuntime] = []
+    for i in range(num_subscribers + 1):
+        runtime = WorkerAgentRuntime(host_address=HOST_ADDRESS)
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(Blob))
+        runtimes.append(runtime)
+        if i > 0:
+            await Counter.register(runtime, f"counter{i}", lambda: Counter())
+            await runtime.add_subscription(TypeSubscription("bench", f"counter{i}"))
+    publisher = runtimes[0]
+
+    Counter.received = 0
+    payload = Blob("x" * payload_bytes)
+    start = time.perf_counter()
+    for _ in range(num_events):
+        await publisher.publish_message(payload, TopicId("bench", "default"))
+    while Counter.received < num_events * num_subscribers:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{num_subscribers:3d} subscribers: {host_seconds / num_events * 1e6:8.1f} us of host time per event, "
+        f"{num_events * num_subscribers / elapsed:8.0f} deliveries/sec"
+    )
+
+    for runtime in runtimes:
+        await runtime.stop()
+    await host.stop()
+
+
+async def main(subscribers: List[int], num_events: int, payload_bytes: int) -> None:
+    for num_subscribers in subscribers:
+        await measure(num_subscribers, num_events, payload_bytes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fanning out events from the host to many workers.")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 50], help="Numbers of subscribers.")
+    parser.add_argument("--events", type=int, default=1000, help="Number of events per measurement.")
+    parser.add_argument("--payload-bytes", type=int, default=10000, help="Size of the payload of every event.")
+    args = parser.parse_args()
+    asyncio.run(main(args.subscribers, args.events, args.payload_bytes))
@@ -0,0 +1,72 @@
+"""Benchmark for encoding the images of a multimodal conversation.
+
+Simulates a conversation that adds a screenshot at every turn and sends the
+whole history to the model, converting every image to the OpenAI format at
+every turn. The time spent encoding is reported for images that are created
+anew at every turn, which encode every time as images did before they cached
+their encoding, and for images that are kept in the history and encode once.
+The size of a screenshot in each format, with and without downscaling to the
+size the model sees, is reported along with the time to encode it.
+
+Usage:
+
+    python image_encoding.py --turns 10 --width 1920 --height 1080
+"""
+
+import argparse
+import time
+from typing import List, Literal, Tuple
+
+from autogen_core.components import Image
+from PIL import Image as PILImage
+
+
+def screenshot(width: int, height: int, turn: int) -> PILImage.Image:
+    """A synthetic screenshot: gradients with some noise, which compress like a rendered page."""
+    size = (width, height)
+    bands = [
+        PILImage.linear_gradient("L").rotate(turn * 10).resize(size),
+        PILImage.effect_noise(size, 16),
+        PILImage.radial_gradient("L").resize(size),
+    ]
+    return PILImage.merge("RGB", bands)
+
+
+def conversation(screenshots: List[PILImage.Image], cached: bool) -> float:
+    start = time.perf_counter()
+    history: List[Image] = []
+    for pil_image in screenshots:
+        history.append(Image.from_pil(pil_image))
+        if not cached:
+            history = [Image.from_pil(image.image) for image in history]
+        for image in history:
+            image.to_openai_format()
+    return time.perf_counter() - start
+
+
+def main(turns: int, width: int, height: int) -> None:
+    screenshots = [screenshot(width, height, turn) for turn in range(turns)]
+    uncached = conversation(screenshots, cached=False)
+    cached = conversation(screenshots, cached=True)
+    print(f"{turns} turns of {width}x{height} screenshots")
+    print(f"  encoded at every turn: {uncached:8.2f}s")
+    print(f"  encoded once:          {cached:8.2f}s  ({uncached / cached:.1f}x faster)")
+
+    print(f"{'format':<8} {'downscale':>9} {'size (KiB)':>11} {'encode (ms)':>12}")
+    formats: List[Tuple[Literal["PNG", "JPEG", "WEBP"], int | None]] = [("PNG", None), ("JPEG", 85), ("WEBP", 80)]
+    for image_format, quality in formats:
+        for downscale in (False, True):
+            start = time.perf_counter()
+            image = Image.from_pil(screenshots[0], format=image_format, quality=quality, downscale=downscale)
+            data = image.to_bytes()
+            elapsed = time.perf_counter() - start
+            print(f"{image_format:<8} {str(downscale):>9} {len(data) / 1024:>11.1f} {elapsed * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark encoding the images of a multimodal conversation.")
+    parser.add_argument("--turns", type=int, default=10, help="Number of turns, each adding a screenshot.")
+    parser.add_argument("--width", type=int, default=1920, help="Width of the screenshots.")
+    parser.add_argument("--height", type=int, default=1080, help="Height of the screenshots.")
+    args = parser.parse_args()
+    main(args.turns, args.width, args.height)
@@ -0,0 +1,208 @@
+"""Benchmark for the goodput of a model client against a rate limited API.
+
+Runs a fake chat completions server that enforces requests and tokens per
+minute with token buckets, like the OpenAI and Azure OpenAI APIs, and answers
+requests over the budget with a 429 and a ``retry-after-ms`` header. As with
+those APIs, a rejected request still counts against the requests per minute.
+A number
+of concurrent callers send a fixed number of requests through an
+:class:`OpenAIChatCompletionClient`, first relying on the retries of the
+OpenAI SDK, then with a :class:`RateLimiter` with the same budget in front of
+the client, at 95% of the budget so that the jitter of the requests on their
+way to the server does not push them over it. The goodput, the completed requests per second, is reported with
+the number of 429 responses, the failed requests and the queue wait times of
+the limiter.
+
+The server charges a request its prompt tokens and ``max_tokens`` when it
+arrives, so with ``--tpm`` the limiter counts the prompt tokens with
+``tiktoken``, which needs the encodings to be downloaded or cached.
+
+Usage:
+
+    python model_client_rate_limit.py --requests 1800 --concurrency 50 --rpm 1200 --tpm 200000
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from aiohttp import web
+from autogen_core.components.models import OpenAIChatCompletionClient, RateLimiter, UserMessage
+from autogen_core.components.models.config import OpenAIClientConfiguration
+
+PORT = 50113
+MAX_TOKENS = 50
+
+
+class FakeServer:
+    """A chat completions endpoint with token buckets of requests and tokens per minute."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float | None, latency: float) -> None:
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._latency = latency
+        self._request_budget = requests_per_minute
+        self._token_budget = tokens_per_minute or 0.0
+        self._updated = time.monotonic()
+        self.num_completed = 0
+        self.num_rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._request_budget = min(
+            self._requests_per_minute, self._request_budget + elapsed * self._requests_per_minute / 60
+        )
+        if self._tokens_per_minute is not None:
+            self._token_budget = min(
+                self._tokens_per_minute, self._token_budget + elapsed * self._tokens_per_minute / 60
+            )
+
+    def _retry_after(self, tokens: int) -> float:
+        """The seconds until a request of the tokens fits in the buckets, or 0 if it fits now."""
+        self._refill()
+        delay = 0.0
+        if self._request_budget < 1:
+            delay = (1 - self._request_budget) * 60 / self._requests_per_minute
+        if self._tokens_per_minute is not None and self._token_budget < tokens:
+            delay = max(delay, (tokens - self._token_budget) * 60 / self._tokens_per_minute)
+        return delay
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        body: Dict[str, Any] = await request.json()
+        # About 4 characters per token, which is close enough for charging.
+        prompt_tokens = sum(len(str(message["content"])) for message in body["messages"]) // 4 + 1
+        max_tokens = body.get("max_tokens") or MAX_TOKENS
+        await asyncio.sleep(self._latency)
+        retry_after = self._retry_after(prompt_tokens + max_tokens)
+        if retry_after > 0:
+            # Rejected requests count against the requests per minute, so retrying in a tight loop does not work.
+            self._request_budget = max(self._request_budget - 1, 0)
+            self.num_rejected += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached.", "type": "requests", "code": "rate_limit_exceeded"}},
+                status=429,
+                headers={"retry-after-ms": str(int(retry_after * 1000) + 1)},
+            )
+        self._request_budget -= 1
+        self._token_budget -= prompt_tokens + max_tokens
+        completion_tokens = max_tokens // 2
+        self.num_completed += 1
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{self.num_completed}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "word " * completion_tokens},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+
+@dataclass
+class Result:
+    elapsed: float
+    num_completed: int
+    num_failed: int
+    num_rejected: int
+
+
+async def run(
+    num_requests: int,
+    concurrency: int,
+    requests_per_minute: float,
+    tokens_per_minute: float | None,
+    latency: float,
+    limiter: RateLimiter | None,
+) -> Result:
+    server = FakeServer(requests_per_minute, tokens_per_minute, latency)
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", server.chat_completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", PORT).start()
+    config: OpenAIClientConfiguration = {
+        "model": "gpt-4o-2024-08-06",
+        "api_key": "api_key",
+        "base_url": f"http://localhost:{PORT}/v1",
+        "max_tokens": MAX_TOKENS,
+        "max_retries": 20,
+    }
+    if limiter is not None:
+        config["rate_limiter"] = limiter
+    client = OpenAIChatCompletionClient(**config)
+    semaphore = asyncio.Semaphore(concurrency)
+    num_failed = 0
+
+    async def call(index: int) -> None:
+        nonlocal num_failed
+        async with semaphore:
+            try:
+                await client.create([UserMessage(content=f"Request {index}: " + "text " * 100, source="user")])
+            except Exception:
+                num_failed += 1
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[call(index) for index in range(num_requests)])
+        elapsed = time.perf_counter() - start
+    finally:
+        # The model client has no close method, so its connections are closed before the event loop.
+        await client._client.close()  # type: ignore[reportPrivateUsage]
+        await runner.cleanup()
+    return Result(elapsed, server.num_completed, num_failed, server.num_rejected)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1800)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rpm", type=float, default=1200, help="Requests per minute of the server.")
+    parser.add_argument("--tpm", type=float, default=0, help="Tokens per minute of the server, or 0 for no limit.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the server takes to answer.")
+    args = parser.parse_args()
+    tokens_per_minute: float | None = args.tpm or None
+
+    results: List[tuple[str, Result, RateLimiter | None]] = []
+    for name in ("retry on 429", "rate limiter"):
+        limiter: RateLimiter | None = None
+        if name == "rate limiter":
+            limiter = RateLimiter(
+                requests_per_minute=args.rpm * 0.95,
+                tokens_per_minute=tokens_per_minute * 0.95 if tokens_per_minute is not None else None,
+            )
+        result = asyncio.run(run(args.requests, args.concurrency, args.rpm, tokens_per_minute, args.latency, limiter))
+        results.append((name, result, limiter))
+
+    print(
+        f"{'client':<14} {'goodput/s':>10} {'completed':>10} {'failed':>7} {'429s':>6} {'mean wait':>10} {'max wait':>9}"
+    )
+    for name, result, limiter in results:
+        mean_wait = max_wait = "-"
+        if limiter is not None:
+            metrics = limiter.metrics
+            mean_wait = f"{metrics.queue_wait_time / max(metrics.num_requests, 1):.3f}s"
+            max_wait = f"{metrics.max_queue_wait_time:.3f}s"
+        goodput = result.num_completed / result.elapsed
+        print(
+            f"{name:<14} {goodput:>10.1f} {result.num_completed:>10} {result.num_failed:>7} "
+            f"{result.num_rejected:>6} {mean_wait:>10} {max_wait:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark for publishing messages to many subscribers of a :class:`SingleThreadedAgentRuntime`.
+
+Subscribes a number of agents to one topic and measures the time to publish a
+message and deliver it to all of them, for 1, 10, 100 and 1000 subscribers by
+default. The agents are created before the measurement, so that the cost of
+instantiating them is reported separately.
+
+Usage:
+
+    python publish_fanout.py --messages 100 --subscribers 1 10 100 1000
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.base import AgentId, MessageContext, TopicId
+from autogen_core.components import RoutedAgent, TypeSubscription, message_handler
+
+
+@dataclass
+class Note:
+    text: str = "hello"
+
+
+class Sink(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that drops every message.")
+
+    @message_handler
+    async def on_note(self, message: Note, ctx: MessageContext) -> None:
+        pass
+
+
+async def measure(num_subscribers: int, num_messages: int) -> tuple[float, float]:
+    runtime = SingleThreadedAgentRuntime()
+    # Each subscriber is an agent of its own type subscribed to the same topic type.
+    for i in range(num_subscribers):
+        await Sink.register(runtime, f"sink_{i}", lambda: Sink())
+        await runtime.add_subscription(TypeSubscription("bench", f"sink_{i}"))
+    runtime.start()
+
+    start = time.perf_counter()
+    for i in range(num_subscribers):
+        await runtime.get(AgentId(f"sink_{i}", "default"), lazy=False)
+    create_time = (time.perf_counter() - start) / num_subscribers
+
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        await runtime.publish_message(Note(), topic_id=TopicId("bench", "default"))
+    await runtime.stop_when_idle()
+    publish_time = (time.perf_counter() - start) / num_messages
+    return create_time, publish_time
+
+
+async def main(num_messages: int, subscribers: List[int]) -> None:
+    for num_subscribers in subscribers:
+        create_time, publish_time = await measure(num_subscribers, num_messages)
+        print(
+            f"{num_subscribers} subscribers: create {create_time * 1e6:.1f}us/agent, "
+            f"publish {publish_time * 1e3:.3f}ms/message, {publish_time / num_subscribers * 1e6:.1f}us/delivery"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark publishing to many subscribers of the runtime.")
+    parser.add_argument("--messages", type=int, default=100, help="Number of messages per measurement.")
+    parser.add_argument(
+        "--subscribers", type=int, nargs="+", default=[1, 10, 100, 1000], help="Numbers of subscribers to measure."
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.subscribers))
@@ -0,0 +1,78 @@
+"""Microbenchmark for the logging overhead of :class:`SingleThreadedAgentRuntime`.
+
+Reports the time per message for direct messages and for published messages,
+with the ``autogen_core`` loggers disabled, and enabled at INFO level with a
+handler that formats every record.
+
+Usage:
+
+    python runtime_logging.py --messages 20000
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.base import AgentId, MessageContext, TopicId
+from autogen_core.components import RoutedAgent, TypeSubscription, message_handler
+
+
+@dataclass
+class Note:
+    text: str = "hello"
+    tags: List[str] = field(default_factory=lambda: ["a", "b", "c"])
+
+
+class Echo(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An echo agent.")
+
+    @message_handler
+    async def on_note(self, message: Note, ctx: MessageContext) -> Note:
+        return message
+
+
+async def measure(num_messages: int) -> tuple[float, float]:
+    runtime = SingleThreadedAgentRuntime()
+    await Echo.register(runtime, "echo", lambda: Echo())
+    await runtime.add_subscription(TypeSubscription("bench", "echo"))
+    runtime.start()
+
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        await runtime.send_message(Note(), AgentId("echo", "default"))
+    send_time = (time.perf_counter() - start) / num_messages
+
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        await runtime.publish_message(Note(), topic_id=TopicId("bench", "default"))
+    await runtime.stop_when_idle()
+    publish_time = (time.perf_counter() - start) / num_messages
+    return send_time, publish_time
+
+
+async def main(num_messages: int) -> None:
+    logger = logging.getLogger("autogen_core")
+    for enabled in [False, True]:
+        handler = logging.StreamHandler(io.StringIO())
+        if enabled:
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+        else:
+            logger.setLevel(logging.WARNING)
+        send_time, publish_time = await measure(num_messages)
+        logger.removeHandler(handler)
+        state = "enabled" if enabled else "disabled"
+        print(f"logging {state}: send {send_time * 1e6:.1f}us/message, publish {publish_time * 1e6:.1f}us/message")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the logging overhead of the SingleThreadedAgentRuntime.")
+    parser.add_argument("--messages", type=int, default=20000, help="Number of messages per measurement.")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages))
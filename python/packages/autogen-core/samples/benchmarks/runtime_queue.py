@@ -0,0 +1,84 @@
+"""Microbenchmark for the message queue of :class:`SingleThreadedAgentRuntime`.
+
+Reports publish throughput (messages/sec) for a backlog of messages, for each
+of the given dispatch batch sizes, and the CPU utilization of a started but
+idle runtime.
+
+Usage:
+
+    python runtime_queue.py --messages 20000 --batch-sizes 1 16 256 --idle-seconds 1
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List
+
+from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.base import MessageContext, TopicId
+from autogen_core.components import RoutedAgent, TypeSubscription, message_handler
+
+
+@dataclass
+class Ping:
+    index: int
+
+
+class Sink(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("A sink agent.")
+        self.received = 0
+
+    @message_handler
+    async def on_ping(self, message: Ping, ctx: MessageContext) -> None:
+        self.received += 1
+
+
+async def measure_throughput(num_messages: int, batch_size: int) -> float:
+    runtime = SingleThreadedAgentRuntime(max_batch_size=batch_size)
+    await Sink.register(runtime, "sink", lambda: Sink())
+    await runtime.add_subscription(TypeSubscription("bench", "sink"))
+    topic_id = TopicId("bench", "default")
+
+    # Fill the queue before starting so that dequeue cost is part of the measurement.
+    for i in range(num_messages):
+        await runtime.publish_message(Ping(i), topic_id=topic_id)
+
+    start = time.perf_counter()
+    runtime.start()
+    await runtime.stop_when_idle()
+    elapsed = time.perf_counter() - start
+    return num_messages / elapsed
+
+
+async def measure_idle_cpu(seconds: float) -> float:
+    runtime = SingleThreadedAgentRuntime()
+    runtime.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    await runtime.stop()
+    return cpu / wall
+
+
+async def main(num_messages: int, batch_sizes: List[int], idle_seconds: float) -> None:
+    for batch_size in batch_sizes:
+        throughput = await measure_throughput(num_messages, batch_size)
+        print(
+            f"publish throughput: {throughput:,.0f} messages/sec "
+            f"({num_messages} queued messages, batch size {batch_size})"
+        )
+    idle_cpu = await measure_idle_cpu(idle_seconds)
+    print(f"idle CPU utilization: {idle_cpu:.1%} of one core over {idle_seconds}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SingleThreadedAgentRuntime message queue.")
+    parser.add_argument("--messages", type=int, default=20000, help="Number of messages to queue.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1], help="Dispatch batch sizes to measure.")
+    parser.add_argument("--idle-seconds", type=float, default=1.0, help="Seconds to measure an idle runtime.")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.batch_sizes, args.idle_seconds))
@@ -0,0 +1,108 @@
+"""Benchmark for serializing typical chat messages in each content type.
+
+Serializes and deserializes a dataclass chat message, a Pydantic model of a
+chat turn with several messages, and a protobuf message with each of the
+serializers that :func:`try_get_known_serializers_for_type` provides for them,
+and the dataclass and the Pydantic model also with the msgpack serializers
+that can be added explicitly. The serialize and deserialize operations per second and the size
+of the payload are reported, along with the content type that the registry
+selects by default, and the time it takes to look up the known serializers
+for each type. The msgpack serializers are only measured when the ``msgpack``
+package is installed.
+
+Usage:
+
+    python serialization.py --iterations 20000
+"""
+
+import argparse
+import timeit
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+from autogen_core.application.protos import agent_worker_pb2
+from autogen_core.base import MessageSerializer, SerializationRegistry, try_get_known_serializers_for_type
+from autogen_core.base._serialization import (
+    DataclassMsgpackMessageSerializer,
+    PydanticMsgpackMessageSerializer,
+    is_msgpack_available,
+)
+from pydantic import BaseModel
+
+TEXT = "Sure! Here is a summary of the document you shared, with the key points highlighted. " * 4
+
+
+@dataclass
+class ChatMessage:
+    content: str
+    source: str
+
+
+class Usage(BaseModel):
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class Turn(BaseModel):
+    content: str
+    source: str
+
+
+class ChatTurns(BaseModel):
+    turns: List[Turn]
+    usage: Usage
+
+
+def ops_per_second(operation: Callable[[], Any], iterations: int) -> float:
+    return iterations / min(timeit.repeat(operation, number=iterations, repeat=3))
+
+
+def measure(message: Any, iterations: int) -> None:
+    known = SerializationRegistry()
+    known.add_serializer(try_get_known_serializers_for_type(type(message)))
+    serializers: List[MessageSerializer[Any]] = try_get_known_serializers_for_type(type(message))
+    if isinstance(message, BaseModel) and is_msgpack_available():
+        serializers.append(PydanticMsgpackMessageSerializer(type(message)))
+    elif isinstance(message, ChatMessage) and is_msgpack_available():
+        serializers.append(DataclassMsgpackMessageSerializer(type(message)))
+    serde = SerializationRegistry()
+    serde.add_serializer(serializers)
+    type_name = serde.type_name(message)
+    for serializer in serializers:
+        content_type = serializer.data_content_type
+        data = serde.serialize(message, type_name=type_name, data_content_type=content_type)
+
+        def serialize_message(content_type: str = content_type) -> bytes:
+            return serde.serialize(message, type_name=type_name, data_content_type=content_type)
+
+        def deserialize_message(data: bytes = data, content_type: str = content_type) -> Any:
+            return serde.deserialize(data, type_name=type_name, data_content_type=content_type)
+
+        serialize = ops_per_second(serialize_message, iterations)
+        deserialize = ops_per_second(deserialize_message, iterations)
+        selected = " (selected)" if content_type == known.select_content_type(type_name) else ""
+        print(
+            f"{type_name:12s} {content_type:24s} {serialize:9.0f} serialize/sec, {deserialize:9.0f} deserialize/sec, "
+            f"{len(data):5d} bytes{selected}"
+        )
+    lookup = ops_per_second(lambda: try_get_known_serializers_for_type(type(message)), iterations)
+    print(f"{type_name:12s} {'serializer lookup':24s} {lookup:9.0f} lookups/sec")
+
+
+def main(iterations: int) -> None:
+    measure(ChatMessage(content=TEXT, source="assistant"), iterations)
+    measure(
+        ChatTurns(
+            turns=[Turn(content=TEXT, source="user" if i % 2 == 0 else "assistant") for i in range(4)],
+            usage=Usage(prompt_tokens=512, completion_tokens=128),
+        ),
+        iterations,
+    )
+    measure(agent_worker_pb2.Payload(data_type="ChatMessage", data=TEXT.encode("utf-8")), iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serializing chat messages in each content type.")
+    parser.add_argument("--iterations", type=int, default=20000, help="Number of operations per measurement.")
+    args = parser.parse_args()
+    main(args.iterations)
@@ -0,0 +1,67 @@
+"""Benchmark for the subscription store used by the runtimes.
+
+Populates a :class:`SubscriptionManager` with a number of subscriptions and
+topics, then measures the cost of adding and removing subscriptions and of
+resolving the recipients of a topic.
+
+Usage:
+
+    python subscription_index.py --topics 10000 --subscriptions 1000 --topic-types 100 --max-cached-topics 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from autogen_core.application._helpers import SubscriptionManager
+from autogen_core.base import TopicId
+from autogen_core.components import TypeSubscription
+
+
+async def main(
+    num_topics: int, num_subscriptions: int, num_topic_types: int, num_changes: int, max_cached_topics: int | None
+) -> None:
+    manager = SubscriptionManager(max_cached_topics=max_cached_topics)
+    sources_per_type = max(1, num_topics // num_topic_types)
+    topics = [TopicId(f"topic_{t}", f"source_{s}") for t in range(num_topic_types) for s in range(sources_per_type)]
+
+    start = time.perf_counter()
+    for i in range(num_subscriptions):
+        await manager.add_subscription(TypeSubscription(f"topic_{i % num_topic_types}", f"agent_{i}"))
+    print(f"initial subscriptions: {num_subscriptions} added in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    for topic in topics:
+        await manager.get_subscribed_recipients(topic)
+    print(f"first lookup of {len(topics)} topics: {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    for topic in topics:
+        await manager.get_subscribed_recipients(topic)
+    elapsed = time.perf_counter() - start
+    print(f"cached lookup: {elapsed / len(topics) * 1e6:.2f}us per topic")
+
+    added = [TypeSubscription(f"topic_{i % num_topic_types}", f"new_agent_{i}") for i in range(num_changes)]
+    start = time.perf_counter()
+    for subscription in added:
+        await manager.add_subscription(subscription)
+    elapsed = time.perf_counter() - start
+    print(f"add subscription with {len(topics)} seen topics: {elapsed / num_changes * 1e3:.3f}ms per add")
+
+    start = time.perf_counter()
+    for subscription in added:
+        await manager.remove_subscription(subscription.id)
+    elapsed = time.perf_counter() - start
+    print(f"remove subscription with {len(topics)} seen topics: {elapsed / num_changes * 1e3:.3f}ms per remove")
+    print(f"recipient cache: {manager.cache_metrics}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the runtime subscription store.")
+    parser.add_argument("--topics", type=int, default=10000, help="Number of distinct topics to publish to.")
+    parser.add_argument("--subscriptions", type=int, default=1000, help="Number of initial subscriptions.")
+    parser.add_argument("--topic-types", type=int, default=100, help="Number of distinct topic types.")
+    parser.add_argument("--changes", type=int, default=10, help="Number of subscriptions to add and then remove.")
+    parser.add_argument("--max-cached-topics", type=int, default=None, help="Bound on the recipient cache.")
+    args = parser.parse_args()
+    asyncio.run(main(args.topics, args.subscriptions, args.topic_types, args.changes, args.max_cached_topics))
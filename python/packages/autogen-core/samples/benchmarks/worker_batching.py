@@ -0,0 +1,100 @@
+"""Benchmark for batching messages sent over the streams between workers and the host.
+
+Starts a :class:`WorkerAgentRuntimeHost`, a worker with an agent that records
+when each message arrives, and a publisher worker, all with the same batch
+settings. The publisher publishes messages carrying their send time in bursts,
+and the throughput and the 50th and 99th percentile latency from publishing a
+message to its handling are reported for each combination of batch size and
+batch interval. A batch size of 1 is the unbatched baseline.
+
+Usage:
+
+    python worker_batching.py --batch-sizes 1 16 64 --intervals 0 0.001 0.005 --messages 10000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+from typing import List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import AgentId, MessageContext, TopicId, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, TypeSubscription, message_handler
+
+HOST_ADDRESS = "localhost:50101"
+
+
+@dataclass
+class Ping:
+    sent_at: float
+
+
+class Recorder(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that records the latency of every message.")
+        self.latencies: List[float] = []
+
+    @message_handler
+    async def on_ping(self, message: Ping, ctx: MessageContext) -> None:
+        self.latencies.append(time.perf_counter() - message.sent_at)
+
+
+async def measure(batch_size: int, interval: float, num_messages: int, burst: int) -> None:
+    host = WorkerAgentRuntimeHost(address=HOST_ADDRESS, max_send_batch_size=batch_size, send_batch_interval=interval)
+    host.start()
+    runtimes: List[WorkerAgentRuntime] = []
+    for _ in range(2):
+        runtime = WorkerAgentRuntime(
+            host_address=HOST_ADDRESS, max_send_batch_size=batch_size, send_batch_interval=interval
+        )
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(Ping))
+        runtimes.append(runtime)
+    publisher, worker = runtimes
+    await Recorder.register(worker, "recorder", lambda: Recorder())
+    await worker.add_subscription(TypeSubscription("bench", "recorder"))
+    recorder = await worker.try_get_underlying_agent_instance(AgentId("recorder", "default"), Recorder)
+
+    start = time.perf_counter()
+    for i in range(0, num_messages, burst):
+        await asyncio.gather(
+            *[
+                publisher.publish_message(Ping(time.perf_counter()), TopicId("bench", "default"))
+                for _ in range(min(burst, num_messages - i))
+            ]
+        )
+    while len(recorder.latencies) < num_messages:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(recorder.latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"batch size {batch_size:4d}, interval {interval * 1000:5.1f} ms: {num_messages / elapsed:8.0f} messages/sec, "
+        f"p50 {p50 * 1000:6.2f} ms, p99 {p99 * 1000:6.2f} ms"
+    )
+
+    for runtime in runtimes:
+        await runtime.stop()
+    await host.stop()
+
+
+async def main(batch_sizes: List[int], intervals: List[float], num_messages: int, burst: int) -> None:
+    for batch_size in batch_sizes:
+        for interval in intervals if batch_size > 1 else [0.0]:
+            await measure(batch_size, interval, num_messages, burst)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batching messages between workers and the host.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64], help="Batch sizes to measure.")
+    parser.add_argument(
+        "--intervals", type=float, nargs="+", default=[0.0, 0.001, 0.005], help="Batch intervals in seconds."
+    )
+    parser.add_argument("--messages", type=int, default=10000, help="Number of messages per measurement.")
+    parser.add_argument("--burst", type=int, default=100, help="Number of messages published concurrently.")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_sizes, args.intervals, args.messages, args.burst))
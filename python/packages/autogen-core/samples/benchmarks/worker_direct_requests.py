@@ -0,0 +1,136 @@
+"""Benchmark for sending requests directly between workers instead of relaying them through the host.
+
+Runs a :class:`WorkerAgentRuntimeHost`, a worker that hosts an echo agent, and
+a driver worker, each in its own process. The driver sends requests to the
+echo agent one at a time to measure the round trip latency, and then many at
+once to measure the throughput. This is done once with requests relayed by the
+host and once with direct addresses, where the host only resolves the address
+of the worker. The latency percentiles, the throughput and the CPU time spent
+by the host process are reported for both modes.
+
+Usage:
+
+    python worker_direct_requests.py --requests 2000 --payload-bytes 1000
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.synchronize import Event
+from typing import List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import AgentId, MessageContext, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, message_handler
+
+HOST_ADDRESS = "localhost:50103"
+WORKER_ADDRESS = "localhost:50104"
+DRIVER_ADDRESS = "localhost:50105"
+# gRPC does not support forking a process that uses it, so processes are started in fresh interpreters.
+mp = multiprocessing.get_context("spawn")
+
+
+@dataclass
+class Payload:
+    data: str
+
+
+class Echo(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that returns the messages it receives.")
+
+    @message_handler
+    async def on_payload(self, message: Payload, ctx: MessageContext) -> Payload:
+        return message
+
+
+async def run_host(ready: Event, stop: Event, cpu_times: Connection) -> None:
+    host = WorkerAgentRuntimeHost(address=HOST_ADDRESS)
+    host.start()
+    ready.set()
+    start = time.process_time()
+    await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+    cpu_times.send(time.process_time() - start)
+    await host.stop()
+
+
+def host_process(ready: Event, stop: Event, cpu_times: Connection) -> None:
+    asyncio.run(run_host(ready, stop, cpu_times))
+
+
+async def run_worker(direct: bool, ready: Event, stop: Event) -> None:
+    worker = WorkerAgentRuntime(host_address=HOST_ADDRESS, direct_address=WORKER_ADDRESS if direct else None)
+    worker.start()
+    worker.add_message_serializer(try_get_known_serializers_for_type(Payload))
+    await Echo.register(worker, "echo", lambda: Echo())
+    ready.set()
+    await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+    await worker.stop()
+
+
+def worker_process(direct: bool, ready: Event, stop: Event) -> None:
+    asyncio.run(run_worker(direct, ready, stop))
+
+
+async def measure(direct: bool, num_requests: int, payload_bytes: int, concurrency: int) -> None:
+    stop = mp.Event()
+    host_ready = mp.Event()
+    cpu_times, host_cpu_times = mp.Pipe(duplex=False)
+    host = mp.Process(target=host_process, args=(host_ready, stop, host_cpu_times))
+    host.start()
+    await asyncio.get_running_loop().run_in_executor(None, host_ready.wait)
+    worker_ready = mp.Event()
+    worker = mp.Process(target=worker_process, args=(direct, worker_ready, stop))
+    worker.start()
+    await asyncio.get_running_loop().run_in_executor(None, worker_ready.wait)
+
+    driver = WorkerAgentRuntime(host_address=HOST_ADDRESS, direct_address=DRIVER_ADDRESS if direct else None)
+    driver.start()
+    driver.add_message_serializer(try_get_known_serializers_for_type(Payload))
+    payload = Payload("x" * payload_bytes)
+    recipient = AgentId("echo", "default")
+    # Warm up the channels and resolve the address of the agent.
+    await driver.send_message(payload, recipient)
+
+    latencies: List[float] = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        await driver.send_message(payload, recipient)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(0, num_requests, concurrency):
+        await asyncio.gather(*[driver.send_message(payload, recipient) for _ in range(concurrency)])
+    throughput = num_requests / (time.perf_counter() - start)
+
+    await driver.stop()
+    stop.set()
+    host_cpu_seconds = cpu_times.recv()
+    worker.join()
+    host.join()
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{'direct' if direct else 'relayed'}: p50 {p50 * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms, "
+        f"{throughput:.0f} requests/sec, host CPU {host_cpu_seconds:.2f} s"
+    )
+
+
+async def main(num_requests: int, payload_bytes: int, concurrency: int) -> None:
+    for direct in [False, True]:
+        await measure(direct, num_requests, payload_bytes, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark direct requests between workers.")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of requests per measurement.")
+    parser.add_argument("--payload-bytes", type=int, default=1000, help="Size of the payload of every request.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of requests sent at once.")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.payload_bytes, args.concurrency))
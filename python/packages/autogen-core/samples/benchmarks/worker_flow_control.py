@@ -0,0 +1,94 @@
+"""Benchmark for the flow control of the requests that the host relays to a worker.
+
+Runs a :class:`WorkerAgentRuntimeHost`, a worker that hosts an agent that
+takes some time to handle each request, and a driver worker, which sends a
+burst of requests to many agent keys at once. This is done once without a
+limit on the requests in flight at the worker, and once with
+``max_in_flight_messages``, where the host holds back the requests that the
+worker has no credits for. The throughput, the peak number of requests in
+flight at the worker, which each have a task, the peak number of requests
+waiting at the host, and the number of credit stalls are reported for both.
+
+Usage:
+
+    python worker_flow_control.py --requests 10000 --max-in-flight 100 --handler-seconds 0.01
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import AgentId, MessageContext, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, message_handler
+
+HOST_ADDRESS = "localhost:50108"
+
+
+@dataclass
+class Payload:
+    data: str
+
+
+class Sleeper(RoutedAgent):
+    def __init__(self, seconds: float) -> None:
+        super().__init__("An agent that returns the messages it receives after some time.")
+        self._seconds = seconds
+
+    @message_handler
+    async def on_payload(self, message: Payload, ctx: MessageContext) -> Payload:
+        await asyncio.sleep(self._seconds)
+        return message
+
+
+async def measure(max_in_flight: int | None, num_requests: int, handler_seconds: float) -> None:
+    host = WorkerAgentRuntimeHost(address=HOST_ADDRESS)
+    host.start()
+    worker = WorkerAgentRuntime(host_address=HOST_ADDRESS, max_in_flight_messages=max_in_flight)
+    driver = WorkerAgentRuntime(host_address=HOST_ADDRESS)
+    for runtime in [worker, driver]:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(Payload))
+    await Sleeper.register(worker, "sleeper", lambda: Sleeper(handler_seconds))
+    payload = Payload("x" * 100)
+
+    peak_waiting = 0
+
+    async def sample_waiting() -> None:
+        nonlocal peak_waiting
+        while True:
+            waiting = sum(metrics.num_waiting for metrics in host.flow_control_metrics.values())
+            peak_waiting = max(peak_waiting, waiting)
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample_waiting())
+    start = time.perf_counter()
+    await asyncio.gather(*[driver.send_message(payload, AgentId("sleeper", str(i))) for i in range(num_requests)])
+    throughput = num_requests / (time.perf_counter() - start)
+    sampler.cancel()
+
+    stalls = sum(metrics.num_credit_stalls for metrics in host.flow_control_metrics.values())
+    print(
+        f"max in flight {max_in_flight}: {throughput:.0f} requests/sec, "
+        f"peak in flight {worker.in_flight_metrics.peak_in_flight}, peak waiting at host {peak_waiting}, "
+        f"{stalls} credit stalls"
+    )
+
+    for runtime in [worker, driver]:
+        await runtime.stop()
+    await host.stop()
+
+
+async def main(num_requests: int, max_in_flight: int, handler_seconds: float) -> None:
+    for limit in [None, max_in_flight]:
+        await measure(limit, num_requests, handler_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the flow control of requests relayed to a worker.")
+    parser.add_argument("--requests", type=int, default=10000, help="Number of requests sent at once.")
+    parser.add_argument("--max-in-flight", type=int, default=100, help="Requests in flight at the worker at once.")
+    parser.add_argument("--handler-seconds", type=float, default=0.01, help="Time the agent takes per request.")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.max_in_flight, args.handler_seconds))
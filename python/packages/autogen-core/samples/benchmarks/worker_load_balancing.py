@@ -0,0 +1,121 @@
+"""Benchmark for load balancing an agent type across worker processes.
+
+Starts a :class:`WorkerAgentRuntimeHost` and, for each of the given numbers of
+workers, that many worker processes that all register the same agent type. The
+agent spends a fixed amount of CPU time on every message. A driver runtime then
+sends messages to many agent keys concurrently, which the host spreads across
+the workers by a consistent hash of the key, and the throughput is reported.
+With enough cores, the throughput grows almost linearly with the number of
+workers until the host saturates.
+
+Usage:
+
+    python worker_load_balancing.py --workers 1 2 4 --messages 2000 --work-ms 2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from dataclasses import dataclass
+from multiprocessing.synchronize import Event
+from typing import List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import AgentId, MessageContext, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, message_handler
+
+HOST_ADDRESS = "localhost:50100"
+# gRPC does not support forking a process that uses it, so workers are started in fresh interpreters.
+mp = multiprocessing.get_context("spawn")
+
+
+@dataclass
+class Job:
+    work_ms: float
+
+
+@dataclass
+class Done:
+    pass
+
+
+class Busy(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that spends CPU time on every message.")
+
+    @message_handler
+    async def on_job(self, message: Job, ctx: MessageContext) -> Done:
+        end = time.perf_counter() + message.work_ms / 1000
+        while time.perf_counter() < end:
+            pass
+        return Done()
+
+
+async def run_worker(ready: Event, stop: Event) -> None:
+    worker = WorkerAgentRuntime(host_address=HOST_ADDRESS)
+    worker.start()
+    worker.add_message_serializer(try_get_known_serializers_for_type(Job))
+    worker.add_message_serializer(try_get_known_serializers_for_type(Done))
+    await Busy.register(worker, "busy", lambda: Busy())
+    ready.set()
+    await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+    await worker.stop()
+
+
+def worker_process(ready: Event, stop: Event) -> None:
+    asyncio.run(run_worker(ready, stop))
+
+
+async def measure(num_workers: int, num_messages: int, num_keys: int, work_ms: float) -> float:
+    stop = mp.Event()
+    processes: List[multiprocessing.process.BaseProcess] = []
+    for _ in range(num_workers):
+        ready = mp.Event()
+        process = mp.Process(target=worker_process, args=(ready, stop))
+        process.start()
+        await asyncio.get_running_loop().run_in_executor(None, ready.wait)
+        processes.append(process)
+
+    driver = WorkerAgentRuntime(host_address=HOST_ADDRESS)
+    driver.start()
+    driver.add_message_serializer(try_get_known_serializers_for_type(Job))
+    driver.add_message_serializer(try_get_known_serializers_for_type(Done))
+    # Create the agents before measuring.
+    await asyncio.gather(*[driver.send_message(Job(0), AgentId("busy", f"key{i}")) for i in range(num_keys)])
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[driver.send_message(Job(work_ms), AgentId("busy", f"key{i % num_keys}")) for i in range(num_messages)]
+    )
+    throughput = num_messages / (time.perf_counter() - start)
+
+    await driver.stop()
+    stop.set()
+    for process in processes:
+        process.join()
+    return throughput
+
+
+async def main(workers: List[int], num_messages: int, num_keys: int, work_ms: float) -> None:
+    host = WorkerAgentRuntimeHost(address=HOST_ADDRESS)
+    host.start()
+    baseline: float | None = None
+    for num_workers in workers:
+        throughput = await measure(num_workers, num_messages, num_keys, work_ms)
+        baseline = baseline or throughput / num_workers
+        print(
+            f"{num_workers} workers: {throughput:.0f} messages/sec, "
+            f"{throughput / baseline:.2f}x the throughput of one worker"
+        )
+    await host.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark load balancing an agent type across worker processes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Numbers of workers to measure.")
+    parser.add_argument("--messages", type=int, default=2000, help="Number of messages per measurement.")
+    parser.add_argument("--keys", type=int, default=256, help="Number of distinct agent keys to send messages to.")
+    parser.add_argument("--work-ms", type=float, default=2.0, help="CPU time the agent spends on every message.")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.messages, args.keys, args.work_ms))
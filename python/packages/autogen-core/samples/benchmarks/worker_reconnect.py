@@ -0,0 +1,141 @@
+"""Benchmark for the recovery of workers from a broken connection to the host.
+
+Runs a :class:`WorkerAgentRuntimeHost`, a worker that hosts an echo agent, and
+a driver worker, which connect to the host through a TCP proxy. The driver
+sends batches of concurrent requests to the echo agent to measure the
+throughput, then the connection is broken while requests are in flight, and
+the throughput is measured again once they have completed. This is done once
+by breaking the connections at the proxy, after which the host resumes the
+sessions of the workers, and once by restarting the host, after which the
+workers register again. The time until the requests in flight completed and
+the throughput before and after the recovery are reported.
+
+Usage:
+
+    python worker_reconnect.py --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.base import AgentId, MessageContext, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, message_handler
+
+HOST_PORT = 50106
+PROXY_PORT = 50107
+
+
+@dataclass
+class Payload:
+    data: str
+
+
+class Echo(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that returns the messages it receives.")
+
+    @message_handler
+    async def on_payload(self, message: Payload, ctx: MessageContext) -> Payload:
+        return message
+
+
+class Proxy:
+    """Forwards TCP connections to the host, and breaks them on request."""
+
+    def __init__(self) -> None:
+        self._server: asyncio.Server | None = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._forward, "localhost", PROXY_PORT)
+
+    async def _forward(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        host_reader, host_writer = await asyncio.open_connection("localhost", HOST_PORT)
+        self._writers += [writer, host_writer]
+
+        async def pipe(source: asyncio.StreamReader, destination: asyncio.StreamWriter) -> None:
+            try:
+                while data := await source.read(65536):
+                    destination.write(data)
+                    await destination.drain()
+            except ConnectionError:
+                pass
+            finally:
+                destination.close()
+
+        await asyncio.gather(pipe(reader, host_writer), pipe(host_reader, writer))
+
+    def break_connections(self) -> None:
+        for writer in self._writers:
+            writer.transport.abort()
+        self._writers.clear()
+
+    async def stop(self) -> None:
+        assert self._server is not None
+        self._server.close()
+        self.break_connections()
+        await self._server.wait_closed()
+
+
+async def throughput(driver: WorkerAgentRuntime, num_requests: int, concurrency: int) -> float:
+    payload = Payload("x" * 100)
+    recipient = AgentId("echo", "default")
+    start = time.perf_counter()
+    for _ in range(0, num_requests, concurrency):
+        await asyncio.gather(*[driver.send_message(payload, recipient) for _ in range(concurrency)])
+    return num_requests / (time.perf_counter() - start)
+
+
+async def measure(restart_host: bool, num_requests: int, concurrency: int) -> None:
+    host = WorkerAgentRuntimeHost(address=f"localhost:{HOST_PORT}")
+    host.start()
+    proxy = Proxy()
+    await proxy.start()
+    worker = WorkerAgentRuntime(host_address=f"localhost:{PROXY_PORT}")
+    driver = WorkerAgentRuntime(host_address=f"localhost:{PROXY_PORT}")
+    for runtime in [worker, driver]:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(Payload))
+    await Echo.register(worker, "echo", lambda: Echo())
+
+    before = await throughput(driver, num_requests, concurrency)
+
+    in_flight = asyncio.ensure_future(throughput(driver, concurrency, concurrency))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    if restart_host:
+        await host.stop(grace=0)
+        host = WorkerAgentRuntimeHost(address=f"localhost:{HOST_PORT}")
+        host.start()
+    else:
+        proxy.break_connections()
+    await in_flight
+    recovery = time.perf_counter() - start
+
+    after = await throughput(driver, num_requests, concurrency)
+    print(
+        f"{'host restart' if restart_host else 'network failure'}: recovered in {recovery * 1000:.0f} ms, "
+        f"{before:.0f} requests/sec before, {after:.0f} requests/sec after"
+    )
+
+    for runtime in [worker, driver]:
+        await runtime.stop()
+    await proxy.stop()
+    await host.stop()
+
+
+async def main(num_requests: int, concurrency: int) -> None:
+    for restart_host in [False, True]:
+        await measure(restart_host, num_requests, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the recovery of workers from a broken connection.")
+    parser.add_argument("--requests", type=int, default=5000, help="Number of requests per measurement.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of requests sent at once.")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,148 @@
+"""Benchmark for the routing throughput of a sharded topology of hosts.
+
+Runs 1, 2 and 4 :class:`WorkerAgentRuntimeHost` processes that share the
+routing with ``hosts``. Each process also runs a worker, which registers an
+agent type owned by its host, and a driver worker, which sends requests with a
+bounded number in flight. With ``local`` traffic, every driver sends to the
+agent type of its own host, so each host routes its share of the requests
+alone. With ``uniform`` traffic, every driver sends to the agent types of all
+hosts in turn, so most requests are forwarded between hosts. The aggregate
+throughput of all drivers is reported for each number of hosts.
+
+The hosts only scale with the number of cores that run them, as each host
+process routes on one core.
+
+Usage:
+
+    python worker_sharded_hosts.py --requests 5000 --concurrency 100 --hosts 1 2 4
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import time
+from dataclasses import dataclass
+from multiprocessing.synchronize import Barrier
+from typing import List
+
+from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.application._hash_ring import HashRing
+from autogen_core.base import AgentId, MessageContext, try_get_known_serializers_for_type
+from autogen_core.components import RoutedAgent, message_handler
+
+HOST_PORTS = range(50109, 50113)
+
+
+@dataclass
+class Payload:
+    data: str
+
+
+class Echo(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that returns the messages it receives.")
+
+    @message_handler
+    async def on_payload(self, message: Payload, ctx: MessageContext) -> Payload:
+        return message
+
+
+def owned_agent_type(addresses: List[str], address: str) -> str:
+    """An agent type that the host at the address owns."""
+    ring = HashRing[str]()
+    for host_address in addresses:
+        ring.add(host_address)
+    return next(f"echo{n}" for n in range(1000) if ring.get(f"echo{n}") == address)
+
+
+async def run_host(
+    index: int, addresses: List[str], traffic: str, num_requests: int, concurrency: int, barrier: Barrier
+) -> float:
+    address = addresses[index]
+    host = WorkerAgentRuntimeHost(address=address, hosts=addresses if len(addresses) > 1 else None)
+    host.start()
+    worker = WorkerAgentRuntime(host_address=address)
+    driver = WorkerAgentRuntime(host_address=address)
+    for runtime in [worker, driver]:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(Payload))
+    await Echo.register(worker, owned_agent_type(addresses, address), lambda: Echo())
+    if traffic == "local":
+        targets = [owned_agent_type(addresses, address)]
+    else:
+        targets = [owned_agent_type(addresses, other) for other in addresses]
+    # Every agent type is registered before any driver starts.
+    await asyncio.to_thread(barrier.wait)
+
+    payload = Payload("x" * 100)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with semaphore:
+            await driver.send_message(payload, AgentId(targets[i % len(targets)], str(i)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[send(i) for i in range(num_requests)])
+    elapsed = time.perf_counter() - start
+
+    # The hosts keep routing until every driver is done.
+    await asyncio.to_thread(barrier.wait)
+    for runtime in [worker, driver]:
+        await runtime.stop()
+    await host.stop()
+    return num_requests / elapsed
+
+
+def host_process(
+    index: int,
+    addresses: List[str],
+    traffic: str,
+    num_requests: int,
+    concurrency: int,
+    barrier: Barrier,
+    results: "multiprocessing.Queue[float]",
+) -> None:
+    # The links between hosts that stop at different times break.
+    logging.getLogger("autogen_core").setLevel(logging.ERROR)
+    results.put(asyncio.run(run_host(index, addresses, traffic, num_requests, concurrency, barrier)))
+
+
+def measure(num_hosts: int, traffic: str, num_requests: int, concurrency: int) -> None:
+    context = multiprocessing.get_context("spawn")
+    addresses = [f"localhost:{port}" for port in HOST_PORTS[:num_hosts]]
+    barrier = context.Barrier(num_hosts)
+    results: "multiprocessing.Queue[float]" = context.Queue()
+    processes = [
+        context.Process(
+            target=host_process, args=(index, addresses, traffic, num_requests, concurrency, barrier, results)
+        )
+        for index in range(num_hosts)
+    ]
+    for process in processes:
+        process.start()
+    throughputs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    print(
+        f"{num_hosts} hosts, {traffic} traffic: {sum(throughputs):.0f} requests/sec in total, "
+        f"{min(throughputs):.0f}-{max(throughputs):.0f} per driver"
+    )
+
+
+def main(num_requests: int, concurrency: int, host_counts: List[int]) -> None:
+    print(f"{multiprocessing.cpu_count()} cores")
+    for num_hosts in host_counts:
+        for traffic in ["local", "uniform"] if num_hosts > 1 else ["local"]:
+            measure(num_hosts, traffic, num_requests, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the routing throughput of sharded hosts.")
+    parser.add_argument("--requests", type=int, default=5000, help="Number of requests sent by each driver.")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight per driver.")
+    parser.add_argument(
+        "--hosts", type=int, nargs="+", default=[1, 2, 4], choices=range(1, len(HOST_PORTS) + 1), help="Host counts."
+    )
+    args = parser.parse_args()
+    main(args.requests, args.concurrency, args.hosts)
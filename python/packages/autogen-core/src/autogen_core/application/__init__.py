@@ -2,8 +2,22 @@
 The :mod:`autogen_core.application` module provides implementations of core components that are used to compose an application
 """
 
+from ._agent_lifecycle import AgentLifecycleMetrics
+from ._flow_control import CreditMetrics, InFlightMetrics
+from ._helpers import SubscriptionCacheMetrics
+from ._message_queue import MessageQueueMetrics, QueueFullPolicy
 from ._single_threaded_agent_runtime import SingleThreadedAgentRuntime
 from ._worker_runtime import WorkerAgentRuntime
 from ._worker_runtime_host import WorkerAgentRuntimeHost
 
-__all__ = ["SingleThreadedAgentRuntime", "WorkerAgentRuntime", "WorkerAgentRuntimeHost"]
+__all__ = [
+    "SingleThreadedAgentRuntime",
+    "WorkerAgentRuntime",
+    "WorkerAgentRuntimeHost",
+    "QueueFullPolicy",
+    "MessageQueueMetrics",
+    "SubscriptionCacheMetrics",
+    "AgentLifecycleMetrics",
+    "InFlightMetrics",
+    "CreditMetrics",
+]
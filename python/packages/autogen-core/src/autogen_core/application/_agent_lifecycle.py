@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import time
+from asyncio import Future, Task
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Set
+
+from ..base import Agent, AgentId
+from .state import InMemoryStateStore, StateStore
+
+logger = logging.getLogger("autogen_core")
+
+
+@dataclass
+class AgentLifecycleMetrics:
+    """A snapshot of the metrics of the agent instances hosted by a runtime."""
+
+    num_instances: int
+    """The number of agent instances currently in memory."""
+
+    num_activations: int
+    """The number of agent instances that have been created."""
+
+    num_reactivations: int
+    """The number of activations that restored state saved when the agent was passivated."""
+
+    num_passivations: int
+    """The number of agent instances whose state was saved to the state store before they were released."""
+
+
+class AgentLifecycleManager:
+    """Creates agent instances on demand and passivates them when they are no longer needed.
+
+    Passivating an agent saves its state with :meth:`~autogen_core.base.Agent.save_state`, writes the state to the
+    state store and releases the instance. The next time the agent is addressed, a new instance is created by the
+    agent factory and the stored state is restored with :meth:`~autogen_core.base.Agent.load_state`, so that to
+    senders the agent appears to have existed all along.
+
+    Agents are passivated when there are more than ``max_instances`` of them, least recently used first, and
+    when they have not been used for ``idle_timeout`` seconds. Agents that are handling a message are never
+    passivated. Idle agents are passivated by a background task that runs between :meth:`start` and :meth:`stop`.
+
+    With a state store, agents that handled a message since they were last written to the store are tracked, so
+    that :meth:`checkpoint` only writes the state of the agents that changed.
+
+    Args:
+        create_agent (Callable[[AgentId], Awaitable[Agent]]): Creates a new instance of an agent.
+        max_instances (int | None, optional): The maximum number of agent instances in memory. Defaults to None, which means unbounded.
+        idle_timeout (float | None, optional): Seconds after its last use at which an agent is passivated. Defaults to None, which means agents do not expire.
+        state_store (StateStore | None, optional): The store that the state of passivated agents is written to.
+            Defaults to None, which means an :class:`~autogen_core.application.state.InMemoryStateStore` if agents can be
+            passivated, and no store otherwise.
+    """
+
+    def __init__(
+        self,
+        create_agent: Callable[[AgentId], Awaitable[Agent]],
+        max_instances: int | None = None,
+        idle_timeout: float | None = None,
+        state_store: StateStore | None = None,
+    ) -> None:
+        if max_instances is not None and max_instances < 1:
+            raise ValueError("max_instances must be at least 1.")
+        if idle_timeout is not None and idle_timeout <= 0:
+            raise ValueError("idle_timeout must be positive.")
+        self._create_agent = create_agent
+        self._max_instances = max_instances
+        self._idle_timeout = idle_timeout
+        self._evicts = max_instances is not None or idle_timeout is not None
+        if state_store is None and self._evicts:
+            state_store = InMemoryStateStore()
+        self._state_store = state_store
+        # Instances ordered from least to most recently used when agents can be passivated.
+        self._instances: OrderedDict[AgentId, Agent] = OrderedDict()
+        self._last_used: Dict[AgentId, float] = {}
+        self._num_in_use: Dict[AgentId, int] = {}
+        # Agents whose state may differ from the state in the store.
+        self._changed: Set[AgentId] = set()
+        # Futures that resolve when an agent that is being activated or passivated is ready.
+        self._activating: Dict[AgentId, Future[Agent]] = {}
+        self._passivating: Dict[AgentId, Future[None]] = {}
+        self._sweep_task: Task[None] | None = None
+        self._wake_sweeper = asyncio.Event()
+        self._num_activations = 0
+        self._num_reactivations = 0
+        self._num_passivations = 0
+
+    @property
+    def instances(self) -> List[AgentId]:
+        """The ids of the agent instances currently in memory."""
+        return list(self._instances)
+
+    @property
+    def state_store(self) -> StateStore | None:
+        return self._state_store
+
+    @property
+    def metrics(self) -> AgentLifecycleMetrics:
+        return AgentLifecycleMetrics(
+            num_instances=len(self._instances),
+            num_activations=self._num_activations,
+            num_reactivations=self._num_reactivations,
+            num_passivations=self._num_passivations,
+        )
+
+    def start(self) -> None:
+        """Start passivating idle agents in the background, if an idle timeout is set."""
+        if self._idle_timeout is not None and self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_idle_agents())
+
+    async def stop(self) -> None:
+        """Stop passivating idle agents in the background. Agent instances are kept."""
+        if self._sweep_task is None:
+            return
+        self._sweep_task.cancel()
+        try:
+            await self._sweep_task
+        except asyncio.CancelledError:
+            pass
+        self._sweep_task = None
+
+    async def get(self, agent_id: AgentId) -> Agent:
+        """Get the instance of an agent, activating it if it is not in memory."""
+        agent = self._instances.get(agent_id)
+        if agent is None:
+            return await self._activate(agent_id)
+        if self._evicts:
+            self._touch(agent_id)
+        return agent
+
+    @contextmanager
+    def in_use(self, agent_id: AgentId) -> Iterator[None]:
+        """Mark an agent as handling a message while the context is active. The agent is not passivated until the
+        context exits, and it is then considered changed since its last checkpoint."""
+        try:
+            with self._hold(agent_id):
+                yield
+        finally:
+            if agent_id in self._instances:
+                self.mark_changed(agent_id)
+                if self._evicts:
+                    self._touch(agent_id)
+
+    def mark_changed(self, agent_id: AgentId) -> None:
+        """Mark the state of an agent as changed since its last checkpoint."""
+        if self._state_store is not None:
+            self._changed.add(agent_id)
+
+    @contextmanager
+    def _hold(self, agent_id: AgentId) -> Iterator[None]:
+        self._pin(agent_id)
+        try:
+            yield
+        finally:
+            self._unpin(agent_id)
+
+    def _pin(self, agent_id: AgentId) -> None:
+        self._num_in_use[agent_id] = self._num_in_use.get(agent_id, 0) + 1
+
+    def _unpin(self, agent_id: AgentId) -> None:
+        remaining = self._num_in_use[agent_id] - 1
+        if remaining == 0:
+            del self._num_in_use[agent_id]
+        else:
+            self._num_in_use[agent_id] = remaining
+
+    def _touch(self, agent_id: AgentId) -> None:
+        self._instances.move_to_end(agent_id)
+        if self._idle_timeout is not None:
+            self._last_used[agent_id] = time.monotonic()
+            self._wake_sweeper.set()
+
+    async def _activate(self, agent_id: AgentId) -> Agent:
+        # Wait for a concurrent activation or passivation of the same agent instead of creating a second instance.
+        while True:
+            passivating = self._passivating.get(agent_id)
+            if passivating is not None:
+                await passivating
+                continue
+            activating = self._activating.get(agent_id)
+            if activating is not None:
+                return await asyncio.shield(activating)
+            agent = self._instances.get(agent_id)
+            if agent is not None:
+                if self._evicts:
+                    self._touch(agent_id)
+                return agent
+            break
+
+        future: Future[Agent] = asyncio.get_running_loop().create_future()
+        self._activating[agent_id] = future
+        try:
+            agent = await self._create_agent(agent_id)
+            state = await self._state_store.get(agent_id) if self._state_store is not None else None
+            if state is not None:
+                await agent.load_state(state)
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved, it is raised to the caller below.
+            future.exception()
+            raise
+        finally:
+            del self._activating[agent_id]
+
+        self._instances[agent_id] = agent
+        self._num_activations += 1
+        if state is not None:
+            self._num_reactivations += 1
+        if self._evicts:
+            self._touch(agent_id)
+        future.set_result(agent)
+
+        if self._max_instances is not None and len(self._instances) > self._max_instances:
+            # Keep the new agent in memory while making room for it.
+            with self._hold(agent_id):
+                await self._passivate_least_recently_used()
+        return agent
+
+    async def _passivate_least_recently_used(self) -> None:
+        assert self._max_instances is not None
+        candidates = [agent_id for agent_id in self._instances if agent_id not in self._num_in_use]
+        num_excess = len(self._instances) - self._max_instances
+        for agent_id in candidates[:num_excess]:
+            await self._passivate(agent_id)
+
+    async def passivate_idle_agents(self) -> None:
+        """Passivate the agents that have not been used for longer than the idle timeout."""
+        if self._idle_timeout is None:
+            return
+        deadline = time.monotonic() - self._idle_timeout
+        expired = [
+            agent_id
+            for agent_id in self._instances
+            if agent_id not in self._num_in_use and self._last_used[agent_id] <= deadline
+        ]
+        for agent_id in expired:
+            await self._passivate(agent_id)
+
+    async def _passivate(self, agent_id: AgentId) -> None:
+        # The agent may have been used or passivated while an earlier agent was being passivated.
+        agent = self._instances.get(agent_id)
+        if agent is None or agent_id in self._num_in_use:
+            return
+        assert self._state_store is not None
+        del self._instances[agent_id]
+        self._last_used.pop(agent_id, None)
+        self._changed.discard(agent_id)
+        done: Future[None] = asyncio.get_running_loop().create_future()
+        self._passivating[agent_id] = done
+        try:
+            state = await agent.save_state()
+            await self._state_store.put(agent_id, state)
+        except BaseException as e:
+            # Keep the instance rather than lose its state.
+            self._instances[agent_id] = agent
+            self._changed.add(agent_id)
+            self._touch(agent_id)
+            if not isinstance(e, Exception):
+                raise
+            logger.error(f"Failed to passivate agent {agent_id}, keeping it in memory.", exc_info=True)
+        else:
+            self._num_passivations += 1
+        finally:
+            del self._passivating[agent_id]
+            done.set_result(None)
+
+    async def checkpoint(self, batch_size: int = 1000) -> int:
+        """Write the state of the agents that changed since their last checkpoint to the state store.
+
+        States are saved and written in batches, so the whole checkpoint is never held in memory at once, and
+        agents keep handling messages between batches.
+
+        Args:
+            batch_size (int, optional): The number of agent states written to the store at once. Defaults to 1000.
+
+        Returns:
+            int: The number of agents whose state was written.
+        """
+        if self._state_store is None:
+            raise RuntimeError("No state store is configured.")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        changed = list(self._changed)
+        num_written = 0
+        for start in range(0, len(changed), batch_size):
+            states: Dict[AgentId, Mapping[str, Any]] = {}
+            # The agents in the batch are not passivated until it is written, so that passivation cannot write a
+            # newer state that the batch then overwrites.
+            pinned: List[AgentId] = []
+            try:
+                for agent_id in changed[start : start + batch_size]:
+                    agent = self._instances.get(agent_id)
+                    if agent is None or agent_id not in self._changed:
+                        # Passivated or written since the checkpoint started.
+                        continue
+                    self._pin(agent_id)
+                    pinned.append(agent_id)
+                    # Changes made while the state is being written mark the agent as changed again.
+                    self._changed.discard(agent_id)
+                    states[agent_id] = await agent.save_state()
+                await self._state_store.put_many(states)
+            except BaseException:
+                self._changed.update(agent_id for agent_id in pinned if agent_id in self._instances)
+                raise
+            finally:
+                for agent_id in pinned:
+                    self._unpin(agent_id)
+            num_written += len(states)
+        return num_written
+
+    def _next_expiry(self) -> float | None:
+        assert self._idle_timeout is not None
+        # Instances are ordered by last use, so the first one that is not in use expires first.
+        for agent_id in self._instances:
+            if agent_id not in self._num_in_use:
+                return self._last_used[agent_id] + self._idle_timeout
+        return None
+
+    async def _sweep_idle_agents(self) -> None:
+        while True:
+            self._wake_sweeper.clear()
+            expiry = self._next_expiry()
+            if expiry is None:
+                await self._wake_sweeper.wait()
+                continue
+            delay = expiry - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.passivate_idle_agents()
+            except Exception:
+                logger.error("Error passivating idle agents", exc_info=True)
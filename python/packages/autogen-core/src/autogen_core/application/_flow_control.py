@@ -0,0 +1,168 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class InFlightMetrics:
+    """A snapshot of the requests and events that a worker received from the host and is handling."""
+
+    in_flight: int
+    """The number of requests and events being handled, including those waiting in the mailboxes of their agents."""
+
+    peak_in_flight: int
+    """The largest number of requests and events that have been handled at once."""
+
+    max_in_flight: int | None
+    """The number of credits that the worker grants the host, or None if it does not limit the host."""
+
+    num_credits_returned: int
+    """The number of credits returned to the host for handled requests and events."""
+
+
+@dataclass
+class CreditMetrics:
+    """A snapshot of the flow control of the messages that the host sends to a worker."""
+
+    credits: int | None
+    """The number of requests and events that the worker can still be sent, or None if it does not limit the host."""
+
+    num_waiting: int
+    """The number of requests and events queued for the worker."""
+
+    num_credit_stalls: int
+    """The number of times that requests or events waited because the worker had no credits left."""
+
+    credit_stall_time: float
+    """The total time, in seconds, that requests or events waited because the worker had no credits left."""
+
+
+class CreditQueue(Generic[T]):
+    """A FIFO queue of messages for a receiver that grants credits for the messages it handles.
+
+    Flow controlled items, added with :meth:`put_credited`, use one credit each when they are dequeued, and are only
+    dequeued while credits are left. Items added with :meth:`put_nowait` do not use credits and are dequeued before
+    flow controlled items, so that messages that complete work, such as responses, are not held back by the work
+    they complete.
+
+    Args:
+        credits (int | None, optional): The initial credits. Defaults to None, which means flow controlled items are
+            not limited.
+    """
+
+    def __init__(self, credits: int | None = None) -> None:
+        if credits is not None and credits < 0:
+            raise ValueError("Credits must not be negative.")
+        self._credits = credits
+        self._items: Deque[T] = deque()
+        self._credited_items: Deque[T] = deque()
+        self._available = asyncio.Event()
+        # The time at which flow controlled items started waiting for credits, while they do.
+        self._stalled_since: float | None = None
+        self._num_credit_stalls = 0
+        self._credit_stall_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items) + len(self._credited_items)
+
+    @property
+    def credits(self) -> int | None:
+        return self._credits
+
+    @property
+    def metrics(self) -> CreditMetrics:
+        stall_time = self._credit_stall_time
+        if self._stalled_since is not None:
+            stall_time += time.perf_counter() - self._stalled_since
+        return CreditMetrics(
+            credits=self._credits,
+            num_waiting=len(self._credited_items),
+            num_credit_stalls=self._num_credit_stalls,
+            credit_stall_time=stall_time,
+        )
+
+    def put_nowait(self, item: T) -> None:
+        """Add an item that does not use credits."""
+        self._items.append(item)
+        self._available.set()
+
+    def put_credited(self, item: T) -> None:
+        """Add an item that uses a credit when it is dequeued."""
+        self._credited_items.append(item)
+        if self._credits == 0:
+            self._on_stalled()
+        else:
+            self._available.set()
+
+    def put_front(self, item: T) -> None:
+        """Return an item that was dequeued but could not be delivered to the front of the queue. It does not use
+        a credit again."""
+        self._items.appendleft(item)
+        self._available.set()
+
+    def add_credits(self, count: int) -> None:
+        """Grant the receiver more credits. Does nothing if the credits are not limited."""
+        if self._credits is None or count <= 0:
+            return
+        self._credits += count
+        if self._stalled_since is not None:
+            self._credit_stall_time += time.perf_counter() - self._stalled_since
+            self._stalled_since = None
+        if len(self._credited_items) > 0:
+            self._available.set()
+
+    def remove(self, item: T) -> bool:
+        """Remove a flow controlled item that has not been dequeued yet.
+
+        Returns:
+            bool: Whether the item was in the queue.
+        """
+        for index, queued in enumerate(self._credited_items):
+            if queued is item:
+                del self._credited_items[index]
+                return True
+        return False
+
+    def drain(self) -> Tuple[List[T], List[T]]:
+        """Remove and return all items, those that do not use credits first and then the flow controlled ones."""
+        items, credited_items = list(self._items), list(self._credited_items)
+        self._items.clear()
+        self._credited_items.clear()
+        self._available.clear()
+        return items, credited_items
+
+    def _on_stalled(self) -> None:
+        if self._stalled_since is None:
+            self._stalled_since = time.perf_counter()
+            self._num_credit_stalls += 1
+
+    def get_nowait(self) -> T:
+        """Remove and return the next item that can be sent.
+
+        Raises:
+            asyncio.QueueEmpty: If the queue is empty, or only has flow controlled items and no credits are left.
+        """
+        if len(self._items) > 0:
+            item = self._items.popleft()
+        elif len(self._credited_items) > 0 and self._credits != 0:
+            item = self._credited_items.popleft()
+            if self._credits is not None:
+                self._credits -= 1
+                if self._credits == 0 and len(self._credited_items) > 0:
+                    self._on_stalled()
+        else:
+            self._available.clear()
+            raise asyncio.QueueEmpty()
+        return item
+
+    async def get(self) -> T:
+        """Remove and return the next item that can be sent, waiting until there is one."""
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                await self._available.wait()
@@ -0,0 +1,71 @@
+import bisect
+import hashlib
+from typing import Dict, Generic, List, Set, TypeVar
+
+T = TypeVar("T")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing(Generic[T]):
+    """A consistent hash ring that assigns keys to nodes.
+
+    Each node is placed on the ring at ``replicas`` points, and a key is assigned to the node at the first
+    point after the hash of the key. A key stays assigned to the same node as long as that node is on the ring,
+    and when a node is added or removed only the keys on the affected arcs of the ring move, about
+    ``1 / len(nodes)`` of them.
+
+    Args:
+        replicas (int, optional): The number of points of each node on the ring. More points spread keys more
+            evenly across nodes. Defaults to 100.
+    """
+
+    def __init__(self, replicas: int = 100) -> None:
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1.")
+        self._replicas = replicas
+        self._nodes: Set[T] = set()
+        self._points: List[int] = []
+        self._owners: Dict[int, T] = {}
+
+    @property
+    def nodes(self) -> Set[T]:
+        return set(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: object) -> bool:
+        return node in self._nodes
+
+    def add(self, node: T) -> None:
+        if node in self._nodes:
+            raise ValueError(f"Node {node} is already on the ring.")
+        self._nodes.add(node)
+        for replica in range(self._replicas):
+            point = _hash(f"{node}:{replica}")
+            # Collisions are resolved in favor of the node that was added first.
+            if point not in self._owners:
+                self._owners[point] = node
+                bisect.insort(self._points, point)
+
+    def remove(self, node: T) -> None:
+        self._nodes.remove(node)
+        points = [point for point, owner in self._owners.items() if owner == node]
+        for point in points:
+            del self._owners[point]
+        removed = set(points)
+        self._points = [point for point in self._points if point not in removed]
+
+    def get(self, key: str) -> T:
+        """Get the node that a key is assigned to.
+
+        Raises:
+            LookupError: If the ring has no nodes.
+        """
+        if not self._points:
+            raise LookupError("The ring has no nodes.")
+        index = bisect.bisect(self._points, _hash(key))
+        return self._owners[self._points[index % len(self._points)]]
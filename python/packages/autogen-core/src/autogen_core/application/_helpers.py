@@ -1,11 +1,17 @@
-from collections import defaultdict
-from typing import Awaitable, Callable, DefaultDict, List, Set
+import inspect
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, DefaultDict, Dict, List, Sequence, Set, Tuple
 
 from ..base._agent import Agent
 from ..base._agent_id import AgentId
+from ..base._agent_runtime import AgentRuntime
 from ..base._agent_type import AgentType
 from ..base._subscription import Subscription
 from ..base._topic import TopicId
+from ..components._type_prefix_subscription import TypePrefixSubscription
+from ..components._type_subscription import TypeSubscription
 
 
 async def get_impl(
@@ -29,46 +35,222 @@ async def get_impl(
     return id
 
 
+class AgentFactory:
+    """An agent factory registered with a runtime.
+
+    The signature of the factory is inspected once, when it is registered, rather than every time an agent is
+    instantiated."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]],
+    ) -> None:
+        self.factory = factory
+        self.num_parameters = len(inspect.signature(factory).parameters)
+
+    def __call__(self, *args: Any) -> Agent | Awaitable[Agent]:
+        return self.factory(*args)  # type: ignore[arg-type]
+
+
+@dataclass
+class SubscriptionCacheMetrics:
+    """A snapshot of the metrics of the topic recipient cache of a :class:`SubscriptionManager`."""
+
+    size: int
+    """The number of topics whose recipients are cached."""
+
+    hits: int
+    """The number of recipient lookups served from the cache."""
+
+    misses: int
+    """The number of recipient lookups that had to be computed."""
+
+    evictions: int
+    """The number of topics evicted from the cache because of the size limit or the TTL."""
+
+
 class SubscriptionManager:
-    def __init__(self) -> None:
-        self._subscriptions: List[Subscription] = []
-        self._seen_topics: Set[TopicId] = set()
-        self._subscribed_recipients: DefaultDict[TopicId, List[AgentId]] = defaultdict(list)
+    """Stores subscriptions and resolves the recipients of topics.
+
+    :class:`~autogen_core.components.TypeSubscription` and
+    :class:`~autogen_core.components.TypePrefixSubscription` are indexed by topic type and prefix, so
+    adding or removing them only updates the cached recipients of topics with a matching type, and
+    duplicate checks are constant time. Other subscriptions are matched against topics one by one.
+    The recipients of a topic are computed once, cached, and updated incrementally when a matching
+    subscription is added or removed.
+
+    The recipient cache can be bounded, which keeps memory flat when every conversation publishes to
+    fresh topics. Evicted topics are recomputed from the index the next time they are published to.
+
+    Args:
+        max_cached_topics (int | None, optional): The maximum number of topics whose recipients are cached.
+            The least recently used topic is evicted when the limit is exceeded. Defaults to None, which means unbounded.
+        cached_topic_ttl (float | None, optional): Seconds after its last use at which a cached topic is evicted.
+            Defaults to None, which means topics do not expire.
+    """
+
+    def __init__(self, max_cached_topics: int | None = None, cached_topic_ttl: float | None = None) -> None:
+        if max_cached_topics is not None and max_cached_topics < 1:
+            raise ValueError("max_cached_topics must be at least 1.")
+        if cached_topic_ttl is not None and cached_topic_ttl <= 0:
+            raise ValueError("cached_topic_ttl must be positive.")
+        # Subscriptions by id, in the order they were added.
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        self._type_subscriptions: DefaultDict[str, Dict[str, TypeSubscription]] = defaultdict(dict)
+        self._prefix_subscriptions: DefaultDict[str, Dict[str, TypePrefixSubscription]] = defaultdict(dict)
+        self._other_subscriptions: Dict[str, Subscription] = {}
+        # Keys of indexed subscriptions, used to detect duplicates.
+        self._subscription_keys: Set[Tuple[str, str, str]] = set()
+        # Cached recipients by topic, ordered from least to most recently used when the cache is bounded.
+        self._subscribed_recipients: OrderedDict[TopicId, List[AgentId]] = OrderedDict()
+        self._seen_topics_by_type: DefaultDict[str, Set[TopicId]] = defaultdict(set)
+        self._max_cached_topics = max_cached_topics
+        self._cached_topic_ttl = cached_topic_ttl
+        self._last_used: Dict[TopicId, float] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+
+    @property
+    def subscriptions(self) -> Sequence[Subscription]:
+        return list(self._subscriptions.values())
+
+    @property
+    def cache_metrics(self) -> SubscriptionCacheMetrics:
+        return SubscriptionCacheMetrics(
+            size=len(self._subscribed_recipients),
+            hits=self._cache_hits,
+            misses=self._cache_misses,
+            evictions=self._cache_evictions,
+        )
+
+    @staticmethod
+    def _key(subscription: Subscription) -> Tuple[str, str, str] | None:
+        if isinstance(subscription, TypeSubscription):
+            return ("type", subscription.topic_type, subscription.agent_type)
+        if isinstance(subscription, TypePrefixSubscription):
+            return ("prefix", subscription.topic_type_prefix, subscription.agent_type)
+        return None
 
     async def add_subscription(self, subscription: Subscription) -> None:
         # Check if the subscription already exists
-        if any(sub == subscription for sub in self._subscriptions):
+        key = self._key(subscription)
+        if (
+            subscription.id in self._subscriptions
+            or (key is not None and key in self._subscription_keys)
+            or any(sub == subscription for sub in self._other_subscriptions.values())
+        ):
             raise ValueError("Subscription already exists")
 
-        self._subscriptions.append(subscription)
-        self._rebuild_subscriptions(self._seen_topics)
+        self._subscriptions[subscription.id] = subscription
+        self._order[subscription.id] = self._next_order
+        self._next_order += 1
+        if isinstance(subscription, TypeSubscription):
+            self._type_subscriptions[subscription.topic_type][subscription.id] = subscription
+        elif isinstance(subscription, TypePrefixSubscription):
+            self._prefix_subscriptions[subscription.topic_type_prefix][subscription.id] = subscription
+        else:
+            self._other_subscriptions[subscription.id] = subscription
+        if key is not None:
+            self._subscription_keys.add(key)
+
+        # The new subscription is the most recently added, so its recipient goes last. Lists are replaced
+        # rather than mutated because callers may be iterating over them.
+        for topic in self._affected_topics(subscription):
+            if subscription.is_match(topic):
+                recipients = self._subscribed_recipients[topic]
+                self._subscribed_recipients[topic] = [*recipients, subscription.map_to_agent(topic)]
 
     async def remove_subscription(self, id: str) -> None:
         # Check if the subscription exists
-        if not any(sub.id == id for sub in self._subscriptions):
+        subscription = self._subscriptions.pop(id, None)
+        if subscription is None:
             raise ValueError("Subscription does not exist")
 
-        def is_not_sub(x: Subscription) -> bool:
-            return x.id != id
-
-        self._subscriptions = list(filter(is_not_sub, self._subscriptions))
+        del self._order[id]
+        if isinstance(subscription, TypeSubscription):
+            subscriptions = self._type_subscriptions[subscription.topic_type]
+            del subscriptions[id]
+            if len(subscriptions) == 0:
+                del self._type_subscriptions[subscription.topic_type]
+        elif isinstance(subscription, TypePrefixSubscription):
+            prefix_subscriptions = self._prefix_subscriptions[subscription.topic_type_prefix]
+            del prefix_subscriptions[id]
+            if len(prefix_subscriptions) == 0:
+                del self._prefix_subscriptions[subscription.topic_type_prefix]
+        else:
+            del self._other_subscriptions[id]
+        key = self._key(subscription)
+        if key is not None:
+            self._subscription_keys.discard(key)
 
-        # Rebuild the subscriptions
-        self._rebuild_subscriptions(self._seen_topics)
+        for topic in self._affected_topics(subscription):
+            if subscription.is_match(topic):
+                recipients = list(self._subscribed_recipients[topic])
+                recipients.remove(subscription.map_to_agent(topic))
+                self._subscribed_recipients[topic] = recipients
 
     async def get_subscribed_recipients(self, topic: TopicId) -> List[AgentId]:
-        if topic not in self._seen_topics:
-            self._build_for_new_topic(topic)
-        return self._subscribed_recipients[topic]
-
-    # TODO: optimize this...
-    def _rebuild_subscriptions(self, topics: Set[TopicId]) -> None:
-        self._subscribed_recipients.clear()
-        for topic in topics:
-            self._build_for_new_topic(topic)
-
-    def _build_for_new_topic(self, topic: TopicId) -> None:
-        self._seen_topics.add(topic)
-        for subscription in self._subscriptions:
-            if subscription.is_match(topic):
-                self._subscribed_recipients[topic].append(subscription.map_to_agent(topic))
+        if self._cached_topic_ttl is not None:
+            now = time.monotonic()
+            self._evict_expired(now)
+            self._last_used[topic] = now
+        recipients = self._subscribed_recipients.get(topic)
+        if recipients is not None:
+            self._cache_hits += 1
+            if self._max_cached_topics is not None or self._cached_topic_ttl is not None:
+                self._subscribed_recipients.move_to_end(topic)
+            return recipients
+
+        self._cache_misses += 1
+        self._seen_topics_by_type[topic.type].add(topic)
+        recipients = self._subscribed_recipients[topic] = self._build_for_topic(topic)
+        if self._max_cached_topics is not None:
+            while len(self._subscribed_recipients) > self._max_cached_topics:
+                self._evict_oldest()
+        return recipients
+
+    def _evict_expired(self, now: float) -> None:
+        assert self._cached_topic_ttl is not None
+        # Entries are ordered by last use, so expired entries are at the front.
+        while len(self._subscribed_recipients) > 0:
+            oldest = next(iter(self._subscribed_recipients))
+            if now - self._last_used[oldest] < self._cached_topic_ttl:
+                break
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        topic, _ = self._subscribed_recipients.popitem(last=False)
+        self._last_used.pop(topic, None)
+        topics = self._seen_topics_by_type[topic.type]
+        topics.discard(topic)
+        if len(topics) == 0:
+            del self._seen_topics_by_type[topic.type]
+        self._cache_evictions += 1
+
+    def _affected_topics(self, subscription: Subscription) -> List[TopicId]:
+        if isinstance(subscription, TypeSubscription):
+            return list(self._seen_topics_by_type.get(subscription.topic_type, ()))
+        if isinstance(subscription, TypePrefixSubscription):
+            prefix = subscription.topic_type_prefix
+            return [
+                topic
+                for topic_type, topics in self._seen_topics_by_type.items()
+                if topic_type.startswith(prefix)
+                for topic in topics
+            ]
+        return list(self._subscribed_recipients.keys())
+
+    def _build_for_topic(self, topic: TopicId) -> List[AgentId]:
+        matches: List[Subscription] = list(self._type_subscriptions.get(topic.type, {}).values())
+        if len(self._prefix_subscriptions) > 0:
+            for end in range(len(topic.type) + 1):
+                prefix_subscriptions = self._prefix_subscriptions.get(topic.type[:end])
+                if prefix_subscriptions is not None:
+                    matches.extend(prefix_subscriptions.values())
+        matches.extend(sub for sub in self._other_subscriptions.values() if sub.is_match(topic))
+        # Keep the recipients in the order the subscriptions were added.
+        matches.sort(key=lambda sub: self._order[sub.id])
+        return [subscription.map_to_agent(topic) for subscription in matches]
@@ -0,0 +1,152 @@
+import asyncio
+import functools
+from asyncio import CancelledError, Future, Task
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Deque, Dict, Mapping, Set, Tuple, TypeVar
+
+from ..base import AgentId
+
+T = TypeVar("T")
+
+# The agents whose handlers the current call runs within, from the outermost to the innermost, as far as they were
+# started by a mailbox scheduler.
+_handling_agents: ContextVar[Tuple[AgentId, ...]] = ContextVar("_handling_agents", default=())
+
+
+def handling_agents() -> Tuple[AgentId, ...]:
+    """The agents whose handlers the current call runs within, from the outermost to the innermost."""
+    return _handling_agents.get()
+
+
+@dataclass
+class _Mailbox:
+    active: int = 0
+    pending: Deque[Tuple[Callable[[], Coroutine[Any, Any, Any]], Future[Any]]] = field(default_factory=deque)
+
+
+class MailboxScheduler:
+    """Schedules message handler invocations for agents, running at most ``max_concurrency``
+    handlers at once for each agent instance.
+
+    Invocations beyond the limit wait in the agent's mailbox, in FIFO order, and are only turned into
+    tasks when a running handler of the same agent finishes. Agent types without a limit have their
+    invocations started as tasks immediately.
+
+    A handler that waits for a request to its own agent, directly or through other agents that call
+    back (A to B to A), waits for a slot that it holds itself. Invocations are submitted with the
+    agents that the request was sent from within, and :meth:`is_reentrant` tells when such a request
+    would wait forever, so that the runtime can fail it instead.
+
+    Args:
+        max_concurrency (int | Mapping[str, int] | None): The limit for every agent, or a mapping from
+            agent type to the limit for that type. None means no limit.
+    """
+
+    def __init__(self, max_concurrency: int | Mapping[str, int] | None = None) -> None:
+        limits = [max_concurrency] if isinstance(max_concurrency, int) else (max_concurrency or {}).values()
+        if any(limit < 1 for limit in limits):
+            raise ValueError("Max concurrency must be at least 1.")
+        self._default_limit = max_concurrency if isinstance(max_concurrency, int) else None
+        self._limits: Dict[str, int] = {} if isinstance(max_concurrency, int) else dict(max_concurrency or {})
+        self._mailboxes: Dict[AgentId, _Mailbox] = {}
+        self._tasks: Set[Task[Any]] = set()
+
+    def max_concurrency(self, agent_type: str) -> int | None:
+        return self._limits.get(agent_type, self._default_limit)
+
+    @property
+    def num_queued(self) -> int:
+        """The number of invocations waiting in mailboxes."""
+        return sum(len(mailbox.pending) for mailbox in self._mailboxes.values())
+
+    def is_reentrant(self, agent_id: AgentId, callers: Tuple[AgentId, ...]) -> bool:
+        """Whether a request to an agent, sent from within the handlers of the callers, would wait forever because
+        the callers hold all of the agent's slots while they wait for the request."""
+        limit = self.max_concurrency(agent_id.type)
+        return limit is not None and callers.count(agent_id) >= limit
+
+    def submit(
+        self, agent_id: AgentId, invocation: Callable[[], Coroutine[Any, Any, T]], callers: Tuple[AgentId, ...] = ()
+    ) -> Future[T]:
+        """Schedule a handler invocation for an agent.
+
+        Args:
+            agent_id (AgentId): The agent whose handler is invoked.
+            invocation (Callable[[], Coroutine[Any, Any, T]]): Invokes the handler.
+            callers (Tuple[AgentId, ...], optional): The agents whose handlers the message was sent from within, as
+                returned by :func:`handling_agents`. Defaults to no agents.
+
+        Returns:
+            Future[T]: A future that resolves to the result of the invocation. Cancelling it before the
+            invocation has started removes the invocation from the mailbox.
+        """
+        limit = self.max_concurrency(agent_id.type)
+        handling = callers + (agent_id,)
+        if limit is None:
+            return self._create_task(self._invoke(handling, invocation))
+
+        mailbox = self._mailboxes.get(agent_id)
+        if mailbox is None:
+            mailbox = self._mailboxes[agent_id] = _Mailbox()
+        future: Future[T] = asyncio.get_running_loop().create_future()
+        if mailbox.active < limit:
+            self._start(agent_id, mailbox, functools.partial(self._invoke, handling, invocation), future)
+        else:
+            mailbox.pending.append((functools.partial(self._invoke, handling, invocation), future))
+        return future
+
+    @staticmethod
+    async def _invoke(handling: Tuple[AgentId, ...], invocation: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        # Runs in the task of the invocation, so the agents are only visible to the handler and what it calls.
+        _handling_agents.set(handling)
+        return await invocation()
+
+    def _create_task(self, coro: Coroutine[Any, Any, T]) -> Task[T]:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _start(
+        self,
+        agent_id: AgentId,
+        mailbox: _Mailbox,
+        invocation: Callable[[], Coroutine[Any, Any, Any]],
+        future: Future[Any],
+    ) -> None:
+        mailbox.active += 1
+        self._create_task(self._run(agent_id, mailbox, invocation, future))
+
+    async def _run(
+        self,
+        agent_id: AgentId,
+        mailbox: _Mailbox,
+        invocation: Callable[[], Coroutine[Any, Any, Any]],
+        future: Future[Any],
+    ) -> None:
+        try:
+            result = await invocation()
+        except CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            mailbox.active -= 1
+            self._start_pending(agent_id, mailbox)
+
+    def _start_pending(self, agent_id: AgentId, mailbox: _Mailbox) -> None:
+        limit = self.max_concurrency(agent_id.type) or 1
+        while len(mailbox.pending) > 0 and mailbox.active < limit:
+            invocation, future = mailbox.pending.popleft()
+            if future.cancelled():
+                continue
+            self._start(agent_id, mailbox, invocation, future)
+        if mailbox.active == 0 and len(mailbox.pending) == 0:
+            del self._mailboxes[agent_id]
@@ -0,0 +1,160 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Iterable, List, TypeVar
+
+from ._flow_control import CreditQueue
+from ._message_queue import MessageQueue
+from ._wire_format import encode_batch_message
+from .protos import agent_worker_pb2
+
+T = TypeVar("T")
+
+# Marks the end of the messages in a send queue.
+_END_OF_STREAM: Any = object()
+
+
+def unbatch(message: agent_worker_pb2.Message) -> Iterable[agent_worker_pb2.Message]:
+    """The messages carried by a message received from the stream, which may be a batch."""
+    if message.WhichOneof("message") == "batch":
+        return message.batch.messages
+    return (message,)
+
+
+def end_stream(queue: "asyncio.Queue[Any] | MessageQueue[Any] | CreditQueue[Any]") -> None:
+    """Mark the end of the messages in a send queue. Batchers of the queue stop when they reach the mark, after sending
+    the messages before it. The mark is added without waiting for space or credits, and ahead of the regular items of a
+    :class:`MessageQueue`."""
+    if isinstance(queue, MessageQueue):
+        queue.put_priority(_END_OF_STREAM)
+    else:
+        queue.put_nowait(_END_OF_STREAM)
+
+
+class BaseMessageBatcher(ABC, AsyncIterator[T]):
+    """Takes messages from a send queue and combines them into batches, so that they are sent to the other end of
+    a stream in one frame.
+
+    A batch is flushed when it has ``max_batch_size`` messages, when adding the next message would take it over
+    ``max_batch_bytes``, or when no further message arrived within ``batch_interval`` seconds of the first one.
+    With an interval of 0, only the messages that are already queued are batched, so no message waits for a
+    batch to fill up. A batch of one message is sent as the message itself.
+
+    The batch being filled is kept by the batcher, so that no message is lost when the task iterating over it is
+    cancelled. The next iteration continues the batch.
+
+    Args:
+        queue (asyncio.Queue[T] | MessageQueue[T] | CreditQueue[T]): The send queue.
+        max_batch_size (int, optional): The maximum number of messages in a batch. Defaults to 1, which means no batching.
+        batch_interval (float, optional): Seconds to wait for more messages after the first message of a batch.
+            Defaults to 0.
+        max_batch_bytes (int, optional): The maximum serialized size of a batch. A single message larger than this is
+            sent on its own. Defaults to 1 MiB, well below the default gRPC message size limit of 4 MiB.
+    """
+
+    def __init__(
+        self,
+        queue: "asyncio.Queue[T] | MessageQueue[T] | CreditQueue[T]",
+        max_batch_size: int = 1,
+        batch_interval: float = 0.0,
+        max_batch_bytes: int = 2**20,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        if batch_interval < 0:
+            raise ValueError("batch_interval must not be negative.")
+        self._queue = queue
+        self._max_batch_size = max_batch_size
+        self._batch_interval = batch_interval
+        self._max_batch_bytes = max_batch_bytes
+        # The batch being filled, and the time at which it is flushed.
+        self._batch: List[T] = []
+        self._batch_bytes = 0
+        self._deadline = 0.0
+        # A message that did not fit in the previous batch, and starts the next one.
+        self._carry_over: T | None = None
+        self._ended = False
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        return self
+
+    def take_pending(self) -> List[T]:
+        """Remove and return the messages that were taken from the queue but not returned in a batch yet."""
+        pending = self._batch
+        if self._carry_over is not None:
+            pending.append(self._carry_over)
+        self._batch = []
+        self._carry_over = None
+        return pending
+
+    @abstractmethod
+    def _size(self, message: T) -> int: ...
+
+    @abstractmethod
+    def _combine(self, batch: List[T]) -> T: ...
+
+    async def _next_message(self, deadline: float) -> T | None:
+        try:
+            return self._queue.get_nowait()
+        except (asyncio.QueueEmpty, IndexError):
+            pass
+        timeout = deadline - asyncio.get_running_loop().time()
+        if timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __anext__(self) -> T:
+        if self._ended:
+            raise StopAsyncIteration
+        if len(self._batch) == 0:
+            first = self._carry_over if self._carry_over is not None else await self._queue.get()
+            self._carry_over = None
+            if first is _END_OF_STREAM:
+                self._ended = True
+                raise StopAsyncIteration
+            if self._max_batch_size == 1:
+                return first
+            self._batch.append(first)
+            self._batch_bytes = self._size(first)
+            self._deadline = asyncio.get_running_loop().time() + self._batch_interval
+
+        while len(self._batch) < self._max_batch_size:
+            message = await self._next_message(self._deadline)
+            if message is None:
+                break
+            if message is _END_OF_STREAM:
+                self._ended = True
+                break
+            message_bytes = self._size(message)
+            if self._batch_bytes + message_bytes > self._max_batch_bytes:
+                self._carry_over = message
+                break
+            self._batch.append(message)
+            self._batch_bytes += message_bytes
+
+        batch, self._batch = self._batch, []
+        if len(batch) == 1:
+            return batch[0]
+        return self._combine(batch)
+
+
+class MessageBatcher(BaseMessageBatcher[agent_worker_pb2.Message]):
+    """Batches messages. See :class:`BaseMessageBatcher` for the arguments."""
+
+    def _size(self, message: agent_worker_pb2.Message) -> int:
+        return message.ByteSize()
+
+    def _combine(self, batch: List[agent_worker_pb2.Message]) -> agent_worker_pb2.Message:
+        return agent_worker_pb2.Message(batch=agent_worker_pb2.MessageBatch(messages=batch))
+
+
+class EncodedMessageBatcher(BaseMessageBatcher[bytes]):
+    """Batches encoded messages, without decoding them. See :class:`BaseMessageBatcher` for the arguments."""
+
+    def _size(self, message: bytes) -> int:
+        return len(message)
+
+    def _combine(self, batch: List[bytes]) -> bytes:
+        return encode_batch_message(batch)
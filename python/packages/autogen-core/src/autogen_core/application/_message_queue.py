@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import Enum
+from typing import Deque, Generic, Set, TypeVar, overload
+
+from ..base.exceptions import MessageDroppedException
+
+T = TypeVar("T")
+
+
+class QueueFullPolicy(Enum):
+    """What a bounded runtime message queue does when a message is added while it is full."""
+
+    BLOCK = "block"
+    """Wait until there is space in the queue, applying backpressure to the producer."""
+
+    DROP_OLDEST = "drop_oldest"
+    """Drop the oldest queued message to make space for the new one."""
+
+    RAISE = "raise"
+    """Reject the new message by raising :class:`~autogen_core.base.exceptions.MessageDroppedException`."""
+
+
+@dataclass
+class MessageQueueMetrics:
+    """A snapshot of the metrics of a runtime message queue."""
+
+    depth: int
+    """The number of messages currently in the queue."""
+
+    peak_depth: int
+    """The largest number of messages that have been in the queue at once."""
+
+    capacity: int | None
+    """The capacity of the queue, or None if it is unbounded."""
+
+    num_dropped: int
+    """The number of messages dropped or rejected because the queue was full."""
+
+    num_backpressure_waits: int
+    """The number of times a producer had to wait for space in the queue."""
+
+    backpressure_wait_time: float
+    """The total time, in seconds, producers spent waiting for space in the queue."""
+
+
+class MessageQueue(Sequence[T], Generic[T]):
+    """A FIFO message queue with an optional capacity and a policy for when it is full.
+
+    Exempt items are added with :meth:`put_exempt`. They are never blocked, dropped or rejected and do not count
+    towards the capacity, but keep their place in the queue. Priority items are added with :meth:`put_priority`.
+    They are exempt from the capacity as well, and are dequeued before all other items.
+
+    Args:
+        capacity (int | None, optional): The maximum number of regular items in the queue. Defaults to None, which means unbounded.
+        policy (QueueFullPolicy, optional): What to do when an item is added to a full queue. Defaults to QueueFullPolicy.BLOCK.
+    """
+
+    def __init__(self, capacity: int | None = None, policy: QueueFullPolicy = QueueFullPolicy.BLOCK) -> None:
+        if capacity is not None and capacity < 1:
+            raise ValueError("Queue capacity must be at least 1.")
+        self._capacity = capacity
+        self._policy = policy
+        self._priority_items: Deque[T] = deque()
+        self._items: Deque[T] = deque()
+        # The ids of the exempt items in _items, which do not count towards the capacity.
+        self._exempt_ids: Set[int] = set()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._peak_depth = 0
+        self._num_dropped = 0
+        self._num_backpressure_waits = 0
+        self._backpressure_wait_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._priority_items) + len(self._items)
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[T]: ...
+
+    def __getitem__(self, index: int | slice) -> T | Sequence[T]:
+        items = [*self._priority_items, *self._items]
+        return items[index]
+
+    @property
+    def capacity(self) -> int | None:
+        return self._capacity
+
+    @property
+    def policy(self) -> QueueFullPolicy:
+        return self._policy
+
+    @property
+    def metrics(self) -> MessageQueueMetrics:
+        return MessageQueueMetrics(
+            depth=len(self),
+            peak_depth=self._peak_depth,
+            capacity=self._capacity,
+            num_dropped=self._num_dropped,
+            num_backpressure_waits=self._num_backpressure_waits,
+            backpressure_wait_time=self._backpressure_wait_time,
+        )
+
+    def _is_full(self) -> bool:
+        return self._capacity is not None and len(self._items) - len(self._exempt_ids) >= self._capacity
+
+    async def put(self, item: T) -> T | None:
+        """Add an item to the end of the queue, applying the queue full policy if the queue is full.
+
+        Returns:
+            T | None: The item that was dropped to make space for this one, if any.
+
+        Raises:
+            MessageDroppedException: If the queue is full and the policy is :attr:`QueueFullPolicy.RAISE`.
+        """
+        dropped: T | None = None
+        if self._is_full():
+            match self._policy:
+                case QueueFullPolicy.BLOCK:
+                    self._num_backpressure_waits += 1
+                    start = time.perf_counter()
+                    try:
+                        while self._is_full():
+                            self._not_full.clear()
+                            await self._not_full.wait()
+                    finally:
+                        self._backpressure_wait_time += time.perf_counter() - start
+                case QueueFullPolicy.DROP_OLDEST:
+                    dropped = self._drop_oldest()
+                    self._num_dropped += 1
+                case QueueFullPolicy.RAISE:
+                    self._num_dropped += 1
+                    raise MessageDroppedException(f"Message queue is full (capacity {self._capacity}).")
+        self._items.append(item)
+        self._on_put()
+        return dropped
+
+    def _drop_oldest(self) -> T:
+        # The oldest item that counts towards the capacity. Exempt items are kept.
+        for index, item in enumerate(self._items):
+            if id(item) not in self._exempt_ids:
+                del self._items[index]
+                return item
+        raise IndexError("No item to drop.")
+
+    def put_exempt(self, item: T) -> None:
+        """Add an item to the end of the queue that bypasses the capacity limit."""
+        self._exempt_ids.add(id(item))
+        self._items.append(item)
+        self._on_put()
+
+    def put_priority(self, item: T) -> None:
+        """Add an item that bypasses the capacity limit and is dequeued before regular items."""
+        self._priority_items.append(item)
+        self._on_put()
+
+    def put_front(self, item: T) -> None:
+        """Return an item that was dequeued but could not be delivered to the front of the queue, ahead of the
+        priority items. Like priority items, it bypasses the capacity limit."""
+        self._priority_items.appendleft(item)
+        self._on_put()
+
+    def remove(self, item: T) -> bool:
+        """Remove an item that has not been dequeued yet.
+
+        Returns:
+            bool: Whether the item was in the queue.
+        """
+        for items in (self._priority_items, self._items):
+            for index, queued in enumerate(items):
+                if queued is item:
+                    del items[index]
+                    self._exempt_ids.discard(id(item))
+                    if not self._is_full():
+                        self._not_full.set()
+                    if len(self) == 0:
+                        self._not_empty.clear()
+                    return True
+        return False
+
+    def _on_put(self) -> None:
+        depth = len(self)
+        if depth > self._peak_depth:
+            self._peak_depth = depth
+        self._not_empty.set()
+
+    def get_nowait(self) -> T:
+        """Remove and return the next item.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        if len(self._priority_items) > 0:
+            item = self._priority_items.popleft()
+        else:
+            item = self._items.popleft()
+            self._exempt_ids.discard(id(item))
+            if not self._is_full():
+                self._not_full.set()
+        if len(self) == 0:
+            self._not_empty.clear()
+        return item
+
+    async def get(self) -> T:
+        """Remove and return the next item, waiting until one is available."""
+        while len(self) == 0:
+            await self._not_empty.wait()
+        return self.get_nowait()
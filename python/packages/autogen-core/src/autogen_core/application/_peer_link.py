@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import random
+from asyncio import Task
+from typing import Any, Awaitable, Callable, Sequence, Tuple
+
+import grpc
+from grpc.aio import StreamStreamCall
+
+from ._flow_control import CreditQueue
+from ._message_batcher import EncodedMessageBatcher, end_stream, unbatch
+from .protos import agent_worker_pb2
+
+logger = logging.getLogger("autogen_core")
+
+# Seconds to wait before reconnecting to the other host, doubled after every failed attempt up to the maximum.
+_MIN_RECONNECT_BACKOFF = 0.1
+_MAX_RECONNECT_BACKOFF = 5.0
+
+# Seconds that closing the link waits for the other host to end the stream.
+_CLOSE_TIMEOUT = 1.0
+
+
+class PeerLink:
+    """The stream from a host of a sharded topology to another host, on which the host is a client of the other one,
+    like a worker.
+
+    The encoded messages queued for the other host are sent as they are, and the messages that the other host sends
+    are passed to ``on_message`` one at a time. When the stream breaks, the link opens a new one, waiting with an
+    exponential backoff between attempts, and the messages that may not have reached the other host are sent again.
+
+    Args:
+        address (str): The address of the other host.
+        worker_id (str): The id that the host is identified by on every stream, so that the other host can resume
+            its session.
+        send_queue (CreditQueue[bytes]): The queue of encoded messages for the other host.
+        on_message (Callable[[agent_worker_pb2.Message], Awaitable[None]]): Called with every message received.
+        on_reconnect (Callable[[bool], None]): Called when a new stream is opened after the first one, with whether
+            the other host resumed the session, before any queued message is sent.
+        max_send_batch_size (int, optional): The maximum number of messages sent in one frame. Defaults to 1.
+        send_batch_interval (float, optional): Seconds to wait for more messages to fill a batch. Defaults to 0.
+        channel_options (Sequence[Tuple[str, Any]], optional): gRPC channel options. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        worker_id: str,
+        send_queue: CreditQueue[bytes],
+        on_message: Callable[[agent_worker_pb2.Message], Awaitable[None]],
+        on_reconnect: Callable[[bool], None],
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        channel_options: Sequence[Tuple[str, Any]] | None = None,
+    ) -> None:
+        self._address = address
+        self._worker_id = worker_id
+        self._send_queue = send_queue
+        self._send_batcher = EncodedMessageBatcher(send_queue, max_send_batch_size, send_batch_interval)
+        self._on_message = on_message
+        self._on_reconnect = on_reconnect
+        self._channel = grpc.aio.insecure_channel(address, options=channel_options)
+        # Messages are encoded by the host already, and sent as they are.
+        self._open_channel = self._channel.stream_stream(
+            "/agents.AgentRpc/OpenChannel",
+            request_serializer=bytes,
+            response_deserializer=agent_worker_pb2.Message.FromString,
+        )
+        self._connection_task: Task[None] | None = None
+        self._write_task: Task[None] | None = None
+        self._closing = False
+
+    def start(self) -> None:
+        self._connection_task = asyncio.create_task(self._connect())
+
+    async def close(self) -> None:
+        if self._connection_task is None:
+            raise RuntimeError("Link is not open.")
+        self._closing = True
+        if self._write_task is not None and not self._write_task.done():
+            # Close the stream rather than breaking it, so that the other host ends the session of this host.
+            self._send_queue.put_nowait(
+                agent_worker_pb2.Message(closeChannel=agent_worker_pb2.CloseChannel()).SerializeToString()
+            )
+            end_stream(self._send_queue)
+            await asyncio.wait([self._connection_task], timeout=_CLOSE_TIMEOUT)
+        await self._channel.close()
+        self._connection_task.cancel()
+        try:
+            await self._connection_task
+        except asyncio.CancelledError:
+            pass
+
+    async def _connect(self) -> None:
+        backoff = _MIN_RECONNECT_BACKOFF
+        connected = False
+        while not self._closing:
+            call: StreamStreamCall[bytes, agent_worker_pb2.Message] = self._open_channel(  # type: ignore
+                metadata=(("worker-id", self._worker_id), ("peer-host", "true"))
+            )
+            try:
+                initial_metadata: grpc.aio.Metadata = await call.initial_metadata()  # type: ignore
+                # A call that failed to connect is done, and reading it raises the error.
+                if not call.done():  # type: ignore
+                    if connected:
+                        self._on_reconnect(initial_metadata.get("session") == "resumed")
+                    else:
+                        logger.info(f"Connected to host {self._address}.")
+                    connected = True
+                    backoff = _MIN_RECONNECT_BACKOFF
+                    self._write_task = asyncio.create_task(self._write_messages(call))  # type: ignore
+                while True:
+                    message = await call.read()  # type: ignore
+                    if message == grpc.aio.EOF:  # type: ignore
+                        logger.info(f"Host {self._address} closed the link.")
+                        break
+                    for received in unbatch(message):  # type: ignore
+                        try:
+                            await self._on_message(received)
+                        except Exception:
+                            logger.error(f"Failed to process message from host {self._address}.", exc_info=True)
+            except grpc.aio.AioRpcError as e:
+                if self._closing:
+                    pass
+                elif connected:
+                    logger.warning(f"Link to host {self._address} lost: {e.code()}")
+                else:
+                    # The other host may not be listening yet.
+                    logger.info(f"Failed to connect to host {self._address}: {e.code()}")
+            finally:
+                if self._write_task is not None:
+                    self._write_task.cancel()
+            if self._closing:
+                break
+            # The delay is randomized, so that the hosts linked to a restarted host do not all reconnect at once.
+            delay = backoff * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, _MAX_RECONNECT_BACKOFF)
+
+    async def _write_messages(self, call: StreamStreamCall[bytes, agent_worker_pb2.Message]) -> None:  # type: ignore
+        async for message in self._send_batcher:
+            try:
+                await call.write(message)  # type: ignore
+            except (grpc.aio.AioRpcError, asyncio.InvalidStateError, asyncio.CancelledError) as e:
+                # The messages may not have reached the other host, so they are sent again on the next stream.
+                decoded = agent_worker_pb2.Message.FromString(message)
+                if decoded.WhichOneof("message") == "batch":
+                    for unsent in reversed(decoded.batch.messages):
+                        self._send_queue.put_front(unsent.SerializeToString())
+                else:
+                    self._send_queue.put_front(message)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return
+        try:
+            await call.done_writing()  # type: ignore
+        except (grpc.aio.AioRpcError, asyncio.InvalidStateError):
+            pass
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import inspect
 import logging
 import threading
 import warnings
-from asyncio import CancelledError, Future, Task
+from asyncio import CancelledError, Future
 from collections.abc import Sequence
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Awaitable, Callable, Dict, List, Mapping, ParamSpec, Set, Type, TypeVar, cast
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, ParamSpec, Set, Tuple, Type, TypeVar, cast
 
 from opentelemetry.trace import TracerProvider
 from typing_extensions import deprecated
@@ -32,7 +33,12 @@
 )
 from ..base.exceptions import MessageDroppedException
 from ..base.intervention import DropMessage, InterventionHandler
-from ._helpers import SubscriptionManager, get_impl
+from ._agent_lifecycle import AgentLifecycleManager, AgentLifecycleMetrics
+from ._helpers import AgentFactory, SubscriptionCacheMetrics, SubscriptionManager, get_impl
+from ._mailbox import MailboxScheduler, handling_agents
+from ._message_queue import MessageQueue, MessageQueueMetrics, QueueFullPolicy
+from .logging.events import DeliveryStage, MessageEvent, MessageKind
+from .state import StateStore
 from .telemetry import EnvelopeMetadata, MessageRuntimeTracingConfig, TraceHelper, get_telemetry_envelope_metadata
 
 logger = logging.getLogger("autogen_core")
@@ -66,6 +72,8 @@ class SendMessageEnvelope:
     future: Future[Any]
     cancellation_token: CancellationToken
     metadata: EnvelopeMetadata | None = None
+    callers: Tuple[AgentId, ...] = ()
+    """The agents whose handlers the message was sent from within, from the outermost to the innermost."""
 
 
 @dataclass(kw_only=True)
@@ -108,36 +116,58 @@ class RunState(Enum):
         CANCELLED = 1
         UNTIL_IDLE = 2
 
-    def __init__(self, runtime: SingleThreadedAgentRuntime) -> None:
+    def __init__(self, runtime: SingleThreadedAgentRuntime, activity: asyncio.Event) -> None:
         self._runtime = runtime
+        self._activity = activity
         self._run_state = RunContext.RunState.RUNNING
         self._end_condition: Callable[[], bool] = self._stop_when_cancelled
+        # Seconds between checks of an end condition given to stop_when, which can depend on state that the runtime
+        # does not signal changes of. None while the end condition is one of the built-in ones.
+        self._poll_interval: float | None = None
         self._run_task = asyncio.create_task(self._run())
         self._lock = asyncio.Lock()
 
     async def _run(self) -> None:
         while True:
+            # Clear the activity flag before checking the end condition and the queue, so that any
+            # activity that happens after the check wakes up the wait below.
+            self._activity.clear()
             async with self._lock:
                 if self._end_condition():
                     return
 
-                await self._runtime.process_next()
+                if len(self._runtime.unprocessed_messages) > 0:
+                    await self._runtime.process_next()
+                    continue
+
+            # Nothing to do: sleep until a message is queued, a task finishes or the end condition changes.
+            if self._poll_interval is None:
+                await self._activity.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._activity.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
 
     async def stop(self) -> None:
         async with self._lock:
             self._run_state = RunContext.RunState.CANCELLED
             self._end_condition = self._stop_when_cancelled
+        self._activity.set()
         await self._run_task
 
     async def stop_when_idle(self) -> None:
         async with self._lock:
             self._run_state = RunContext.RunState.UNTIL_IDLE
             self._end_condition = self._stop_when_idle
+        self._activity.set()
         await self._run_task
 
-    async def stop_when(self, condition: Callable[[], bool]) -> None:
+    async def stop_when(self, condition: Callable[[], bool], poll_interval: float) -> None:
         async with self._lock:
             self._end_condition = condition
+            self._poll_interval = poll_interval
+        self._activity.set()
         await self._run_task
 
     def _stop_when_cancelled(self) -> bool:
@@ -148,23 +178,77 @@ def _stop_when_idle(self) -> bool:
 
 
 class SingleThreadedAgentRuntime(AgentRuntime):
+    """An agent runtime that processes all messages using a single asyncio event loop.
+
+    Args:
+        intervention_handlers (List[InterventionHandler], optional): A list of intervention handlers that can intercept messages before they are sent or published. Defaults to None.
+        tracer_provider (TracerProvider, optional): The tracer provider to use for tracing. Defaults to None.
+        max_batch_size (int, optional): The maximum number of queued messages dispatched per iteration of the message loop.
+            Larger batches reduce scheduling overhead under high fan-out loads, while messages are still dispatched in queue order.
+            Defaults to 1.
+        max_queue_size (int, optional): The maximum number of sent and published messages waiting in the message queue.
+            Responses are always accepted and do not count towards this limit. Defaults to None, which means unbounded.
+        queue_full_policy (QueueFullPolicy, optional): What :meth:`send_message` and :meth:`publish_message` do when the
+            message queue is full: block until there is space, drop the oldest queued message, or raise
+            :class:`~autogen_core.base.exceptions.MessageDroppedException`. Defaults to QueueFullPolicy.BLOCK.
+        max_concurrency_per_agent (int | Mapping[str, int], optional): The maximum number of message handlers that run
+            concurrently for each agent instance, either for all agents or as a mapping from agent type to the limit for
+            that type. Messages beyond the limit wait in the agent's mailbox and are handled in the order they were
+            delivered, so a limit of 1 gives each agent sequential, actor-style message handling. A handler that sends a
+            message to its own agent, directly or through agents that call back (A to B to A), while the agent has no
+            free slot would wait for itself forever, so :meth:`send_message` raises a :class:`RuntimeError` for it
+            instead. Defaults to None, which means no limit.
+        max_cached_topics (int, optional): The maximum number of topics whose subscribed recipients are cached.
+            The least recently published-to topic is evicted first. Defaults to None, which means unbounded.
+        cached_topic_ttl (float, optional): Seconds after the last publish to a topic at which its cached recipients
+            are evicted. Defaults to None, which means cached topics do not expire.
+        max_agent_instances (int, optional): The maximum number of agent instances kept in memory. When it is exceeded,
+            the least recently used agent that is not handling a message is passivated: its state is saved with
+            :meth:`~autogen_core.base.Agent.save_state` and written to the agent state store, and the instance is released.
+            The next message to the agent creates a new instance and restores the state with
+            :meth:`~autogen_core.base.Agent.load_state`. Defaults to None, which means unbounded.
+        agent_idle_timeout (float, optional): Seconds after its last message at which an agent is passivated while the
+            runtime is running. Defaults to None, which means agents are not passivated when idle.
+        agent_state_store (StateStore, optional): The store that the state of passivated agents and :meth:`checkpoint` is
+            written to, and that agents are restored from when they are activated. Defaults to None, which means an
+            :class:`~autogen_core.application.state.InMemoryStateStore` if agents can be passivated, and no store otherwise.
+    """
+
     def __init__(
         self,
         *,
         intervention_handlers: List[InterventionHandler] | None = None,
         tracer_provider: TracerProvider | None = None,
+        max_batch_size: int = 1,
+        max_queue_size: int | None = None,
+        queue_full_policy: QueueFullPolicy = QueueFullPolicy.BLOCK,
+        max_concurrency_per_agent: int | Mapping[str, int] | None = None,
+        max_cached_topics: int | None = None,
+        cached_topic_ttl: float | None = None,
+        max_agent_instances: int | None = None,
+        agent_idle_timeout: float | None = None,
+        agent_state_store: StateStore | None = None,
     ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
         self._tracer_helper = TraceHelper(tracer_provider, MessageRuntimeTracingConfig("SingleThreadedAgentRuntime"))
-        self._message_queue: List[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope] = []
+        self._message_queue: MessageQueue[PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope] = (
+            MessageQueue(max_queue_size, queue_full_policy)
+        )
+        # Set whenever a message is queued or a message processing task finishes, so that the
+        # run loop can sleep while the runtime is idle instead of polling.
+        self._activity = asyncio.Event()
         # (namespace, type) -> List[AgentId]
-        self._agent_factories: Dict[
-            str, Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]]
-        ] = {}
-        self._instantiated_agents: Dict[AgentId, Agent] = {}
+        self._agent_factories: Dict[str, AgentFactory] = {}
+        self._agent_lifecycle = AgentLifecycleManager(
+            self._create_agent, max_agent_instances, agent_idle_timeout, agent_state_store
+        )
         self._intervention_handlers = intervention_handlers
+        self._max_batch_size = max_batch_size
         self._outstanding_tasks = Counter()
-        self._background_tasks: Set[Task[Any]] = set()
-        self._subscription_manager = SubscriptionManager()
+        self._background_tasks: Set[Future[Any]] = set()
+        self._mailbox_scheduler = MailboxScheduler(max_concurrency_per_agent)
+        self._subscription_manager = SubscriptionManager(max_cached_topics, cached_topic_ttl)
         self._run_context: RunContext | None = None
         self._serialization_registry = SerializationRegistry()
 
@@ -178,6 +262,21 @@ def unprocessed_messages(
     def outstanding_tasks(self) -> int:
         return self._outstanding_tasks.get()
 
+    @property
+    def queue_metrics(self) -> MessageQueueMetrics:
+        """Depth and backpressure metrics of the message queue."""
+        return self._message_queue.metrics
+
+    @property
+    def subscription_cache_metrics(self) -> SubscriptionCacheMetrics:
+        """Size and hit/miss metrics of the cache of subscribed recipients per topic."""
+        return self._subscription_manager.cache_metrics
+
+    @property
+    def agent_lifecycle_metrics(self) -> AgentLifecycleMetrics:
+        """Activation and passivation metrics of the agent instances."""
+        return self._agent_lifecycle.metrics
+
     @property
     def _known_agent_names(self) -> Set[str]:
         return set(self._agent_factories.keys())
@@ -194,15 +293,17 @@ async def send_message(
         if cancellation_token is None:
             cancellation_token = CancellationToken()
 
-        # event_logger.info(
-        #     MessageEvent(
-        #         payload=message,
-        #         sender=sender,
-        #         receiver=recipient,
-        #         kind=MessageKind.DIRECT,
-        #         delivery_stage=DeliveryStage.SEND,
-        #     )
-        # )
+        # Events are only created when they will be logged, so that logging costs nothing when it is disabled.
+        if event_logger.isEnabledFor(logging.INFO):
+            event_logger.info(
+                MessageEvent(
+                    payload=message,
+                    sender=sender,
+                    receiver=recipient,
+                    kind=MessageKind.DIRECT,
+                    delivery_stage=DeliveryStage.SEND,
+                )
+            )
 
         with self._tracer_helper.trace_block(
             "create",
@@ -214,10 +315,7 @@ async def send_message(
             if recipient.type not in self._known_agent_names:
                 future.set_exception(Exception("Recipient not found"))
 
-            content = message.__dict__ if hasattr(message, "__dict__") else message
-            logger.info(f"Sending message of type {type(message).__name__} to {recipient.type}: {content}")
-
-            self._message_queue.append(
+            await self._enqueue(
                 SendMessageEnvelope(
                     message=message,
                     recipient=recipient,
@@ -225,6 +323,7 @@ async def send_message(
                     cancellation_token=cancellation_token,
                     sender=sender,
                     metadata=get_telemetry_envelope_metadata(),
+                    callers=handling_agents(),
                 )
             )
 
@@ -248,20 +347,19 @@ async def publish_message(
         ):
             if cancellation_token is None:
                 cancellation_token = CancellationToken()
-            content = message.__dict__ if hasattr(message, "__dict__") else message
-            logger.info(f"Publishing message of type {type(message).__name__} to all subscribers: {content}")
-
-            # event_logger.info(
-            #     MessageEvent(
-            #         payload=message,
-            #         sender=sender,
-            #         receiver=None,
-            #         kind=MessageKind.PUBLISH,
-            #         delivery_stage=DeliveryStage.SEND,
-            #     )
-            # )
-
-            self._message_queue.append(
+
+            if event_logger.isEnabledFor(logging.INFO):
+                event_logger.info(
+                    MessageEvent(
+                        payload=message,
+                        sender=sender,
+                        receiver=None,
+                        kind=MessageKind.PUBLISH,
+                        delivery_stage=DeliveryStage.SEND,
+                    )
+                )
+
+            await self._enqueue(
                 PublishMessageEnvelope(
                     message=message,
                     cancellation_token=cancellation_token,
@@ -271,9 +369,34 @@ async def publish_message(
                 )
             )
 
+    async def _enqueue(self, envelope: PublishMessageEnvelope | SendMessageEnvelope) -> None:
+        dropped = await self._message_queue.put(envelope)
+        self._activity.set()
+        match dropped:
+            case SendMessageEnvelope(future=future):
+                logger.warning("Message queue is full, dropped message sent to %s.", dropped.recipient)
+                if not future.done():
+                    future.set_exception(MessageDroppedException())
+            case PublishMessageEnvelope():
+                logger.warning("Message queue is full, dropped message published to %s.", dropped.topic_id)
+            case _:
+                pass
+
+    def _enqueue_response(self, envelope: ResponseMessageEnvelope) -> None:
+        # Responses complete work that is already in flight, so they are never subject to the queue capacity. They
+        # still wait for the messages queued before them, so envelopes are handled in the order they were queued.
+        self._message_queue.put_exempt(envelope)
+        self._activity.set()
+
+    def _on_task_done(self, task: Future[Any]) -> None:
+        self._background_tasks.discard(task)
+        # The outstanding task count changed, so the idle state may have changed as well.
+        self._activity.set()
+
     async def save_state(self) -> Mapping[str, Any]:
+        """Save the state of the agent instances in memory. The state of passivated agents is kept in the agent state store."""
         state: Dict[str, Dict[str, Any]] = {}
-        for agent_id in self._instantiated_agents:
+        for agent_id in self._agent_lifecycle.instances:
             state[str(agent_id)] = dict(await (await self._get_agent(agent_id)).save_state())
         return state
 
@@ -282,6 +405,26 @@ async def load_state(self, state: Mapping[str, Any]) -> None:
             agent_id = AgentId.from_str(agent_id_str)
             if agent_id.type in self._known_agent_names:
                 await (await self._get_agent(agent_id)).load_state(state[str(agent_id)])
+                self._agent_lifecycle.mark_changed(agent_id)
+
+    async def checkpoint(self, batch_size: int = 1000) -> int:
+        """Write the state of each agent instance that changed since its last checkpoint to the agent state store.
+
+        Unlike :meth:`save_state`, which builds one snapshot of every agent, checkpoints are incremental and per agent:
+        only the agents that handled a message or had their state loaded since they were last written are saved, in
+        batches of ``batch_size``. A runtime created with the same agent state store restores each agent from its latest
+        checkpoint the first time the agent is addressed.
+
+        Args:
+            batch_size (int, optional): The number of agent states written to the store at once. Defaults to 1000.
+
+        Returns:
+            int: The number of agents whose state was written.
+
+        Raises:
+            RuntimeError: If the runtime has no agent state store.
+        """
+        return await self._agent_lifecycle.checkpoint(batch_size)
 
     async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
         with self._tracer_helper.trace_block("send", message_envelope.recipient, parent=message_envelope.metadata):
@@ -290,20 +433,16 @@ async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
             # assert recipient in self._agents
 
             try:
-                # TODO use id
-                sender_name = message_envelope.sender.type if message_envelope.sender is not None else "Unknown"
-                logger.info(
-                    f"Calling message handler for {recipient} with message type {type(message_envelope.message).__name__} sent by {sender_name}"
-                )
-                # event_logger.info(
-                #     MessageEvent(
-                #         payload=message_envelope.message,
-                #         sender=message_envelope.sender,
-                #         receiver=recipient,
-                #         kind=MessageKind.DIRECT,
-                #         delivery_stage=DeliveryStage.DELIVER,
-                #     )
-                # )
+                if event_logger.isEnabledFor(logging.INFO):
+                    event_logger.info(
+                        MessageEvent(
+                            payload=message_envelope.message,
+                            sender=message_envelope.sender,
+                            receiver=recipient,
+                            kind=MessageKind.DIRECT,
+                            delivery_stage=DeliveryStage.DELIVER,
+                        )
+                    )
                 recipient_agent = await self._get_agent(recipient)
                 message_context = MessageContext(
                     sender=message_envelope.sender,
@@ -311,7 +450,10 @@ async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
                     is_rpc=True,
                     cancellation_token=message_envelope.cancellation_token,
                 )
-                with MessageHandlerContext.populate_context(recipient_agent.id):
+                with (
+                    self._agent_lifecycle.in_use(recipient),
+                    MessageHandlerContext.populate_context(recipient_agent.id),
+                ):
                     response = await recipient_agent.on_message(
                         message_envelope.message,
                         ctx=message_context,
@@ -326,7 +468,7 @@ async def _process_send(self, message_envelope: SendMessageEnvelope) -> None:
                 self._outstanding_tasks.decrement()
                 return
 
-            self._message_queue.append(
+            self._enqueue_response(
                 ResponseMessageEnvelope(
                     message=response,
                     future=message_envelope.future,
@@ -342,44 +484,50 @@ async def _process_publish(self, message_envelope: PublishMessageEnvelope) -> No
             try:
                 responses: List[Awaitable[Any]] = []
                 recipients = await self._subscription_manager.get_subscribed_recipients(message_envelope.topic_id)
+
+                async def _on_message(agent_id: AgentId, message_context: MessageContext) -> Any:
+                    # The agent is fetched when the handler starts, as it may be passivated while the message
+                    # waits in its mailbox.
+                    agent = await self._get_agent(agent_id)
+                    with self._tracer_helper.trace_block("process", agent.id, parent=None):
+                        with (
+                            self._agent_lifecycle.in_use(agent_id),
+                            MessageHandlerContext.populate_context(agent.id),
+                        ):
+                            return await agent.on_message(
+                                message_envelope.message,
+                                ctx=message_context,
+                            )
+
+                # Everything that does not depend on the recipient is computed once, outside the fan-out loop.
+                sender = message_envelope.sender
+                log_events = event_logger.isEnabledFor(logging.INFO)
                 for agent_id in recipients:
                     # Avoid sending the message back to the sender
-                    if message_envelope.sender is not None and agent_id == message_envelope.sender:
+                    if agent_id == sender:
                         continue
 
-                    sender_agent = (
-                        await self._get_agent(message_envelope.sender) if message_envelope.sender is not None else None
-                    )
-                    sender_name = str(sender_agent.id) if sender_agent is not None else "Unknown"
-                    logger.info(
-                        f"Calling message handler for {agent_id.type} with message type {type(message_envelope.message).__name__} published by {sender_name}"
-                    )
-                    # event_logger.info(
-                    #     MessageEvent(
-                    #         payload=message_envelope.message,
-                    #         sender=message_envelope.sender,
-                    #         receiver=agent,
-                    #         kind=MessageKind.PUBLISH,
-                    #         delivery_stage=DeliveryStage.DELIVER,
-                    #     )
-                    # )
+                    if log_events:
+                        event_logger.info(
+                            MessageEvent(
+                                payload=message_envelope.message,
+                                sender=sender,
+                                receiver=agent_id,
+                                kind=MessageKind.PUBLISH,
+                                delivery_stage=DeliveryStage.DELIVER,
+                            )
+                        )
                     message_context = MessageContext(
-                        sender=message_envelope.sender,
+                        sender=sender,
                         topic_id=message_envelope.topic_id,
                         is_rpc=False,
                         cancellation_token=message_envelope.cancellation_token,
                     )
-                    agent = await self._get_agent(agent_id)
 
-                    async def _on_message(agent: Agent, message_context: MessageContext) -> Any:
-                        with self._tracer_helper.trace_block("process", agent.id, parent=None):
-                            with MessageHandlerContext.populate_context(agent.id):
-                                return await agent.on_message(
-                                    message_envelope.message,
-                                    ctx=message_context,
-                                )
-
-                    future = _on_message(agent, message_context)
+                    # Delivered through the recipient's mailbox, which limits its concurrent handlers if configured.
+                    future = self._mailbox_scheduler.submit(
+                        agent_id, functools.partial(_on_message, agent_id, message_context)
+                    )
                     responses.append(future)
 
                 await asyncio.gather(*responses)
@@ -394,36 +542,43 @@ async def _on_message(agent: Agent, message_context: MessageContext) -> Any:
 
     async def _process_response(self, message_envelope: ResponseMessageEnvelope) -> None:
         with self._tracer_helper.trace_block("ack", message_envelope.recipient, parent=message_envelope.metadata):
-            content = (
-                message_envelope.message.__dict__
-                if hasattr(message_envelope.message, "__dict__")
-                else message_envelope.message
-            )
-            logger.info(
-                f"Resolving response with message type {type(message_envelope.message).__name__} for recipient {message_envelope.recipient} from {message_envelope.sender.type}: {content}"
-            )
-            # event_logger.info(
-            #     MessageEvent(
-            #         payload=message_envelope.message,
-            #         sender=message_envelope.sender,
-            #         receiver=message_envelope.recipient,
-            #         kind=MessageKind.RESPOND,
-            #         delivery_stage=DeliveryStage.DELIVER,
-            #     )
-            # )
+            if event_logger.isEnabledFor(logging.INFO):
+                event_logger.info(
+                    MessageEvent(
+                        payload=message_envelope.message,
+                        sender=message_envelope.sender,
+                        receiver=message_envelope.recipient,
+                        kind=MessageKind.RESPOND,
+                        delivery_stage=DeliveryStage.DELIVER,
+                    )
+                )
             self._outstanding_tasks.decrement()
             if not message_envelope.future.cancelled():
                 message_envelope.future.set_result(message_envelope.message)
 
     async def process_next(self) -> None:
-        """Process the next message in the queue."""
+        """Process the next message in the queue.
+
+        If the runtime was created with a ``max_batch_size`` greater than 1, up to that many
+        queued messages are dispatched, in queue order, before control is yielded to the event loop."""
 
         if len(self._message_queue) == 0:
             # Yield control to the event loop to allow other tasks to run
             await asyncio.sleep(0)
             return
-        message_envelope = self._message_queue.pop(0)
 
+        num_dispatched = 0
+        while num_dispatched < self._max_batch_size and len(self._message_queue) > 0:
+            await self._dispatch(self._message_queue.get_nowait())
+            num_dispatched += 1
+
+        # Yield control to the message loop to allow other tasks to run
+        await asyncio.sleep(0)
+
+    async def _dispatch(
+        self, message_envelope: PublishMessageEnvelope | SendMessageEnvelope | ResponseMessageEnvelope
+    ) -> None:
+        """Run the intervention handlers on a message and schedule the task that processes it."""
         match message_envelope:
             case SendMessageEnvelope(message=message, sender=sender, recipient=recipient, future=future):
                 if self._intervention_handlers is not None:
@@ -441,10 +596,22 @@ async def process_next(self) -> None:
                                 return
 
                         message_envelope.message = temp_message
+                if self._mailbox_scheduler.is_reentrant(recipient, message_envelope.callers):
+                    future.set_exception(
+                        RuntimeError(
+                            f"Agent {recipient} cannot handle a message sent from within its own handler, directly or "
+                            "through agents that call back, as all of its concurrent handlers are waiting for it."
+                        )
+                    )
+                    return
                 self._outstanding_tasks.increment()
-                task = asyncio.create_task(self._process_send(message_envelope))
+                task = self._mailbox_scheduler.submit(
+                    message_envelope.recipient,
+                    functools.partial(self._process_send, message_envelope),
+                    message_envelope.callers,
+                )
                 self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
+                task.add_done_callback(self._on_task_done)
             case PublishMessageEnvelope(
                 message=message,
                 sender=sender,
@@ -458,7 +625,7 @@ async def process_next(self) -> None:
                                 temp_message = await handler.on_publish(message, sender=sender)
                             except BaseException as e:
                                 # TODO: we should raise the intervention exception to the publisher.
-                                logger.error(f"Exception raised in in intervention handler: {e}", exc_info=True)
+                                logger.error("Exception raised in intervention handler: %s", e, exc_info=True)
                                 return
                             if temp_message is DropMessage or isinstance(temp_message, DropMessage):
                                 # TODO log message dropped
@@ -468,7 +635,7 @@ async def process_next(self) -> None:
                 self._outstanding_tasks.increment()
                 task = asyncio.create_task(self._process_publish(message_envelope))
                 self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
+                task.add_done_callback(self._on_task_done)
             case ResponseMessageEnvelope(message=message, sender=sender, recipient=recipient, future=future):
                 if self._intervention_handlers is not None:
                     for handler in self._intervention_handlers:
@@ -485,10 +652,7 @@ async def process_next(self) -> None:
                 self._outstanding_tasks.increment()
                 task = asyncio.create_task(self._process_response(message_envelope))
                 self._background_tasks.add(task)
-                task.add_done_callback(self._background_tasks.discard)
-
-        # Yield control to the message loop to allow other tasks to run
-        await asyncio.sleep(0)
+                task.add_done_callback(self._on_task_done)
 
     @property
     def idle(self) -> bool:
@@ -498,7 +662,8 @@ def start(self) -> None:
         """Start the runtime message processing loop."""
         if self._run_context is not None:
             raise RuntimeError("Runtime is already started")
-        self._run_context = RunContext(self)
+        self._run_context = RunContext(self, self._activity)
+        self._agent_lifecycle.start()
 
     async def stop(self) -> None:
         """Stop the runtime message processing loop."""
@@ -506,6 +671,7 @@ async def stop(self) -> None:
             raise RuntimeError("Runtime is not started")
         await self._run_context.stop()
         self._run_context = None
+        await self._agent_lifecycle.stop()
 
     async def stop_when_idle(self) -> None:
         """Stop the runtime message processing loop when there is
@@ -514,13 +680,18 @@ async def stop_when_idle(self) -> None:
             raise RuntimeError("Runtime is not started")
         await self._run_context.stop_when_idle()
         self._run_context = None
+        await self._agent_lifecycle.stop()
+
+    async def stop_when(self, condition: Callable[[], bool], poll_interval: float = 0.05) -> None:
+        """Stop the runtime message processing loop when the condition is met.
 
-    async def stop_when(self, condition: Callable[[], bool]) -> None:
-        """Stop the runtime message processing loop when the condition is met."""
+        The condition is checked after every message, and every ``poll_interval`` seconds while the runtime is idle,
+        so it can depend on state outside of the runtime."""
         if self._run_context is None:
             raise RuntimeError("Runtime is not started")
-        await self._run_context.stop_when(condition)
+        await self._run_context.stop_when(condition, poll_interval)
         self._run_context = None
+        await self._agent_lifecycle.stop()
 
     async def agent_metadata(self, agent: AgentId) -> AgentMetadata:
         return (await self._get_agent(agent)).metadata
@@ -530,6 +701,7 @@ async def agent_save_state(self, agent: AgentId) -> Mapping[str, Any]:
 
     async def agent_load_state(self, agent: AgentId, state: Mapping[str, Any]) -> None:
         await (await self._get_agent(agent)).load_state(state)
+        self._agent_lifecycle.mark_changed(agent)
 
     @deprecated(
         "Use your agent's `register` method directly instead of this method. See documentation for latest usage."
@@ -559,7 +731,7 @@ async def register(
             for subscription in subscriptions_list:
                 await self.add_subscription(subscription)
 
-        self._agent_factories[type] = agent_factory
+        self._agent_factories[type] = AgentFactory(agent_factory)
         return AgentType(type)
 
     async def register_factory(
@@ -584,45 +756,41 @@ async def factory_wrapper() -> T:
 
             return agent_instance
 
-        self._agent_factories[type.type] = factory_wrapper
+        self._agent_factories[type.type] = AgentFactory(factory_wrapper)
 
         return type
 
     async def _invoke_agent_factory(
         self,
-        agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
+        agent_factory: AgentFactory,
         agent_id: AgentId,
-    ) -> T:
+    ) -> Agent:
         with AgentInstantiationContext.populate_context((self, agent_id)):
-            if len(inspect.signature(agent_factory).parameters) == 0:
-                factory_one = cast(Callable[[], T], agent_factory)
-                agent = factory_one()
-            elif len(inspect.signature(agent_factory).parameters) == 2:
+            if agent_factory.num_parameters == 0:
+                agent = agent_factory()
+            elif agent_factory.num_parameters == 2:
                 warnings.warn(
                     "Agent factories that take two arguments are deprecated. Use AgentInstantiationContext instead. Two arg factories will be removed in a future version.",
                     stacklevel=2,
                 )
-                factory_two = cast(Callable[[AgentRuntime, AgentId], T], agent_factory)
-                agent = factory_two(self, agent_id)
+                agent = agent_factory(self, agent_id)
             else:
                 raise ValueError("Agent factory must take 0 or 2 arguments.")
 
             if inspect.isawaitable(agent):
-                return cast(T, await agent)
+                return cast(Agent, await agent)
 
-            return agent
-
-    async def _get_agent(self, agent_id: AgentId) -> Agent:
-        if agent_id in self._instantiated_agents:
-            return self._instantiated_agents[agent_id]
+            return cast(Agent, agent)
 
+    async def _create_agent(self, agent_id: AgentId) -> Agent:
         if agent_id.type not in self._agent_factories:
             raise LookupError(f"Agent with name {agent_id.type} not found.")
 
         agent_factory = self._agent_factories[agent_id.type]
-        agent = await self._invoke_agent_factory(agent_factory, agent_id)
-        self._instantiated_agents[agent_id] = agent
-        return agent
+        return await self._invoke_agent_factory(agent_factory, agent_id)
+
+    async def _get_agent(self, agent_id: AgentId) -> Agent:
+        return await self._agent_lifecycle.get(agent_id)
 
     # TODO: uncomment out the following type ignore when this is fixed in mypy: https://github.com/python/mypy/issues/3737
     async def try_get_underlying_agent_instance(self, id: AgentId, type: Type[T] = Agent) -> T:  # type: ignore[assignment]
@@ -0,0 +1,36 @@
+from typing import Iterable
+
+from .protos import agent_worker_pb2
+
+# Protobuf merges repeated occurrences of a message field, so a message can be extended or wrapped by
+# concatenating encoded fields, without parsing or re-encoding what has been encoded already.
+
+_MESSAGE_EVENT_FIELD = agent_worker_pb2.Message.DESCRIPTOR.fields_by_name["event"].number
+_MESSAGE_BATCH_FIELD = agent_worker_pb2.Message.DESCRIPTOR.fields_by_name["batch"].number
+_MESSAGE_BATCH_MESSAGES_FIELD = agent_worker_pb2.MessageBatch.DESCRIPTOR.fields_by_name["messages"].number
+_LENGTH_DELIMITED = 2
+
+
+def _encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def encode_field(field_number: int, payload: bytes) -> bytes:
+    """Encode an already encoded message, or bytes, as a length-delimited field."""
+    return _encode_varint(field_number << 3 | _LENGTH_DELIMITED) + _encode_varint(len(payload)) + payload
+
+
+def encode_event_message(encoded_event: bytes) -> bytes:
+    """Encode a :class:`Message` that carries an already encoded :class:`Event`."""
+    return encode_field(_MESSAGE_EVENT_FIELD, encoded_event)
+
+
+def encode_batch_message(encoded_messages: Iterable[bytes]) -> bytes:
+    """Encode a :class:`Message` that carries a batch of already encoded messages."""
+    batch = b"".join(encode_field(_MESSAGE_BATCH_MESSAGES_FIELD, message) for message in encoded_messages)
+    return encode_field(_MESSAGE_BATCH_FIELD, batch)
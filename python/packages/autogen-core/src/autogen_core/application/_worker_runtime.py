@@ -1,21 +1,24 @@
 import asyncio
+import functools
 import inspect
 import json
 import logging
+import random
 import signal
+import uuid
 import warnings
 from asyncio import Future, Task
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
 from typing import (
     TYPE_CHECKING,
     Any,
-    AsyncIterable,
-    AsyncIterator,
     Awaitable,
     Callable,
     ClassVar,
     DefaultDict,
     Dict,
+    FrozenSet,
     List,
     Literal,
     Mapping,
@@ -32,8 +35,8 @@
 from opentelemetry.trace import TracerProvider
 from typing_extensions import Self, deprecated
 
-from autogen_core.base import JSON_DATA_CONTENT_TYPE
-from autogen_core.base._serialization import MessageSerializer, SerializationRegistry
+from autogen_core.base import JSON_DATA_CONTENT_TYPE, MSGPACK_DATA_CONTENT_TYPE, PROTOBUF_DATA_CONTENT_TYPE
+from autogen_core.base._serialization import MessageSerializer, SerializationRegistry, is_msgpack_available
 from autogen_core.base._type_helpers import ChannelArgumentType
 
 from ..base import (
@@ -50,36 +53,117 @@
     SubscriptionInstantiationContext,
     TopicId,
 )
-from ..components import TypeSubscription
-from ._helpers import SubscriptionManager, get_impl
+from ..base.exceptions import MessageDroppedException
+from ..components import TypePrefixSubscription, TypeSubscription
+from ._agent_lifecycle import AgentLifecycleManager, AgentLifecycleMetrics
+from ._flow_control import InFlightMetrics
+from ._helpers import AgentFactory, SubscriptionCacheMetrics, SubscriptionManager, get_impl
+from ._mailbox import MailboxScheduler
+from ._message_batcher import MessageBatcher, end_stream, unbatch
+from ._message_queue import MessageQueue, MessageQueueMetrics, QueueFullPolicy
+from .logging.events import DeliveryStage, MessageEvent, MessageKind
 from .protos import agent_worker_pb2, agent_worker_pb2_grpc
+from .state import StateStore
 from .telemetry import MessageRuntimeTracingConfig, TraceHelper, get_telemetry_grpc_metadata
 
 if TYPE_CHECKING:
-    from .protos.agent_worker_pb2_grpc import AgentRpcAsyncStub
+    from .protos.agent_worker_pb2_grpc import AgentRpcAsyncStub, AgentWorkerRpcAsyncStub
 
 logger = logging.getLogger("autogen_core")
 event_logger = logging.getLogger("autogen_core.events")
 
 P = ParamSpec("P")
 T = TypeVar("T", bound=Agent)
+R = TypeVar("R")
 
 
 type_func_alias = type
 
+# The maximum number of agents whose direct addresses a worker keeps.
+_MAX_RESOLVED_AGENTS = 10000
 
-class QueueAsyncIterable(AsyncIterator[Any], AsyncIterable[Any]):
-    def __init__(self, queue: asyncio.Queue[Any]) -> None:
-        self._queue = queue
+# The maximum number of responses to requests relayed by the host that a worker keeps, to answer the requests again
+# when the host forwards them again after a reconnection.
+_MAX_RECENT_RESPONSES = 1000
 
-    async def __anext__(self) -> Any:
-        return await self._queue.get()
+# Seconds to wait before reconnecting to the host, doubled after every failed attempt up to the maximum.
+_MIN_RECONNECT_BACKOFF = 0.1
+_MAX_RECONNECT_BACKOFF = 5.0
 
-    def __aiter__(self) -> AsyncIterator[Any]:
-        return self
+# Seconds that closing the connection to the host waits for the host to end the stream.
+_CLOSE_TIMEOUT = 1.0
+
+# The deadline of the request whose handler is running, in the time of the event loop. Requests sent by the handler
+# inherit it.
+_request_deadline: ContextVar[float | None] = ContextVar("_request_deadline", default=None)
+
+
+def _is_wildcard_address(address: str) -> bool:
+    """Whether a bind address of the form host:port binds all interfaces rather than a host that can be dialed."""
+    host = address.rpartition(":")[0]
+    return host.strip("[]") in ("", "0.0.0.0", "::", "*")
+
+
+class _RequestScope:
+    """The cancellation token of a request handled by this worker, which is cancelled when the sender cancels the
+    request or when its deadline passes."""
+
+    def __init__(self, timeout: float) -> None:
+        self.cancellation_token = CancellationToken()
+        self.deadline: float | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        if timeout > 0:
+            loop = asyncio.get_running_loop()
+            self.deadline = loop.time() + timeout
+            self._timer = loop.call_at(self.deadline, self.cancellation_token.cancel)
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+class _DirectRequestServicer(agent_worker_pb2_grpc.AgentWorkerRpcServicer):
+    """Serves requests sent directly by other workers."""
+
+    def __init__(
+        self, handle_request: Callable[[agent_worker_pb2.RpcRequest], Awaitable[agent_worker_pb2.RpcResponse]]
+    ):
+        self._handle_request = handle_request
+
+    async def SendRequest(  # type: ignore
+        self,
+        request: agent_worker_pb2.RpcRequest,
+        context: grpc.aio.ServicerContext[agent_worker_pb2.RpcRequest, agent_worker_pb2.RpcResponse],
+    ) -> agent_worker_pb2.RpcResponse:  # type: ignore
+        return await self._handle_request(request)
 
 
 class HostConnection:
+    """The stream of messages between a worker and the host.
+
+    When the stream breaks, the connection opens a new one, waiting with an exponential backoff between attempts,
+    and keeps queueing the messages sent in the meantime. Messages that may not have reached the host are sent
+    again. The worker is identified by the same worker id on every stream, so that the host can resume its session.
+
+    Requests and events received from the host are in flight until they are released with :meth:`release`. With
+    ``max_in_flight``, every stream grants the host credits for the messages that are not in flight, and the credits of
+    released messages are returned to the host, so that the host never has more than ``max_in_flight`` of them in
+    flight at once.
+
+    Args:
+        channel (grpc.aio.Channel): The channel to the host.
+        send_queue_size (int, optional): The capacity of the send queue. Defaults to None, which means unbounded.
+        send_queue_full_policy (QueueFullPolicy, optional): What sending does when the send queue is full.
+            Defaults to QueueFullPolicy.BLOCK.
+        max_send_batch_size (int, optional): The maximum number of messages sent in one frame. Defaults to 1.
+        send_batch_interval (float, optional): Seconds to wait for more messages to fill a batch. Defaults to 0.
+        worker_id (str, optional): The id of the worker. Defaults to None, which means a random id.
+        on_reconnect (Callable[[bool], Awaitable[None]], optional): Called when a new stream is opened after the first
+            one, with whether the host resumed the session of the worker, before any queued message is sent.
+        max_in_flight (int, optional): The maximum number of requests and events received from the host that are in
+            flight at once. Defaults to None, which means the host is not limited.
+    """
+
     DEFAULT_GRPC_CONFIG: ClassVar[ChannelArgumentType] = [
         (
             "grpc.service_config",
@@ -102,14 +186,50 @@ class HostConnection:
         )
     ]
 
-    def __init__(self, channel: grpc.aio.Channel) -> None:  # type: ignore
+    def __init__(  # type: ignore
+        self,
+        channel: grpc.aio.Channel,  # type: ignore
+        send_queue_size: int | None = None,
+        send_queue_full_policy: QueueFullPolicy = QueueFullPolicy.BLOCK,
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        worker_id: str | None = None,
+        on_reconnect: Callable[[bool], Awaitable[None]] | None = None,
+        max_in_flight: int | None = None,
+    ) -> None:
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
         self._channel = channel
-        self._send_queue = asyncio.Queue[agent_worker_pb2.Message]()
+        self._send_queue = MessageQueue[agent_worker_pb2.Message](send_queue_size, send_queue_full_policy)
+        self._send_batcher = MessageBatcher(self._send_queue, max_send_batch_size, send_batch_interval)
         self._recv_queue = asyncio.Queue[agent_worker_pb2.Message]()
         self._connection_task: Task[None] | None = None
+        self._worker_id = worker_id if worker_id is not None else uuid.uuid4().hex
+        self._on_reconnect = on_reconnect
+        self._write_task: Task[None] | None = None
+        self._closing = False
+        self._max_in_flight = max_in_flight
+        # Credits are returned in batches of a quarter of the window, so that the host is not sent a message for
+        # every handled message, and all at once when nothing is in flight.
+        self._credit_batch_size = max(1, max_in_flight // 4) if max_in_flight is not None else 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._unreturned_credits = 0
+        self._num_credits_returned = 0
 
     @classmethod
-    def from_host_address(cls, host_address: str, extra_grpc_config: ChannelArgumentType = DEFAULT_GRPC_CONFIG) -> Self:
+    def from_host_address(
+        cls,
+        host_address: str,
+        extra_grpc_config: ChannelArgumentType = DEFAULT_GRPC_CONFIG,
+        send_queue_size: int | None = None,
+        send_queue_full_policy: QueueFullPolicy = QueueFullPolicy.BLOCK,
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        worker_id: str | None = None,
+        on_reconnect: Callable[[bool], Awaitable[None]] | None = None,
+        max_in_flight: int | None = None,
+    ) -> Self:
         logger.info("Connecting to %s", host_address)
         #  Always use DEFAULT_GRPC_CONFIG and override it with provided grpc_config
         merged_options = [
@@ -120,139 +240,446 @@ def from_host_address(cls, host_address: str, extra_grpc_config: ChannelArgument
             host_address,
             options=merged_options,
         )
-        instance = cls(channel)
-        instance._connection_task = asyncio.create_task(
-            instance._connect(channel, instance._send_queue, instance._recv_queue)
+        instance = cls(
+            channel,
+            send_queue_size,
+            send_queue_full_policy,
+            max_send_batch_size,
+            send_batch_interval,
+            worker_id,
+            on_reconnect,
+            max_in_flight,
         )
+        instance._connection_task = asyncio.create_task(instance._connect())
         return instance
 
     async def close(self) -> None:
         if self._connection_task is None:
             raise RuntimeError("Connection is not open.")
+        self._closing = True
+        if self._write_task is not None and not self._write_task.done():
+            # Close the stream rather than breaking it, so that the host ends the session of this worker instead of
+            # waiting for it to reconnect. Messages that are still queued are not sent.
+            self._send_queue.put_priority(agent_worker_pb2.Message(closeChannel=agent_worker_pb2.CloseChannel()))
+            end_stream(self._send_queue)
+            await asyncio.wait([self._connection_task], timeout=_CLOSE_TIMEOUT)
         await self._channel.close()
-        await self._connection_task
-
-    @staticmethod
-    async def _connect(  # type: ignore
-        channel: grpc.aio.Channel,
-        send_queue: asyncio.Queue[agent_worker_pb2.Message],
-        receive_queue: asyncio.Queue[agent_worker_pb2.Message],
-    ) -> None:
-        stub: AgentRpcAsyncStub = agent_worker_pb2_grpc.AgentRpcStub(channel)  # type: ignore
-
-        # TODO: where do exceptions from reading the iterable go? How do we recover from those?
-        recv_stream: StreamStreamCall[agent_worker_pb2.Message, agent_worker_pb2.Message] = stub.OpenChannel(  # type: ignore
-            QueueAsyncIterable(send_queue)
-        )  # type: ignore
-
-        while True:
-            logger.info("Waiting for message from host")
-            message = await recv_stream.read()  # type: ignore
-            if message == grpc.aio.EOF:  # type: ignore
-                logger.info("EOF")
+        self._connection_task.cancel()
+        try:
+            await self._connection_task
+        except asyncio.CancelledError:
+            pass
+
+    async def _connect(self) -> None:
+        stub: AgentRpcAsyncStub = agent_worker_pb2_grpc.AgentRpcStub(self._channel)  # type: ignore
+        backoff = _MIN_RECONNECT_BACKOFF
+        connected = False
+        while not self._closing:
+            call: StreamStreamCall[agent_worker_pb2.Message, agent_worker_pb2.Message] = stub.OpenChannel(  # type: ignore
+                metadata=self._open_channel_metadata()
+            )
+            try:
+                initial_metadata: grpc.aio.Metadata = await call.initial_metadata()  # type: ignore
+                # A call that failed to connect is done, and reading it raises the error.
+                if not call.done():  # type: ignore
+                    if connected and self._on_reconnect is not None:
+                        await self._on_reconnect(initial_metadata.get("session") == "resumed")
+                    connected = True
+                    backoff = _MIN_RECONNECT_BACKOFF
+                    self._write_task = asyncio.create_task(self._write_messages(call))  # type: ignore
+                while True:
+                    message = await call.read()  # type: ignore
+                    if message == grpc.aio.EOF:  # type: ignore
+                        logger.info("Host closed the connection.")
+                        break
+                    message = cast(agent_worker_pb2.Message, message)
+                    # Formatting a whole message is expensive, so it is deferred until the record is emitted.
+                    logger.debug("Received a message from host: %s", message)
+                    for received in unbatch(message):
+                        if received.WhichOneof("message") in ("request", "event"):
+                            self._in_flight += 1
+                            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+                        await self._recv_queue.put(received)
+            except grpc.aio.AioRpcError as e:
+                if not self._closing:
+                    logger.warning("Connection to host lost: %s", e.code())
+            finally:
+                if self._write_task is not None:
+                    self._write_task.cancel()
+            if self._closing:
                 break
-            message = cast(agent_worker_pb2.Message, message)
-            logger.info(f"Received a message from host: {message}")
-            await receive_queue.put(message)
-            logger.info("Put message in receive queue")
+            # The delay is randomized, so that the workers of a restarted host do not all reconnect at once.
+            delay = backoff * random.uniform(0.5, 1.0)
+            logger.info("Reconnecting to host in %.2f seconds.", delay)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, _MAX_RECONNECT_BACKOFF)
+
+    def _open_channel_metadata(self) -> Sequence[tuple[str, str]]:
+        if self._max_in_flight is None:
+            return (("worker-id", self._worker_id),)
+        # The stream starts with credits for the messages that are not in flight, which include those whose credits
+        # were not returned yet. Credits that were not sent on the previous stream are replaced by these.
+        for message in reversed(self._send_batcher.take_pending()):
+            self._send_queue.put_front(message)
+        for message in self._send_queue[:]:
+            if message.WhichOneof("message") == "credits":
+                self._send_queue.remove(message)
+                self._num_credits_returned -= message.credits.count
+        self._unreturned_credits = 0
+        return (("worker-id", self._worker_id), ("credits", str(max(0, self._max_in_flight - self._in_flight))))
+
+    async def _write_messages(self, call: StreamStreamCall[agent_worker_pb2.Message, agent_worker_pb2.Message]) -> None:  # type: ignore
+        async for message in self._send_batcher:
+            try:
+                await call.write(message)  # type: ignore
+            except (grpc.aio.AioRpcError, asyncio.InvalidStateError, asyncio.CancelledError) as e:
+                # The message may not have reached the host, so it is sent again on the next stream.
+                for unsent in reversed(list(unbatch(message))):
+                    self._send_queue.put_front(unsent)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return
+        try:
+            await call.done_writing()  # type: ignore
+        except (grpc.aio.AioRpcError, asyncio.InvalidStateError):
+            pass
+
+    @property
+    def send_queue_metrics(self) -> MessageQueueMetrics:
+        return self._send_queue.metrics
 
-    async def send(self, message: agent_worker_pb2.Message) -> None:
-        logger.info(f"Send message to host: {message}")
-        await self._send_queue.put(message)
-        logger.info("Put message in send queue")
+    @property
+    def in_flight_metrics(self) -> InFlightMetrics:
+        return InFlightMetrics(
+            in_flight=self._in_flight,
+            peak_in_flight=self._peak_in_flight,
+            max_in_flight=self._max_in_flight,
+            num_credits_returned=self._num_credits_returned,
+        )
+
+    def release(self) -> None:
+        """Release a request or event received from the host that is no longer in flight, returning its credit."""
+        self._in_flight -= 1
+        if self._max_in_flight is None:
+            return
+        self._unreturned_credits += 1
+        if self._unreturned_credits >= self._credit_batch_size or self._in_flight == 0:
+            self.send_nowait(agent_worker_pb2.Message(credits=agent_worker_pb2.Credits(count=self._unreturned_credits)))
+            self._num_credits_returned += self._unreturned_credits
+            self._unreturned_credits = 0
+
+    async def send(
+        self, message: agent_worker_pb2.Message, *, priority: bool = False
+    ) -> agent_worker_pb2.Message | None:
+        """Queue a message to be sent to the host.
+
+        Priority messages, such as responses and registration requests, bypass the send queue capacity.
+        Returns the message that was dropped from the send queue to make space for this one, if any."""
+        logger.debug("Send message to host: %s", message)
+        if priority:
+            self._send_queue.put_priority(message)
+            dropped = None
+        else:
+            dropped = await self._send_queue.put(message)
+        return dropped
+
+    def send_nowait(self, message: agent_worker_pb2.Message) -> None:
+        """Queue a priority message to be sent to the host without waiting."""
+        logger.debug("Send message to host: %s", message)
+        self._send_queue.put_priority(message)
+
+    def withdraw(self, message: agent_worker_pb2.Message) -> bool:
+        """Remove a message from the send queue if it has not been sent yet. Returns whether it was removed."""
+        return self._send_queue.remove(message)
 
     async def recv(self) -> agent_worker_pb2.Message:
-        logger.info("Getting message from queue")
         return await self._recv_queue.get()
 
 
 class WorkerAgentRuntime(AgentRuntime):
+    """An agent runtime that connects to a :class:`WorkerAgentRuntimeHost` and exchanges messages with other workers through it.
+
+    Messages are serialized in the fastest format that a serializer is registered for and that all workers connected
+    to the host accept: protobuf, then msgpack, then JSON. Msgpack serializers are added explicitly with
+    :meth:`add_message_serializer`, and are only used when every worker has the ``msgpack`` package installed.
+
+    Args:
+        host_address (str): The address of the host.
+        tracer_provider (TracerProvider, optional): The tracer provider to use for tracing. Defaults to None.
+        extra_grpc_config (ChannelArgumentType, optional): Extra gRPC channel options. Defaults to None.
+        max_send_queue_size (int, optional): The maximum number of sent and published messages waiting to be sent
+            to the host. Responses and control messages do not count towards this limit. Defaults to None, which means unbounded.
+        send_queue_full_policy (QueueFullPolicy, optional): What :meth:`send_message` and :meth:`publish_message` do when
+            the send queue is full. Defaults to QueueFullPolicy.BLOCK.
+        max_concurrency_per_agent (int | Mapping[str, int], optional): The maximum number of message handlers that run
+            concurrently for each agent instance hosted by this worker, either for all agents or as a mapping from agent
+            type to the limit for that type. Messages beyond the limit wait in the agent's mailbox in arrival order.
+            Unlike the :class:`~autogen_core.application.SingleThreadedAgentRuntime`, this runtime does not detect a
+            handler that sends a request to its own agent, directly or through agents that call back (A to B to A),
+            while the agent has no free slot. Such a request waits for the handler that waits for it, until the
+            request times out. Defaults to None, which means no limit.
+        max_cached_topics (int, optional): The maximum number of topics whose subscribed recipients are cached.
+            The least recently used topic is evicted first. Defaults to None, which means unbounded.
+        cached_topic_ttl (float, optional): Seconds after its last use at which a cached topic is evicted.
+            Defaults to None, which means cached topics do not expire.
+        max_agent_instances (int, optional): The maximum number of agent instances kept in memory by this worker. When it
+            is exceeded, the least recently used agent that is not handling a message is passivated: its state is saved and
+            written to the agent state store, and the instance is released. The next message to the agent creates a new
+            instance and restores the state. Defaults to None, which means unbounded.
+        agent_idle_timeout (float, optional): Seconds after its last message at which an agent is passivated while the
+            runtime is running. Defaults to None, which means agents are not passivated when idle.
+        agent_state_store (StateStore, optional): The store that the state of passivated agents and :meth:`checkpoint` is
+            written to, and that agents are restored from when they are activated. Defaults to None, which means an
+            :class:`~autogen_core.application.state.InMemoryStateStore` if agents can be passivated, and no store otherwise.
+        max_send_batch_size (int, optional): The maximum number of messages sent to the host together in one frame.
+            Batching reduces the per-message cost of the stream when many messages are sent at once. Requires a host that
+            supports batches. Defaults to 1, which means messages are sent one by one.
+        send_batch_interval (float, optional): Seconds to wait for more messages to fill a batch after the first one is
+            queued. Defaults to 0, which means only messages that are already queued are batched, adding no latency.
+        direct_address (str, optional): The address to accept requests from other workers on, bypassing the host. The
+            worker also sends its own requests directly to workers that accept them, after resolving their address
+            through the host once per agent, and falls back to relaying through the host when a worker cannot be
+            reached. Events and control messages always go through the host. Defaults to None, which means all
+            requests are relayed by the host.
+        advertised_address (str, optional): The address that other workers dial to reach the direct address, for
+            example the external address of a container or a host behind NAT. Required when the direct address binds
+            a wildcard host such as ``0.0.0.0`` or ``[::]``, which other workers cannot dial. Defaults to None, which
+            means the direct address.
+        request_timeout (float, optional): Seconds that :meth:`send_message` waits for a response before it raises
+            :class:`asyncio.TimeoutError`. Defaults to None, which means no limit.
+        max_in_flight_messages (int, optional): The maximum number of requests and events relayed by the host that
+            this worker handles at once, including those waiting in the mailboxes of their agents. The host holds
+            back further requests and events until handled ones complete. Handlers that send requests to agents on
+            the same worker, directly or through other agents, wait for those requests to be handled, so the limit
+            must leave room for them. Requires a host that supports credits. Defaults to None, which means no limit.
+
+    Requests carry their deadline, which is the earlier of the request timeout and the deadline of the request being
+    handled when they are sent. The recipient cancels the cancellation token of the handler when the deadline passes,
+    and when the sender stops waiting for the response: when the cancellation token passed to :meth:`send_message` is
+    cancelled, when the awaiting task is cancelled, or when the deadline passes.
+
+    When the connection to the host breaks, the worker reconnects with an exponential backoff, and messages sent in
+    the meantime wait in the send queue. If the host no longer knows the worker, for example because it restarted,
+    the worker registers its agent types and subscriptions again. Requests and registrations that are waiting for
+    a response are sent again, and requests that the host forwards again are recognized by their id, so that each is
+    handled once and answered again from the recent responses if it was already handled.
+    """
+
     def __init__(
         self,
         host_address: str,
         tracer_provider: TracerProvider | None = None,
         extra_grpc_config: ChannelArgumentType | None = None,
+        max_send_queue_size: int | None = None,
+        send_queue_full_policy: QueueFullPolicy = QueueFullPolicy.BLOCK,
+        max_concurrency_per_agent: int | Mapping[str, int] | None = None,
+        max_cached_topics: int | None = None,
+        cached_topic_ttl: float | None = None,
+        max_agent_instances: int | None = None,
+        agent_idle_timeout: float | None = None,
+        agent_state_store: StateStore | None = None,
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        direct_address: str | None = None,
+        advertised_address: str | None = None,
+        request_timeout: float | None = None,
+        max_in_flight_messages: int | None = None,
     ) -> None:
+        if advertised_address is not None and direct_address is None:
+            raise ValueError("An advertised address requires a direct address to bind.")
+        if direct_address is not None and advertised_address is None and _is_wildcard_address(direct_address):
+            raise ValueError(
+                f"The direct address {direct_address} binds all interfaces, which other workers cannot dial. "
+                "Pass the address they can reach this worker at as advertised_address."
+            )
         self._host_address = host_address
         self._trace_helper = TraceHelper(tracer_provider, MessageRuntimeTracingConfig("Worker Runtime"))
         self._per_type_subscribers: DefaultDict[tuple[str, str], Set[AgentId]] = defaultdict(set)
-        self._agent_factories: Dict[
-            str, Callable[[], Agent | Awaitable[Agent]] | Callable[[AgentRuntime, AgentId], Agent | Awaitable[Agent]]
-        ] = {}
-        self._instantiated_agents: Dict[AgentId, Agent] = {}
+        self._agent_factories: Dict[str, AgentFactory] = {}
+        self._agent_lifecycle = AgentLifecycleManager(
+            self._create_agent, max_agent_instances, agent_idle_timeout, agent_state_store
+        )
         self._known_namespaces: set[str] = set()
         self._read_task: None | Task[None] = None
         self._running = False
         self._pending_requests: Dict[str, Future[Any]] = {}
+        # The requests relayed by the host that this worker is handling, by request id, and the responses to the
+        # most recently handled ones, ordered from oldest to newest.
+        self._running_requests: Dict[str, _RequestScope] = {}
+        self._recent_responses: OrderedDict[str, agent_worker_pb2.RpcResponse] = OrderedDict()
+        # The messages sent to the host that are waiting for a response, by request id, which are sent again after
+        # a reconnection.
+        self._unanswered_messages: Dict[str, agent_worker_pb2.Message] = {}
+        self._request_timeout = request_timeout
+        self._max_in_flight_messages = max_in_flight_messages
         self._pending_requests_lock = asyncio.Lock()
         self._next_request_id = 0
         self._host_connection: HostConnection | None = None
-        self._background_tasks: Set[Task[Any]] = set()
-        self._subscription_manager = SubscriptionManager()
+        self._background_tasks: Set[Future[Any]] = set()
+        self._mailbox_scheduler = MailboxScheduler(max_concurrency_per_agent)
+        self._subscription_manager = SubscriptionManager(max_cached_topics, cached_topic_ttl)
         self._serialization_registry = SerializationRegistry()
         self._extra_grpc_config = extra_grpc_config or []
+        self._max_send_queue_size = max_send_queue_size
+        self._send_queue_full_policy = send_queue_full_policy
+        self._max_send_batch_size = max_send_batch_size
+        self._send_batch_interval = send_batch_interval
+        self._direct_address = direct_address
+        # The address that the host gives other workers to dial, which is compared to resolved addresses to find the
+        # agents hosted by this worker.
+        self._advertised_address = advertised_address or direct_address
+        self._direct_server: grpc.aio.Server | None = None  # type: ignore
+        self._direct_server_task: Task[None] | None = None
+        self._direct_channels: Dict[str, grpc.aio.Channel] = {}  # type: ignore
+        # Direct addresses of agents by agent id, ordered from least to most recently used. An empty address means
+        # requests to the agent are relayed by the host.
+        self._resolved_addresses: OrderedDict[AgentId, str] = OrderedDict()
+        # The content types that all workers accept, as told by the host.
+        # A frozenset, so that the serialization registry can cache the content type selected for it.
+        self._common_content_types: FrozenSet[str] = frozenset([JSON_DATA_CONTENT_TYPE])
 
     def start(self) -> None:
         """Start the runtime in a background task."""
         if self._running:
             raise ValueError("Runtime is already running.")
-        logger.info(f"Connecting to host: {self._host_address}")
+        logger.info("Connecting to host: %s", self._host_address)
         self._host_connection = HostConnection.from_host_address(
-            self._host_address, extra_grpc_config=self._extra_grpc_config
+            self._host_address,
+            extra_grpc_config=self._extra_grpc_config,
+            send_queue_size=self._max_send_queue_size,
+            send_queue_full_policy=self._send_queue_full_policy,
+            max_send_batch_size=self._max_send_batch_size,
+            send_batch_interval=self._send_batch_interval,
+            on_reconnect=self._on_reconnect,
+            max_in_flight=self._max_in_flight_messages,
         )
         logger.info("Connection established")
+        self._host_connection.send_nowait(self._accepted_content_types_message())
+        if self._direct_address is not None:
+            self._direct_server = grpc.aio.server(options=self._extra_grpc_config)
+            agent_worker_pb2_grpc.add_AgentWorkerRpcServicer_to_server(
+                _DirectRequestServicer(self._handle_direct_request), self._direct_server
+            )
+            self._direct_server.add_insecure_port(self._direct_address)
+            self._direct_server_task = asyncio.create_task(self._direct_server.start())
         if self._read_task is None:
             self._read_task = asyncio.create_task(self._run_read_loop())
+        self._agent_lifecycle.start()
         self._running = True
 
-    def _raise_on_exception(self, task: Task[Any]) -> None:
+    @staticmethod
+    def _accepted_content_types_message() -> agent_worker_pb2.Message:
+        accepted_content_types = [JSON_DATA_CONTENT_TYPE, PROTOBUF_DATA_CONTENT_TYPE]
+        if is_msgpack_available():
+            accepted_content_types.append(MSGPACK_DATA_CONTENT_TYPE)
+        return agent_worker_pb2.Message(
+            acceptedContentTypes=agent_worker_pb2.AcceptedContentTypes(content_types=accepted_content_types)
+        )
+
+    async def _on_reconnect(self, resumed: bool) -> None:
+        assert self._host_connection is not None
+        if not resumed:
+            logger.info("Host started a new session, registering agent types and subscriptions again.")
+            self._common_content_types = frozenset([JSON_DATA_CONTENT_TYPE])
+            self._resolved_addresses.clear()
+            self._host_connection.send_nowait(self._accepted_content_types_message())
+            messages: List[agent_worker_pb2.Message] = []
+            for agent_type in self._agent_factories:
+                messages.append(self._register_agent_type_message(await self._get_new_request_id(), agent_type))
+            for subscription in self._subscription_manager.subscriptions:
+                assert isinstance(subscription, TypeSubscription)
+                messages.append(self._add_subscription_message(await self._get_new_request_id(), subscription))
+            for message in messages:
+                future = asyncio.get_event_loop().create_future()
+                future.add_done_callback(self._log_registration_error)
+                self._pending_requests[getattr(message, cast(str, message.WhichOneof("message"))).request_id] = future
+                self._host_connection.send_nowait(message)
+        # The messages or their responses may have been lost with the stream. The host and the workers handling
+        # requests recognize the messages that they already received.
+        for message in list(self._unanswered_messages.values()):
+            self._host_connection.withdraw(message)
+            self._host_connection.send_nowait(message)
+
+    @staticmethod
+    def _log_registration_error(future: Future[Any]) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Failed to register with the host again: %s", future.exception())
+
+    def _keep_until_answered(self, request_id: str, future: Future[Any], message: agent_worker_pb2.Message) -> None:
+        """Keep a message sent to the host until its response arrives or the sender stops waiting for it, so that it
+        is sent again if the connection breaks in the meantime."""
+        self._unanswered_messages[request_id] = message
+        future.add_done_callback(lambda _: self._unanswered_messages.pop(request_id, None))
+
+    def _raise_on_exception(self, task: Future[Any]) -> None:
         exception = task.exception()
         if exception is not None:
             raise exception
 
+    def _release(self, task: Future[Any]) -> None:
+        assert self._host_connection is not None
+        self._host_connection.release()
+
     async def _run_read_loop(self) -> None:
         logger.info("Starting read loop")
-        # TODO: catch exceptions and reconnect
         while self._running:
             try:
                 message = await self._host_connection.recv()  # type: ignore
                 oneofcase = agent_worker_pb2.Message.WhichOneof(message, "message")
                 match oneofcase:
                     case "registerAgentTypeRequest" | "addSubscriptionRequest":
-                        logger.warning(f"Cant handle {oneofcase}, skipping.")
+                        logger.warning("Cant handle %s, skipping.", oneofcase)
                     case "request":
-                        task = asyncio.create_task(self._process_request(message.request))
-                        self._background_tasks.add(task)
-                        task.add_done_callback(self._raise_on_exception)
-                        task.add_done_callback(self._background_tasks.discard)
-                    case "response":
-                        task = asyncio.create_task(self._process_response(message.response))
+                        request = message.request
+                        if request.request_id in self._running_requests:
+                            # The host forwarded the request again after a reconnection.
+                            self._host_connection.release()  # type: ignore
+                            continue
+                        recent_response = self._recent_responses.get(request.request_id)
+                        if recent_response is not None:
+                            self._host_connection.send_nowait(agent_worker_pb2.Message(response=recent_response))  # type: ignore
+                            self._host_connection.release()  # type: ignore
+                            continue
+                        # The deadline counts from when the request is received, including the time in the mailbox.
+                        scope = self._running_requests[request.request_id] = _RequestScope(request.timeout)
+                        task = self._mailbox_scheduler.submit(
+                            AgentId(request.target.type, request.target.key),
+                            functools.partial(self._process_request, request, scope),
+                        )
                         self._background_tasks.add(task)
                         task.add_done_callback(self._raise_on_exception)
                         task.add_done_callback(self._background_tasks.discard)
+                        task.add_done_callback(self._release)
                     case "event":
                         task = asyncio.create_task(self._process_event(message.event))
                         self._background_tasks.add(task)
                         task.add_done_callback(self._raise_on_exception)
                         task.add_done_callback(self._background_tasks.discard)
+                        task.add_done_callback(self._release)
+                    # Responses only complete the futures of their requests, so they are processed without a task.
+                    case "response":
+                        await self._process_response(message.response)
                     case "registerAgentTypeResponse":
-                        task = asyncio.create_task(
-                            self._process_register_agent_type_response(message.registerAgentTypeResponse)
-                        )
-                        self._background_tasks.add(task)
-                        task.add_done_callback(self._raise_on_exception)
-                        task.add_done_callback(self._background_tasks.discard)
+                        await self._process_register_agent_type_response(message.registerAgentTypeResponse)
                     case "addSubscriptionResponse":
-                        task = asyncio.create_task(
-                            self._process_add_subscription_response(message.addSubscriptionResponse)
-                        )
-                        self._background_tasks.add(task)
-                        task.add_done_callback(self._raise_on_exception)
-                        task.add_done_callback(self._background_tasks.discard)
+                        await self._process_add_subscription_response(message.addSubscriptionResponse)
+                    case "resolveAgentResponse":
+                        response = message.resolveAgentResponse
+                        resolved = self._pending_requests.pop(response.request_id, None)
+                        if resolved is not None:
+                            resolved.set_result(response.direct_address)
+                    case "routingChanged":
+                        self._resolved_addresses.clear()
+                    case "acceptedContentTypes":
+                        self._common_content_types = frozenset(message.acceptedContentTypes.content_types)
+                    case "cancelRequest":
+                        running = self._running_requests.get(message.cancelRequest.request_id)
+                        if running is not None:
+                            running.cancellation_token.cancel()
                     case None:
                         logger.warning("No message")
                     case other:
-                        logger.error(f"Unknown message type: {other}")
+                        logger.error("Unknown message type: %s", other)
             except Exception as e:
                 logger.error("Error in read loop", exc_info=e)
 
@@ -266,6 +693,13 @@ async def stop(self) -> None:
         for task_result in final_tasks_results:
             if isinstance(task_result, Exception):
                 logger.error("Error in background task", exc_info=task_result)
+        await self._agent_lifecycle.stop()
+        # Stop accepting direct requests and close the channels to other workers.
+        if self._direct_server is not None:
+            await self._direct_server.stop(grace=None)
+        for channel in self._direct_channels.values():
+            await channel.close()
+        self._direct_channels.clear()
         # Close the host connection.
         if self._host_connection is not None:
             try:
@@ -302,6 +736,30 @@ def signal_handler() -> None:
     def _known_agent_names(self) -> Set[str]:
         return set(self._agent_factories.keys())
 
+    @property
+    def queue_metrics(self) -> MessageQueueMetrics:
+        """Depth and backpressure metrics of the queue of messages waiting to be sent to the host."""
+        if self._host_connection is None:
+            raise RuntimeError("Host connection is not set.")
+        return self._host_connection.send_queue_metrics
+
+    @property
+    def in_flight_metrics(self) -> InFlightMetrics:
+        """Metrics of the requests and events relayed by the host that this worker is handling."""
+        if self._host_connection is None:
+            raise RuntimeError("Host connection is not set.")
+        return self._host_connection.in_flight_metrics
+
+    @property
+    def subscription_cache_metrics(self) -> SubscriptionCacheMetrics:
+        """Size and hit/miss metrics of the cache of subscribed recipients per topic."""
+        return self._subscription_manager.cache_metrics
+
+    @property
+    def agent_lifecycle_metrics(self) -> AgentLifecycleMetrics:
+        """Activation and passivation metrics of the agent instances hosted by this worker."""
+        return self._agent_lifecycle.metrics
+
     async def _send_message(
         self,
         runtime_message: agent_worker_pb2.Message,
@@ -312,7 +770,14 @@ async def _send_message(
         if self._host_connection is None:
             raise RuntimeError("Host connection is not set.")
         with self._trace_helper.trace_block(send_type, recipient, parent=telemetry_metadata):
-            await self._host_connection.send(runtime_message)
+            dropped = await self._host_connection.send(runtime_message)
+        if dropped is not None and dropped.WhichOneof("message") == "request":
+            logger.warning("Send queue is full, dropped request to %s.", dropped.request.target.type)
+            future = self._pending_requests.pop(dropped.request.request_id, None)
+            if future is not None and not future.done():
+                future.set_exception(MessageDroppedException())
+        elif dropped is not None:
+            logger.warning("Send queue is full, dropped event published to %s.", dropped.event.topic_type)
 
     async def send_message(
         self,
@@ -326,16 +791,29 @@ async def send_message(
             raise ValueError("Runtime must be running when sending message.")
         if self._host_connection is None:
             raise RuntimeError("Host connection is not set.")
+        # Events are only created when they will be logged, so that logging costs nothing when it is disabled.
+        if event_logger.isEnabledFor(logging.INFO):
+            event_logger.info(
+                MessageEvent(
+                    payload=message,
+                    sender=sender,
+                    receiver=recipient,
+                    kind=MessageKind.DIRECT,
+                    delivery_stage=DeliveryStage.SEND,
+                )
+            )
         data_type = self._serialization_registry.type_name(message)
         with self._trace_helper.trace_block(
             "create", recipient, parent=None, extraAttributes={"message_type": data_type}
         ):
+            timeout = self._get_request_timeout()
             # create a new future for the result
             future = asyncio.get_event_loop().create_future()
             request_id = await self._get_new_request_id()
             self._pending_requests[request_id] = future
+            data_content_type = self._serialization_registry.select_content_type(data_type, self._common_content_types)
             serialized_message = self._serialization_registry.serialize(
-                message, type_name=data_type, data_content_type=JSON_DATA_CONTENT_TYPE
+                message, type_name=data_type, data_content_type=data_content_type
             )
             telemetry_metadata = get_telemetry_grpc_metadata()
             runtime_message = agent_worker_pb2.Message(
@@ -347,17 +825,121 @@ async def send_message(
                     payload=agent_worker_pb2.Payload(
                         data_type=data_type,
                         data=serialized_message,
-                        data_content_type=JSON_DATA_CONTENT_TYPE,
+                        data_content_type=data_content_type,
                     ),
+                    timeout=timeout or 0.0,
                 )
             )
 
-            # TODO: Find a way to handle timeouts/errors
-            task = asyncio.create_task(self._send_message(runtime_message, "send", recipient, telemetry_metadata))
-            self._background_tasks.add(task)
-            task.add_done_callback(self._raise_on_exception)
-            task.add_done_callback(self._background_tasks.discard)
-            return await future
+            if self._direct_address is not None:
+                try:
+                    response = await self._send_request_directly(
+                        runtime_message.request, recipient, telemetry_metadata, timeout, cancellation_token
+                    )
+                except BaseException:
+                    self._pending_requests.pop(request_id, None)
+                    raise
+                if response is not None:
+                    await self._process_response(response)
+                    return await future
+
+            try:
+                # Waits for space in the send queue when it is full, applying backpressure to the caller.
+                await self._send_message(runtime_message, "send", recipient, telemetry_metadata)
+            except MessageDroppedException:
+                self._pending_requests.pop(request_id, None)
+                raise
+            self._keep_until_answered(request_id, future, runtime_message)
+            try:
+                return await self._wait_for_response(future, timeout, cancellation_token)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                # The recipient stops handling the request, or never gets it if it has not been sent yet.
+                if self._pending_requests.pop(request_id, None) is not None and not self._host_connection.withdraw(
+                    runtime_message
+                ):
+                    self._host_connection.send_nowait(
+                        agent_worker_pb2.Message(cancelRequest=agent_worker_pb2.CancelRequest(request_id=request_id))
+                    )
+                raise
+
+    def _get_request_timeout(self) -> float | None:
+        """The seconds left to respond to a request sent now: the earlier of the request timeout and the deadline of
+        the request being handled, if any."""
+        timeout = self._request_timeout
+        deadline = _request_deadline.get()
+        if deadline is not None:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("The deadline of the request being handled has passed.")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    @staticmethod
+    async def _wait_for_response(
+        response: Awaitable[R], timeout: float | None, cancellation_token: CancellationToken | None
+    ) -> R:
+        future = asyncio.ensure_future(response)
+        if cancellation_token is not None:
+            cancellation_token.link_future(future)
+        return await asyncio.wait_for(future, timeout)
+
+    async def _resolve_direct_address(self, agent_id: AgentId) -> str:
+        address = self._resolved_addresses.get(agent_id)
+        if address is not None:
+            self._resolved_addresses.move_to_end(agent_id)
+            return address
+        assert self._host_connection is not None
+        future: Future[str] = asyncio.get_event_loop().create_future()
+        request_id = await self._get_new_request_id()
+        self._pending_requests[request_id] = future
+        message = agent_worker_pb2.Message(
+            resolveAgentRequest=agent_worker_pb2.ResolveAgentRequest(
+                request_id=request_id, agent=agent_worker_pb2.AgentId(type=agent_id.type, key=agent_id.key)
+            )
+        )
+        self._keep_until_answered(request_id, future, message)
+        await self._host_connection.send(message, priority=True)
+        address = await future
+        self._resolved_addresses[agent_id] = address
+        if len(self._resolved_addresses) > _MAX_RESOLVED_AGENTS:
+            self._resolved_addresses.popitem(last=False)
+        return address
+
+    async def _send_request_directly(
+        self,
+        request: agent_worker_pb2.RpcRequest,
+        recipient: AgentId,
+        telemetry_metadata: Mapping[str, str],
+        timeout: float | None,
+        cancellation_token: CancellationToken | None,
+    ) -> agent_worker_pb2.RpcResponse | None:
+        """Send a request to the worker that hosts the recipient, bypassing the host. Returns None when the request
+        has to be relayed by the host instead. Cancelling the request cancels the call, which cancels the handler."""
+        address = await self._resolve_direct_address(recipient)
+        if address == "":
+            return None
+        with self._trace_helper.trace_block("send", recipient, parent=telemetry_metadata):
+            if address == self._advertised_address:
+                # The recipient is hosted by this worker.
+                return await self._wait_for_response(self._handle_direct_request(request), timeout, cancellation_token)
+            channel = self._direct_channels.get(address)
+            if channel is None:
+                channel = self._direct_channels[address] = grpc.aio.insecure_channel(
+                    address, options=self._extra_grpc_config
+                )
+            stub: AgentWorkerRpcAsyncStub = agent_worker_pb2_grpc.AgentWorkerRpcStub(channel)  # type: ignore
+            try:
+                return await self._wait_for_response(stub.SendRequest(request), timeout, cancellation_token)  # type: ignore
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise
+                # The worker is gone or unreachable, and the request was not delivered.
+                logger.warning("Worker at %s is unavailable, relaying request through the host.", address)
+                for agent_id in [agent_id for agent_id, a in self._resolved_addresses.items() if a == address]:
+                    del self._resolved_addresses[agent_id]
+                del self._direct_channels[address]
+                await channel.close()
+                return None
 
     async def publish_message(
         self,
@@ -371,12 +953,25 @@ async def publish_message(
             raise ValueError("Runtime must be running when publishing message.")
         if self._host_connection is None:
             raise RuntimeError("Host connection is not set.")
+        if event_logger.isEnabledFor(logging.INFO):
+            event_logger.info(
+                MessageEvent(
+                    payload=message,
+                    sender=sender,
+                    receiver=None,
+                    kind=MessageKind.PUBLISH,
+                    delivery_stage=DeliveryStage.SEND,
+                )
+            )
         message_type = self._serialization_registry.type_name(message)
         with self._trace_helper.trace_block(
             "create", topic_id, parent=None, extraAttributes={"message_type": message_type}
         ):
+            data_content_type = self._serialization_registry.select_content_type(
+                message_type, self._common_content_types
+            )
             serialized_message = self._serialization_registry.serialize(
-                message, type_name=message_type, data_content_type=JSON_DATA_CONTENT_TYPE
+                message, type_name=message_type, data_content_type=data_content_type
             )
             telemetry_metadata = get_telemetry_grpc_metadata()
             runtime_message = agent_worker_pb2.Message(
@@ -388,15 +983,13 @@ async def publish_message(
                     payload=agent_worker_pb2.Payload(
                         data_type=message_type,
                         data=serialized_message,
-                        data_content_type=JSON_DATA_CONTENT_TYPE,
+                        data_content_type=data_content_type,
                     ),
                 )
             )
 
-            task = asyncio.create_task(self._send_message(runtime_message, "publish", topic_id, telemetry_metadata))
-            self._background_tasks.add(task)
-            task.add_done_callback(self._raise_on_exception)
-            task.add_done_callback(self._background_tasks.discard)
+            # Waits for space in the send queue when it is full, applying backpressure to the caller.
+            await self._send_message(runtime_message, "publish", topic_id, telemetry_metadata)
 
     async def save_state(self) -> Mapping[str, Any]:
         raise NotImplementedError("Saving state is not yet implemented.")
@@ -404,6 +997,21 @@ async def save_state(self) -> Mapping[str, Any]:
     async def load_state(self, state: Mapping[str, Any]) -> None:
         raise NotImplementedError("Loading state is not yet implemented.")
 
+    async def checkpoint(self, batch_size: int = 1000) -> int:
+        """Write the state of each agent instance hosted by this worker that changed since its last checkpoint to the
+        agent state store, in batches of ``batch_size``.
+
+        Args:
+            batch_size (int, optional): The number of agent states written to the store at once. Defaults to 1000.
+
+        Returns:
+            int: The number of agents whose state was written.
+
+        Raises:
+            RuntimeError: If the runtime has no agent state store.
+        """
+        return await self._agent_lifecycle.checkpoint(batch_size)
+
     async def agent_metadata(self, agent: AgentId) -> AgentMetadata:
         raise NotImplementedError("Agent metadata is not yet implemented.")
 
@@ -418,15 +1026,44 @@ async def _get_new_request_id(self) -> str:
             self._next_request_id += 1
             return str(self._next_request_id)
 
-    async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
+    async def _process_request(self, request: agent_worker_pb2.RpcRequest, scope: _RequestScope) -> None:
         assert self._host_connection is not None
+        try:
+            response = await self._handle_request(request, scope)
+        finally:
+            scope.close()
+            del self._running_requests[request.request_id]
+        self._recent_responses[request.request_id] = response
+        if len(self._recent_responses) > _MAX_RECENT_RESPONSES:
+            self._recent_responses.popitem(last=False)
+        # Send the response.
+        await self._host_connection.send(agent_worker_pb2.Message(response=response), priority=True)
+
+    async def _handle_direct_request(self, request: agent_worker_pb2.RpcRequest) -> agent_worker_pb2.RpcResponse:
+        scope = _RequestScope(request.timeout)
+        try:
+            # Delivered through the recipient's mailbox, like requests relayed by the host.
+            return await self._mailbox_scheduler.submit(
+                AgentId(request.target.type, request.target.key),
+                functools.partial(self._handle_request, request, scope),
+            )
+        except asyncio.CancelledError:
+            # The sender cancelled the call.
+            scope.cancellation_token.cancel()
+            raise
+        finally:
+            scope.close()
+
+    async def _handle_request(
+        self, request: agent_worker_pb2.RpcRequest, scope: _RequestScope
+    ) -> agent_worker_pb2.RpcResponse:
+        if scope.cancellation_token.is_cancelled():
+            # The request was cancelled while it waited in the mailbox.
+            return agent_worker_pb2.RpcResponse(request_id=request.request_id, error="Request was cancelled.")
         recipient = AgentId(request.target.type, request.target.key)
         sender: AgentId | None = None
         if request.HasField("source"):
             sender = AgentId(request.source.type, request.source.key)
-            logging.info(f"Processing request from {sender} to {recipient}")
-        else:
-            logging.info(f"Processing request from unknown source to {recipient}")
 
         # Deserialize the message.
         message = self._serialization_registry.deserialize(
@@ -434,6 +1071,16 @@ async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
             type_name=request.payload.data_type,
             data_content_type=request.payload.data_content_type,
         )
+        if event_logger.isEnabledFor(logging.INFO):
+            event_logger.info(
+                MessageEvent(
+                    payload=message,
+                    sender=sender,
+                    receiver=recipient,
+                    kind=MessageKind.DIRECT,
+                    delivery_stage=DeliveryStage.DELIVER,
+                )
+            )
 
         # Get the receiving agent and prepare the message context.
         rec_agent = await self._get_agent(recipient)
@@ -441,12 +1088,13 @@ async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
             sender=sender,
             topic_id=None,
             is_rpc=True,
-            cancellation_token=CancellationToken(),
+            cancellation_token=scope.cancellation_token,
         )
 
         # Call the receiving agent.
+        deadline_token = _request_deadline.set(scope.deadline)
         try:
-            with MessageHandlerContext.populate_context(rec_agent.id):
+            with self._agent_lifecycle.in_use(recipient), MessageHandlerContext.populate_context(rec_agent.id):
                 with self._trace_helper.trace_block(
                     "process",
                     rec_agent.id,
@@ -456,40 +1104,40 @@ async def _process_request(self, request: agent_worker_pb2.RpcRequest) -> None:
                 ):
                     result = await rec_agent.on_message(message, ctx=message_context)
         except BaseException as e:
-            response_message = agent_worker_pb2.Message(
-                response=agent_worker_pb2.RpcResponse(
-                    request_id=request.request_id,
-                    error=str(e),
-                    metadata=get_telemetry_grpc_metadata(),
-                ),
+            return agent_worker_pb2.RpcResponse(
+                request_id=request.request_id,
+                # An empty error means success, so exceptions without a message, such as when the handler is
+                # cancelled, are reported by their type.
+                error=str(e) or type(e).__name__,
+                metadata=get_telemetry_grpc_metadata(),
             )
-            # Send the error response.
-            await self._host_connection.send(response_message)
-            return
+        finally:
+            _request_deadline.reset(deadline_token)
 
         # Serialize the result.
         result_type = self._serialization_registry.type_name(result)
+        result_content_type = self._serialization_registry.select_content_type(result_type, self._common_content_types)
         serialized_result = self._serialization_registry.serialize(
-            result, type_name=result_type, data_content_type=JSON_DATA_CONTENT_TYPE
+            result, type_name=result_type, data_content_type=result_content_type
         )
 
-        # Create the response message.
-        response_message = agent_worker_pb2.Message(
-            response=agent_worker_pb2.RpcResponse(
-                request_id=request.request_id,
-                payload=agent_worker_pb2.Payload(
-                    data_type=result_type,
-                    data=serialized_result,
-                    data_content_type=JSON_DATA_CONTENT_TYPE,
-                ),
-                metadata=get_telemetry_grpc_metadata(),
-            )
+        # Create the response.
+        return agent_worker_pb2.RpcResponse(
+            request_id=request.request_id,
+            payload=agent_worker_pb2.Payload(
+                data_type=result_type,
+                data=serialized_result,
+                data_content_type=result_content_type,
+            ),
+            metadata=get_telemetry_grpc_metadata(),
         )
 
-        # Send the response.
-        await self._host_connection.send(response_message)
-
     async def _process_response(self, response: agent_worker_pb2.RpcResponse) -> None:
+        future = self._pending_requests.pop(response.request_id, None)
+        if future is None:
+            # The sender stopped waiting for the response.
+            logger.debug("Dropping the response to abandoned request %s.", response.request_id)
+            return
         with self._trace_helper.trace_block(
             "ack",
             None,
@@ -503,8 +1151,18 @@ async def _process_response(self, response: agent_worker_pb2.RpcResponse) -> Non
                 type_name=response.payload.data_type,
                 data_content_type=response.payload.data_content_type,
             )
-            # Get the future and set the result.
-            future = self._pending_requests.pop(response.request_id)
+            if event_logger.isEnabledFor(logging.INFO):
+                event_logger.info(
+                    MessageEvent(
+                        payload=result,
+                        sender=None,
+                        receiver=None,
+                        kind=MessageKind.RESPOND,
+                        delivery_stage=DeliveryStage.DELIVER,
+                        request_id=response.request_id,
+                    )
+                )
+            # Set the result.
             if len(response.error) > 0:
                 future.set_exception(Exception(response.error))
             else:
@@ -518,32 +1176,53 @@ async def _process_event(self, event: agent_worker_pb2.Event) -> None:
         if event.HasField("source"):
             sender = AgentId(event.source.type, event.source.key)
         topic_id = TopicId(event.topic_type, event.topic_source)
-        # Get the recipients for the topic.
-        recipients = await self._subscription_manager.get_subscribed_recipients(topic_id)
+        # Get the recipients for the topic. The host names them when the agent types are hosted by several workers.
+        recipients: Sequence[AgentId]
+        if len(event.recipients) > 0:
+            recipients = [AgentId(recipient.type, recipient.key) for recipient in event.recipients]
+        else:
+            recipients = await self._subscription_manager.get_subscribed_recipients(topic_id)
+
+        async def send_message(agent_id: AgentId, message_context: MessageContext) -> Any:
+            # The agent is fetched when the handler starts, as it may be passivated while the message
+            # waits in its mailbox.
+            agent = await self._get_agent(agent_id)
+            with self._agent_lifecycle.in_use(agent_id), MessageHandlerContext.populate_context(agent.id):
+                with self._trace_helper.trace_block(
+                    "process",
+                    agent.id,
+                    parent=event.metadata,
+                    extraAttributes={"message_type": event.payload.data_type},
+                ):
+                    await agent.on_message(message, ctx=message_context)
+
         # Send the message to each recipient.
         responses: List[Awaitable[Any]] = []
+        log_events = event_logger.isEnabledFor(logging.INFO)
         for agent_id in recipients:
             if agent_id == sender:
                 continue
+            if log_events:
+                event_logger.info(
+                    MessageEvent(
+                        payload=message,
+                        sender=sender,
+                        receiver=agent_id,
+                        kind=MessageKind.PUBLISH,
+                        delivery_stage=DeliveryStage.DELIVER,
+                    )
+                )
             message_context = MessageContext(
                 sender=sender,
                 topic_id=topic_id,
                 is_rpc=False,
                 cancellation_token=CancellationToken(),
             )
-            agent = await self._get_agent(agent_id)
-            with MessageHandlerContext.populate_context(agent.id):
-
-                async def send_message(agent: Agent, message_context: MessageContext) -> Any:
-                    with self._trace_helper.trace_block(
-                        "process",
-                        agent.id,
-                        parent=event.metadata,
-                        extraAttributes={"message_type": event.payload.data_type},
-                    ):
-                        await agent.on_message(message, ctx=message_context)
-
-                future = send_message(agent, message_context)
+
+            # Delivered through the recipient's mailbox, which limits its concurrent handlers if configured.
+            future = self._mailbox_scheduler.submit(
+                agent_id, functools.partial(send_message, agent_id, message_context)
+            )
             responses.append(future)
         # Wait for all responses.
         try:
@@ -564,7 +1243,7 @@ async def register(
     ) -> AgentType:
         if type in self._agent_factories:
             raise ValueError(f"Agent with type {type} already exists.")
-        self._agent_factories[type] = agent_factory
+        self._agent_factories[type] = AgentFactory(agent_factory)
 
         if self._host_connection is None:
             raise RuntimeError("Host connection is not set.")
@@ -574,11 +1253,14 @@ async def register(
         request_id = await self._get_new_request_id()
         self._pending_requests[request_id] = future
 
+        # Other workers may send requests to the direct address as soon as the host knows it.
+        if self._direct_server_task is not None:
+            await self._direct_server_task
+
         # Send the registration request message to the host.
-        message = agent_worker_pb2.Message(
-            registerAgentTypeRequest=agent_worker_pb2.RegisterAgentTypeRequest(request_id=request_id, type=type)
-        )
-        await self._host_connection.send(message)
+        message = self._register_agent_type_message(request_id, type)
+        self._keep_until_answered(request_id, future, message)
+        await self._host_connection.send(message, priority=True)
 
         # Wait for the registration response.
         await future
@@ -623,26 +1305,39 @@ async def factory_wrapper() -> T:
 
             return agent_instance
 
-        self._agent_factories[type.type] = factory_wrapper
+        self._agent_factories[type.type] = AgentFactory(factory_wrapper)
 
         # Create a future for the registration response.
         future = asyncio.get_event_loop().create_future()
         request_id = await self._get_new_request_id()
         self._pending_requests[request_id] = future
 
+        # Other workers may send requests to the direct address as soon as the host knows it.
+        if self._direct_server_task is not None:
+            await self._direct_server_task
+
         # Send the registration request message to the host.
-        message = agent_worker_pb2.Message(
-            registerAgentTypeRequest=agent_worker_pb2.RegisterAgentTypeRequest(request_id=request_id, type=type.type)
-        )
-        await self._host_connection.send(message)
+        message = self._register_agent_type_message(request_id, type.type)
+        self._keep_until_answered(request_id, future, message)
+        await self._host_connection.send(message, priority=True)
 
         # Wait for the registration response.
         await future
 
         return type
 
+    def _register_agent_type_message(self, request_id: str, type: str) -> agent_worker_pb2.Message:
+        return agent_worker_pb2.Message(
+            registerAgentTypeRequest=agent_worker_pb2.RegisterAgentTypeRequest(
+                request_id=request_id, type=type, direct_address=self._advertised_address or ""
+            )
+        )
+
     async def _process_register_agent_type_response(self, response: agent_worker_pb2.RegisterAgentTypeResponse) -> None:
-        future = self._pending_requests.pop(response.request_id)
+        future = self._pending_requests.pop(response.request_id, None)
+        if future is None:
+            # The host answered a registration that was sent again after a reconnection.
+            return
         if response.HasField("error"):
             future.set_exception(RuntimeError(response.error))
         else:
@@ -650,39 +1345,35 @@ async def _process_register_agent_type_response(self, response: agent_worker_pb2
 
     async def _invoke_agent_factory(
         self,
-        agent_factory: Callable[[], T | Awaitable[T]] | Callable[[AgentRuntime, AgentId], T | Awaitable[T]],
+        agent_factory: AgentFactory,
         agent_id: AgentId,
-    ) -> T:
+    ) -> Agent:
         with AgentInstantiationContext.populate_context((self, agent_id)):
-            if len(inspect.signature(agent_factory).parameters) == 0:
-                factory_one = cast(Callable[[], T], agent_factory)
-                agent = factory_one()
-            elif len(inspect.signature(agent_factory).parameters) == 2:
+            if agent_factory.num_parameters == 0:
+                agent = agent_factory()
+            elif agent_factory.num_parameters == 2:
                 warnings.warn(
                     "Agent factories that take two arguments are deprecated. Use AgentInstantiationContext instead. Two arg factories will be removed in a future version.",
                     stacklevel=2,
                 )
-                factory_two = cast(Callable[[AgentRuntime, AgentId], T], agent_factory)
-                agent = factory_two(self, agent_id)
+                agent = agent_factory(self, agent_id)
             else:
                 raise ValueError("Agent factory must take 0 or 2 arguments.")
 
             if inspect.isawaitable(agent):
-                return cast(T, await agent)
-
-        return agent
+                return cast(Agent, await agent)
 
-    async def _get_agent(self, agent_id: AgentId) -> Agent:
-        if agent_id in self._instantiated_agents:
-            return self._instantiated_agents[agent_id]
+        return cast(Agent, agent)
 
+    async def _create_agent(self, agent_id: AgentId) -> Agent:
         if agent_id.type not in self._agent_factories:
             raise ValueError(f"Agent with name {agent_id.type} not found.")
 
         agent_factory = self._agent_factories[agent_id.type]
-        agent = await self._invoke_agent_factory(agent_factory, agent_id)
-        self._instantiated_agents[agent_id] = agent
-        return agent
+        return await self._invoke_agent_factory(agent_factory, agent_id)
+
+    async def _get_agent(self, agent_id: AgentId) -> Agent:
+        return await self._agent_lifecycle.get(agent_id)
 
     # TODO: uncomment out the following type ignore when this is fixed in mypy: https://github.com/python/mypy/issues/3737
     async def try_get_underlying_agent_instance(self, id: AgentId, type: Type[T] = Agent) -> T:  # type: ignore[assignment]
@@ -698,10 +1389,15 @@ async def try_get_underlying_agent_instance(self, id: AgentId, type: Type[T] = A
         return agent_instance
 
     async def add_subscription(self, subscription: Subscription) -> None:
-        if self._host_connection is None:
-            raise RuntimeError("Host connection is not set.")
+        if isinstance(subscription, TypePrefixSubscription):
+            raise ValueError(
+                "TypePrefixSubscription is not supported by the worker runtime, as the host cannot route events by topic "
+                "type prefix. Use a TypeSubscription for each topic type instead."
+            )
         if not isinstance(subscription, TypeSubscription):
             raise ValueError("Only TypeSubscription is supported.")
+        if self._host_connection is None:
+            raise RuntimeError("Host connection is not set.")
         # Add to local subscription manager.
         await self._subscription_manager.add_subscription(subscription)
 
@@ -711,7 +1407,16 @@ async def add_subscription(self, subscription: Subscription) -> None:
         self._pending_requests[request_id] = future
 
         # Send the subscription to the host.
-        message = agent_worker_pb2.Message(
+        message = self._add_subscription_message(request_id, subscription)
+        self._keep_until_answered(request_id, future, message)
+        await self._host_connection.send(message, priority=True)
+
+        # Wait for the subscription response.
+        await future
+
+    @staticmethod
+    def _add_subscription_message(request_id: str, subscription: TypeSubscription) -> agent_worker_pb2.Message:
+        return agent_worker_pb2.Message(
             addSubscriptionRequest=agent_worker_pb2.AddSubscriptionRequest(
                 request_id=request_id,
                 subscription=agent_worker_pb2.Subscription(
@@ -721,13 +1426,12 @@ async def add_subscription(self, subscription: Subscription) -> None:
                 ),
             )
         )
-        await self._host_connection.send(message)
-
-        # Wait for the subscription response.
-        await future
 
     async def _process_add_subscription_response(self, response: agent_worker_pb2.AddSubscriptionResponse) -> None:
-        future = self._pending_requests.pop(response.request_id)
+        future = self._pending_requests.pop(response.request_id, None)
+        if future is None:
+            # The host answered a subscription that was sent again after a reconnection.
+            return
         if response.HasField("error"):
             future.set_exception(RuntimeError(response.error))
         else:
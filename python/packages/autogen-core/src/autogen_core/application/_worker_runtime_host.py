@@ -1,27 +1,92 @@
 import asyncio
 import logging
 import signal
-from typing import Optional, Sequence
+from typing import Dict, Optional, Sequence
 
 import grpc
 
 from autogen_core.base._type_helpers import ChannelArgumentType
 
-from ._worker_runtime_host_servicer import WorkerAgentRuntimeHostServicer
-from .protos import agent_worker_pb2_grpc
+from ._flow_control import CreditMetrics
+from ._helpers import SubscriptionCacheMetrics
+from ._worker_runtime_host_servicer import WorkerAgentRuntimeHostServicer, add_servicer_to_server
+from .state import StateStore
 
 logger = logging.getLogger("autogen_core")
 
 
 class WorkerAgentRuntimeHost:
-    def __init__(self, address: str, extra_grpc_config: Optional[ChannelArgumentType] = None) -> None:
+    """A host that routes messages between :class:`WorkerAgentRuntime` instances.
+
+    An agent type can be registered by several workers to scale it out. Its agents are then spread across those
+    workers by a consistent hash of the agent key, and rebalanced when workers join or leave.
+
+    Workers that limit the messages they handle at once with ``max_in_flight_messages`` are only sent as many requests
+    and events as they have credits for, and the others wait at the host until the worker returns credits.
+
+    Several hosts can share the routing when each is given the addresses of all hosts with ``hosts``. Each host owns
+    the agent types that hash to it, and forwards the registrations, subscriptions and requests for the agent types of
+    the other hosts to their owners, so workers can connect to any host. Events are sent to all hosts.
+
+    Args:
+        address (str): The address to listen on.
+        extra_grpc_config (ChannelArgumentType, optional): Extra gRPC server options. Defaults to None.
+        max_cached_topics (int, optional): The maximum number of topics whose subscribed recipients are cached.
+            Bounding the cache keeps memory flat when conversations use fresh topic sources. Defaults to None, which means unbounded.
+        cached_topic_ttl (float, optional): Seconds after its last use at which a cached topic is evicted.
+            Defaults to None, which means cached topics do not expire.
+        state_store (StateStore, optional): The store that agent state saved through the ``SaveState`` RPC is written to
+            and that the ``GetState`` RPC reads from. Defaults to None, which means an
+            :class:`~autogen_core.application.state.InMemoryStateStore`.
+        max_send_batch_size (int, optional): The maximum number of messages sent to a worker in one frame of its stream.
+            Requires workers that support batches. Defaults to 1, which means no batching.
+        send_batch_interval (float, optional): Seconds to wait for more messages to a worker after the first message
+            of a batch. Defaults to 0, which means only messages that are already queued are batched.
+        worker_reconnect_timeout (float, optional): Seconds that the agent types, subscriptions and queued messages of
+            a worker whose connection broke are kept for it to reconnect and resume, and that requests to agent types
+            that are not registered wait for a worker to register them. Defaults to 10.
+        hosts (Sequence[str], optional): The addresses of all hosts that share the routing, including ``address``,
+            the same on every host. Defaults to None, which means this host routes all agent types itself.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        extra_grpc_config: Optional[ChannelArgumentType] = None,
+        max_cached_topics: int | None = None,
+        cached_topic_ttl: float | None = None,
+        state_store: StateStore | None = None,
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        worker_reconnect_timeout: float = 10.0,
+        hosts: Sequence[str] | None = None,
+    ) -> None:
         self._server = grpc.aio.server(options=extra_grpc_config)
-        self._servicer = WorkerAgentRuntimeHostServicer()
-        agent_worker_pb2_grpc.add_AgentRpcServicer_to_server(self._servicer, self._server)
+        self._servicer = WorkerAgentRuntimeHostServicer(
+            max_cached_topics,
+            cached_topic_ttl,
+            state_store,
+            max_send_batch_size,
+            send_batch_interval,
+            worker_reconnect_timeout,
+            address,
+            hosts,
+        )
+        add_servicer_to_server(self._servicer, self._server)
         self._server.add_insecure_port(address)
         self._address = address
         self._serve_task: asyncio.Task[None] | None = None
 
+    @property
+    def subscription_cache_metrics(self) -> SubscriptionCacheMetrics:
+        """Size and hit/miss metrics of the cache of subscribed recipients per topic."""
+        return self._servicer.subscription_cache_metrics
+
+    @property
+    def flow_control_metrics(self) -> Dict[int, CreditMetrics]:
+        """Credit and stall metrics of the requests and events sent to each connected worker, by client id."""
+        return self._servicer.flow_control_metrics
+
     async def _serve(self) -> None:
         await self._server.start()
         logger.info(f"Server started at {self._address}.")
@@ -32,11 +97,13 @@ def start(self) -> None:
         if self._serve_task is not None:
             raise RuntimeError("Host runtime is already started.")
         self._serve_task = asyncio.create_task(self._serve())
+        self._servicer.start_peer_links()
 
     async def stop(self, grace: int = 5) -> None:
         """Stop the server."""
         if self._serve_task is None:
             raise RuntimeError("Host runtime is not started.")
+        await self._servicer.close_peer_links()
         await self._server.stop(grace=grace)
         self._serve_task.cancel()
         try:
@@ -1,87 +1,574 @@
 import asyncio
+import functools
+import hashlib
+import json
 import logging
+import time
+import uuid
+import warnings
 from _collections_abc import AsyncIterator, Iterator
 from asyncio import Future, Task
-from typing import Any, Dict, Set
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Sequence, Set, Tuple, cast
 
 import grpc
 
-from ..base import TopicId
+from ..base import JSON_DATA_CONTENT_TYPE, MSGPACK_DATA_CONTENT_TYPE, PROTOBUF_DATA_CONTENT_TYPE, AgentId, TopicId
 from ..components import TypeSubscription
-from ._helpers import SubscriptionManager
+from ._flow_control import CreditMetrics, CreditQueue
+from ._hash_ring import HashRing
+from ._helpers import SubscriptionCacheMetrics, SubscriptionManager
+from ._message_batcher import EncodedMessageBatcher, end_stream, unbatch
+from ._peer_link import PeerLink
+from ._wire_format import encode_event_message
 from .protos import agent_worker_pb2, agent_worker_pb2_grpc
+from .state import InMemoryStateStore, StateStore
 
 logger = logging.getLogger("autogen_core")
 event_logger = logging.getLogger("autogen_core.events")
 
 
+@dataclass
+class _EventRoute:
+    """The clients that events published to a topic are delivered to."""
+
+    recipients: List[AgentId]
+    """The subscribed recipients of the topic that the route was computed from."""
+
+    routing_version: int
+    """The version of the agent type to client mapping that the route was computed from."""
+
+    clients: Sequence[Tuple[int, bytes]]
+    """The client ids, each with the encoded recipients field that is appended to the events sent to it. The field is
+    empty when the client delivers events to all of its subscribed agents."""
+
+    last_used: float
+
+
+@dataclass
+class _ForwardedRequest:
+    """A request forwarded to the client that handles it, waiting for the response."""
+
+    future: Future[agent_worker_pb2.RpcResponse]
+    message: bytes
+    """The encoded request message, which is forwarded again when the client reconnects."""
+
+
+class _EncodedMessage:
+    """Decodes an encoded message only when it is formatted, for logging."""
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+
+    def __str__(self) -> str:
+        return str(agent_worker_pb2.Message.FromString(self._data))
+
+
 class WorkerAgentRuntimeHostServicer(agent_worker_pb2_grpc.AgentRpcServicer):
-    """A gRPC servicer that hosts message delivery service for agents."""
+    """A gRPC servicer that hosts message delivery service for agents.
+
+    An agent type can be registered by many workers. The agents of such a type are spread across its workers
+    by a consistent hash of the agent key, so that every message for a given agent goes to the same worker.
+    When a worker registers or disconnects, only the keys of about one worker's share of the agents move.
+
+    Messages are encoded when they are queued for a client. An event is encoded once however many clients it is
+    delivered to, and the clients that each topic is delivered to are computed once and cached until the
+    subscriptions or the registered agent types change. Register the servicer with
+    :func:`add_servicer_to_server`, which sends the encoded messages as they are. The servicer still works when it is
+    registered with the generated ``agent_worker_pb2_grpc.add_AgentRpcServicer_to_server``, but then every message
+    is decoded again before it is sent, and a :class:`RuntimeWarning` says so when a client connects.
+
+    Workers that register their agent types with a direct address serve requests to their agents themselves.
+    Other workers resolve the address of the worker that hosts an agent through the host and then send requests
+    to it directly, and the host notifies them when agents may have moved between workers.
+
+    Requests are forwarded with the id of the sending worker prepended to their id, so that requests from different
+    workers cannot be mistaken for each other. When a client cancels a request, or disconnects while it waits for
+    responses, the host tells the clients handling the requests to cancel them.
 
-    def __init__(self) -> None:
+    Workers identify themselves with the ``worker-id`` metadata of ``OpenChannel``. When the stream of a worker breaks,
+    rather than being closed by the worker, the host keeps its agent types, subscriptions and queued messages for
+    ``worker_reconnect_timeout`` seconds. If the worker reconnects in that time, its session resumes: the queued
+    messages are sent, and the requests it was handling are forwarded again. The ``session`` initial metadata of the
+    stream tells the worker whether its session was ``resumed`` or is ``new``, in which case it registers again.
+    Requests sent again by workers are recognized by their id and not forwarded twice, and requests to agent types
+    that are not registered wait for them to be registered for the same time.
+
+    Workers announce the content types of payloads they accept, and the host tells every worker which content types
+    all connected workers accept, so that payloads are serialized in a format that every receiver can read.
+
+    Workers that limit the requests and events they handle at once announce their initial credits with the ``credits``
+    metadata of ``OpenChannel``, and return credits with ``Credits`` messages as they finish handling them. Requests
+    and events for a worker without credits wait in its send queue, while responses and control messages are sent
+    regardless. Messages received from a worker are processed in the order they arrive before the next one is read,
+    so that a worker that sends faster than the host forwards is slowed down by the flow control of the stream.
+
+    Several hosts can share the routing as a sharded topology, when each is given the addresses of all of them.
+    Agent types are assigned to hosts by a consistent hash of their name, and the host that owns an agent type keeps
+    its registrations and its subscriptions. Workers connect to any host. Every host links to every other host with
+    a stream on which it is a client of the other host, identified by the ``peer-host`` metadata. A host forwards
+    the registrations, subscriptions and requests of its workers for agent types that other hosts own to the owner,
+    which routes requests for those agent types to the host whose workers registered them, and that host to one of
+    its workers. Events published by the workers of a host are sent to all hosts, and each host delivers them to the
+    subscribed agents of the agent types it owns, naming the recipients when they are hosted behind another host.
+    The addresses of agents of agent types owned by other hosts are not resolved, so requests to them are relayed.
+
+    Args:
+        max_cached_topics (int, optional): The maximum number of topics whose subscribed recipients are cached.
+            Defaults to None, which means unbounded.
+        cached_topic_ttl (float, optional): Seconds after its last use at which a cached topic is evicted.
+            Defaults to None, which means cached topics do not expire.
+        state_store (StateStore, optional): The store behind the ``GetState`` and ``SaveState`` RPCs.
+            Defaults to None, which means an :class:`~autogen_core.application.state.InMemoryStateStore`.
+        max_send_batch_size (int, optional): The maximum number of messages sent to a client together in one frame.
+            Defaults to 1, which means messages are sent one by one.
+        send_batch_interval (float, optional): Seconds to wait for more messages to fill a batch after the first one is
+            queued. Defaults to 0, which means only messages that are already queued are batched.
+        worker_reconnect_timeout (float, optional): Seconds that the session of a worker whose stream broke is kept for
+            it to reconnect. Defaults to 10.
+        address (str, optional): The address of this host, as it appears in ``hosts``. Required with ``hosts``.
+        hosts (Sequence[str], optional): The addresses of all hosts of a sharded topology, including this one, the
+            same on every host. Call :meth:`start_peer_links` to link to the other hosts. Defaults to None, which
+            means this host routes all agent types itself.
+    """
+
+    def __init__(
+        self,
+        max_cached_topics: int | None = None,
+        cached_topic_ttl: float | None = None,
+        state_store: StateStore | None = None,
+        max_send_batch_size: int = 1,
+        send_batch_interval: float = 0.0,
+        worker_reconnect_timeout: float = 10.0,
+        address: str | None = None,
+        hosts: Sequence[str] | None = None,
+    ) -> None:
+        if hosts is not None and (address is None or address not in hosts):
+            raise ValueError("The address of the host must be one of the hosts.")
         self._client_id = 0
         self._client_id_lock = asyncio.Lock()
-        self._send_queues: Dict[int, asyncio.Queue[agent_worker_pb2.Message]] = {}
-        self._agent_type_to_client_id_lock = asyncio.Lock()
-        self._agent_type_to_client_id: Dict[str, int] = {}
-        self._pending_responses: Dict[int, Dict[str, Future[Any]]] = {}
+        self._send_queues: Dict[int, CreditQueue[bytes]] = {}
+        self._agent_type_to_client_ids_lock = asyncio.Lock()
+        self._agent_type_to_client_ids: Dict[str, HashRing[int]] = {}
+        # Incremented whenever an agent type moves between clients, which invalidates the cached event routes.
+        self._routing_version = 0
+        # The addresses that clients accept direct requests on, and the clients that have resolved addresses
+        # and are notified when the routing changes.
+        self._direct_addresses: Dict[int, str] = {}
+        self._resolving_client_ids: Set[int] = set()
+        # The content types that each client accepts, and those that all clients accept. Clients that have not
+        # announced theirs only accept JSON.
+        self._accepted_content_types: Dict[int, Set[str]] = {}
+        self._common_content_types: Set[str] = {JSON_DATA_CONTENT_TYPE}
+        # Cached event routes by topic, ordered from least to most recently used, and bounded like the
+        # cached recipients of the subscription manager.
+        self._event_routes: OrderedDict[TopicId, _EventRoute] = OrderedDict()
+        self._max_cached_topics = max_cached_topics
+        self._cached_topic_ttl = cached_topic_ttl
+        # The worker id of each client, and the client of each worker id.
+        self._worker_ids: Dict[int, str] = {}
+        self._worker_client_ids: Dict[str, int] = {}
+        # The timers that end the sessions of clients whose streams broke, and the messages that were taken from
+        # their send queues but not sent.
+        self._session_timers: Dict[int, asyncio.TimerHandle] = {}
+        self._unsent_messages: Dict[int, List[bytes]] = {}
+        self._worker_reconnect_timeout = worker_reconnect_timeout
+        # Whether the servicer was registered with add_servicer_to_server, which sends the encoded messages of
+        # OpenChannel as they are. The generated registration serializes Message objects, so they are decoded for it.
+        self._sends_encoded_messages = False
+        # The requests forwarded to each client, by forwarded request id.
+        self._pending_responses: Dict[int, Dict[str, _ForwardedRequest]] = {}
+        # The client handling each forwarded request, by sending client and request id.
+        self._request_targets: Dict[int, Dict[str, int]] = {}
+        # Requests to agent types that are not registered, with the clients that sent them, by agent type.
+        self._held_requests: Dict[str, List[Tuple[agent_worker_pb2.RpcRequest, int]]] = {}
         self._background_tasks: Set[Task[Any]] = set()
-        self._subscription_manager = SubscriptionManager()
+        self._subscription_manager = SubscriptionManager(max_cached_topics, cached_topic_ttl)
         self._client_id_to_subscription_id_mapping: Dict[int, set[str]] = {}
+        # Workers of the same agent type add the same subscriptions, which are stored once and removed
+        # when the last worker that added them disconnects.
+        self._subscription_ids: Dict[Tuple[str, str], str] = {}
+        self._subscription_id_to_client_ids: Dict[str, Set[int]] = {}
+        self._state_store = state_store if state_store is not None else InMemoryStateStore()
+        # Serializes saves, so that no save happens between the eTag check and the write of a conditional save.
+        self._save_state_lock = asyncio.Lock()
+        self._max_send_batch_size = max_send_batch_size
+        self._send_batch_interval = send_batch_interval
+        # The hosts of a sharded topology that own the agent types, and the clients that stand for the links to
+        # the other hosts by address. Clients that are the links of other hosts to this one are peer clients.
+        self._address = address
+        self._shards: HashRing[str] | None = None
+        self._owner_links: Dict[str, int | None] = {}
+        self._peer_links: Dict[str, PeerLink] = {}
+        self._link_addresses: Dict[int, str] = {}
+        self._peer_client_ids: Set[int] = set()
+        # The registrations and subscriptions forwarded to the owners of their agent types by link client, which are
+        # sent again when an owner starts a new session, and those waiting for a response, with the client and
+        # request id that the response goes to.
+        self._forwarded_registrations: Dict[int, Set[str]] = {}
+        self._forwarded_subscriptions: Dict[int, Set[Tuple[str, str]]] = {}
+        self._forwarded_control_requests: Dict[str, Tuple[int, str, bytes]] = {}
+        self._next_control_request_id = 0
+        # The content types that the workers of this host accept, which are announced to the other hosts.
+        self._local_content_types: Set[str] = {
+            JSON_DATA_CONTENT_TYPE,
+            PROTOBUF_DATA_CONTENT_TYPE,
+            MSGPACK_DATA_CONTENT_TYPE,
+        }
+        if hosts is not None and len(hosts) > 1:
+            self._shards = HashRing()
+            for host in hosts:
+                self._shards.add(host)
+            for host in hosts:
+                if host != address:
+                    self._add_link_client(host)
+
+    @property
+    def subscription_cache_metrics(self) -> SubscriptionCacheMetrics:
+        return self._subscription_manager.cache_metrics
+
+    @property
+    def flow_control_metrics(self) -> Dict[int, CreditMetrics]:
+        return {client_id: send_queue.metrics for client_id, send_queue in self._send_queues.items()}
+
+    def _add_link_client(self, address: str) -> None:
+        # The link to another host is a client of this host, whose messages are sent to the other host, and whose
+        # received messages are what the other host routes to the workers of this host.
+        self._client_id += 1
+        client_id = self._client_id
+        self._link_addresses[client_id] = address
+        self._worker_ids[client_id] = f"link/{address}"
+        self._send_queues[client_id] = CreditQueue[bytes]()
+        self._forwarded_registrations[client_id] = set()
+        self._forwarded_subscriptions[client_id] = set()
+
+    def start_peer_links(self, channel_options: Sequence[Tuple[str, Any]] | None = None) -> None:
+        """Open the links to the other hosts of a sharded topology.
+
+        Args:
+            channel_options (Sequence[Tuple[str, Any]], optional): gRPC options of the channels to the other hosts.
+                Defaults to None.
+        """
+        # A new id on every start, so that the other hosts do not resume the session of a host that restarted.
+        worker_id = f"host/{self._address}/{uuid.uuid4().hex}"
+        for client_id, address in self._link_addresses.items():
+            self._send_queues[client_id].put_nowait(self._encode_local_content_types())
+            link = PeerLink(
+                address,
+                worker_id,
+                self._send_queues[client_id],
+                functools.partial(self._process_link_message, client_id),
+                functools.partial(self._on_link_reconnect, client_id),
+                self._max_send_batch_size,
+                self._send_batch_interval,
+                channel_options,
+            )
+            link.start()
+            self._peer_links[address] = link
+
+    async def close_peer_links(self) -> None:
+        """Close the links to the other hosts of a sharded topology."""
+        for link in self._peer_links.values():
+            await link.close()
+        self._peer_links.clear()
+
+    async def _process_link_message(self, client_id: int, message: agent_worker_pb2.Message) -> None:
+        logger.debug("Received message from host %s: %s", self._link_addresses[client_id], message)
+        await self._process_message(message, client_id)
+
+    def _on_link_reconnect(self, client_id: int, resumed: bool) -> None:
+        send_queue = self._send_queues[client_id]
+        messages, credited_messages = send_queue.drain()
+        resent = [self._encode_local_content_types()]
+        if not resumed:
+            # The other host restarted, and no longer knows what this host forwarded to it.
+            logger.info(f"Host {self._link_addresses[client_id]} started a new session, registering again.")
+            for agent_type in self._forwarded_registrations[client_id]:
+                resent.append(
+                    agent_worker_pb2.Message(
+                        registerAgentTypeRequest=agent_worker_pb2.RegisterAgentTypeRequest(
+                            request_id=self._new_control_request_id(), type=agent_type
+                        )
+                    ).SerializeToString()
+                )
+            for topic_type, agent_type in self._forwarded_subscriptions[client_id]:
+                resent.append(
+                    agent_worker_pb2.Message(
+                        addSubscriptionRequest=agent_worker_pb2.AddSubscriptionRequest(
+                            request_id=self._new_control_request_id(),
+                            subscription=agent_worker_pb2.Subscription(
+                                typeSubscription=agent_worker_pb2.TypeSubscription(
+                                    topic_type=topic_type, agent_type=agent_type
+                                )
+                            ),
+                        )
+                    ).SerializeToString()
+                )
+        # The registrations, subscriptions and requests that wait for a response may have been lost with the old
+        # stream. The other host recognizes the ones it already received.
+        for target_client_id, _, message in self._forwarded_control_requests.values():
+            if target_client_id == client_id:
+                resent.append(message)
+        for message in [*resent, *messages]:
+            send_queue.put_nowait(message)
+        for message in credited_messages:
+            send_queue.put_credited(message)
+        queued = set(map(id, credited_messages))
+        for forwarded in self._pending_responses.get(client_id, {}).values():
+            if id(forwarded.message) not in queued:
+                send_queue.put_credited(forwarded.message)
+
+    def _owner_link(self, agent_type: str) -> int | None:
+        """The link to the host that owns an agent type, or None if this host owns it."""
+        if self._shards is None:
+            return None
+        if agent_type not in self._owner_links:
+            owner = self._shards.get(agent_type)
+            self._owner_links[agent_type] = next(
+                (client_id for client_id, address in self._link_addresses.items() if address == owner), None
+            )
+        return self._owner_links[agent_type]
+
+    def _new_control_request_id(self) -> str:
+        self._next_control_request_id += 1
+        return f"{self._address}:{self._next_control_request_id}"
+
+    def _forward_control_request(self, link_client_id: int, client_id: int, message: agent_worker_pb2.Message) -> None:
+        """Forward a registration or subscription to the host that owns its agent type. Its response is sent to the
+        client when it arrives."""
+        request = getattr(message, cast(str, message.WhichOneof("message")))
+        request_id = self._new_control_request_id()
+        original_request_id, request.request_id = request.request_id, request_id
+        encoded = message.SerializeToString()
+        self._forwarded_control_requests[request_id] = (client_id, original_request_id, encoded)
+        self._send_queues[link_client_id].put_nowait(encoded)
+
+    def _process_owner_response(self, message: agent_worker_pb2.Message) -> None:
+        response = getattr(message, cast(str, message.WhichOneof("message")))
+        forwarded = self._forwarded_control_requests.pop(response.request_id, None)
+        if forwarded is None:
+            # A response to a registration or subscription that was sent again.
+            return
+        client_id, response.request_id, _ = forwarded
+        send_queue = self._send_queues.get(client_id)
+        if send_queue is not None:
+            send_queue.put_nowait(message.SerializeToString())
+
+    def _encode_local_content_types(self) -> bytes:
+        return agent_worker_pb2.Message(
+            acceptedContentTypes=agent_worker_pb2.AcceptedContentTypes(content_types=sorted(self._local_content_types))
+        ).SerializeToString()
 
     async def OpenChannel(  # type: ignore
         self,
         request_iterator: AsyncIterator[agent_worker_pb2.Message],
-        context: grpc.aio.ServicerContext[agent_worker_pb2.Message, agent_worker_pb2.Message],
-    ) -> Iterator[agent_worker_pb2.Message] | AsyncIterator[agent_worker_pb2.Message]:  # type: ignore
+        context: grpc.aio.ServicerContext[agent_worker_pb2.Message, bytes],
+    ) -> Iterator[bytes] | AsyncIterator[bytes]:  # type: ignore
+        metadata = dict(context.invocation_metadata() or ())
+        worker_id = metadata.get("worker-id")
+        # Workers that do not announce credits are sent requests and events without limit.
+        credits = metadata.get("credits")
+        identified = isinstance(worker_id, str)
         # Aquire the lock to get a new client id.
         async with self._client_id_lock:
-            self._client_id += 1
-            client_id = self._client_id
+            client_id = self._worker_client_ids.get(worker_id) if isinstance(worker_id, str) else None
+            resumed = client_id is not None
+            if client_id is None:
+                self._client_id += 1
+                client_id = self._client_id
 
-        # Register the client with the server and create a send queue for the client.
-        send_queue: asyncio.Queue[agent_worker_pb2.Message] = asyncio.Queue()
-        self._send_queues[client_id] = send_queue
-        logger.info(f"Client {client_id} connected.")
+        if not self._sends_encoded_messages:
+            warnings.warn(
+                "The host servicer was registered with add_AgentRpcServicer_to_server, so every message is decoded "
+                "again before it is sent. Register it with add_servicer_to_server instead.",
+                RuntimeWarning,
+                stacklevel=1,
+            )
 
-        try:
-            # Concurrently handle receiving messages from the client and sending messages to the client.
-            # This task will receive messages from the client.
-            receiving_task = asyncio.create_task(self._receive_messages(client_id, request_iterator))
+        send_queue = CreditQueue[bytes](int(credits) if isinstance(credits, str) and credits.isdigit() else None)
+        if resumed:
+            self._resume_session(client_id, send_queue)
+            logger.info(f"Client {client_id} reconnected.")
+        else:
+            # Register the client with the server and create a send queue for the client. Clients that do not identify
+            # themselves get a worker id that is not reused.
+            worker_id = worker_id if isinstance(worker_id, str) else uuid.uuid4().hex
+            self._worker_ids[client_id] = worker_id
+            self._worker_client_ids[worker_id] = client_id
+            self._send_queues[client_id] = send_queue
+            self._accepted_content_types[client_id] = {JSON_DATA_CONTENT_TYPE}
+            if metadata.get("peer-host") == "true":
+                self._peer_client_ids.add(client_id)
+            self._update_common_content_types()
+            logger.info(f"Client {client_id} connected.")
+
+        closed = False
+        handler_task = asyncio.current_task()
 
+        def on_receiving_done(task: Task[bool]) -> None:
+            nonlocal closed
+            if task.cancelled():
+                return
+            # Clients that do not identify themselves cannot resume their session, so the end of their stream closes it.
+            closed = task.exception() is None and (task.result() or not identified)
+            if closed or task.exception() is not None:
+                # The messages already queued for the client are sent, and then the stream ends.
+                end_stream(send_queue)
+            elif handler_task is not None:
+                # The stream broke. The messages queued for the client are kept for it to reconnect.
+                handler_task.cancel()
+
+        # Concurrently handle receiving messages from the client and sending messages to the client.
+        # This task will receive messages from the client.
+        receiving_task = asyncio.create_task(self._receive_messages(client_id, request_iterator))
+        receiving_task.add_done_callback(on_receiving_done)
+        batcher = EncodedMessageBatcher(send_queue, self._max_send_batch_size, self._send_batch_interval)
+        try:
+            await context.send_initial_metadata((("session", "resumed" if resumed else "new"),))
             # Return an async generator that will yield messages from the send queue to the client.
-            while True:
-                message = await send_queue.get()
+            async for message in batcher:
                 # Yield the message to the client.
                 try:
-                    yield message
+                    yield message if self._sends_encoded_messages else agent_worker_pb2.Message.FromString(message)  # type: ignore
                 except Exception as e:
                     logger.error(f"Failed to send message to client {client_id}: {e}", exc_info=True)
                     break
-                logger.info(f"Sent message to client {client_id}: {message}")
-            # Wait for the receiving task to finish.
-            await receiving_task
+                # Formatting a whole message is expensive, so it is deferred until the record is emitted.
+                logger.debug("Sent message to client %s: %s", client_id, _EncodedMessage(message))
+            # Raise the error that receiving messages failed with, if any.
+            if receiving_task.done():
+                await receiving_task
 
         finally:
-            # Clean up the client connection.
-            del self._send_queues[client_id]
-            # Cancel pending requests sent to this client.
-            for future in self._pending_responses.pop(client_id, {}).values():
-                future.cancel()
-            # Remove the client id from the agent type to client id mapping.
-            await self._on_client_disconnect(client_id)
+            receiving_task.cancel()
+            if self._send_queues.get(client_id) is not send_queue:
+                # The client reconnected on another stream, which took over the session.
+                pass
+            elif closed or self._worker_reconnect_timeout <= 0:
+                await self._end_session(client_id)
+            else:
+                logger.info(f"Client {client_id} disconnected, waiting for it to reconnect.")
+                self._unsent_messages[client_id] = batcher.take_pending()
+                self._session_timers[client_id] = asyncio.get_running_loop().call_later(
+                    self._worker_reconnect_timeout, self._on_session_timeout, client_id
+                )
+
+    def _resume_session(self, client_id: int, send_queue: CreditQueue[bytes]) -> None:
+        timer = self._session_timers.pop(client_id, None)
+        if timer is not None:
+            timer.cancel()
+        # The messages queued while the client was disconnected are sent on the new stream, and the old stream
+        # ends if it is still open. The credits of the old stream are replaced by those announced on the new one.
+        for message in self._unsent_messages.pop(client_id, []):
+            if agent_worker_pb2.Message.FromString(message).WhichOneof("message") in ("request", "event"):
+                send_queue.put_credited(message)
+            else:
+                send_queue.put_nowait(message)
+        old_send_queue = self._send_queues[client_id]
+        messages, credited_messages = old_send_queue.drain()
+        for message in messages:
+            # Skip the end of the old stream, which is marked when receiving messages from the client failed.
+            if isinstance(message, bytes):
+                send_queue.put_nowait(message)
+        for message in credited_messages:
+            send_queue.put_credited(message)
+        end_stream(old_send_queue)
+        self._send_queues[client_id] = send_queue
+        # Requests that the client was handling may have been lost with the old stream. The client recognizes the
+        # ones it already received.
+        queued = set(map(id, credited_messages))
+        for forwarded in self._pending_responses.get(client_id, {}).values():
+            if id(forwarded.message) not in queued:
+                send_queue.put_credited(forwarded.message)
+
+    def _on_session_timeout(self, client_id: int) -> None:
+        del self._session_timers[client_id]
+        logger.info(f"Client {client_id} did not reconnect.")
+        task = asyncio.create_task(self._end_session(client_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._raise_on_exception)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _end_session(self, client_id: int) -> None:
+        # Clean up the client connection.
+        del self._send_queues[client_id]
+        self._unsent_messages.pop(client_id, None)
+        # Fail pending requests sent to this client.
+        for forwarded in self._pending_responses.pop(client_id, {}).values():
+            if not forwarded.future.done():
+                forwarded.future.set_result(
+                    agent_worker_pb2.RpcResponse(error="The worker handling the request disconnected.")
+                )
+        # Cancel the requests this client was waiting for.
+        for request_id, target_client_id in self._request_targets.pop(client_id, {}).items():
+            self._send_cancel_request(target_client_id, client_id, request_id)
+        self._direct_addresses.pop(client_id, None)
+        self._resolving_client_ids.discard(client_id)
+        del self._accepted_content_types[client_id]
+        self._update_common_content_types()
+        del self._worker_client_ids[self._worker_ids.pop(client_id)]
+        # Remove the client id from the agent type to client id mapping.
+        await self._on_client_disconnect(client_id)
+        self._peer_client_ids.discard(client_id)
 
     async def _on_client_disconnect(self, client_id: int) -> None:
-        async with self._agent_type_to_client_id_lock:
-            agent_types = [agent_type for agent_type, id_ in self._agent_type_to_client_id.items() if id_ == client_id]
-            for agent_type in agent_types:
-                logger.info(f"Removing agent type {agent_type} from agent type to client id mapping")
-                del self._agent_type_to_client_id[agent_type]
-            for sub_id in self._client_id_to_subscription_id_mapping.get(client_id, []):
-                logger.info(f"Client id {client_id} disconnected. Removing corresponding subscription with id {id}")
-                await self._subscription_manager.remove_subscription(sub_id)
+        async with self._agent_type_to_client_ids_lock:
+            for agent_type, client_ids in list(self._agent_type_to_client_ids.items()):
+                if client_id not in client_ids:
+                    continue
+                client_ids.remove(client_id)
+                self._on_routing_changed()
+                if len(client_ids) == 0:
+                    logger.info(f"Removing agent type {agent_type} from agent type to client id mapping")
+                    del self._agent_type_to_client_ids[agent_type]
+                    owner_link = self._owner_link(agent_type) if client_id not in self._peer_client_ids else None
+                    if owner_link is not None:
+                        self._unregister_from_owner(owner_link, agent_type)
+                else:
+                    logger.info(f"Rebalancing agent type {agent_type} across clients {sorted(client_ids.nodes)}")
+            for sub_id in self._client_id_to_subscription_id_mapping.pop(client_id, set()):
+                await self._remove_client_subscription(client_id, sub_id)
         logger.info(f"Client {client_id} disconnected successfully")
 
+    async def _remove_client_subscription(self, client_id: int, sub_id: str) -> None:
+        sub_client_ids = self._subscription_id_to_client_ids[sub_id]
+        sub_client_ids.discard(client_id)
+        if len(sub_client_ids) > 0:
+            return
+        logger.info("Client id %s disconnected. Removing corresponding subscription with id %s", client_id, sub_id)
+        del self._subscription_id_to_client_ids[sub_id]
+        del self._subscription_ids[next(key for key, id_ in self._subscription_ids.items() if id_ == sub_id)]
+        await self._subscription_manager.remove_subscription(sub_id)
+
+    def _unregister_from_owner(self, link_client_id: int, agent_type: str) -> None:
+        # The last worker of this host that registered the agent type disconnected.
+        self._forwarded_registrations[link_client_id].discard(agent_type)
+        self._forwarded_subscriptions[link_client_id] = {
+            key for key in self._forwarded_subscriptions[link_client_id] if key[1] != agent_type
+        }
+        self._send_queues[link_client_id].put_nowait(
+            agent_worker_pb2.Message(
+                unregisterAgentType=agent_worker_pb2.UnregisterAgentType(type=agent_type)
+            ).SerializeToString()
+        )
+
+    async def _process_unregister_agent_type(self, agent_type: str, client_id: int) -> None:
+        async with self._agent_type_to_client_ids_lock:
+            client_ids = self._agent_type_to_client_ids.get(agent_type)
+            if client_ids is None or client_id not in client_ids:
+                return
+            client_ids.remove(client_id)
+            self._on_routing_changed()
+            if len(client_ids) == 0:
+                logger.info(f"Removing agent type {agent_type} from agent type to client id mapping")
+                del self._agent_type_to_client_ids[agent_type]
+            subscription_ids = self._client_id_to_subscription_id_mapping.get(client_id, set())
+            for key, sub_id in list(self._subscription_ids.items()):
+                if key[1] == agent_type and sub_id in subscription_ids:
+                    subscription_ids.discard(sub_id)
+                    await self._remove_client_subscription(client_id, sub_id)
+
     def _raise_on_exception(self, task: Task[Any]) -> None:
         exception = task.exception()
         if exception is not None:
@@ -89,127 +576,382 @@ def _raise_on_exception(self, task: Task[Any]) -> None:
 
     async def _receive_messages(
         self, client_id: int, request_iterator: AsyncIterator[agent_worker_pb2.Message]
-    ) -> None:
-        # Receive messages from the client and process them.
-        async for message in request_iterator:
-            logger.info(f"Received message from client {client_id}: {message}")
-            oneofcase = message.WhichOneof("message")
-            match oneofcase:
-                case "request":
-                    request: agent_worker_pb2.RpcRequest = message.request
-                    task = asyncio.create_task(self._process_request(request, client_id))
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._raise_on_exception)
-                    task.add_done_callback(self._background_tasks.discard)
-                case "response":
-                    response: agent_worker_pb2.RpcResponse = message.response
-                    task = asyncio.create_task(self._process_response(response, client_id))
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._raise_on_exception)
-                    task.add_done_callback(self._background_tasks.discard)
-                case "event":
-                    event: agent_worker_pb2.Event = message.event
-                    task = asyncio.create_task(self._process_event(event))
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._raise_on_exception)
-                    task.add_done_callback(self._background_tasks.discard)
-                case "registerAgentTypeRequest":
-                    register_agent_type: agent_worker_pb2.RegisterAgentTypeRequest = message.registerAgentTypeRequest
-                    task = asyncio.create_task(
-                        self._process_register_agent_type_request(register_agent_type, client_id)
-                    )
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._raise_on_exception)
-                    task.add_done_callback(self._background_tasks.discard)
-                case "addSubscriptionRequest":
-                    add_subscription: agent_worker_pb2.AddSubscriptionRequest = message.addSubscriptionRequest
-                    task = asyncio.create_task(self._process_add_subscription_request(add_subscription, client_id))
-                    self._background_tasks.add(task)
-                    task.add_done_callback(self._raise_on_exception)
-                    task.add_done_callback(self._background_tasks.discard)
-                case "registerAgentTypeResponse" | "addSubscriptionResponse":
-                    logger.warning(f"Received unexpected message type: {oneofcase}")
-                case None:
-                    logger.warning("Received empty message")
-                case other:
-                    logger.error(f"Received unexpected message: {other}")
+    ) -> bool:
+        """Receive messages from the client and process them. Returns whether the client closed the stream, rather
+        than the stream ending because it broke.
+
+        Messages are processed one at a time, none of which waits for other clients, rather than in a task each, so
+        that a burst of messages does not create a burst of tasks, and the next message is only read from the stream
+        when the previous one was processed."""
+        async for received in request_iterator:
+            for message in unbatch(received):
+                logger.debug("Received message from client %s: %s", client_id, message)
+                try:
+                    if await self._process_message(message, client_id):
+                        return True
+                except Exception:
+                    logger.error(f"Failed to process message from client {client_id}.", exc_info=True)
+        return False
+
+    async def _process_message(self, message: agent_worker_pb2.Message, client_id: int) -> bool:
+        """Process a message received from the client. Returns whether it closed the stream."""
+        oneofcase = message.WhichOneof("message")
+        match oneofcase:
+            case "request":
+                await self._process_request(message.request, client_id)
+            case "response":
+                self._process_response(message.response, client_id)
+            case "event":
+                await self._process_event(message.event, client_id)
+            case "registerAgentTypeRequest":
+                await self._process_register_agent_type_request(message.registerAgentTypeRequest, client_id)
+            case "addSubscriptionRequest":
+                await self._process_add_subscription_request(message.addSubscriptionRequest, client_id)
+            case "credits":
+                self._send_queues[client_id].add_credits(message.credits.count)
+            case "resolveAgentRequest":
+                self._process_resolve_agent_request(message.resolveAgentRequest, client_id)
+            case "cancelRequest":
+                request_id = message.cancelRequest.request_id
+                target_client_id = self._request_targets.get(client_id, {}).get(request_id)
+                if target_client_id is not None:
+                    self._send_cancel_request(target_client_id, client_id, request_id)
+            case "closeChannel":
+                return True
+            case "unregisterAgentType":
+                await self._process_unregister_agent_type(message.unregisterAgentType.type, client_id)
+            case "registerAgentTypeResponse" | "addSubscriptionResponse" if client_id in self._link_addresses:
+                self._process_owner_response(message)
+            case "acceptedContentTypes" | "routingChanged" if client_id in self._link_addresses:
+                # The content types that another host announces to its clients include those of this host, which
+                # are announced on the link, and this host does not resolve the addresses of agents on other hosts.
+                pass
+            case "acceptedContentTypes":
+                self._accepted_content_types[client_id] = set(message.acceptedContentTypes.content_types)
+                if not self._update_common_content_types():
+                    # The new client still needs to be told.
+                    self._send_queues[client_id].put_nowait(self._encode_common_content_types())
+            case "registerAgentTypeResponse" | "addSubscriptionResponse" | "resolveAgentResponse":
+                logger.warning(f"Received unexpected message type: {oneofcase}")
+            case None:
+                logger.warning("Received empty message")
+            case other:
+                logger.error(f"Received unexpected message: {other}")
+        return False
 
     async def _process_request(self, request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
-        # Deliver the message to a client given the target agent type.
-        async with self._agent_type_to_client_id_lock:
-            target_client_id = self._agent_type_to_client_id.get(request.target.type)
+        request_id = request.request_id
+        if request_id in self._request_targets.get(client_id, {}):
+            # The client sent the request again after reconnecting, and it was already forwarded.
+            return
+        # Requests to agent types that another host owns go to that host, unless they come from it.
+        target_client_id = self._owner_link(request.target.type) if client_id not in self._link_addresses else None
+        if target_client_id is None:
+            # Deliver the message to the client that hosts the target agent. The lock is not needed to read the
+            # mapping, because it is changed without awaiting in between.
+            client_ids = self._agent_type_to_client_ids.get(request.target.type)
+            target_client_id = client_ids.get(request.target.key) if client_ids is not None else None
         if target_client_id is None:
-            logger.error(f"Agent {request.target.type} not found, failed to deliver message.")
+            # The agent type may be registered again by a worker that is reconnecting.
+            self._hold_request(request, client_id)
             return
         target_send_queue = self._send_queues.get(target_client_id)
         if target_send_queue is None:
             logger.error(f"Client {target_client_id} not found, failed to deliver message.")
             return
-        await target_send_queue.put(agent_worker_pb2.Message(request=request))
+        sender_worker_id = self._worker_ids.get(client_id)
+        if sender_worker_id is None:
+            logger.error(f"Client {client_id} not found, failed to deliver message.")
+            return
+        request.request_id = _forwarded_request_id(sender_worker_id, request_id)
+        message = agent_worker_pb2.Message(request=request).SerializeToString()
+        target_send_queue.put_credited(message)
+
+        # Create a future for the response from the target, which sends it back to the client when it is set.
+        future: Future[agent_worker_pb2.RpcResponse] = asyncio.get_event_loop().create_future()
+        self._pending_responses.setdefault(target_client_id, {})[request.request_id] = _ForwardedRequest(
+            future, message
+        )
+        self._request_targets.setdefault(client_id, {})[request_id] = target_client_id
+        future.add_done_callback(functools.partial(self._send_response, client_id, request_id))
 
-        # Create a future to wait for the response from the target.
-        future = asyncio.get_event_loop().create_future()
-        self._pending_responses.setdefault(target_client_id, {})[request.request_id] = future
+    def _hold_request(self, request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
+        logger.info(f"Agent {request.target.type} not found, holding the request until it is registered.")
+        self._held_requests.setdefault(request.target.type, []).append((request, client_id))
+        asyncio.get_running_loop().call_later(
+            self._worker_reconnect_timeout, self._on_held_request_timeout, request, client_id
+        )
 
-        # Create a task to wait for the response and send it back to the client.
-        send_response_task = asyncio.create_task(self._wait_and_send_response(future, client_id))
-        self._background_tasks.add(send_response_task)
-        send_response_task.add_done_callback(self._raise_on_exception)
-        send_response_task.add_done_callback(self._background_tasks.discard)
+    def _on_held_request_timeout(self, request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
+        held = self._held_requests.get(request.target.type)
+        if held is None or (request, client_id) not in held:
+            return
+        held.remove((request, client_id))
+        if len(held) == 0:
+            del self._held_requests[request.target.type]
+        logger.error(f"Agent {request.target.type} not found, failed to deliver message.")
+        send_queue = self._send_queues.get(client_id)
+        if send_queue is not None:
+            send_queue.put_nowait(
+                agent_worker_pb2.Message(
+                    response=agent_worker_pb2.RpcResponse(
+                        request_id=request.request_id, error=f"Agent type {request.target.type} is not registered."
+                    )
+                ).SerializeToString()
+            )
 
-    async def _wait_and_send_response(self, future: Future[agent_worker_pb2.RpcResponse], client_id: int) -> None:
-        response = await future
+    def _send_response(self, client_id: int, request_id: str, future: Future[agent_worker_pb2.RpcResponse]) -> None:
+        self._request_targets.get(client_id, {}).pop(request_id, None)
+        if future.cancelled():
+            return
+        response = future.result()
+        response.request_id = request_id
         message = agent_worker_pb2.Message(response=response)
         send_queue = self._send_queues.get(client_id)
         if send_queue is None:
             logger.error(f"Client {client_id} not found, failed to send response message.")
             return
-        await send_queue.put(message)
+        send_queue.put_nowait(message.SerializeToString())
 
-    async def _process_response(self, response: agent_worker_pb2.RpcResponse, client_id: int) -> None:
+    def _process_response(self, response: agent_worker_pb2.RpcResponse, client_id: int) -> None:
+        forwarded = self._pending_responses.get(client_id, {}).pop(response.request_id, None)
+        if forwarded is None:
+            # A response sent again by a client that received the request again after reconnecting, or to a
+            # request whose sender disconnected.
+            return
         # Setting the result of the future will send the response back to the original sender.
-        future = self._pending_responses[client_id].pop(response.request_id)
-        future.set_result(response)
+        forwarded.future.set_result(response)
 
-    async def _process_event(self, event: agent_worker_pb2.Event) -> None:
+    def _send_cancel_request(self, target_client_id: int, client_id: int, request_id: str) -> None:
+        send_queue = self._send_queues.get(target_client_id)
+        if send_queue is None:
+            return
+        forwarded_request_id = _forwarded_request_id(self._worker_ids[client_id], request_id)
+        pending_responses = self._pending_responses.get(target_client_id, {})
+        forwarded = pending_responses.get(forwarded_request_id)
+        if forwarded is not None and send_queue.remove(forwarded.message):
+            # The request was still waiting for credits, so the target never receives it.
+            del pending_responses[forwarded_request_id]
+            forwarded.future.set_result(agent_worker_pb2.RpcResponse(error="Request was cancelled."))
+            return
+        send_queue.put_nowait(
+            agent_worker_pb2.Message(
+                cancelRequest=agent_worker_pb2.CancelRequest(request_id=forwarded_request_id)
+            ).SerializeToString()
+        )
+
+    async def _process_event(self, event: agent_worker_pb2.Event, client_id: int) -> None:
+        if client_id in self._link_addresses:
+            self._deliver_event(event)
+            return
+        # Encode the event once, and send the same bytes to every client that does not need its own recipients.
+        encoded_event = event.SerializeToString()
+        message: bytes | None = None
+        if client_id not in self._peer_client_ids and len(self._link_addresses) > 0:
+            # Published by a worker of this host. The other hosts deliver it to the agent types they own.
+            message = encode_event_message(encoded_event)
+            for link_client_id in self._link_addresses:
+                self._send_queues[link_client_id].put_credited(message)
         topic_id = TopicId(type=event.topic_type, source=event.topic_source)
         recipients = await self._subscription_manager.get_subscribed_recipients(topic_id)
+        route = self._get_event_route(topic_id, recipients)
+        for target_client_id, encoded_recipients in route.clients:
+            send_queue = self._send_queues.get(target_client_id)
+            if send_queue is None:
+                logger.error(f"Client {target_client_id} not found, failed to deliver event to topic {topic_id}.")
+                continue
+            if len(encoded_recipients) > 0:
+                send_queue.put_credited(encode_event_message(encoded_event + encoded_recipients))
+            else:
+                if message is None:
+                    message = encode_event_message(encoded_event)
+                send_queue.put_credited(message)
+
+    def _deliver_event(self, event: agent_worker_pb2.Event) -> None:
+        """Deliver an event that another host routed to the workers of this host, to the recipients it names."""
+        recipients = [
+            agent_worker_pb2.AgentId(type=recipient.type, key=recipient.key) for recipient in event.recipients
+        ]
+        event.ClearField("recipients")
+        encoded_event = event.SerializeToString()
+        client_recipients: Dict[int, List[agent_worker_pb2.AgentId]] = {}
+        for recipient in recipients:
+            client_ids = self._agent_type_to_client_ids.get(recipient.type)
+            if client_ids is None:
+                logger.error(f"Agent {recipient.type} and its client not found for topic {event.topic_type}.")
+                continue
+            client_recipients.setdefault(client_ids.get(recipient.key), []).append(recipient)
+        for client_id, agent_ids in client_recipients.items():
+            send_queue = self._send_queues.get(client_id)
+            if send_queue is None:
+                logger.error(f"Client {client_id} not found, failed to deliver event to topic {event.topic_type}.")
+                continue
+            send_queue.put_credited(
+                encode_event_message(encoded_event + agent_worker_pb2.Event(recipients=agent_ids).SerializeToString())
+            )
+
+    def _get_event_route(self, topic_id: TopicId, recipients: List[AgentId]) -> _EventRoute:
+        now = time.monotonic()
+        if self._cached_topic_ttl is not None:
+            # Routes are ordered by last use, so expired routes are at the front.
+            while len(self._event_routes) > 0:
+                oldest = next(iter(self._event_routes.values()))
+                if now - oldest.last_used < self._cached_topic_ttl:
+                    break
+                self._event_routes.popitem(last=False)
+        route = self._event_routes.get(topic_id)
+        # The subscription manager replaces the recipients of a topic when they change, rather than mutating them.
+        if route is not None and route.recipients is recipients and route.routing_version == self._routing_version:
+            route.last_used = now
+            self._event_routes.move_to_end(topic_id)
+            return route
+        route = self._event_routes[topic_id] = _EventRoute(
+            recipients=recipients,
+            routing_version=self._routing_version,
+            clients=self._build_event_route(topic_id, recipients),
+            last_used=now,
+        )
+        self._event_routes.move_to_end(topic_id)
+        if self._max_cached_topics is not None:
+            while len(self._event_routes) > self._max_cached_topics:
+                self._event_routes.popitem(last=False)
+        return route
+
+    def _build_event_route(self, topic_id: TopicId, recipients: List[AgentId]) -> List[Tuple[int, bytes]]:
         # Get the client ids of the recipients.
-        async with self._agent_type_to_client_id_lock:
-            client_ids: Set[int] = set()
-            for recipient in recipients:
-                client_id = self._agent_type_to_client_id.get(recipient.type)
-                if client_id is not None:
-                    client_ids.add(client_id)
-                else:
-                    logger.error(f"Agent {recipient.type} and its client not found for topic {topic_id}.")
-        # Deliver the event to clients.
-        for client_id in client_ids:
-            await self._send_queues[client_id].put(agent_worker_pb2.Message(event=event))
+        client_recipients: Dict[int, List[AgentId]] = {}
+        load_balanced = False
+        for recipient in recipients:
+            client_ids = self._agent_type_to_client_ids.get(recipient.type)
+            if client_ids is None:
+                logger.error(f"Agent {recipient.type} and its client not found for topic {topic_id}.")
+                continue
+            client_recipients.setdefault(client_ids.get(recipient.key), []).append(recipient)
+            load_balanced = load_balanced or len(client_ids) > 1
+        if not load_balanced and self._peer_client_ids.isdisjoint(client_recipients):
+            return [(client_id, b"") for client_id in client_recipients]
+        # When an agent type is hosted by several clients, every client subscribes its agents of that type,
+        # so the event names the recipients each client should deliver it to. Other hosts do not know the
+        # subscriptions, so the events they deliver to their workers always name the recipients.
+        return [
+            (
+                client_id,
+                agent_worker_pb2.Event(
+                    recipients=[
+                        agent_worker_pb2.AgentId(type=agent_id.type, key=agent_id.key) for agent_id in agent_ids
+                    ]
+                ).SerializeToString(),
+            )
+            for client_id, agent_ids in client_recipients.items()
+        ]
 
     async def _process_register_agent_type_request(
         self, register_agent_type_req: agent_worker_pb2.RegisterAgentTypeRequest, client_id: int
     ) -> None:
         # Register the agent type with the host runtime.
-        async with self._agent_type_to_client_id_lock:
-            if register_agent_type_req.type in self._agent_type_to_client_id:
-                existing_client_id = self._agent_type_to_client_id[register_agent_type_req.type]
-                logger.error(
-                    f"Agent type {register_agent_type_req.type} already registered with client {existing_client_id}."
-                )
-                success = False
-                error = f"Agent type {register_agent_type_req.type} already registered."
+        held: List[Tuple[agent_worker_pb2.RpcRequest, int]] = []
+        async with self._agent_type_to_client_ids_lock:
+            client_ids = self._agent_type_to_client_ids.setdefault(register_agent_type_req.type, HashRing())
+            if client_id in client_ids:
+                # The client sent the registration again after reconnecting.
+                success = True
+                error = None
             else:
-                self._agent_type_to_client_id[register_agent_type_req.type] = client_id
+                client_ids.add(client_id)
+                if register_agent_type_req.direct_address:
+                    self._direct_addresses[client_id] = register_agent_type_req.direct_address
+                self._on_routing_changed()
+                if len(client_ids) > 1:
+                    logger.info(
+                        f"Rebalancing agent type {register_agent_type_req.type} across clients {sorted(client_ids.nodes)}"
+                    )
                 success = True
                 error = None
-        # Send a response back to the client.
-        await self._send_queues[client_id].put(
+                held = self._held_requests.pop(register_agent_type_req.type, [])
+        owner_link = self._owner_link(register_agent_type_req.type) if client_id not in self._peer_client_ids else None
+        if owner_link is not None:
+            # The host that owns the agent type routes its agents to this host, and responds to the client.
+            self._forwarded_registrations[owner_link].add(register_agent_type_req.type)
+            register_agent_type_req.ClearField("direct_address")
+            self._forward_control_request(
+                owner_link, client_id, agent_worker_pb2.Message(registerAgentTypeRequest=register_agent_type_req)
+            )
+        else:
+            # Send a response back to the client.
+            self._send_queues[client_id].put_nowait(
+                agent_worker_pb2.Message(
+                    registerAgentTypeResponse=agent_worker_pb2.RegisterAgentTypeResponse(
+                        request_id=register_agent_type_req.request_id, success=success, error=error
+                    )
+                ).SerializeToString()
+            )
+        # Forward the requests that waited for the agent type.
+        for request, sender_client_id in held:
+            await self._process_request(request, sender_client_id)
+
+    def _encode_common_content_types(self) -> bytes:
+        return agent_worker_pb2.Message(
+            acceptedContentTypes=agent_worker_pb2.AcceptedContentTypes(content_types=sorted(self._common_content_types))
+        ).SerializeToString()
+
+    def _update_common_content_types(self) -> bool:
+        """Recompute the content types that all clients accept, and send them to all clients if they changed."""
+        if len(self._link_addresses) > 0:
+            # The other hosts are told what the workers of this host accept. A host without workers does not
+            # restrict the content types.
+            local_types = [
+                content_types
+                for client_id, content_types in self._accepted_content_types.items()
+                if client_id not in self._peer_client_ids
+            ]
+            local = (
+                set.intersection(*local_types)
+                if local_types
+                else {JSON_DATA_CONTENT_TYPE, PROTOBUF_DATA_CONTENT_TYPE, MSGPACK_DATA_CONTENT_TYPE}
+            )
+            local.add(JSON_DATA_CONTENT_TYPE)
+            if local != self._local_content_types:
+                self._local_content_types = local
+                announcement = self._encode_local_content_types()
+                for link_client_id in self._link_addresses:
+                    self._send_queues[link_client_id].put_nowait(announcement)
+        # The peer clients announce the content types of the workers of the other hosts.
+        common = set.intersection(*self._accepted_content_types.values()) if self._accepted_content_types else set()
+        common.add(JSON_DATA_CONTENT_TYPE)
+        if common == self._common_content_types:
+            return False
+        self._common_content_types = common
+        logger.info(f"Content types accepted by all clients: {sorted(common)}")
+        message = self._encode_common_content_types()
+        for client_id, send_queue in self._send_queues.items():
+            if client_id not in self._link_addresses:
+                send_queue.put_nowait(message)
+        return True
+
+    def _on_routing_changed(self) -> None:
+        self._routing_version += 1
+        # Clients that resolved addresses of agents forget them, as the agents may have moved.
+        message = agent_worker_pb2.Message(routingChanged=agent_worker_pb2.RoutingChanged()).SerializeToString()
+        for client_id in self._resolving_client_ids:
+            self._send_queues[client_id].put_nowait(message)
+
+    def _process_resolve_agent_request(
+        self, resolve_agent_req: agent_worker_pb2.ResolveAgentRequest, client_id: int
+    ) -> None:
+        self._resolving_client_ids.add(client_id)
+        client_ids = self._agent_type_to_client_ids.get(resolve_agent_req.agent.type)
+        target_client_id = client_ids.get(resolve_agent_req.agent.key) if client_ids is not None else None
+        if self._owner_link(resolve_agent_req.agent.type) is not None:
+            # The agents of agent types that other hosts own are routed by those hosts.
+            target_client_id = None
+        # Without a direct address, requests to the agent are relayed, which also reports unknown agent types.
+        direct_address = self._direct_addresses.get(target_client_id, "") if target_client_id is not None else ""
+        self._send_queues[client_id].put_nowait(
             agent_worker_pb2.Message(
-                registerAgentTypeResponse=agent_worker_pb2.RegisterAgentTypeResponse(
-                    request_id=register_agent_type_req.request_id, success=success, error=error
+                resolveAgentResponse=agent_worker_pb2.ResolveAgentResponse(
+                    request_id=resolve_agent_req.request_id, direct_address=direct_address
                 )
-            )
+            ).SerializeToString()
         )
 
     async def _process_add_subscription_request(
@@ -221,39 +963,124 @@ async def _process_add_subscription_request(
                 type_subscription_msg: agent_worker_pb2.TypeSubscription = (
                     add_subscription_req.subscription.typeSubscription
                 )
-                type_subscription = TypeSubscription(
-                    topic_type=type_subscription_msg.topic_type, agent_type=type_subscription_msg.agent_type
-                )
-                try:
-                    await self._subscription_manager.add_subscription(type_subscription)
-                    subscription_ids = self._client_id_to_subscription_id_mapping.setdefault(client_id, set())
-                    subscription_ids.add(type_subscription.id)
+                key = (type_subscription_msg.topic_type, type_subscription_msg.agent_type)
+                owner_link = self._owner_link(key[1]) if client_id not in self._peer_client_ids else None
+                if owner_link is not None:
+                    # The host that owns the agent type keeps the subscription, and responds to the client.
+                    self._forwarded_subscriptions[owner_link].add(key)
+                    self._forward_control_request(
+                        owner_link, client_id, agent_worker_pb2.Message(addSubscriptionRequest=add_subscription_req)
+                    )
+                    return
+                subscription_ids = self._client_id_to_subscription_id_mapping.setdefault(client_id, set())
+                existing_id = self._subscription_ids.get(key)
+                if existing_id is None:
+                    type_subscription = TypeSubscription(topic_type=key[0], agent_type=key[1])
+                    try:
+                        await self._subscription_manager.add_subscription(type_subscription)
+                        self._subscription_ids[key] = type_subscription.id
+                        self._subscription_id_to_client_ids[type_subscription.id] = {client_id}
+                        subscription_ids.add(type_subscription.id)
+                        success = True
+                        error = None
+                    except ValueError as e:
+                        success = False
+                        error = str(e)
+                elif existing_id in subscription_ids:
+                    # The client sent the subscription again after reconnecting.
+                    success = True
+                    error = None
+                else:
+                    # Another client of the same agent type added this subscription already.
+                    self._subscription_id_to_client_ids[existing_id].add(client_id)
+                    subscription_ids.add(existing_id)
                     success = True
                     error = None
-                except ValueError as e:
-                    success = False
-                    error = str(e)
                 # Send a response back to the client.
-                await self._send_queues[client_id].put(
+                self._send_queues[client_id].put_nowait(
                     agent_worker_pb2.Message(
                         addSubscriptionResponse=agent_worker_pb2.AddSubscriptionResponse(
                             request_id=add_subscription_req.request_id, success=success, error=error
                         )
-                    )
+                    ).SerializeToString()
                 )
             case None:
                 logger.warning("Received empty subscription message")
 
+    @staticmethod
+    def _encode_state(state: Mapping[str, Any]) -> tuple[str, str]:
+        """Encode a state as canonical JSON and compute its eTag, which changes whenever the state changes."""
+        text = json.dumps(state, sort_keys=True)
+        return text, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
     async def GetState(  # type: ignore
         self,
         request: agent_worker_pb2.AgentId,
         context: grpc.aio.ServicerContext[agent_worker_pb2.AgentId, agent_worker_pb2.GetStateResponse],
     ) -> agent_worker_pb2.GetStateResponse:  # type: ignore
-        raise NotImplementedError("Method not implemented!")
+        state = await self._state_store.get(AgentId(request.type, request.key))
+        if state is None:
+            return agent_worker_pb2.GetStateResponse(
+                success=False, error=f"No state is stored for agent {request.type}/{request.key}."
+            )
+        text, etag = self._encode_state(state)
+        return agent_worker_pb2.GetStateResponse(
+            agent_state=agent_worker_pb2.AgentState(agent_id=request, eTag=etag, text_data=text),
+            success=True,
+        )
 
     async def SaveState(  # type: ignore
         self,
         request: agent_worker_pb2.AgentState,
         context: grpc.aio.ServicerContext[agent_worker_pb2.AgentId, agent_worker_pb2.SaveStateResponse],
     ) -> agent_worker_pb2.SaveStateResponse:  # type: ignore
-        raise NotImplementedError("Method not implemented!")
+        agent_id = AgentId(request.agent_id.type, request.agent_id.key)
+        # States are JSON objects, sent as text or as UTF-8 encoded bytes.
+        data_case = request.WhichOneof("data")
+        if data_case not in ("text_data", "binary_data"):
+            return agent_worker_pb2.SaveStateResponse(success=False, error="State must be sent as text or binary data.")
+        try:
+            state = json.loads(request.text_data if data_case == "text_data" else request.binary_data)
+        except ValueError as e:
+            return agent_worker_pb2.SaveStateResponse(success=False, error=f"State is not valid JSON: {e}")
+        if not isinstance(state, dict):
+            return agent_worker_pb2.SaveStateResponse(success=False, error="State must be a JSON object.")
+        async with self._save_state_lock:
+            # A non-empty eTag makes the save conditional on the stored state not having changed since it was read.
+            if request.eTag:
+                current = await self._state_store.get(agent_id)
+                if current is None or self._encode_state(current)[1] != request.eTag:
+                    return agent_worker_pb2.SaveStateResponse(
+                        success=False,
+                        error=f"The state of agent {agent_id} has changed since it was read (eTag mismatch).",
+                    )
+            await self._state_store.put(agent_id, state)
+        return agent_worker_pb2.SaveStateResponse(success=True)
+
+
+def _forwarded_request_id(worker_id: str, request_id: str) -> str:
+    return f"{worker_id}:{request_id}"
+
+
+def add_servicer_to_server(servicer: WorkerAgentRuntimeHostServicer, server: grpc.aio.Server) -> None:  # type: ignore
+    """Register the servicer with a server. Unlike the generated ``add_AgentRpcServicer_to_server``, the messages
+    that the servicer sends through ``OpenChannel`` are already encoded and are sent as they are."""
+    servicer._sends_encoded_messages = True  # type: ignore[reportPrivateUsage]
+    rpc_method_handlers = {
+        "OpenChannel": grpc.stream_stream_rpc_method_handler(
+            servicer.OpenChannel,
+            request_deserializer=agent_worker_pb2.Message.FromString,
+            response_serializer=bytes,
+        ),
+        "GetState": grpc.unary_unary_rpc_method_handler(
+            servicer.GetState,
+            request_deserializer=agent_worker_pb2.AgentId.FromString,
+            response_serializer=agent_worker_pb2.GetStateResponse.SerializeToString,
+        ),
+        "SaveState": grpc.unary_unary_rpc_method_handler(
+            servicer.SaveState,
+            request_deserializer=agent_worker_pb2.AgentState.FromString,
+            response_serializer=agent_worker_pb2.SaveStateResponse.SerializeToString,
+        ),
+    }
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler("agents.AgentRpc", rpc_method_handlers),))
@@ -1,10 +1,24 @@
 import json
+from dataclasses import asdict, is_dataclass
 from enum import Enum
 from typing import Any, cast
 
+from pydantic import BaseModel
+
 from autogen_core.base import AgentId
 
 
+def _json_default(obj: Any) -> Any:
+    """Convert the values that json cannot serialize, such as message payloads and enums."""
+    if isinstance(obj, Enum):
+        return obj.name
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
+    return str(obj)
+
+
 class LLMCallEvent:
     def __init__(self, *, prompt_tokens: int, completion_tokens: int, **kwargs: Any) -> None:
         """To be used by model clients to log the call to the LLM.
@@ -53,6 +67,24 @@ class DeliveryStage(Enum):
 
 
 class MessageEvent:
+    """A message being sent or delivered by a runtime, logged to the event logger at INFO level.
+
+    Runtimes only create message events when the event logger is enabled for INFO, and the payload is only
+    serialized when the event is formatted by a handler, so message events cost close to nothing when disabled.
+
+    Example:
+
+        .. code-block:: python
+
+            import logging
+
+            from autogen_core.application.logging import EVENT_LOGGER_NAME
+
+            logger = logging.getLogger(EVENT_LOGGER_NAME)
+            logger.setLevel(logging.INFO)
+            logger.addHandler(logging.StreamHandler())
+    """
+
     def __init__(
         self,
         *,
@@ -81,4 +113,4 @@ def completion_tokens(self) -> int:
 
     # This must output the event in a json serializable format
     def __str__(self) -> str:
-        return json.dumps(self.kwargs)
+        return json.dumps(self.kwargs, default=_json_default)
@@ -16,7 +16,7 @@
 from google.protobuf import any_pb2 as google_dot_protobuf_dot_any__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12\x61gent_worker.proto\x12\x06\x61gents\x1a\x10\x63loudevent.proto\x1a\x19google/protobuf/any.proto\"\'\n\x07TopicId\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0e\n\x06source\x18\x02 \x01(\t\"$\n\x07\x41gentId\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0b\n\x03key\x18\x02 \x01(\t\"E\n\x07Payload\x12\x11\n\tdata_type\x18\x01 \x01(\t\x12\x19\n\x11\x64\x61ta_content_type\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"\x89\x02\n\nRpcRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12$\n\x06source\x18\x02 \x01(\x0b\x32\x0f.agents.AgentIdH\x00\x88\x01\x01\x12\x1f\n\x06target\x18\x03 \x01(\x0b\x32\x0f.agents.AgentId\x12\x0e\n\x06method\x18\x04 \x01(\t\x12 \n\x07payload\x18\x05 \x01(\x0b\x32\x0f.agents.Payload\x12\x32\n\x08metadata\x18\x06 \x03(\x0b\x32 .agents.RpcRequest.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\t\n\x07_source\"\xb8\x01\n\x0bRpcResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12 \n\x07payload\x18\x02 \x01(\x0b\x32\x0f.agents.Payload\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x12\x33\n\x08metadata\x18\x04 \x03(\x0b\x32!.agents.RpcResponse.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\xe4\x01\n\x05\x45vent\x12\x12\n\ntopic_type\x18\x01 \x01(\t\x12\x14\n\x0ctopic_source\x18\x02 \x01(\t\x12$\n\x06source\x18\x03 \x01(\x0b\x32\x0f.agents.AgentIdH\x00\x88\x01\x01\x12 \n\x07payload\x18\x04 \x01(\x0b\x32\x0f.agents.Payload\x12-\n\x08metadata\x18\x05 \x03(\x0b\x32\x1b.agents.Event.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\t\n\x07_source\"<\n\x18RegisterAgentTypeRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0c\n\x04type\x18\x02 \x01(\t\"^\n\x19RegisterAgentTypeResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\":\n\x10TypeSubscription\x12\x12\n\ntopic_type\x18\x01 \x01(\t\x12\x12\n\nagent_type\x18\x02 \x01(\t\"T\n\x0cSubscription\x12\x34\n\x10typeSubscription\x18\x01 \x01(\x0b\x32\x18.agents.TypeSubscriptionH\x00\x42\x0e\n\x0csubscription\"X\n\x16\x41\x64\x64SubscriptionRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12*\n\x0csubscription\x18\x02 \x01(\x0b\x32\x14.agents.Subscription\"\\\n\x17\x41\x64\x64SubscriptionResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"\x9d\x01\n\nAgentState\x12!\n\x08\x61gent_id\x18\x01 \x01(\x0b\x32\x0f.agents.AgentId\x12\x0c\n\x04\x65Tag\x18\x02 \x01(\t\x12\x15\n\x0b\x62inary_data\x18\x03 \x01(\x0cH\x00\x12\x13\n\ttext_data\x18\x04 \x01(\tH\x00\x12*\n\nproto_data\x18\x05 \x01(\x0b\x32\x14.google.protobuf.AnyH\x00\x42\x06\n\x04\x64\x61ta\"j\n\x10GetStateResponse\x12\'\n\x0b\x61gent_state\x18\x01 \x01(\x0b\x32\x12.agents.AgentState\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"B\n\x11SaveStateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x12\n\x05\x65rror\x18\x02 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"\xc6\x03\n\x07Message\x12%\n\x07request\x18\x01 \x01(\x0b\x32\x12.agents.RpcRequestH\x00\x12\'\n\x08response\x18\x02 \x01(\x0b\x32\x13.agents.RpcResponseH\x00\x12\x1e\n\x05\x65vent\x18\x03 \x01(\x0b\x32\r.agents.EventH\x00\x12\x44\n\x18registerAgentTypeRequest\x18\x04 \x01(\x0b\x32 .agents.RegisterAgentTypeRequestH\x00\x12\x46\n\x19registerAgentTypeResponse\x18\x05 \x01(\x0b\x32!.agents.RegisterAgentTypeResponseH\x00\x12@\n\x16\x61\x64\x64SubscriptionRequest\x18\x06 \x01(\x0b\x32\x1e.agents.AddSubscriptionRequestH\x00\x12\x42\n\x17\x61\x64\x64SubscriptionResponse\x18\x07 \x01(\x0b\x32\x1f.agents.AddSubscriptionResponseH\x00\x12,\n\ncloudEvent\x18\x08 \x01(\x0b\x32\x16.cloudevent.CloudEventH\x00\x42\t\n\x07message2\xb2\x01\n\x08\x41gentRpc\x12\x33\n\x0bOpenChannel\x12\x0f.agents.Message\x1a\x0f.agents.Message(\x01\x30\x01\x12\x35\n\x08GetState\x12\x0f.agents.AgentId\x1a\x18.agents.GetStateResponse\x12:\n\tSaveState\x12\x12.agents.AgentState\x1a\x19.agents.SaveStateResponseB!\xaa\x02\x1eMicrosoft.AutoGen.Abstractionsb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12\x61gent_worker.proto\x12\x06\x61gents\x1a\x10\x63loudevent.proto\x1a\x19google/protobuf/any.proto\"\'\n\x07TopicId\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0e\n\x06source\x18\x02 \x01(\t\"$\n\x07\x41gentId\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0b\n\x03key\x18\x02 \x01(\t\"E\n\x07Payload\x12\x11\n\tdata_type\x18\x01 \x01(\t\x12\x19\n\x11\x64\x61ta_content_type\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"\x9a\x02\n\nRpcRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12$\n\x06source\x18\x02 \x01(\x0b\x32\x0f.agents.AgentIdH\x00\x88\x01\x01\x12\x1f\n\x06target\x18\x03 \x01(\x0b\x32\x0f.agents.AgentId\x12\x0e\n\x06method\x18\x04 \x01(\t\x12 \n\x07payload\x18\x05 \x01(\x0b\x32\x0f.agents.Payload\x12\x32\n\x08metadata\x18\x06 \x03(\x0b\x32 .agents.RpcRequest.MetadataEntry\x12\x0f\n\x07timeout\x18\x07 \x01(\x01\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\t\n\x07_source\"#\n\rCancelRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"\xb8\x01\n\x0bRpcResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12 \n\x07payload\x18\x02 \x01(\x0b\x32\x0f.agents.Payload\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x12\x33\n\x08metadata\x18\x04 \x03(\x0b\x32!.agents.RpcResponse.MetadataEntry\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x89\x02\n\x05\x45vent\x12\x12\n\ntopic_type\x18\x01 \x01(\t\x12\x14\n\x0ctopic_source\x18\x02 \x01(\t\x12$\n\x06source\x18\x03 \x01(\x0b\x32\x0f.agents.AgentIdH\x00\x88\x01\x01\x12 \n\x07payload\x18\x04 \x01(\x0b\x32\x0f.agents.Payload\x12-\n\x08metadata\x18\x05 \x03(\x0b\x32\x1b.agents.Event.MetadataEntry\x12#\n\nrecipients\x18\x06 \x03(\x0b\x32\x0f.agents.AgentId\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\t\n\x07_source\"T\n\x18RegisterAgentTypeRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0c\n\x04type\x18\x02 \x01(\t\x12\x16\n\x0e\x64irect_address\x18\x03 \x01(\t\"^\n\x19RegisterAgentTypeResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\":\n\x10TypeSubscription\x12\x12\n\ntopic_type\x18\x01 \x01(\t\x12\x12\n\nagent_type\x18\x02 \x01(\t\"T\n\x0cSubscription\x12\x34\n\x10typeSubscription\x18\x01 \x01(\x0b\x32\x18.agents.TypeSubscriptionH\x00\x42\x0e\n\x0csubscription\"X\n\x16\x41\x64\x64SubscriptionRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12*\n\x0csubscription\x18\x02 \x01(\x0b\x32\x14.agents.Subscription\"\\\n\x17\x41\x64\x64SubscriptionResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"I\n\x13ResolveAgentRequest\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x1e\n\x05\x61gent\x18\x02 \x01(\x0b\x32\x0f.agents.AgentId\"B\n\x14ResolveAgentResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x16\n\x0e\x64irect_address\x18\x02 \x01(\t\"\x10\n\x0eRoutingChanged\"-\n\x14\x41\x63\x63\x65ptedContentTypes\x12\x15\n\rcontent_types\x18\x01 \x03(\t\"\x0e\n\x0c\x43loseChannel\"\x18\n\x07\x43redits\x12\r\n\x05\x63ount\x18\x01 \x01(\r\"#\n\x13UnregisterAgentType\x12\x0c\n\x04type\x18\x01 \x01(\t\"\x9d\x01\n\nAgentState\x12!\n\x08\x61gent_id\x18\x01 \x01(\x0b\x32\x0f.agents.AgentId\x12\x0c\n\x04\x65Tag\x18\x02 \x01(\t\x12\x15\n\x0b\x62inary_data\x18\x03 \x01(\x0cH\x00\x12\x13\n\ttext_data\x18\x04 \x01(\tH\x00\x12*\n\nproto_data\x18\x05 \x01(\x0b\x32\x14.google.protobuf.AnyH\x00\x42\x06\n\x04\x64\x61ta\"j\n\x10GetStateResponse\x12\'\n\x0b\x61gent_state\x18\x01 \x01(\x0b\x32\x12.agents.AgentState\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\x05\x65rror\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"B\n\x11SaveStateResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x12\n\x05\x65rror\x18\x02 \x01(\tH\x00\x88\x01\x01\x42\x08\n\x06_error\"\x95\x07\n\x07Message\x12%\n\x07request\x18\x01 \x01(\x0b\x32\x12.agents.RpcRequestH\x00\x12\'\n\x08response\x18\x02 \x01(\x0b\x32\x13.agents.RpcResponseH\x00\x12\x1e\n\x05\x65vent\x18\x03 \x01(\x0b\x32\r.agents.EventH\x00\x12\x44\n\x18registerAgentTypeRequest\x18\x04 \x01(\x0b\x32 .agents.RegisterAgentTypeRequestH\x00\x12\x46\n\x19registerAgentTypeResponse\x18\x05 \x01(\x0b\x32!.agents.RegisterAgentTypeResponseH\x00\x12@\n\x16\x61\x64\x64SubscriptionRequest\x18\x06 \x01(\x0b\x32\x1e.agents.AddSubscriptionRequestH\x00\x12\x42\n\x17\x61\x64\x64SubscriptionResponse\x18\x07 \x01(\x0b\x32\x1f.agents.AddSubscriptionResponseH\x00\x12,\n\ncloudEvent\x18\x08 \x01(\x0b\x32\x16.cloudevent.CloudEventH\x00\x12%\n\x05\x62\x61tch\x18\t \x01(\x0b\x32\x14.agents.MessageBatchH\x00\x12:\n\x13resolveAgentRequest\x18\n \x01(\x0b\x32\x1b.agents.ResolveAgentRequestH\x00\x12<\n\x14resolveAgentResponse\x18\x0b \x01(\x0b\x32\x1c.agents.ResolveAgentResponseH\x00\x12\x30\n\x0eroutingChanged\x18\x0c \x01(\x0b\x32\x16.agents.RoutingChangedH\x00\x12<\n\x14\x61\x63\x63\x65ptedContentTypes\x18\r \x01(\x0b\x32\x1c.agents.AcceptedContentTypesH\x00\x12.\n\rcancelRequest\x18\x0e \x01(\x0b\x32\x15.agents.CancelRequestH\x00\x12,\n\x0c\x63loseChannel\x18\x0f \x01(\x0b\x32\x14.agents.CloseChannelH\x00\x12\"\n\x07\x63redits\x18\x10 \x01(\x0b\x32\x0f.agents.CreditsH\x00\x12:\n\x13unregisterAgentType\x18\x11 \x01(\x0b\x32\x1b.agents.UnregisterAgentTypeH\x00\x42\t\n\x07message\"1\n\x0cMessageBatch\x12!\n\x08messages\x18\x01 \x03(\x0b\x32\x0f.agents.Message2\xb2\x01\n\x08\x41gentRpc\x12\x33\n\x0bOpenChannel\x12\x0f.agents.Message\x1a\x0f.agents.Message(\x01\x30\x01\x12\x35\n\x08GetState\x12\x0f.agents.AgentId\x1a\x18.agents.GetStateResponse\x12:\n\tSaveState\x12\x12.agents.AgentState\x1a\x19.agents.SaveStateResponse2H\n\x0e\x41gentWorkerRpc\x12\x36\n\x0bSendRequest\x12\x12.agents.RpcRequest\x1a\x13.agents.RpcResponseB!\xaa\x02\x1eMicrosoft.AutoGen.Abstractionsb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -37,37 +37,57 @@
   _globals['_PAYLOAD']._serialized_start=154
   _globals['_PAYLOAD']._serialized_end=223
   _globals['_RPCREQUEST']._serialized_start=226
-  _globals['_RPCREQUEST']._serialized_end=491
-  _globals['_RPCREQUEST_METADATAENTRY']._serialized_start=433
-  _globals['_RPCREQUEST_METADATAENTRY']._serialized_end=480
-  _globals['_RPCRESPONSE']._serialized_start=494
-  _globals['_RPCRESPONSE']._serialized_end=678
-  _globals['_RPCRESPONSE_METADATAENTRY']._serialized_start=433
-  _globals['_RPCRESPONSE_METADATAENTRY']._serialized_end=480
-  _globals['_EVENT']._serialized_start=681
-  _globals['_EVENT']._serialized_end=909
-  _globals['_EVENT_METADATAENTRY']._serialized_start=433
-  _globals['_EVENT_METADATAENTRY']._serialized_end=480
-  _globals['_REGISTERAGENTTYPEREQUEST']._serialized_start=911
-  _globals['_REGISTERAGENTTYPEREQUEST']._serialized_end=971
-  _globals['_REGISTERAGENTTYPERESPONSE']._serialized_start=973
-  _globals['_REGISTERAGENTTYPERESPONSE']._serialized_end=1067
-  _globals['_TYPESUBSCRIPTION']._serialized_start=1069
-  _globals['_TYPESUBSCRIPTION']._serialized_end=1127
-  _globals['_SUBSCRIPTION']._serialized_start=1129
-  _globals['_SUBSCRIPTION']._serialized_end=1213
-  _globals['_ADDSUBSCRIPTIONREQUEST']._serialized_start=1215
-  _globals['_ADDSUBSCRIPTIONREQUEST']._serialized_end=1303
-  _globals['_ADDSUBSCRIPTIONRESPONSE']._serialized_start=1305
-  _globals['_ADDSUBSCRIPTIONRESPONSE']._serialized_end=1397
-  _globals['_AGENTSTATE']._serialized_start=1400
-  _globals['_AGENTSTATE']._serialized_end=1557
-  _globals['_GETSTATERESPONSE']._serialized_start=1559
-  _globals['_GETSTATERESPONSE']._serialized_end=1665
-  _globals['_SAVESTATERESPONSE']._serialized_start=1667
-  _globals['_SAVESTATERESPONSE']._serialized_end=1733
-  _globals['_MESSAGE']._serialized_start=1736
-  _globals['_MESSAGE']._serialized_end=2190
-  _globals['_AGENTRPC']._serialized_start=2193
-  _globals['_AGENTRPC']._serialized_end=2371
+  _globals['_RPCREQUEST']._serialized_end=508
+  _globals['_RPCREQUEST_METADATAENTRY']._serialized_start=450
+  _globals['_RPCREQUEST_METADATAENTRY']._serialized_end=497
+  _globals['_CANCELREQUEST']._serialized_start=510
+  _globals['_CANCELREQUEST']._serialized_end=545
+  _globals['_RPCRESPONSE']._serialized_start=548
+  _globals['_RPCRESPONSE']._serialized_end=732
+  _globals['_RPCRESPONSE_METADATAENTRY']._serialized_start=450
+  _globals['_RPCRESPONSE_METADATAENTRY']._serialized_end=497
+  _globals['_EVENT']._serialized_start=735
+  _globals['_EVENT']._serialized_end=1000
+  _globals['_EVENT_METADATAENTRY']._serialized_start=450
+  _globals['_EVENT_METADATAENTRY']._serialized_end=497
+  _globals['_REGISTERAGENTTYPEREQUEST']._serialized_start=1002
+  _globals['_REGISTERAGENTTYPEREQUEST']._serialized_end=1086
+  _globals['_REGISTERAGENTTYPERESPONSE']._serialized_start=1088
+  _globals['_REGISTERAGENTTYPERESPONSE']._serialized_end=1182
+  _globals['_TYPESUBSCRIPTION']._serialized_start=1184
+  _globals['_TYPESUBSCRIPTION']._serialized_end=1242
+  _globals['_SUBSCRIPTION']._serialized_start=1244
+  _globals['_SUBSCRIPTION']._serialized_end=1328
+  _globals['_ADDSUBSCRIPTIONREQUEST']._serialized_start=1330
+  _globals['_ADDSUBSCRIPTIONREQUEST']._serialized_end=1418
+  _globals['_ADDSUBSCRIPTIONRESPONSE']._serialized_start=1420
+  _globals['_ADDSUBSCRIPTIONRESPONSE']._serialized_end=1512
+  _globals['_RESOLVEAGENTREQUEST']._serialized_start=1514
+  _globals['_RESOLVEAGENTREQUEST']._serialized_end=1587
+  _globals['_RESOLVEAGENTRESPONSE']._serialized_start=1589
+  _globals['_RESOLVEAGENTRESPONSE']._serialized_end=1655
+  _globals['_ROUTINGCHANGED']._serialized_start=1657
+  _globals['_ROUTINGCHANGED']._serialized_end=1673
+  _globals['_ACCEPTEDCONTENTTYPES']._serialized_start=1675
+  _globals['_ACCEPTEDCONTENTTYPES']._serialized_end=1720
+  _globals['_CLOSECHANNEL']._serialized_start=1722
+  _globals['_CLOSECHANNEL']._serialized_end=1736
+  _globals['_CREDITS']._serialized_start=1738
+  _globals['_CREDITS']._serialized_end=1762
+  _globals['_UNREGISTERAGENTTYPE']._serialized_start=1764
+  _globals['_UNREGISTERAGENTTYPE']._serialized_end=1799
+  _globals['_AGENTSTATE']._serialized_start=1802
+  _globals['_AGENTSTATE']._serialized_end=1959
+  _globals['_GETSTATERESPONSE']._serialized_start=1961
+  _globals['_GETSTATERESPONSE']._serialized_end=2067
+  _globals['_SAVESTATERESPONSE']._serialized_start=2069
+  _globals['_SAVESTATERESPONSE']._serialized_end=2135
+  _globals['_MESSAGE']._serialized_start=2138
+  _globals['_MESSAGE']._serialized_end=3055
+  _globals['_MESSAGEBATCH']._serialized_start=3057
+  _globals['_MESSAGEBATCH']._serialized_end=3106
+  _globals['_AGENTRPC']._serialized_start=3109
+  _globals['_AGENTRPC']._serialized_end=3287
+  _globals['_AGENTWORKERRPC']._serialized_start=3289
+  _globals['_AGENTWORKERRPC']._serialized_end=3361
 # @@protoc_insertion_point(module_scope)
@@ -97,8 +97,13 @@ class RpcRequest(google.protobuf.message.Message):
     METHOD_FIELD_NUMBER: builtins.int
     PAYLOAD_FIELD_NUMBER: builtins.int
     METADATA_FIELD_NUMBER: builtins.int
+    TIMEOUT_FIELD_NUMBER: builtins.int
     request_id: builtins.str
     method: builtins.str
+    timeout: builtins.float
+    """Seconds the sender waits for the response, counted from when the request is sent. The recipient cancels the
+    handler when they have passed. 0 means no deadline.
+    """
     @property
     def source(self) -> global___AgentId: ...
     @property
@@ -116,13 +121,33 @@ class RpcRequest(google.protobuf.message.Message):
         method: builtins.str = ...,
         payload: global___Payload | None = ...,
         metadata: collections.abc.Mapping[builtins.str, builtins.str] | None = ...,
+        timeout: builtins.float = ...,
     ) -> None: ...
     def HasField(self, field_name: typing.Literal["_source", b"_source", "payload", b"payload", "source", b"source", "target", b"target"]) -> builtins.bool: ...
-    def ClearField(self, field_name: typing.Literal["_source", b"_source", "metadata", b"metadata", "method", b"method", "payload", b"payload", "request_id", b"request_id", "source", b"source", "target", b"target"]) -> None: ...
+    def ClearField(self, field_name: typing.Literal["_source", b"_source", "metadata", b"metadata", "method", b"method", "payload", b"payload", "request_id", b"request_id", "source", b"source", "target", b"target", "timeout", b"timeout"]) -> None: ...
     def WhichOneof(self, oneof_group: typing.Literal["_source", b"_source"]) -> typing.Literal["source"] | None: ...
 
 global___RpcRequest = RpcRequest
 
+@typing.final
+class CancelRequest(google.protobuf.message.Message):
+    """Sent by the sender of a request that no longer waits for the response. The host forwards it to the worker
+    handling the request, which cancels the handler.
+    """
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    REQUEST_ID_FIELD_NUMBER: builtins.int
+    request_id: builtins.str
+    def __init__(
+        self,
+        *,
+        request_id: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["request_id", b"request_id"]) -> None: ...
+
+global___CancelRequest = CancelRequest
+
 @typing.final
 class RpcResponse(google.protobuf.message.Message):
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
@@ -191,6 +216,7 @@ class Event(google.protobuf.message.Message):
     SOURCE_FIELD_NUMBER: builtins.int
     PAYLOAD_FIELD_NUMBER: builtins.int
     METADATA_FIELD_NUMBER: builtins.int
+    RECIPIENTS_FIELD_NUMBER: builtins.int
     topic_type: builtins.str
     topic_source: builtins.str
     @property
@@ -199,6 +225,10 @@ class Event(google.protobuf.message.Message):
     def payload(self) -> global___Payload: ...
     @property
     def metadata(self) -> google.protobuf.internal.containers.ScalarMap[builtins.str, builtins.str]: ...
+    @property
+    def recipients(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___AgentId]:
+        """The agents of the receiving worker to deliver the event to. Empty means every subscribed agent of the worker."""
+
     def __init__(
         self,
         *,
@@ -207,9 +237,10 @@ class Event(google.protobuf.message.Message):
         source: global___AgentId | None = ...,
         payload: global___Payload | None = ...,
         metadata: collections.abc.Mapping[builtins.str, builtins.str] | None = ...,
+        recipients: collections.abc.Iterable[global___AgentId] | None = ...,
     ) -> None: ...
     def HasField(self, field_name: typing.Literal["_source", b"_source", "payload", b"payload", "source", b"source"]) -> builtins.bool: ...
-    def ClearField(self, field_name: typing.Literal["_source", b"_source", "metadata", b"metadata", "payload", b"payload", "source", b"source", "topic_source", b"topic_source", "topic_type", b"topic_type"]) -> None: ...
+    def ClearField(self, field_name: typing.Literal["_source", b"_source", "metadata", b"metadata", "payload", b"payload", "recipients", b"recipients", "source", b"source", "topic_source", b"topic_source", "topic_type", b"topic_type"]) -> None: ...
     def WhichOneof(self, oneof_group: typing.Literal["_source", b"_source"]) -> typing.Literal["source"] | None: ...
 
 global___Event = Event
@@ -220,15 +251,19 @@ class RegisterAgentTypeRequest(google.protobuf.message.Message):
 
     REQUEST_ID_FIELD_NUMBER: builtins.int
     TYPE_FIELD_NUMBER: builtins.int
+    DIRECT_ADDRESS_FIELD_NUMBER: builtins.int
     request_id: builtins.str
     type: builtins.str
+    direct_address: builtins.str
+    """The address the registering worker serves AgentWorkerRpc on. Empty means requests are relayed by the host."""
     def __init__(
         self,
         *,
         request_id: builtins.str = ...,
         type: builtins.str = ...,
+        direct_address: builtins.str = ...,
     ) -> None: ...
-    def ClearField(self, field_name: typing.Literal["request_id", b"request_id", "type", b"type"]) -> None: ...
+    def ClearField(self, field_name: typing.Literal["direct_address", b"direct_address", "request_id", b"request_id", "type", b"type"]) -> None: ...
 
 global___RegisterAgentTypeRequest = RegisterAgentTypeRequest
 
@@ -334,6 +369,132 @@ class AddSubscriptionResponse(google.protobuf.message.Message):
 
 global___AddSubscriptionResponse = AddSubscriptionResponse
 
+@typing.final
+class ResolveAgentRequest(google.protobuf.message.Message):
+    """Asks the host for the address of the worker that hosts an agent, to send requests to it directly."""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    REQUEST_ID_FIELD_NUMBER: builtins.int
+    AGENT_FIELD_NUMBER: builtins.int
+    request_id: builtins.str
+    @property
+    def agent(self) -> global___AgentId: ...
+    def __init__(
+        self,
+        *,
+        request_id: builtins.str = ...,
+        agent: global___AgentId | None = ...,
+    ) -> None: ...
+    def HasField(self, field_name: typing.Literal["agent", b"agent"]) -> builtins.bool: ...
+    def ClearField(self, field_name: typing.Literal["agent", b"agent", "request_id", b"request_id"]) -> None: ...
+
+global___ResolveAgentRequest = ResolveAgentRequest
+
+@typing.final
+class ResolveAgentResponse(google.protobuf.message.Message):
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    REQUEST_ID_FIELD_NUMBER: builtins.int
+    DIRECT_ADDRESS_FIELD_NUMBER: builtins.int
+    request_id: builtins.str
+    direct_address: builtins.str
+    """Empty when requests to the agent are relayed by the host."""
+    def __init__(
+        self,
+        *,
+        request_id: builtins.str = ...,
+        direct_address: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["direct_address", b"direct_address", "request_id", b"request_id"]) -> None: ...
+
+global___ResolveAgentResponse = ResolveAgentResponse
+
+@typing.final
+class RoutingChanged(google.protobuf.message.Message):
+    """Sent by the host when agents may have moved between workers, which invalidates resolved addresses."""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    def __init__(
+        self,
+    ) -> None: ...
+
+global___RoutingChanged = RoutingChanged
+
+@typing.final
+class AcceptedContentTypes(google.protobuf.message.Message):
+    """The content types of payloads that a worker accepts. Sent by a worker when it connects, and by the host with the
+    content types that all connected workers accept, whenever they change.
+    """
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    CONTENT_TYPES_FIELD_NUMBER: builtins.int
+    @property
+    def content_types(self) -> google.protobuf.internal.containers.RepeatedScalarFieldContainer[builtins.str]: ...
+    def __init__(
+        self,
+        *,
+        content_types: collections.abc.Iterable[builtins.str] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["content_types", b"content_types"]) -> None: ...
+
+global___AcceptedContentTypes = AcceptedContentTypes
+
+@typing.final
+class CloseChannel(google.protobuf.message.Message):
+    """Sent by a worker as the last message of a stream that it closes, so that the host ends its session rather than
+    keeping it for the worker to reconnect.
+    """
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    def __init__(
+        self,
+    ) -> None: ...
+
+global___CloseChannel = CloseChannel
+
+@typing.final
+class Credits(google.protobuf.message.Message):
+    """Sent by a worker to allow the host to send it `count` more requests and events. A worker that announces its
+    initial credits with the `credits` metadata of OpenChannel returns a credit for every request and event that it
+    finished handling, and the host holds back requests and events for it while it has no credits left.
+    """
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    COUNT_FIELD_NUMBER: builtins.int
+    count: builtins.int
+    def __init__(
+        self,
+        *,
+        count: builtins.int = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["count", b"count"]) -> None: ...
+
+global___Credits = Credits
+
+@typing.final
+class UnregisterAgentType(google.protobuf.message.Message):
+    """Sent by a host of a sharded topology to the host that owns an agent type, when the last of its workers that
+    registered the agent type disconnected, so that the owner stops routing the agents of the type to it.
+    """
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    TYPE_FIELD_NUMBER: builtins.int
+    type: builtins.str
+    def __init__(
+        self,
+        *,
+        type: builtins.str = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["type", b"type"]) -> None: ...
+
+global___UnregisterAgentType = UnregisterAgentType
+
 @typing.final
 class AgentState(google.protobuf.message.Message):
     DESCRIPTOR: google.protobuf.descriptor.Descriptor
@@ -421,6 +582,15 @@ class Message(google.protobuf.message.Message):
     ADDSUBSCRIPTIONREQUEST_FIELD_NUMBER: builtins.int
     ADDSUBSCRIPTIONRESPONSE_FIELD_NUMBER: builtins.int
     CLOUDEVENT_FIELD_NUMBER: builtins.int
+    BATCH_FIELD_NUMBER: builtins.int
+    RESOLVEAGENTREQUEST_FIELD_NUMBER: builtins.int
+    RESOLVEAGENTRESPONSE_FIELD_NUMBER: builtins.int
+    ROUTINGCHANGED_FIELD_NUMBER: builtins.int
+    ACCEPTEDCONTENTTYPES_FIELD_NUMBER: builtins.int
+    CANCELREQUEST_FIELD_NUMBER: builtins.int
+    CLOSECHANNEL_FIELD_NUMBER: builtins.int
+    CREDITS_FIELD_NUMBER: builtins.int
+    UNREGISTERAGENTTYPE_FIELD_NUMBER: builtins.int
     @property
     def request(self) -> global___RpcRequest: ...
     @property
@@ -437,6 +607,24 @@ class Message(google.protobuf.message.Message):
     def addSubscriptionResponse(self) -> global___AddSubscriptionResponse: ...
     @property
     def cloudEvent(self) -> cloudevent_pb2.CloudEvent: ...
+    @property
+    def batch(self) -> global___MessageBatch: ...
+    @property
+    def resolveAgentRequest(self) -> global___ResolveAgentRequest: ...
+    @property
+    def resolveAgentResponse(self) -> global___ResolveAgentResponse: ...
+    @property
+    def routingChanged(self) -> global___RoutingChanged: ...
+    @property
+    def acceptedContentTypes(self) -> global___AcceptedContentTypes: ...
+    @property
+    def cancelRequest(self) -> global___CancelRequest: ...
+    @property
+    def closeChannel(self) -> global___CloseChannel: ...
+    @property
+    def credits(self) -> global___Credits: ...
+    @property
+    def unregisterAgentType(self) -> global___UnregisterAgentType: ...
     def __init__(
         self,
         *,
@@ -448,9 +636,36 @@ class Message(google.protobuf.message.Message):
         addSubscriptionRequest: global___AddSubscriptionRequest | None = ...,
         addSubscriptionResponse: global___AddSubscriptionResponse | None = ...,
         cloudEvent: cloudevent_pb2.CloudEvent | None = ...,
+        batch: global___MessageBatch | None = ...,
+        resolveAgentRequest: global___ResolveAgentRequest | None = ...,
+        resolveAgentResponse: global___ResolveAgentResponse | None = ...,
+        routingChanged: global___RoutingChanged | None = ...,
+        acceptedContentTypes: global___AcceptedContentTypes | None = ...,
+        cancelRequest: global___CancelRequest | None = ...,
+        closeChannel: global___CloseChannel | None = ...,
+        credits: global___Credits | None = ...,
+        unregisterAgentType: global___UnregisterAgentType | None = ...,
     ) -> None: ...
-    def HasField(self, field_name: typing.Literal["addSubscriptionRequest", b"addSubscriptionRequest", "addSubscriptionResponse", b"addSubscriptionResponse", "cloudEvent", b"cloudEvent", "event", b"event", "message", b"message", "registerAgentTypeRequest", b"registerAgentTypeRequest", "registerAgentTypeResponse", b"registerAgentTypeResponse", "request", b"request", "response", b"response"]) -> builtins.bool: ...
-    def ClearField(self, field_name: typing.Literal["addSubscriptionRequest", b"addSubscriptionRequest", "addSubscriptionResponse", b"addSubscriptionResponse", "cloudEvent", b"cloudEvent", "event", b"event", "message", b"message", "registerAgentTypeRequest", b"registerAgentTypeRequest", "registerAgentTypeResponse", b"registerAgentTypeResponse", "request", b"request", "response", b"response"]) -> None: ...
-    def WhichOneof(self, oneof_group: typing.Literal["message", b"message"]) -> typing.Literal["request", "response", "event", "registerAgentTypeRequest", "registerAgentTypeResponse", "addSubscriptionRequest", "addSubscriptionResponse", "cloudEvent"] | None: ...
+    def HasField(self, field_name: typing.Literal["acceptedContentTypes", b"acceptedContentTypes", "addSubscriptionRequest", b"addSubscriptionRequest", "addSubscriptionResponse", b"addSubscriptionResponse", "batch", b"batch", "cancelRequest", b"cancelRequest", "closeChannel", b"closeChannel", "cloudEvent", b"cloudEvent", "credits", b"credits", "event", b"event", "message", b"message", "registerAgentTypeRequest", b"registerAgentTypeRequest", "registerAgentTypeResponse", b"registerAgentTypeResponse", "request", b"request", "resolveAgentRequest", b"resolveAgentRequest", "resolveAgentResponse", b"resolveAgentResponse", "response", b"response", "routingChanged", b"routingChanged", "unregisterAgentType", b"unregisterAgentType"]) -> builtins.bool: ...
+    def ClearField(self, field_name: typing.Literal["acceptedContentTypes", b"acceptedContentTypes", "addSubscriptionRequest", b"addSubscriptionRequest", "addSubscriptionResponse", b"addSubscriptionResponse", "batch", b"batch", "cancelRequest", b"cancelRequest", "closeChannel", b"closeChannel", "cloudEvent", b"cloudEvent", "credits", b"credits", "event", b"event", "message", b"message", "registerAgentTypeRequest", b"registerAgentTypeRequest", "registerAgentTypeResponse", b"registerAgentTypeResponse", "request", b"request", "resolveAgentRequest", b"resolveAgentRequest", "resolveAgentResponse", b"resolveAgentResponse", "response", b"response", "routingChanged", b"routingChanged", "unregisterAgentType", b"unregisterAgentType"]) -> None: ...
+    def WhichOneof(self, oneof_group: typing.Literal["message", b"message"]) -> typing.Literal["request", "response", "event", "registerAgentTypeRequest", "registerAgentTypeResponse", "addSubscriptionRequest", "addSubscriptionResponse", "cloudEvent", "batch", "resolveAgentRequest", "resolveAgentResponse", "routingChanged", "acceptedContentTypes", "cancelRequest", "closeChannel", "credits", "unregisterAgentType"] | None: ...
 
 global___Message = Message
+
+@typing.final
+class MessageBatch(google.protobuf.message.Message):
+    """Several messages sent together in one frame of the stream."""
+
+    DESCRIPTOR: google.protobuf.descriptor.Descriptor
+
+    MESSAGES_FIELD_NUMBER: builtins.int
+    @property
+    def messages(self) -> google.protobuf.internal.containers.RepeatedCompositeFieldContainer[global___Message]: ...
+    def __init__(
+        self,
+        *,
+        messages: collections.abc.Iterable[global___Message] | None = ...,
+    ) -> None: ...
+    def ClearField(self, field_name: typing.Literal["messages", b"messages"]) -> None: ...
+
+global___MessageBatch = MessageBatch
@@ -130,3 +130,67 @@ def SaveState(request,
             agent__worker__pb2.SaveStateResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+
+class AgentWorkerRpcStub(object):
+    """Served by workers that accept requests directly from other workers, bypassing the host.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.SendRequest = channel.unary_unary(
+                '/agents.AgentWorkerRpc/SendRequest',
+                request_serializer=agent__worker__pb2.RpcRequest.SerializeToString,
+                response_deserializer=agent__worker__pb2.RpcResponse.FromString,
+                )
+
+
+class AgentWorkerRpcServicer(object):
+    """Served by workers that accept requests directly from other workers, bypassing the host.
+    """
+
+    def SendRequest(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_AgentWorkerRpcServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'SendRequest': grpc.unary_unary_rpc_method_handler(
+                    servicer.SendRequest,
+                    request_deserializer=agent__worker__pb2.RpcRequest.FromString,
+                    response_serializer=agent__worker__pb2.RpcResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'agents.AgentWorkerRpc', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+ # This class is part of an EXPERIMENTAL API.
+class AgentWorkerRpc(object):
+    """Served by workers that accept requests directly from other workers, bypassing the host.
+    """
+
+    @staticmethod
+    def SendRequest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/agents.AgentWorkerRpc/SendRequest',
+            agent__worker__pb2.RpcRequest.SerializeToString,
+            agent__worker__pb2.RpcResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -73,3 +73,32 @@ class AgentRpcServicer(metaclass=abc.ABCMeta):
     ) -> typing.Union[agent_worker_pb2.SaveStateResponse, collections.abc.Awaitable[agent_worker_pb2.SaveStateResponse]]: ...
 
 def add_AgentRpcServicer_to_server(servicer: AgentRpcServicer, server: typing.Union[grpc.Server, grpc.aio.Server]) -> None: ...
+
+class AgentWorkerRpcStub:
+    """Served by workers that accept requests directly from other workers, bypassing the host."""
+
+    def __init__(self, channel: typing.Union[grpc.Channel, grpc.aio.Channel]) -> None: ...
+    SendRequest: grpc.UnaryUnaryMultiCallable[
+        agent_worker_pb2.RpcRequest,
+        agent_worker_pb2.RpcResponse,
+    ]
+
+class AgentWorkerRpcAsyncStub:
+    """Served by workers that accept requests directly from other workers, bypassing the host."""
+
+    SendRequest: grpc.aio.UnaryUnaryMultiCallable[
+        agent_worker_pb2.RpcRequest,
+        agent_worker_pb2.RpcResponse,
+    ]
+
+class AgentWorkerRpcServicer(metaclass=abc.ABCMeta):
+    """Served by workers that accept requests directly from other workers, bypassing the host."""
+
+    @abc.abstractmethod
+    def SendRequest(
+        self,
+        request: agent_worker_pb2.RpcRequest,
+        context: _ServicerContext,
+    ) -> typing.Union[agent_worker_pb2.RpcResponse, collections.abc.Awaitable[agent_worker_pb2.RpcResponse]]: ...
+
+def add_AgentWorkerRpcServicer_to_server(servicer: AgentWorkerRpcServicer, server: typing.Union[grpc.Server, grpc.aio.Server]) -> None: ...
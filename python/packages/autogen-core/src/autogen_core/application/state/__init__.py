@@ -0,0 +1,15 @@
+"""
+The :mod:`autogen_core.application.state` module provides stores for the saved state of agents.
+"""
+
+from ._file import FileStateStore
+from ._memory import InMemoryStateStore
+from ._sqlite import SQLiteStateStore
+from ._state_store import StateStore
+
+__all__ = [
+    "StateStore",
+    "InMemoryStateStore",
+    "SQLiteStateStore",
+    "FileStateStore",
+]
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Mapping, Tuple
+from urllib.parse import quote
+
+from ...base import AgentId
+from ._state_store import StateStore
+
+
+class FileStateStore(StateStore):
+    """A state store that keeps the state of each agent in its own file, under a directory per agent type.
+
+    Files are written to a temporary file first and then renamed, so a crash during a write never leaves a
+    partially written state behind. File operations run in a worker thread so that they do not block the event loop.
+
+    Args:
+        directory (str | os.PathLike[str]): The directory the state files are stored in. It is created if it does not exist.
+        format (Literal["json", "msgpack"], optional): The format of the state files. The ``"msgpack"`` format is more
+            compact and faster to read and write, and requires the ``msgpack`` package. Defaults to ``"json"``.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str], format: Literal["json", "msgpack"] = "json") -> None:
+        if format not in ("json", "msgpack"):
+            raise ValueError(f"Unsupported state file format: {format}")
+        if format == "msgpack":
+            try:
+                import msgpack  # type: ignore # noqa: F401
+            except ImportError as e:
+                raise RuntimeError(
+                    "Missing dependencies for FileStateStore with the msgpack format. Please ensure the autogen-core package was installed with the 'msgpack' extra."
+                ) from e
+        self._directory = Path(directory)
+        self._format = format
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, agent_id: AgentId) -> Path:
+        # Agent types and keys are quoted so that any string maps to a single file name.
+        return self._directory / quote(agent_id.type, safe="") / f"{quote(agent_id.key, safe='')}.{self._format}"
+
+    def _dumps(self, state: Mapping[str, Any]) -> bytes:
+        if self._format == "msgpack":
+            import msgpack  # type: ignore
+
+            data: bytes = msgpack.packb(state)
+            return data
+        return json.dumps(state).encode("utf-8")
+
+    def _loads(self, data: bytes) -> Dict[str, Any]:
+        if self._format == "msgpack":
+            import msgpack  # type: ignore
+
+            state: Dict[str, Any] = msgpack.unpackb(data)
+            return state
+        result: Dict[str, Any] = json.loads(data)
+        return result
+
+    async def get(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        return await asyncio.to_thread(self._read, self._path(agent_id))
+
+    async def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> None:
+        await self.put_many({agent_id: state})
+
+    async def put_many(self, states: Mapping[AgentId, Mapping[str, Any]]) -> None:
+        # Serialize on the event loop, as the states may still be referenced by the agents.
+        files = [(self._path(agent_id), self._dumps(state)) for agent_id, state in states.items()]
+        await asyncio.to_thread(self._write_all, files)
+
+    async def delete(self, agent_id: AgentId) -> None:
+        await asyncio.to_thread(self._path(agent_id).unlink, missing_ok=True)
+
+    def _read(self, path: Path) -> Dict[str, Any] | None:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        return self._loads(data)
+
+    def _write_all(self, files: List[Tuple[Path, bytes]]) -> None:
+        for path, data in files:
+            path.parent.mkdir(exist_ok=True)
+            # Each write has its own temporary file, so that concurrent writes of the same agent do not collide.
+            temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
@@ -0,0 +1,34 @@
+import copy
+from typing import Any, Dict, Mapping
+
+from ...base import AgentId
+from ._state_store import StateStore
+
+
+class InMemoryStateStore(StateStore):
+    """A state store that keeps agent state in a dictionary in the memory of the process.
+
+    States are copied when they are stored, so later changes to the agent do not affect the stored state.
+    """
+
+    def __init__(self) -> None:
+        self._states: Dict[AgentId, Mapping[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, agent_id: AgentId) -> bool:
+        return agent_id in self._states
+
+    async def get(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        return self._states.get(agent_id)
+
+    async def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> None:
+        self._states[agent_id] = copy.deepcopy(dict(state))
+
+    async def put_many(self, states: Mapping[AgentId, Mapping[str, Any]]) -> None:
+        for agent_id, state in states.items():
+            self._states[agent_id] = copy.deepcopy(dict(state))
+
+    async def delete(self, agent_id: AgentId) -> None:
+        self._states.pop(agent_id, None)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Mapping, Tuple
+
+from ...base import AgentId
+from ._state_store import StateStore
+
+
+class SQLiteStateStore(StateStore):
+    """A state store that keeps agent state in a SQLite database, one row per agent.
+
+    States are stored as JSON. Database operations run in a worker thread so that they do not block the event loop,
+    and :meth:`put_many` writes all of its states in a single transaction.
+
+    Args:
+        path (str | os.PathLike[str]): The path of the database file. It is created if it does not exist.
+            Use ``":memory:"`` for a database that only lives as long as the store.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # The connection is shared by the worker threads, so access to it is serialized.
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS agent_state ("
+                "agent_type TEXT NOT NULL, agent_key TEXT NOT NULL, state TEXT NOT NULL, "
+                "PRIMARY KEY (agent_type, agent_key))"
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    async def get(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        return await asyncio.to_thread(self._get, agent_id)
+
+    async def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> None:
+        await self.put_many({agent_id: state})
+
+    async def put_many(self, states: Mapping[AgentId, Mapping[str, Any]]) -> None:
+        # Serialize on the event loop, as the states may still be referenced by the agents.
+        rows = [(agent_id.type, agent_id.key, json.dumps(state)) for agent_id, state in states.items()]
+        await asyncio.to_thread(self._put_many, rows)
+
+    async def delete(self, agent_id: AgentId) -> None:
+        await asyncio.to_thread(self._delete, agent_id)
+
+    def _get(self, agent_id: AgentId) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state FROM agent_state WHERE agent_type = ? AND agent_key = ?", (agent_id.type, agent_id.key)
+            ).fetchone()
+        if row is None:
+            return None
+        state: Dict[str, Any] = json.loads(row[0])
+        return state
+
+    def _put_many(self, rows: List[Tuple[str, str, str]]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO agent_state (agent_type, agent_key, state) VALUES (?, ?, ?)", rows
+            )
+
+    def _delete(self, agent_id: AgentId) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM agent_state WHERE agent_type = ? AND agent_key = ?", (agent_id.type, agent_id.key)
+            )
@@ -0,0 +1,48 @@
+from typing import Any, Mapping, Protocol, runtime_checkable
+
+from ...base import AgentId
+
+
+@runtime_checkable
+class StateStore(Protocol):
+    """A protocol for stores that persist the saved state of individual agents.
+
+    The runtimes write the state of an agent to the store when the agent instance is passivated, and read it back
+    when the agent is next addressed, so that it can be reactivated with :meth:`~autogen_core.base.Agent.load_state`.
+    """
+
+    async def get(self, agent_id: AgentId) -> Mapping[str, Any] | None:
+        """Get the saved state of an agent.
+
+        Args:
+            agent_id (AgentId): The agent id.
+
+        Returns:
+            Mapping[str, Any] | None: The saved state, or None if no state is stored for the agent.
+        """
+        ...
+
+    async def put(self, agent_id: AgentId, state: Mapping[str, Any]) -> None:
+        """Store the saved state of an agent, replacing any state previously stored for it.
+
+        Args:
+            agent_id (AgentId): The agent id.
+            state (Mapping[str, Any]): The saved state. Must be JSON serializable.
+        """
+        ...
+
+    async def put_many(self, states: Mapping[AgentId, Mapping[str, Any]]) -> None:
+        """Store the saved state of several agents at once. Used to write checkpoints in batches.
+
+        Args:
+            states (Mapping[AgentId, Mapping[str, Any]]): The saved state of each agent.
+        """
+        ...
+
+    async def delete(self, agent_id: AgentId) -> None:
+        """Delete the saved state of an agent. Does nothing if no state is stored for the agent.
+
+        Args:
+            agent_id (AgentId): The agent id.
+        """
+        ...
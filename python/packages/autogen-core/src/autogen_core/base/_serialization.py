@@ -1,9 +1,24 @@
-import json
-from dataclasses import asdict, dataclass, fields
-from typing import Any, ClassVar, Dict, List, Protocol, Sequence, TypeVar, cast, get_args, get_origin, runtime_checkable
+import importlib.util
+from dataclasses import dataclass, fields
+from typing import (
+    Any,
+    ClassVar,
+    Collection,
+    Dict,
+    List,
+    Protocol,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+    get_args,
+    get_origin,
+    runtime_checkable,
+)
 
 from google.protobuf.message import Message
-from pydantic import BaseModel
+from pydantic import BaseModel, PydanticUserError, TypeAdapter
+from pydantic_core import from_json, to_json, to_jsonable_python
 
 from autogen_core.base._type_helpers import is_union
 
@@ -38,6 +53,11 @@ def has_nested_dataclass(cls: type[IsDataclass]) -> bool:
     return any(is_dataclass(f.type) for f in cls.__dataclass_fields__.values())
 
 
+def has_nested_dataclass_in_type(tp: Any) -> bool:
+    """Helper function to check if the arguments of a generic type, such as List[Item], are dataclasses."""
+    return any(is_dataclass(arg) or has_nested_dataclass_in_type(arg) for arg in get_args(tp))
+
+
 def contains_a_union(cls: type[IsDataclass]) -> bool:
     return any(is_union(f.type) for f in cls.__dataclass_fields__.values())
 
@@ -93,9 +113,45 @@ def has_nested_base_model_in_type(tp: Any) -> bool:
 JSON_DATA_CONTENT_TYPE = "application/json"
 # TODO: what's the correct content type? There seems to be some disagreement over what it should be
 PROTOBUF_DATA_CONTENT_TYPE = "application/x-protobuf"
+MSGPACK_DATA_CONTENT_TYPE = "application/msgpack"
+
+# Content types from the fastest to the slowest to serialize and deserialize, as measured by
+# samples/benchmarks/serialization.py.
+_CONTENT_TYPE_PREFERENCE = [PROTOBUF_DATA_CONTENT_TYPE, MSGPACK_DATA_CONTENT_TYPE, JSON_DATA_CONTENT_TYPE]
+
+
+def is_msgpack_available() -> bool:
+    """Whether the optional ``msgpack`` package that the msgpack serializers require is installed."""
+    return importlib.util.find_spec("msgpack") is not None
+
+
+def _import_msgpack() -> Any:
+    try:
+        import msgpack  # type: ignore
+    except ImportError as e:
+        raise ImportError(
+            "Missing dependencies for msgpack serialization. Please ensure the autogen-core package was installed with the 'msgpack' extra."
+        ) from e
+    return msgpack
+
+
+def _nested_dataclass_type_adapter(cls: type[DataclassT]) -> TypeAdapter[DataclassT] | None:
+    # Only dataclasses with dataclasses in their fields pay for validation, which the others do not need.
+    if any(has_nested_dataclass_in_type(f.type) for f in fields(cls)):
+        try:
+            return TypeAdapter(cls)
+        except PydanticUserError as e:
+            raise ValueError(
+                "Dataclass has field types that Pydantic cannot validate, which are not supported with nested dataclasses. To use these types, use a Pydantic model"
+            ) from e
+    return None
 
 
 class DataclassJsonMessageSerializer(MessageSerializer[DataclassT]):
+    """Serializes a dataclass as a JSON object of its fields, with the JSON encoder and decoder of ``pydantic-core``.
+    The field names are collected once, when the serializer is created. Dataclasses in the items of a field, such as
+    a ``List[Item]``, are rebuilt by validating the payload against the dataclass with Pydantic."""
+
     def __init__(self, cls: type[DataclassT]) -> None:
         if contains_a_union(cls):
             raise ValueError("Dataclass has a union type, which is not supported. To use a union, use a Pydantic model")
@@ -106,6 +162,9 @@ def __init__(self, cls: type[DataclassT]) -> None:
             )
 
         self.cls = cls
+        self._type_name = _type_name(cls)
+        self._field_names = [f.name for f in fields(cls)]
+        self._type_adapter = _nested_dataclass_type_adapter(cls)
 
     @property
     def data_content_type(self) -> str:
@@ -113,14 +172,62 @@ def data_content_type(self) -> str:
 
     @property
     def type_name(self) -> str:
-        return _type_name(self.cls)
+        return self._type_name
 
     def deserialize(self, payload: bytes) -> DataclassT:
-        message_str = payload.decode("utf-8")
-        return self.cls(**json.loads(message_str))
+        if self._type_adapter is not None:
+            return self._type_adapter.validate_json(payload)
+        return self.cls(**from_json(payload))
 
     def serialize(self, message: DataclassT) -> bytes:
-        return json.dumps(asdict(message)).encode("utf-8")
+        # The fields are not dataclasses themselves, so there is no need for the deep copy that asdict makes.
+        # NaN and infinity are written as the JavaScript constants, as json.dumps does, rather than as null.
+        return to_json({name: getattr(message, name) for name in self._field_names}, inf_nan_mode="constants")
+
+
+class DataclassMsgpackMessageSerializer(MessageSerializer[DataclassT]):
+    """Serializes a dataclass as a msgpack map of its fields. The same restrictions on field types apply as for
+    :class:`DataclassJsonMessageSerializer`, and field values that msgpack has no type for, such as a ``datetime``,
+    are converted as they are for JSON.
+
+    Not every peer has the ``msgpack`` package, so this serializer is not among the known serializers for dataclasses
+    and has to be added explicitly."""
+
+    def __init__(self, cls: type[DataclassT]) -> None:
+        if contains_a_union(cls):
+            raise ValueError("Dataclass has a union type, which is not supported. To use a union, use a Pydantic model")
+
+        if has_nested_dataclass(cls) or has_nested_base_model(cls):
+            raise ValueError(
+                "Dataclass has nested dataclasses or base models, which are not supported. To use nested types, use a Pydantic model"
+            )
+
+        self.cls = cls
+        self._type_name = _type_name(cls)
+        self._msgpack = _import_msgpack()
+        self._field_names = [f.name for f in fields(cls)]
+        self._type_adapter = _nested_dataclass_type_adapter(cls)
+
+    @property
+    def data_content_type(self) -> str:
+        return MSGPACK_DATA_CONTENT_TYPE
+
+    @property
+    def type_name(self) -> str:
+        return self._type_name
+
+    def deserialize(self, payload: bytes) -> DataclassT:
+        if self._type_adapter is not None:
+            return self._type_adapter.validate_python(self._msgpack.unpackb(payload))
+        return self.cls(**self._msgpack.unpackb(payload))
+
+    def serialize(self, message: DataclassT) -> bytes:
+        return cast(
+            bytes,
+            self._msgpack.packb(
+                {name: getattr(message, name) for name in self._field_names}, default=to_jsonable_python
+            ),
+        )
 
 
 PydanticT = TypeVar("PydanticT", bound=BaseModel)
@@ -129,6 +236,7 @@ def serialize(self, message: DataclassT) -> bytes:
 class PydanticJsonMessageSerializer(MessageSerializer[PydanticT]):
     def __init__(self, cls: type[PydanticT]) -> None:
         self.cls = cls
+        self._type_name = _type_name(cls)
 
     @property
     def data_content_type(self) -> str:
@@ -136,39 +244,67 @@ def data_content_type(self) -> str:
 
     @property
     def type_name(self) -> str:
-        return _type_name(self.cls)
+        return self._type_name
 
     def deserialize(self, payload: bytes) -> PydanticT:
-        message_str = payload.decode("utf-8")
-        return self.cls.model_validate_json(message_str)
+        return self.cls.model_validate_json(payload)
 
     def serialize(self, message: PydanticT) -> bytes:
-        return message.model_dump_json().encode("utf-8")
+        # The serializer of the model produces bytes directly, which model_dump_json would decode to a str.
+        return message.__pydantic_serializer__.to_json(message)
+
+
+class PydanticMsgpackMessageSerializer(MessageSerializer[PydanticT]):
+    """Serializes a Pydantic model as a msgpack map of its JSON compatible fields.
+
+    The payloads are smaller than JSON, but not faster to produce than Pydantic's native JSON, so this serializer is
+    not among the known serializers for Pydantic models and has to be added explicitly."""
+
+    def __init__(self, cls: type[PydanticT]) -> None:
+        self.cls = cls
+        self._type_name = _type_name(cls)
+        self._msgpack = _import_msgpack()
+
+    @property
+    def data_content_type(self) -> str:
+        return MSGPACK_DATA_CONTENT_TYPE
+
+    @property
+    def type_name(self) -> str:
+        return self._type_name
+
+    def deserialize(self, payload: bytes) -> PydanticT:
+        return self.cls.model_validate(self._msgpack.unpackb(payload))
+
+    def serialize(self, message: PydanticT) -> bytes:
+        return cast(bytes, self._msgpack.packb(message.model_dump(mode="json")))
 
 
 ProtobufT = TypeVar("ProtobufT", bound=Message)
 
 
 class ProtobufMessageSerializer(MessageSerializer[ProtobufT]):
-    def __init__(self, cls: type[ProtobufT]) -> None:
+    """Serializes a protobuf message in its binary wire format.
+
+    Workers that predate content type negotiation label protobuf payloads as JSON, so the known serializers for a
+    protobuf message include one with the JSON label as well. It is selected for receivers that do not accept the
+    protobuf content type, and reads the payloads of those workers."""
+
+    def __init__(self, cls: type[ProtobufT], data_content_type: str = PROTOBUF_DATA_CONTENT_TYPE) -> None:
         self.cls = cls
+        self._type_name = _type_name(cls)
+        self._data_content_type = data_content_type
 
     @property
     def data_content_type(self) -> str:
-        # TODO: This should be PROTOBUF_DATA_CONTENT_TYPE. There are currently
-        #       a couple of hard coded places where the system assumes the
-        #       content is JSON_DATA_CONTENT_TYPE which will need to be fixed
-        #       first.
-        return JSON_DATA_CONTENT_TYPE
+        return self._data_content_type
 
     @property
     def type_name(self) -> str:
-        return _type_name(self.cls)
+        return self._type_name
 
     def deserialize(self, payload: bytes) -> ProtobufT:
-        ret = self.cls()
-        ret.ParseFromString(payload)
-        return ret
+        return self.cls.FromString(payload)
 
     def serialize(self, message: ProtobufT) -> bytes:
         return message.SerializeToString()
@@ -191,7 +327,34 @@ def _type_name(cls: type[Any] | Any) -> str:
 V = TypeVar("V")
 
 
+def _content_type_rank(content_type: str) -> int:
+    # Content types that are not known to be fast come after JSON.
+    if content_type in _CONTENT_TYPE_PREFERENCE:
+        return _CONTENT_TYPE_PREFERENCE.index(content_type)
+    return len(_CONTENT_TYPE_PREFERENCE)
+
+
 def try_get_known_serializers_for_type(cls: type[Any]) -> list[MessageSerializer[Any]]:
+    """Get the serializers for a Pydantic model, dataclass or protobuf message type.
+
+    Pydantic models and dataclasses get a JSON serializer. Protobuf messages get a protobuf serializer, and one that
+    labels the same payload as JSON for older workers. The msgpack serializers are not among them and have to be added
+    explicitly.
+
+    The serializers for a type are created once and shared by every call for that type, so the type is only inspected
+    the first time."""
+    serializers = _known_serializers.get(cls)
+    if serializers is None:
+        serializers = _create_known_serializers_for_type(cls)
+        _known_serializers[cls] = serializers
+    return list(serializers)
+
+
+# type -> its known serializers, which are immutable and shared
+_known_serializers: Dict[type[Any], Tuple[MessageSerializer[Any], ...]] = {}
+
+
+def _create_known_serializers_for_type(cls: type[Any]) -> Tuple[MessageSerializer[Any], ...]:
     serializers: List[MessageSerializer[Any]] = []
     if issubclass(cls, BaseModel):
         serializers.append(PydanticJsonMessageSerializer(cls))
@@ -199,14 +362,19 @@ def try_get_known_serializers_for_type(cls: type[Any]) -> list[MessageSerializer
         serializers.append(DataclassJsonMessageSerializer(cls))
     elif issubclass(cls, Message):
         serializers.append(ProtobufMessageSerializer(cls))
+        serializers.append(ProtobufMessageSerializer(cls, data_content_type=JSON_DATA_CONTENT_TYPE))
 
-    return serializers
+    return tuple(serializers)
 
 
 class SerializationRegistry:
     def __init__(self) -> None:
         # type_name, data_content_type -> serializer
         self._serializers: dict[tuple[str, str], MessageSerializer[Any]] = {}
+        # type_name -> the content types of its serializers, in the order they were added
+        self._content_types: dict[str, List[str]] = {}
+        # type_name, accepted content types -> selected content type
+        self._selected_content_types: dict[tuple[str, frozenset[str] | None], str] = {}
 
     def add_serializer(self, serializer: MessageSerializer[Any] | Sequence[MessageSerializer[Any]]) -> None:
         if isinstance(serializer, Sequence):
@@ -215,6 +383,10 @@ def add_serializer(self, serializer: MessageSerializer[Any] | Sequence[MessageSe
             return
 
         self._serializers[(serializer.type_name, serializer.data_content_type)] = serializer
+        content_types = self._content_types.setdefault(serializer.type_name, [])
+        if serializer.data_content_type not in content_types:
+            content_types.append(serializer.data_content_type)
+            self._selected_content_types.clear()
 
     def deserialize(self, payload: bytes, *, type_name: str, data_content_type: str) -> Any:
         serializer = self._serializers.get((type_name, data_content_type))
@@ -230,6 +402,40 @@ def serialize(self, message: Any, *, type_name: str, data_content_type: str) ->
 
         return serializer.serialize(message)
 
+    def select_content_type(self, type_name: str, accepted: Collection[str] | None = None) -> str:
+        """Select the content type to serialize a type in.
+
+        This is the fastest content type among the accepted ones that a serializer for the type is registered for.
+        When there is none, it is JSON if a JSON serializer is registered, and otherwise the content type of the first
+        serializer registered for the type.
+
+        Args:
+            type_name (str): The name of the type.
+            accepted (Collection[str], optional): The content types that the receivers accept. Defaults to None, which
+                means any content type.
+
+        Raises:
+            ValueError: If no serializer is registered for the type.
+
+        The selection is cached until another content type is registered. Passing the accepted content types as a
+        ``frozenset`` avoids copying them to look up the cache.
+        """
+        key = (type_name, accepted if accepted is None or isinstance(accepted, frozenset) else frozenset(accepted))
+        selected = self._selected_content_types.get(key)
+        if selected is None:
+            selected = self._select_content_type(type_name, accepted)
+            self._selected_content_types[key] = selected
+        return selected
+
+    def _select_content_type(self, type_name: str, accepted: Collection[str] | None) -> str:
+        content_types = self._content_types.get(type_name)
+        if content_types is None:
+            raise ValueError(f"Unknown type {type_name}")
+        candidates = [content_type for content_type in content_types if accepted is None or content_type in accepted]
+        if len(candidates) > 0:
+            return min(candidates, key=_content_type_rank)
+        return JSON_DATA_CONTENT_TYPE if JSON_DATA_CONTENT_TYPE in content_types else content_types[0]
+
     def is_registered(self, type_name: str, data_content_type: str) -> bool:
         return (type_name, data_content_type) in self._serializers
 
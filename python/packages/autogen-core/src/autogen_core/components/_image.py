@@ -13,44 +13,165 @@
 from pydantic_core import core_schema
 from typing_extensions import Literal
 
+ImageFormat = Literal["PNG", "JPEG", "WEBP"]
+
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# The largest size that OpenAI models see an image at, as in calculate_vision_tokens: larger images are scaled to fit
+# in a square of the long edge, then so that their short side is at most the short edge.
+_MAX_LONG_EDGE = 2048
+_MAX_SHORT_EDGE = 768
+
 
 class Image:
-    def __init__(self, image: PILImage.Image):
-        self.image: PILImage.Image = image.convert("RGB")
+    """An image in the messages of model clients.
+
+    The image is encoded the first time it is needed, and the encoded bytes are cached, so that an image sent with
+    every call of a conversation is only compressed once. An image created from encoded bytes, with
+    :meth:`from_base64`, :meth:`from_file`, :meth:`from_uri` or :meth:`from_url`, keeps the original bytes when their
+    format is PNG, JPEG or WebP and no other format or downscaling is requested. The cache is reset when
+    :attr:`image` is set, but not when the PIL image is modified in place.
+
+    Args:
+        image (PIL.Image.Image): The image, which is converted to RGB.
+        format (str, optional): The format of the encoded image: "PNG", "JPEG" or "WEBP". Defaults to "PNG".
+        quality (int, optional): The quality of JPEG and WebP encoding, from 1 to 100. Defaults to None, which means
+            the default of Pillow.
+        downscale (bool, optional): Whether to scale the image down to the largest size that OpenAI models see it at,
+            which makes the encoded image smaller without changing its tokens. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        image: PILImage.Image,
+        *,
+        format: ImageFormat = "PNG",
+        quality: int | None = None,
+        downscale: bool = False,
+    ):
+        if format not in _MIME_TYPES:
+            raise ValueError(f"Unsupported image format {format}, expected one of {', '.join(_MIME_TYPES)}.")
+        self._format: ImageFormat = format
+        self._quality = quality
+        self._downscale = downscale
+        self.image = image
+
+    @property
+    def image(self) -> PILImage.Image:
+        return self._image
+
+    @image.setter
+    def image(self, image: PILImage.Image) -> None:
+        image = image.convert("RGB")
+        if self._downscale:
+            image = _downscale(image)
+        self._image = image
+        self._data: bytes | None = None
+        self._mime_type = _MIME_TYPES[self._format]
+        self._base64: str | None = None
+        self._data_uri: str | None = None
 
     @classmethod
-    def from_pil(cls, pil_image: PILImage.Image) -> Image:
-        return cls(pil_image)
+    def from_pil(
+        cls,
+        pil_image: PILImage.Image,
+        *,
+        format: ImageFormat = "PNG",
+        quality: int | None = None,
+        downscale: bool = False,
+    ) -> Image:
+        return cls(pil_image, format=format, quality=quality, downscale=downscale)
 
     @classmethod
-    def from_uri(cls, uri: str) -> Image:
-        if not re.match(r"data:image/(?:png|jpeg);base64,", uri):
+    def from_uri(
+        cls,
+        uri: str,
+        *,
+        format: ImageFormat | None = None,
+        quality: int | None = None,
+        downscale: bool = False,
+    ) -> Image:
+        if not re.match(r"data:image/(?:png|jpeg|webp);base64,", uri):
             raise ValueError("Invalid URI format. It should be a base64 encoded image URI.")
 
         # A URI. Remove the prefix and decode the base64 string.
-        base64_data = re.sub(r"data:image/(?:png|jpeg);base64,", "", uri)
-        return cls.from_base64(base64_data)
+        base64_data = re.sub(r"data:image/(?:png|jpeg|webp);base64,", "", uri)
+        return cls.from_base64(base64_data, format=format, quality=quality, downscale=downscale)
 
     @classmethod
-    async def from_url(cls, url: str) -> Image:
+    async def from_url(
+        cls,
+        url: str,
+        *,
+        format: ImageFormat | None = None,
+        quality: int | None = None,
+        downscale: bool = False,
+    ) -> Image:
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as response:
                 content = await response.read()
-                return cls(PILImage.open(content))
+                return cls._from_bytes(content, format, quality, downscale)
 
     @classmethod
-    def from_base64(cls, base64_str: str) -> Image:
-        return cls(PILImage.open(BytesIO(base64.b64decode(base64_str))))
+    def from_base64(
+        cls,
+        base64_str: str,
+        *,
+        format: ImageFormat | None = None,
+        quality: int | None = None,
+        downscale: bool = False,
+    ) -> Image:
+        """Create an image from base64 encoded bytes.
+
+        Args:
+            base64_str (str): The base64 encoded bytes of the image.
+            format (str, optional): The format to encode the image in. Defaults to None, which means the original
+                bytes are kept if they are PNG, JPEG or WebP, and the image is encoded as PNG otherwise.
+            quality (int, optional): The quality of JPEG and WebP encoding, from 1 to 100. Defaults to None.
+            downscale (bool, optional): Whether to scale the image down to the largest size that OpenAI models see it
+                at. Defaults to False.
+        """
+        return cls._from_bytes(base64.b64decode(base64_str), format, quality, downscale)
 
     def to_base64(self) -> str:
-        buffered = BytesIO()
-        self.image.save(buffered, format="PNG")
-        content = buffered.getvalue()
-        return base64.b64encode(content).decode("utf-8")
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.to_bytes()).decode("utf-8")
+        return self._base64
+
+    def to_bytes(self) -> bytes:
+        """The encoded bytes of the image, which are encoded once and cached."""
+        if self._data is None:
+            buffered = BytesIO()
+            if self._quality is not None:
+                self.image.save(buffered, format=self._format, quality=self._quality)
+            else:
+                self.image.save(buffered, format=self._format)
+            self._data = buffered.getvalue()
+        return self._data
+
+    @classmethod
+    def from_file(
+        cls,
+        file_path: Path,
+        *,
+        format: ImageFormat | None = None,
+        quality: int | None = None,
+        downscale: bool = False,
+    ) -> Image:
+        return cls._from_bytes(Path(file_path).read_bytes(), format, quality, downscale)
 
     @classmethod
-    def from_file(cls, file_path: Path) -> Image:
-        return cls(PILImage.open(file_path))
+    def _from_bytes(cls, data: bytes, format: ImageFormat | None, quality: int | None, downscale: bool) -> Image:
+        pil_image = PILImage.open(BytesIO(data))
+        original_format = pil_image.format
+        keep_original = format is None and quality is None and original_format in _MIME_TYPES
+        if format is None:
+            format = cast(ImageFormat, original_format) if original_format in _MIME_TYPES else "PNG"
+        image = cls(pil_image, format=format, quality=quality, downscale=downscale)
+        if keep_original and image.image.size == pil_image.size:
+            # The original bytes are sent as they are, without encoding the image again.
+            image._data = data
+        return image
 
     def _repr_html_(self) -> str:
         # Show the image in Jupyter notebook
@@ -58,7 +179,9 @@ def _repr_html_(self) -> str:
 
     @property
     def data_uri(self) -> str:
-        return _convert_base64_to_data_uri(self.to_base64())
+        if self._data_uri is None:
+            self._data_uri = f"data:{self._mime_type};base64,{self.to_base64()}"
+        return self._data_uri
 
     def to_openai_format(self, detail: Literal["auto", "low", "high"] = "auto") -> ChatCompletionContentPartImageParam:
         return {"type": "image_url", "image_url": {"url": self.data_uri, "detail": detail}}
@@ -88,21 +211,12 @@ def serialize(value: Image) -> dict[str, Any]:
         )
 
 
-def _convert_base64_to_data_uri(base64_image: str) -> str:
-    def _get_mime_type_from_data_uri(base64_image: str) -> str:
-        # Decode the base64 string
-        image_data = base64.b64decode(base64_image)
-        # Check the first few bytes for known signatures
-        if image_data.startswith(b"\xff\xd8\xff"):
-            return "image/jpeg"
-        elif image_data.startswith(b"\x89PNG\r\n\x1a\n"):
-            return "image/png"
-        elif image_data.startswith(b"GIF87a") or image_data.startswith(b"GIF89a"):
-            return "image/gif"
-        elif image_data.startswith(b"RIFF") and image_data[8:12] == b"WEBP":
-            return "image/webp"
-        return "image/jpeg"  # use jpeg for unknown formats, best guess.
-
-    mime_type = _get_mime_type_from_data_uri(base64_image)
-    data_uri = f"data:{mime_type};base64,{base64_image}"
-    return data_uri
+def _downscale(image: PILImage.Image) -> PILImage.Image:
+    width, height = image.size
+    scale = min(1.0, _MAX_LONG_EDGE / max(width, height))
+    short_edge = min(width, height) * scale
+    if short_edge > _MAX_SHORT_EDGE:
+        scale *= _MAX_SHORT_EDGE / short_edge
+    if scale >= 1:
+        return image
+    return image.resize((max(1, round(width * scale)), max(1, round(height * scale))), PILImage.Resampling.LANCZOS)
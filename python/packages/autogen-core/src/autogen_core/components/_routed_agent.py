@@ -497,7 +497,7 @@ def _handles_types(cls) -> List[Tuple[Type[Any], List[MessageSerializer[Any]]]]:
                 if len(serializers) == 0:
                     raise ValueError(f"No serializers found for type {t}.")
 
-                types.append((t, try_get_known_serializers_for_type(t)))
+                types.append((t, serializers))
         return types
 
 
@@ -3,6 +3,7 @@
 from typing import TYPE_CHECKING, Any
 
 from ._model_client import ChatCompletionClient, ModelCapabilities
+from ._rate_limiter import RateLimiter, RateLimiterMetrics
 from ._types import (
     AssistantMessage,
     ChatCompletionTokenLogprob,
@@ -16,6 +17,7 @@
     TopLogprob,
     UserMessage,
 )
+from ._usage_meter import UsageMeter, UsageStats
 
 if TYPE_CHECKING:
     from ._openai_client import AzureOpenAIChatCompletionClient, OpenAIChatCompletionClient
@@ -37,6 +39,10 @@
     "CreateResult",
     "TopLogprob",
     "ChatCompletionTokenLogprob",
+    "RateLimiter",
+    "RateLimiterMetrics",
+    "UsageMeter",
+    "UsageStats",
 ]
 
 
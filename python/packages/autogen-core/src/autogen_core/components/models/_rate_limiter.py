@@ -0,0 +1,210 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Tuple
+
+
+@dataclass
+class RateLimiterMetrics:
+    """A snapshot of the metrics of a :class:`RateLimiter`."""
+
+    num_requests: int
+    """The number of requests that were let through."""
+
+    num_delayed: int
+    """The number of requests that had to wait in the queue."""
+
+    queue_wait_time: float
+    """The total time, in seconds, that requests waited in the queue."""
+
+    max_queue_wait_time: float
+    """The longest time, in seconds, that a request waited in the queue."""
+
+    queued: int
+    """The number of requests waiting in the queue."""
+
+    active: int
+    """The number of requests that were let through and have not finished."""
+
+
+class RateLimiter:
+    """A client-side limiter of the requests sent to a model API, with token buckets for the requests and the tokens
+    allowed per minute and an optional limit on concurrent requests.
+
+    Each bucket holds up to its budget per minute and refills continuously. A request is charged one request and an
+    estimate of its tokens when it is let through, and the estimate is reconciled with the actual usage when it
+    finishes, so that an underestimate delays later requests and an overestimate is refunded. Requests that cannot
+    be let through wait in a first-in, first-out queue, so that a large request is not starved by smaller ones.
+
+    A limiter can be shared by several model clients that use the same deployment, and is used from a single event
+    loop.
+
+    Args:
+        requests_per_minute (float, optional): The requests allowed per minute. Defaults to None, which means
+            unlimited.
+        tokens_per_minute (float, optional): The prompt and completion tokens allowed per minute. Defaults to None,
+            which means unlimited.
+        max_concurrent_requests (int, optional): The maximum number of requests that have been let through and have
+            not finished. Defaults to None, which means unlimited.
+
+    Examples:
+
+        .. code-block:: python
+
+            limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=30000)
+            client = OpenAIChatCompletionClient(model="gpt-4o", rate_limiter=limiter)
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrent_requests: int | None = None,
+    ) -> None:
+        if requests_per_minute is not None and requests_per_minute <= 0:
+            raise ValueError("Requests per minute must be positive.")
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError("Tokens per minute must be positive.")
+        if max_concurrent_requests is not None and max_concurrent_requests < 1:
+            raise ValueError("The maximum number of concurrent requests must be at least 1.")
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._max_concurrent_requests = max_concurrent_requests
+        # The buckets start full.
+        self._request_budget = requests_per_minute or 0.0
+        self._token_budget = tokens_per_minute or 0.0
+        self._updated = time.monotonic()
+        self._active = 0
+        # The waiting requests with the tokens they are charged, in arrival order.
+        self._waiters: Deque[Tuple[int, asyncio.Future[None]]] = deque()
+        self._timer: asyncio.TimerHandle | None = None
+        self._num_requests = 0
+        self._num_delayed = 0
+        self._queue_wait_time = 0.0
+        self._max_queue_wait_time = 0.0
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether requests are charged for their tokens, which callers need to estimate."""
+        return self._tokens_per_minute is not None
+
+    @property
+    def metrics(self) -> RateLimiterMetrics:
+        return RateLimiterMetrics(
+            num_requests=self._num_requests,
+            num_delayed=self._num_delayed,
+            queue_wait_time=self._queue_wait_time,
+            max_queue_wait_time=self._max_queue_wait_time,
+            queued=sum(1 for _, future in self._waiters if not future.done()),
+            active=self._active,
+        )
+
+    async def acquire(self, tokens: int = 0) -> int:
+        """Wait until a request can be sent, and charge it.
+
+        Args:
+            tokens (int, optional): The estimated prompt and completion tokens of the request. Defaults to 0.
+
+        Returns:
+            int: The tokens charged, which are passed to :meth:`release`. A request larger than the tokens per minute
+            is charged the tokens per minute, so that it can be sent at all.
+        """
+        if self._tokens_per_minute is None:
+            tokens = 0
+        else:
+            tokens = min(max(tokens, 0), int(self._tokens_per_minute))
+        self._refill()
+        if len(self._waiters) == 0 and self._delay(tokens) == 0:
+            self._take(tokens)
+            self._num_requests += 1
+            return tokens
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append((tokens, future))
+        start = time.perf_counter()
+        if self._timer is None:
+            self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The request was let through just as it was cancelled.
+                self.release(tokens, 0)
+            else:
+                # The requests behind it may be able to go.
+                self._wake()
+            raise
+        finally:
+            wait_time = time.perf_counter() - start
+            self._queue_wait_time += wait_time
+            self._max_queue_wait_time = max(self._max_queue_wait_time, wait_time)
+        self._num_requests += 1
+        self._num_delayed += 1
+        return tokens
+
+    def release(self, charged_tokens: int, used_tokens: int | None = None) -> None:
+        """Mark a request as finished, and reconcile the tokens it was charged with those it used.
+
+        Args:
+            charged_tokens (int): The tokens returned by :meth:`acquire`.
+            used_tokens (int, optional): The prompt and completion tokens that the request used. Defaults to None,
+                which means the usage is not known and the charge stands.
+        """
+        self._active -= 1
+        if self._tokens_per_minute is not None and used_tokens is not None:
+            self._refill()
+            # The budget may go negative when the estimate was too low, which delays the next requests.
+            self._token_budget = min(self._tokens_per_minute, self._token_budget + charged_tokens - used_tokens)
+        self._wake()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self._requests_per_minute is not None:
+            self._request_budget = min(
+                self._requests_per_minute, self._request_budget + elapsed * self._requests_per_minute / 60
+            )
+        if self._tokens_per_minute is not None:
+            self._token_budget = min(
+                self._tokens_per_minute, self._token_budget + elapsed * self._tokens_per_minute / 60
+            )
+
+    def _delay(self, tokens: int) -> float | None:
+        """The seconds until a request can be let through, or None if it waits for another request to finish."""
+        if self._max_concurrent_requests is not None and self._active >= self._max_concurrent_requests:
+            return None
+        delay = 0.0
+        if self._requests_per_minute is not None and self._request_budget < 1:
+            delay = (1 - self._request_budget) * 60 / self._requests_per_minute
+        if self._tokens_per_minute is not None and self._token_budget < tokens:
+            delay = max(delay, (tokens - self._token_budget) * 60 / self._tokens_per_minute)
+        return delay
+
+    def _take(self, tokens: int) -> None:
+        self._active += 1
+        if self._requests_per_minute is not None:
+            self._request_budget -= 1
+        if self._tokens_per_minute is not None:
+            self._token_budget -= tokens
+
+    def _wake(self) -> None:
+        """Let through the requests at the head of the queue that can go, and schedule a wake up for the next one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while len(self._waiters) > 0:
+            tokens, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            delay = self._delay(tokens)
+            if delay is None:
+                return
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+                return
+            self._waiters.popleft()
+            self._take(tokens)
+            future.set_result(None)
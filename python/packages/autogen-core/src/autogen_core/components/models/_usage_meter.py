@@ -0,0 +1,210 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Deque, Dict, Generator, List, Optional
+
+from opentelemetry.metrics import MeterProvider, NoOpMeterProvider
+from opentelemetry.util import types
+
+from ...base import MessageHandlerContext
+from ._types import RequestUsage
+
+_RUN_ID: ContextVar[str] = ContextVar("USAGE_METER_RUN_ID")
+
+
+@dataclass
+class UsageStats:
+    """A snapshot of the usage of the model requests of a rollup of a :class:`UsageMeter`."""
+
+    num_requests: int
+    """The number of requests."""
+
+    prompt_tokens: int
+    """The prompt tokens of the requests."""
+
+    completion_tokens: int
+    """The completion tokens of the requests."""
+
+    latency_p50: float
+    """The median latency, in seconds, of the recent requests."""
+
+    latency_p95: float
+    """The 95th percentile latency, in seconds, of the recent requests."""
+
+    time_to_first_token_p50: Optional[float]
+    """The median time, in seconds, to the first token of the recent streams, or None if there were no streams."""
+
+    time_to_first_token_p95: Optional[float]
+    """The 95th percentile time, in seconds, to the first token of the recent streams, or None if there were no
+    streams."""
+
+    tokens_per_second: float
+    """The completion tokens per second of request latency."""
+
+    @property
+    def usage(self) -> RequestUsage:
+        return RequestUsage(prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+
+
+class _Rollup:
+    def __init__(self, max_samples: int) -> None:
+        self.num_requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_latency = 0.0
+        self.latencies: Deque[float] = deque(maxlen=max_samples)
+        self.times_to_first_token: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, usage: RequestUsage, latency: float, time_to_first_token: Optional[float]) -> None:
+        self.num_requests += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.total_latency += latency
+        self.latencies.append(latency)
+        if time_to_first_token is not None:
+            self.times_to_first_token.append(time_to_first_token)
+
+    def stats(self) -> UsageStats:
+        latencies = sorted(self.latencies)
+        times_to_first_token = sorted(self.times_to_first_token)
+        return UsageStats(
+            num_requests=self.num_requests,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            latency_p50=_percentile(latencies, 0.5) or 0.0,
+            latency_p95=_percentile(latencies, 0.95) or 0.0,
+            time_to_first_token_p50=_percentile(times_to_first_token, 0.5),
+            time_to_first_token_p95=_percentile(times_to_first_token, 0.95),
+            tokens_per_second=self.completion_tokens / self.total_latency if self.total_latency > 0 else 0.0,
+        )
+
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    """The nearest-rank percentile of sorted samples."""
+    if len(samples) == 0:
+        return None
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class UsageMeter:
+    """A meter of the usage of model requests, with rollups per model, per agent and per run.
+
+    Model clients record every request that completes with its usage, its latency and, for streams, the time to its
+    first token. The requests recorded within a message handler are attributed to the agent of the handler, and those
+    recorded within :meth:`run` to its run ID. The latency percentiles are computed over the most recent requests of
+    each rollup.
+
+    A meter can be shared by several model clients, and is safe to use from several threads. When a meter provider
+    is given, the requests are also recorded as OpenTelemetry metrics: the ``autogen.model.requests`` and
+    ``autogen.model.tokens`` counters and the ``autogen.model.latency`` and ``autogen.model.time_to_first_token``
+    histograms, with the model, agent and run as attributes.
+
+    Args:
+        meter_provider (MeterProvider, optional): The OpenTelemetry meter provider of the metrics. Defaults to None,
+            which means no metrics are recorded.
+        max_samples (int, optional): The number of recent requests of each rollup that its percentiles are computed
+            over. Defaults to 1000.
+
+    Examples:
+
+        .. code-block:: python
+
+            meter = UsageMeter()
+            client = OpenAIChatCompletionClient(model="gpt-4o", usage_meter=meter)
+            with UsageMeter.run("run-1"):
+                await client.create([UserMessage(content="Hello", source="user")])
+            print(meter.by_run()["run-1"].latency_p95)
+    """
+
+    def __init__(self, meter_provider: MeterProvider | None = None, max_samples: int = 1000) -> None:
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._total = _Rollup(max_samples)
+        self._models: Dict[str, _Rollup] = {}
+        self._agents: Dict[str, _Rollup] = {}
+        self._runs: Dict[str, _Rollup] = {}
+        meter = (meter_provider if meter_provider else NoOpMeterProvider()).get_meter("autogen model client")
+        self._requests_counter = meter.create_counter("autogen.model.requests", description="Model requests.")
+        self._tokens_counter = meter.create_counter("autogen.model.tokens", unit="token", description="Model tokens.")
+        self._latency_histogram = meter.create_histogram(
+            "autogen.model.latency", unit="s", description="The latency of model requests."
+        )
+        self._time_to_first_token_histogram = meter.create_histogram(
+            "autogen.model.time_to_first_token", unit="s", description="The time to the first token of model streams."
+        )
+
+    @staticmethod
+    @contextmanager
+    def run(run_id: str) -> Generator[None, None, None]:
+        """Attribute the requests recorded within the context to a run, in every meter."""
+        token = _RUN_ID.set(run_id)
+        try:
+            yield
+        finally:
+            _RUN_ID.reset(token)
+
+    def record(
+        self, model: str, usage: RequestUsage, latency: float, time_to_first_token: Optional[float] = None
+    ) -> None:
+        """Record a request that completed.
+
+        Args:
+            model (str): The model of the request.
+            usage (RequestUsage): The tokens that the request used.
+            latency (float): The seconds from sending the request to receiving all of the response.
+            time_to_first_token (float, optional): The seconds from sending the request to receiving the first token
+                of the response, for streams. Defaults to None.
+        """
+        try:
+            agent: Optional[str] = str(MessageHandlerContext.agent_id())
+        except RuntimeError:
+            agent = None
+        run_id = _RUN_ID.get(None)
+        with self._lock:
+            rollups = [self._total, self._rollup(self._models, model)]
+            if agent is not None:
+                rollups.append(self._rollup(self._agents, agent))
+            if run_id is not None:
+                rollups.append(self._rollup(self._runs, run_id))
+            for rollup in rollups:
+                rollup.add(usage, latency, time_to_first_token)
+
+        attributes: Dict[str, types.AttributeValue] = {"model": model}
+        if agent is not None:
+            attributes["agent"] = agent
+        if run_id is not None:
+            attributes["run"] = run_id
+        self._requests_counter.add(1, attributes)
+        self._tokens_counter.add(usage.prompt_tokens, {**attributes, "token.type": "prompt"})
+        self._tokens_counter.add(usage.completion_tokens, {**attributes, "token.type": "completion"})
+        self._latency_histogram.record(latency, attributes)
+        if time_to_first_token is not None:
+            self._time_to_first_token_histogram.record(time_to_first_token, attributes)
+
+    def total(self) -> UsageStats:
+        """The usage of all requests."""
+        with self._lock:
+            return self._total.stats()
+
+    def by_model(self) -> Dict[str, UsageStats]:
+        """The usage of the requests of each model."""
+        with self._lock:
+            return {model: rollup.stats() for model, rollup in self._models.items()}
+
+    def by_agent(self) -> Dict[str, UsageStats]:
+        """The usage of the requests of each agent, by agent ID."""
+        with self._lock:
+            return {agent: rollup.stats() for agent, rollup in self._agents.items()}
+
+    def by_run(self) -> Dict[str, UsageStats]:
+        """The usage of the requests of each run, by run ID."""
+        with self._lock:
+            return {run_id: rollup.stats() for run_id, rollup in self._runs.items()}
+
+    def _rollup(self, rollups: Dict[str, _Rollup], key: str) -> _Rollup:
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = _Rollup(self._max_samples)
+        return rollup
@@ -0,0 +1,19 @@
+"""
+The :mod:`autogen_core.components.models.cache` module provides a model client that caches the results of another
+model client, and stores for the cached results.
+"""
+
+from ._cache_store import CacheStore
+from ._chat_completion_cache import ChatCompletionCache, ChatCompletionCacheMetrics
+from ._file import FileCacheStore
+from ._memory import InMemoryCacheStore
+from ._sqlite import SQLiteCacheStore
+
+__all__ = [
+    "ChatCompletionCache",
+    "ChatCompletionCacheMetrics",
+    "CacheStore",
+    "InMemoryCacheStore",
+    "SQLiteCacheStore",
+    "FileCacheStore",
+]
@@ -0,0 +1,30 @@
+from typing import Any, Mapping, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class CacheStore(Protocol):
+    """A protocol for stores that keep the cached results of model calls.
+
+    Entries are looked up by a key that is a hash of everything that determines the result of a call, so a store
+    never needs to inspect the values it keeps.
+    """
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        """Get a cached entry.
+
+        Args:
+            key (str): The key of the entry.
+
+        Returns:
+            Mapping[str, Any] | None: The entry, or None if no entry is stored for the key.
+        """
+        ...
+
+    async def put(self, key: str, value: Mapping[str, Any]) -> None:
+        """Store an entry, replacing any entry previously stored for the key.
+
+        Args:
+            key (str): The key of the entry.
+            value (Mapping[str, Any]): The entry. Must be JSON serializable.
+        """
+        ...
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, List, Mapping, Optional, Sequence, Union
+
+from ....base import CancellationToken
+from ... import FunctionCall, Image
+from ...tools import Tool, ToolSchema
+from .._model_client import ChatCompletionClient, ModelCapabilities
+from .._types import ChatCompletionTokenLogprob, CreateResult, LLMMessage, RequestUsage, TopLogprob
+from ._cache_store import CacheStore
+from ._memory import InMemoryCacheStore
+
+
+@dataclass
+class ChatCompletionCacheMetrics:
+    """A snapshot of the metrics of a :class:`ChatCompletionCache`."""
+
+    hits: int
+    """The number of calls served from the cache."""
+
+    misses: int
+    """The number of calls passed on to the model client."""
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of calls served from the cache, or 0 if there were no calls."""
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class ChatCompletionCache(ChatCompletionClient):
+    """A model client that caches the results of another model client.
+
+    Calls are looked up by a SHA-256 hash of the canonical JSON of the wrapped client, the messages, the tools,
+    ``json_output`` and ``extra_create_args``, so an identical call returns the cached result, with ``cached`` set,
+    instead of calling the model. :meth:`create_stream` caches the chunks of the stream along with its result and replays them on a hit.
+    :meth:`create` and :meth:`create_stream` share the cache: a result cached by a stream is returned by
+    :meth:`create`, and a result cached by :meth:`create` is replayed by :meth:`create_stream` as a single chunk.
+
+    The wrapped client is identified in the key by its type, its capabilities and, for the OpenAI clients, the create
+    args it was constructed with, such as the model and the temperature. Clients that do not expose their create args
+    and share a store with clients of the same type on other models must use different namespaces.
+
+    Args:
+        client (ChatCompletionClient): The model client whose results are cached.
+        store (CacheStore, optional): The store of the cached results. Defaults to None, which means an
+            :class:`InMemoryCacheStore` without a size limit.
+        namespace (str, optional): A prefix of the keys, for example the model name. Defaults to "".
+
+    Examples:
+
+        .. code-block:: python
+
+            client = OpenAIChatCompletionClient(model="gpt-4o")
+            cached_client = ChatCompletionCache(client, SQLiteCacheStore("cache.db"), namespace="gpt-4o")
+            result = await cached_client.create([UserMessage(content="Hello", source="user")])
+            result = await cached_client.create([UserMessage(content="Hello", source="user")])
+            assert result.cached
+            print(cached_client.metrics.hit_rate)  # 0.5
+    """
+
+    def __init__(self, client: ChatCompletionClient, store: CacheStore | None = None, namespace: str = "") -> None:
+        self._client = client
+        self._store = store if store is not None else InMemoryCacheStore()
+        self._namespace = namespace
+        self._client_key = _client_key(client)
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def metrics(self) -> ChatCompletionCacheMetrics:
+        return ChatCompletionCacheMetrics(hits=self._hits, misses=self._misses)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = self._key(messages, tools, json_output, extra_create_args)
+        entry = await self._store.get(key)
+        if entry is not None:
+            self._hits += 1
+            return _decode_result(entry["result"])
+        self._misses += 1
+        result = await self._client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        await self._store.put(key, {"result": dataclasses.asdict(result)})
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = self._key(messages, tools, json_output, extra_create_args)
+        entry = await self._store.get(key)
+        if entry is not None:
+            self._hits += 1
+            result = _decode_result(entry["result"])
+            chunks: List[str] | None = entry.get("chunks")
+            if chunks is None:
+                chunks = [result.content] if isinstance(result.content, str) else []
+            for chunk in chunks:
+                yield chunk
+            yield result
+            return
+        self._misses += 1
+        chunks = []
+        async for item in self._client.create_stream(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(item, CreateResult):
+                # Only streams that ran to completion are cached.
+                await self._store.put(key, {"chunks": chunks, "result": dataclasses.asdict(item)})
+            else:
+                chunks.append(item)
+            yield item
+
+    def _key(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        json_output: Optional[bool],
+        extra_create_args: Mapping[str, Any],
+    ) -> str:
+        call = {
+            "namespace": self._namespace,
+            "client": self._client_key,
+            "messages": messages,
+            "tools": [tool.schema if isinstance(tool, Tool) else tool for tool in tools],
+            "json_output": json_output,
+            "extra_create_args": extra_create_args,
+        }
+        text = json.dumps(call, sort_keys=True, separators=(",", ":"), default=_encode_for_key)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return self._client.capabilities
+
+
+def _client_key(client: ChatCompletionClient) -> str:
+    # The OpenAI clients of autogen-core and autogen-ext keep the create args they were constructed with, including
+    # the model, in _create_args. They are part of the key so that clients on different models or settings that share
+    # a store do not return each other's results.
+    create_args = getattr(client, "_create_args", None)
+    client_info = {
+        "type": type(client).__name__,
+        "capabilities": client.capabilities,
+        "create_args": create_args if isinstance(create_args, Mapping) else None,
+    }
+    return json.dumps(client_info, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _encode_for_key(value: Any) -> Any:
+    if isinstance(value, Image):
+        return {"image": value.to_base64()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        # The type is part of the key, as messages of different types can have the same fields.
+        fields: Dict[str, Any] = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+        return {"type": type(value).__name__, **fields}
+    raise TypeError(f"Cannot compute a cache key for a value of type {type(value).__name__}")
+
+
+def _decode_result(data: Mapping[str, Any]) -> CreateResult:
+    content: str | List[FunctionCall] = data["content"]
+    if not isinstance(content, str):
+        content = [FunctionCall(**call) for call in data["content"]]
+    logprobs: List[ChatCompletionTokenLogprob] | None = None
+    if data.get("logprobs") is not None:
+        logprobs = [
+            ChatCompletionTokenLogprob(
+                token=logprob["token"],
+                logprob=logprob["logprob"],
+                top_logprobs=[TopLogprob(**top) for top in logprob["top_logprobs"]]
+                if logprob.get("top_logprobs") is not None
+                else None,
+                bytes=logprob.get("bytes"),
+            )
+            for logprob in data["logprobs"]
+        ]
+    return CreateResult(
+        finish_reason=data["finish_reason"],
+        content=content,
+        usage=RequestUsage(**data["usage"]),
+        cached=True,
+        logprobs=logprobs,
+    )
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Mapping
+
+from ._cache_store import CacheStore
+
+
+class FileCacheStore(CacheStore):
+    """A cache store that keeps each entry in its own JSON file, under a directory per key prefix so that no
+    directory grows too large.
+
+    Files are written to a temporary file first and then renamed, so a crash during a write never leaves a
+    partially written entry behind. File operations run in a worker thread so that they do not block the event loop.
+
+    Args:
+        directory (str | os.PathLike[str]): The directory the entries are stored in. It is created if it does not exist.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str]) -> None:
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self._directory / key[:2] / f"{key}.json"
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        return await asyncio.to_thread(self._read, self._path(key))
+
+    async def put(self, key: str, value: Mapping[str, Any]) -> None:
+        await asyncio.to_thread(self._write, self._path(key), json.dumps(value).encode("utf-8"))
+
+    def _read(self, path: Path) -> Dict[str, Any] | None:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        value: Dict[str, Any] = json.loads(data)
+        return value
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(exist_ok=True)
+        # Identical calls may be cached at the same time, so each write has its own temporary file.
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
@@ -0,0 +1,46 @@
+import copy
+from collections import OrderedDict
+from typing import Any, Mapping
+
+from ._cache_store import CacheStore
+
+
+class InMemoryCacheStore(CacheStore):
+    """A cache store that keeps entries in the memory of the process, evicting the least recently used entry when it
+    is full.
+
+    Args:
+        max_size (int, optional): The maximum number of entries kept. Defaults to None, which means unbounded.
+    """
+
+    def __init__(self, max_size: int | None = None) -> None:
+        if max_size is not None and max_size < 1:
+            raise ValueError("The maximum size must be at least 1.")
+        self._max_size = max_size
+        # Entries ordered from least to most recently used.
+        self._entries: OrderedDict[str, Mapping[str, Any]] = OrderedDict()
+        self._num_evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def num_evictions(self) -> int:
+        """The number of entries evicted because the store was full."""
+        return self._num_evictions
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    async def put(self, key: str, value: Mapping[str, Any]) -> None:
+        self._entries[key] = copy.deepcopy(dict(value))
+        self._entries.move_to_end(key)
+        if self._max_size is not None and len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._num_evictions += 1
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Mapping
+
+from ._cache_store import CacheStore
+
+
+class SQLiteCacheStore(CacheStore):
+    """A cache store that keeps entries in a SQLite database, one row per entry.
+
+    Entries are stored as JSON. Database operations run in a worker thread so that they do not block the event loop.
+
+    Args:
+        path (str | os.PathLike[str]): The path of the database file. It is created if it does not exist.
+            Use ``":memory:"`` for a database that only lives as long as the store.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # The connection is shared by the worker threads, so access to it is serialized.
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS model_cache (key TEXT NOT NULL PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    async def get(self, key: str) -> Mapping[str, Any] | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def put(self, key: str, value: Mapping[str, Any]) -> None:
+        await asyncio.to_thread(self._put, key, json.dumps(value))
+
+    def _get(self, key: str) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM model_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value: Dict[str, Any] = json.loads(row[0])
+        return value
+
+    def _put(self, key: str, value: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO model_cache (key, value) VALUES (?, ?)", (key, value))
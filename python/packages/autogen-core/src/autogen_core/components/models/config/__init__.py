@@ -3,6 +3,8 @@
 from typing_extensions import Required, TypedDict
 
 from .._model_client import ModelCapabilities
+from .._rate_limiter import RateLimiter
+from .._usage_meter import UsageMeter
 
 
 class ResponseFormat(TypedDict):
@@ -31,6 +33,10 @@ class BaseOpenAIClientConfiguration(CreateArguments, total=False):
     api_key: str
     timeout: Union[float, None]
     max_retries: int
+    # Not passed to the API, shared by the clients that use the same deployment
+    rate_limiter: RateLimiter
+    # Not passed to the API, records the usage, latency and time to first token of the requests
+    usage_meter: UsageMeter
 
 
 # See OpenAI docs for explanation of these parameters
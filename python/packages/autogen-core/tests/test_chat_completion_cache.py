@@ -0,0 +1,211 @@
+from pathlib import Path
+from typing import Any, AsyncGenerator, List, Mapping, Optional, Sequence, Union
+
+import pytest
+from autogen_core.base import CancellationToken
+from autogen_core.components import FunctionCall
+from autogen_core.components.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,
+    OpenAIChatCompletionClient,
+    RequestUsage,
+    SystemMessage,
+    UserMessage,
+)
+from autogen_core.components.models.cache import (
+    CacheStore,
+    ChatCompletionCache,
+    FileCacheStore,
+    InMemoryCacheStore,
+    SQLiteCacheStore,
+)
+from autogen_core.components.tools import Tool, ToolSchema
+from openai.resources.chat.completions import AsyncCompletions
+from openai.types.chat.chat_completion import ChatCompletion, Choice
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.completion_usage import CompletionUsage
+
+
+class CountingClient(ChatCompletionClient):
+    """A model client that answers with the number of calls it received."""
+
+    def __init__(self) -> None:
+        self.num_calls = 0
+        self._usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def _result(self, content: Union[str, List[FunctionCall]]) -> CreateResult:
+        return CreateResult(
+            finish_reason="stop",
+            content=content,
+            usage=RequestUsage(prompt_tokens=3, completion_tokens=2),
+            cached=False,
+        )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        self.num_calls += 1
+        if len(tools) > 0:
+            return self._result([FunctionCall(id="1", arguments="{}", name="tool")])
+        return self._result(f"call {self.num_calls}")
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        self.num_calls += 1
+        yield "stream "
+        yield str(self.num_calls)
+        yield self._result(f"stream {self.num_calls}")
+
+    def actual_usage(self) -> RequestUsage:
+        return self._usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 0
+
+    @property
+    def capabilities(self) -> ModelCapabilities:
+        return ModelCapabilities(vision=False, function_calling=True, json_output=False)
+
+
+def create_store(kind: str, tmp_path: Path) -> CacheStore:
+    match kind:
+        case "memory":
+            return InMemoryCacheStore()
+        case "sqlite":
+            return SQLiteCacheStore(tmp_path / "cache.db")
+        case _:
+            return FileCacheStore(tmp_path / "cache")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "file"])
+async def test_chat_completion_cache(kind: str, tmp_path: Path) -> None:
+    client = CountingClient()
+    cache = ChatCompletionCache(client, create_store(kind, tmp_path))
+    messages: List[LLMMessage] = [SystemMessage(content="system"), UserMessage(content="Hello", source="user")]
+
+    # An identical call is served from the cache.
+    result = await cache.create(messages)
+    assert result.content == "call 1"
+    assert not result.cached
+    result = await cache.create(messages)
+    assert result.content == "call 1"
+    assert result.cached
+    assert result.usage == RequestUsage(prompt_tokens=3, completion_tokens=2)
+    assert client.num_calls == 1
+
+    # Different messages, create args or tools are different calls.
+    assert (await cache.create([UserMessage(content="Hello", source="other")])).content == "call 2"
+    assert (await cache.create(messages, extra_create_args={"temperature": 0})).content == "call 3"
+    tool: ToolSchema = {"name": "tool", "description": "A tool."}
+    await cache.create(messages, tools=[tool])
+    result = await cache.create(messages, tools=[tool])
+    assert result.content == [FunctionCall(id="1", arguments="{}", name="tool")]
+    assert client.num_calls == 4
+
+    # Streams are replayed chunk by chunk, and their results are shared with create.
+    stream_messages: List[LLMMessage] = [UserMessage(content="Stream", source="user")]
+    first = [item async for item in cache.create_stream(stream_messages)]
+    second = [item async for item in cache.create_stream(stream_messages)]
+    assert first[:2] == second[:2] == ["stream ", "5"]
+    assert isinstance(second[2], CreateResult) and second[2].cached
+    assert (await cache.create(stream_messages)).content == "stream 5"
+    replayed = [item async for item in cache.create_stream(messages)]
+    assert replayed[0] == "call 1"
+    assert client.num_calls == 5
+
+    metrics = cache.metrics
+    assert metrics.hits == 5
+    assert metrics.misses == 5
+    assert metrics.hit_rate == 0.5
+
+    # The cache outlives the client when the store is persistent.
+    if kind != "memory":
+        cache = ChatCompletionCache(CountingClient(), create_store(kind, tmp_path))
+        assert (await cache.create(messages)).content == "call 1"
+        assert cache.metrics.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_cache_namespace_and_eviction() -> None:
+    client = CountingClient()
+    store = InMemoryCacheStore(max_size=2)
+    cache = ChatCompletionCache(client, store, namespace="model-a")
+    other_cache = ChatCompletionCache(client, store, namespace="model-b")
+    messages: List[LLMMessage] = [UserMessage(content="Hello", source="user")]
+
+    # Clients with different namespaces do not share results.
+    await cache.create(messages)
+    assert (await other_cache.create(messages)).content == "call 2"
+
+    # The least recently used entry is evicted when the store is full.
+    await cache.create(messages)
+    await cache.create([UserMessage(content="Other", source="user")])
+    assert len(store) == 2
+    assert store.num_evictions == 1
+    assert (await cache.create(messages)).content == "call 1"
+    assert (await other_cache.create(messages)).content == "call 4"
+
+
+async def _mock_create(*args: Any, **kwargs: Any) -> ChatCompletion:
+    # Answers with the model and the temperature of the request.
+    return ChatCompletion(
+        id="id",
+        choices=[
+            Choice(
+                finish_reason="stop",
+                index=0,
+                message=ChatCompletionMessage(
+                    content=f"{kwargs['model']} {kwargs.get('temperature')}", role="assistant"
+                ),
+            )
+        ],
+        created=0,
+        model=kwargs["model"],
+        object="chat.completion",
+        usage=CompletionUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5),
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_cache_keyed_by_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
+    store = InMemoryCacheStore()
+    messages: List[LLMMessage] = [UserMessage(content="Hello", source="user")]
+    # Clients on different models or temperatures that share a store without a namespace do not share results.
+    caches = [
+        ChatCompletionCache(OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key"), store),
+        ChatCompletionCache(OpenAIChatCompletionClient(model="gpt-4o-mini", api_key="api_key"), store),
+        ChatCompletionCache(OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key", temperature=0.5), store),
+    ]
+    for cache in caches:
+        assert not (await cache.create(messages)).cached
+    assert [(await cache.create(messages)).content for cache in caches] == [
+        "gpt-4o None",
+        "gpt-4o-mini None",
+        "gpt-4o 0.5",
+    ]
+    assert len(store) == 3
+
+    # A client with the same create args shares the results.
+    same = ChatCompletionCache(OpenAIChatCompletionClient(model="gpt-4o", api_key="other_key"), store)
+    assert (await same.create(messages)).cached
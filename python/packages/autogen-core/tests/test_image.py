@@ -0,0 +1,101 @@
+import base64
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from autogen_core.components import Image
+from autogen_core.components.models._openai_client import calculate_vision_tokens
+from PIL import Image as PILImage
+
+
+def _pil_image(width: int, height: int) -> PILImage.Image:
+    # Smooth gradients with some noise, which compress like a photo.
+    size = (width, height)
+    bands = [
+        PILImage.radial_gradient("L").resize(size),
+        PILImage.effect_noise(size, 32),
+        PILImage.linear_gradient("L").resize(size),
+    ]
+    return PILImage.merge("RGB", bands)
+
+
+def _encode(image: PILImage.Image, format: str) -> bytes:
+    buffered = BytesIO()
+    image.save(buffered, format=format)
+    return buffered.getvalue()
+
+
+def test_image_encoding_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    image = Image.from_pil(_pil_image(64, 32))
+    num_saves = 0
+    save = PILImage.Image.save
+
+    def counting_save(self: PILImage.Image, *args: object, **kwargs: object) -> None:
+        nonlocal num_saves
+        num_saves += 1
+        save(self, *args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(PILImage.Image, "save", counting_save)
+
+    # The image is encoded once, however often it is sent.
+    data_uri = image.data_uri
+    assert data_uri.startswith("data:image/png;base64,")
+    assert image.to_openai_format()["image_url"]["url"] == data_uri
+    assert Image.from_uri(data_uri).image.size == (64, 32)
+    image.to_base64()
+    assert num_saves == 1
+
+    # Setting the image encodes it again.
+    image.image = _pil_image(16, 16)
+    assert image.data_uri != data_uri
+    assert num_saves == 2
+
+
+def test_image_keeps_original_bytes(tmp_path: Path) -> None:
+    # PNG with transparency, which is not kept by the RGB image, is sent as it was given.
+    png = _encode(PILImage.new("RGBA", (8, 8), (255, 0, 0, 128)), "PNG")
+    image = Image.from_base64(base64.b64encode(png).decode("utf-8"))
+    assert image.image.mode == "RGB"
+    assert image.to_bytes() == png
+
+    jpeg = _encode(_pil_image(32, 32), "JPEG")
+    path = tmp_path / "image.jpg"
+    path.write_bytes(jpeg)
+    image = Image.from_file(path)
+    assert image.to_bytes() == jpeg
+    assert image.data_uri.startswith("data:image/jpeg;base64,")
+
+    # Requesting another format encodes the image again.
+    image = Image.from_file(path, format="PNG")
+    assert image.to_bytes() != jpeg
+    assert image.data_uri.startswith("data:image/png;base64,")
+
+
+def test_image_formats() -> None:
+    pil_image = _pil_image(256, 256)
+    png = Image.from_pil(pil_image).to_bytes()
+    low = Image.from_pil(pil_image, format="JPEG", quality=20)
+    high = Image.from_pil(pil_image, format="JPEG", quality=95)
+    assert low.data_uri.startswith("data:image/jpeg;base64,")
+    assert len(low.to_bytes()) < len(high.to_bytes()) < len(png)
+    webp = Image.from_pil(pil_image, format="WEBP", quality=50)
+    assert webp.data_uri.startswith("data:image/webp;base64,")
+    assert Image.from_uri(webp.data_uri).to_bytes() == webp.to_bytes()
+    with pytest.raises(ValueError):
+        Image.from_pil(pil_image, format="BMP")  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+    "size, expected_size",
+    [
+        ((512, 512), (512, 512)),
+        ((4096, 1024), (2048, 512)),
+        ((3000, 3000), (768, 768)),
+        ((1000, 2000), (768, 1536)),
+    ],
+)
+def test_image_downscale(size: tuple[int, int], expected_size: tuple[int, int]) -> None:
+    image = Image.from_pil(_pil_image(*size), downscale=True)
+    assert image.image.size == expected_size
+    # The model sees the same tiles, so the tokens are the same.
+    assert calculate_vision_tokens(image) == calculate_vision_tokens(Image.from_pil(_pil_image(*size)))
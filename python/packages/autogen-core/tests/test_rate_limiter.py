@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Any, List
+
+import pytest
+from autogen_core.components.models import OpenAIChatCompletionClient, RateLimiter, UserMessage
+from openai.resources.chat.completions import AsyncCompletions
+from openai.types.chat.chat_completion import ChatCompletion, Choice
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.completion_usage import CompletionUsage
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute() -> None:
+    # A bucket of 120 requests that refills 2 requests per second.
+    limiter = RateLimiter(requests_per_minute=120)
+    start = time.monotonic()
+    for _ in range(122):
+        limiter.release(await limiter.acquire())
+    # The first 120 requests are sent at once, and the next 2 wait half a second each.
+    assert 0.9 < time.monotonic() - start < 1.5
+    metrics = limiter.metrics
+    assert metrics.num_requests == 122
+    assert metrics.num_delayed == 2
+    assert metrics.queue_wait_time > 0.9
+    assert metrics.active == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute() -> None:
+    # A bucket of 60000 tokens that refills 1000 tokens per second.
+    limiter = RateLimiter(tokens_per_minute=60000)
+    charged = await limiter.acquire(40000)
+    assert charged == 40000
+    # The request used less than it was charged, so the rest is refunded and the next request is not delayed.
+    limiter.release(charged, 10000)
+    limiter.release(await limiter.acquire(50000))
+    assert limiter.metrics.num_delayed == 0
+
+    # A request that used more than it was charged delays the next one until the bucket has refilled.
+    limiter.release(await limiter.acquire(0), 100)
+    start = time.monotonic()
+    limiter.release(await limiter.acquire(50))
+    assert time.monotonic() - start > 0.1
+    assert limiter.metrics.num_delayed == 1
+
+    # A request larger than the bucket is charged the whole bucket.
+    assert await RateLimiter(tokens_per_minute=600).acquire(10000) == 600
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_queue() -> None:
+    limiter = RateLimiter(tokens_per_minute=60000, max_concurrent_requests=2)
+    order: List[int] = []
+
+    async def request(index: int, tokens: int) -> None:
+        charged = await limiter.acquire(tokens)
+        order.append(index)
+        await asyncio.sleep(0.05)
+        limiter.release(charged)
+
+    # A large request is not overtaken by the smaller requests behind it, which would fit in the bucket sooner.
+    tasks = [asyncio.create_task(request(0, 55000)), asyncio.create_task(request(1, 5100))]
+    tasks += [asyncio.create_task(request(index, 10)) for index in range(2, 5)]
+    await asyncio.sleep(0.01)
+    assert limiter.metrics.queued == 4
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2, 3, 4]
+
+    # A request that is cancelled while it waits leaves the queue, and the request behind it goes in its place.
+    limiter = RateLimiter(tokens_per_minute=600, max_concurrent_requests=2)
+    charged = await limiter.acquire(600)
+    waiting = asyncio.create_task(limiter.acquire(300))
+    behind = asyncio.create_task(limiter.acquire(0))
+    await asyncio.sleep(0.01)
+    waiting.cancel()
+    assert await asyncio.wait_for(behind, 1) == 0
+    limiter.release(charged)
+    assert limiter.metrics.active == 1
+
+
+@pytest.mark.asyncio
+async def test_openai_client_rate_limiter(monkeypatch: pytest.MonkeyPatch) -> None:
+    num_concurrent = 0
+    max_concurrent = 0
+
+    async def mock_create(*args: Any, **kwargs: Any) -> ChatCompletion:
+        nonlocal num_concurrent, max_concurrent
+        num_concurrent += 1
+        max_concurrent = max(max_concurrent, num_concurrent)
+        await asyncio.sleep(0.05)
+        num_concurrent -= 1
+        return ChatCompletion(
+            id="id",
+            choices=[
+                Choice(finish_reason="stop", index=0, message=ChatCompletionMessage(content="Hello", role="assistant"))
+            ],
+            created=0,
+            model="gpt-4o-2024-05-13",
+            object="chat.completion",
+            usage=CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+        )
+
+    monkeypatch.setattr(AsyncCompletions, "create", mock_create)
+    # Token counting needs the tiktoken encodings, so only the requests are limited here.
+    limiter = RateLimiter(requests_per_minute=100000, max_concurrent_requests=3)
+    client = OpenAIChatCompletionClient(model="gpt-4o-2024-05-13", api_key="api_key", rate_limiter=limiter)
+    messages = [UserMessage(content="Hello", source="user")]
+    results = await asyncio.gather(*[client.create(messages) for _ in range(10)])
+    assert all(result.content == "Hello" for result in results)
+    assert max_concurrent == 3
+    metrics = limiter.metrics
+    assert metrics.num_requests == 10
+    assert metrics.num_delayed == 7
+    assert metrics.active == 0
@@ -1,20 +1,30 @@
 import asyncio
+import json
 import logging
+from dataclasses import dataclass
+from typing import List
 
 import pytest
-from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application import QueueFullPolicy, SingleThreadedAgentRuntime
+from autogen_core.application.logging import EVENT_LOGGER_NAME
+from autogen_core.application.logging.events import DeliveryStage, MessageEvent, MessageKind
 from autogen_core.base import (
     AgentId,
     AgentInstantiationContext,
     AgentType,
+    MessageContext,
     Subscription,
     SubscriptionInstantiationContext,
     TopicId,
     try_get_known_serializers_for_type,
 )
+from autogen_core.base.exceptions import MessageDroppedException
 from autogen_core.components import (
     DefaultTopicId,
+    RoutedAgent,
     TypeSubscription,
+    default_subscription,
+    message_handler,
     type_subscription,
 )
 from opentelemetry.sdk.trace import TracerProvider
@@ -112,6 +122,68 @@ async def agent_factory() -> LoopbackAgent:
         assert any("Error processing publish message" in e.message for e in caplog.records)
 
 
+@pytest.mark.asyncio
+async def test_message_events_are_logged(caplog: pytest.LogCaptureFixture) -> None:
+    runtime = SingleThreadedAgentRuntime()
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
+    agent_id = AgentId("name", "default")
+    runtime.start()
+
+    # No events are created while the event logger is disabled for INFO.
+    with caplog.at_level(logging.WARNING, logger=EVENT_LOGGER_NAME):
+        await runtime.send_message(MessageType(), agent_id)
+    assert not any(isinstance(record.msg, MessageEvent) for record in caplog.records)
+
+    with caplog.at_level(logging.INFO, logger=EVENT_LOGGER_NAME):
+        await runtime.send_message(MessageType(), agent_id)
+        await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+        await runtime.stop_when_idle()
+    events = [record.msg for record in caplog.records if isinstance(record.msg, MessageEvent)]
+    assert [(event.kwargs["kind"], event.kwargs["delivery_stage"]) for event in events] == [
+        (MessageKind.DIRECT, DeliveryStage.SEND),
+        (MessageKind.DIRECT, DeliveryStage.DELIVER),
+        (MessageKind.RESPOND, DeliveryStage.DELIVER),
+        (MessageKind.PUBLISH, DeliveryStage.SEND),
+        (MessageKind.PUBLISH, DeliveryStage.DELIVER),
+    ]
+    assert json.loads(str(events[1])) == {
+        "payload": {},
+        "sender": None,
+        "receiver": "name/default",
+        "kind": "DIRECT",
+        "delivery_stage": "DELIVER",
+        "type": "Message",
+    }
+
+
+class PublishThenRespondAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that publishes an event before it responds.")
+
+    @message_handler
+    async def on_message_type(self, message: MessageType, ctx: MessageContext) -> MessageType:
+        await self.publish_message(MessageType(), TopicId("events", "default"))
+        return MessageType()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_queue_size", [None, 10])
+async def test_response_does_not_overtake_publish(caplog: pytest.LogCaptureFixture, max_queue_size: int | None) -> None:
+    runtime = SingleThreadedAgentRuntime(max_queue_size=max_queue_size)
+    await PublishThenRespondAgent.register(runtime, "responder", PublishThenRespondAgent)
+    await LoopbackAgent.register(runtime, "listener", LoopbackAgent)
+    await runtime.add_subscription(TypeSubscription("events", "listener"))
+    runtime.start()
+
+    with caplog.at_level(logging.INFO, logger=EVENT_LOGGER_NAME):
+        await runtime.send_message(MessageType(), AgentId("responder", "default"))
+        await runtime.stop_when_idle()
+    events = [record.msg for record in caplog.records if isinstance(record.msg, MessageEvent)]
+    delivered = [event.kwargs["kind"] for event in events if event.kwargs["delivery_stage"] == DeliveryStage.DELIVER]
+    # The event was published before the response was queued, so it is delivered first.
+    assert delivered == [MessageKind.DIRECT, MessageKind.PUBLISH, MessageKind.RESPOND]
+
+
 @pytest.mark.asyncio
 async def test_register_receives_publish_cascade() -> None:
     num_agents = 5
@@ -142,6 +214,25 @@ async def test_register_receives_publish_cascade() -> None:
         assert agent.num_calls == total_num_calls_expected
 
 
+@pytest.mark.asyncio
+async def test_publish_does_not_instantiate_sender() -> None:
+    runtime = SingleThreadedAgentRuntime()
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "receiver", LoopbackAgentWithDefaultSubscription)
+    await runtime.register("sender", lambda rt, agent_id: LoopbackAgent())
+    runtime.start()
+
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId(), sender=AgentId("sender", "default"))
+    await runtime.stop_when_idle()
+
+    # Only the receiver was created to deliver the message.
+    assert runtime.agent_lifecycle_metrics.num_activations == 1
+
+    # Factories taking the runtime and the agent id are still supported.
+    with pytest.warns(UserWarning):
+        sender = await runtime.try_get_underlying_agent_instance(AgentId("sender", "default"), type=LoopbackAgent)
+    assert sender.num_calls == 0
+
+
 @pytest.mark.asyncio
 async def test_register_factory_explicit_name() -> None:
     runtime = SingleThreadedAgentRuntime()
@@ -306,3 +397,242 @@ async def test_default_subscription_publish_to_other_source() -> None:
         AgentId("name", key="other"), type=LoopbackAgentWithDefaultSubscription
     )
     assert other_long_running_agent.num_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_runtime_wakes_up_on_new_message() -> None:
+    runtime = SingleThreadedAgentRuntime()
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
+    runtime.start()
+
+    # Let the run loop go to sleep on an empty queue.
+    await asyncio.sleep(0.05)
+    assert runtime.idle
+
+    response = await runtime.send_message(MessageType(), recipient=AgentId("name", "default"))
+    assert isinstance(response, MessageType)
+
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+    await runtime.stop_when_idle()
+
+    agent = await runtime.try_get_underlying_agent_instance(
+        AgentId("name", "default"), type=LoopbackAgentWithDefaultSubscription
+    )
+    assert agent.num_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_when_condition_outside_runtime() -> None:
+    runtime = SingleThreadedAgentRuntime()
+    runtime.start()
+    # The condition changes without any activity in the runtime, and is still noticed while the runtime is idle.
+    flag = [False]
+    asyncio.get_running_loop().call_later(0.2, lambda: flag.__setitem__(0, True))
+    await asyncio.wait_for(runtime.stop_when(lambda: flag[0]), timeout=5)
+    assert flag[0]
+
+
+@pytest.mark.asyncio
+async def test_batched_dispatch_preserves_order() -> None:
+    runtime = SingleThreadedAgentRuntime(max_batch_size=16)
+
+    received: List[int] = []
+
+    @default_subscription
+    class RecordingAgent(RoutedAgent):
+        def __init__(self) -> None:
+            super().__init__("A recording agent.")
+
+        @message_handler
+        async def on_message_type(self, message: CascadingMessageType, ctx: MessageContext) -> None:
+            received.append(message.round)
+
+    await RecordingAgent.register(runtime, "recorder", RecordingAgent)
+    for i in range(100):
+        await runtime.publish_message(CascadingMessageType(round=i), topic_id=DefaultTopicId())
+    runtime.start()
+    await runtime.stop_when_idle()
+
+    assert received == list(range(100))
+
+
+def test_batch_size_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        SingleThreadedAgentRuntime(max_batch_size=0)
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_blocks_producer() -> None:
+    runtime = SingleThreadedAgentRuntime(max_queue_size=2, queue_full_policy=QueueFullPolicy.BLOCK)
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
+
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+    blocked = asyncio.create_task(runtime.publish_message(MessageType(), topic_id=DefaultTopicId()))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    assert runtime.queue_metrics.depth == 2
+
+    runtime.start()
+    await blocked
+    await runtime.stop_when_idle()
+
+    metrics = runtime.queue_metrics
+    assert metrics.num_backpressure_waits == 1
+    assert metrics.backpressure_wait_time > 0
+    assert metrics.peak_depth == 2
+    assert metrics.num_dropped == 0
+    agent = await runtime.try_get_underlying_agent_instance(
+        AgentId("name", "default"), type=LoopbackAgentWithDefaultSubscription
+    )
+    assert agent.num_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_drop_oldest() -> None:
+    runtime = SingleThreadedAgentRuntime(max_queue_size=1, queue_full_policy=QueueFullPolicy.DROP_OLDEST)
+    await LoopbackAgent.register(runtime, "name", LoopbackAgent)
+    recipient = AgentId("name", "default")
+
+    first = asyncio.create_task(runtime.send_message(MessageType(), recipient=recipient))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(runtime.send_message(MessageType(), recipient=recipient))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(MessageDroppedException):
+        await first
+
+    runtime.start()
+    assert isinstance(await second, MessageType)
+    await runtime.stop_when_idle()
+    assert runtime.queue_metrics.num_dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_raise() -> None:
+    runtime = SingleThreadedAgentRuntime(max_queue_size=1, queue_full_policy=QueueFullPolicy.RAISE)
+    await LoopbackAgentWithDefaultSubscription.register(runtime, "name", LoopbackAgentWithDefaultSubscription)
+
+    await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+    with pytest.raises(MessageDroppedException):
+        await runtime.publish_message(MessageType(), topic_id=DefaultTopicId())
+
+    runtime.start()
+    await runtime.stop_when_idle()
+    assert runtime.queue_metrics.num_dropped == 1
+    agent = await runtime.try_get_underlying_agent_instance(
+        AgentId("name", "default"), type=LoopbackAgentWithDefaultSubscription
+    )
+    assert agent.num_calls == 1
+
+
+class ConcurrencyTrackingAgent(RoutedAgent):
+    def __init__(self, release: asyncio.Event) -> None:
+        super().__init__("An agent that tracks how many handlers run at once.")
+        self.release = release
+        self.running = 0
+        self.max_running = 0
+        self.received: List[int] = []
+
+    @message_handler
+    async def on_message_type(self, message: CascadingMessageType, ctx: MessageContext) -> int:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.received.append(message.round)
+        await self.release.wait()
+        self.running -= 1
+        return message.round
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+async def test_max_concurrency_per_agent(max_concurrency: int) -> None:
+    runtime = SingleThreadedAgentRuntime(max_concurrency_per_agent={"limited": max_concurrency})
+    release = asyncio.Event()
+    await ConcurrencyTrackingAgent.register(runtime, "limited", lambda: ConcurrencyTrackingAgent(release))
+    await ConcurrencyTrackingAgent.register(runtime, "unlimited", lambda: ConcurrencyTrackingAgent(release))
+    await runtime.add_subscription(TypeSubscription("default", "limited"))
+    await runtime.add_subscription(TypeSubscription("default", "unlimited"))
+    runtime.start()
+
+    for i in range(10):
+        await runtime.publish_message(CascadingMessageType(round=i), topic_id=DefaultTopicId())
+    sends = asyncio.gather(
+        *[runtime.send_message(CascadingMessageType(round=i), AgentId("limited", "default")) for i in range(10, 15)]
+    )
+    limited = await runtime.try_get_underlying_agent_instance(AgentId("limited", "default"), ConcurrencyTrackingAgent)
+    unlimited = await runtime.try_get_underlying_agent_instance(
+        AgentId("unlimited", "default"), ConcurrencyTrackingAgent
+    )
+
+    # Wait until every handler that is allowed to run has started.
+    async def all_started() -> None:
+        while unlimited.running < 10 or limited.running < max_concurrency:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(all_started(), timeout=5)
+    await asyncio.sleep(0.05)
+    assert limited.running == max_concurrency
+    assert unlimited.running == 10
+
+    release.set()
+    assert await sends == list(range(10, 15))
+    await runtime.stop_when_idle()
+
+    assert limited.max_running == max_concurrency
+    assert sorted(limited.received) == list(range(15))
+    if max_concurrency == 1:
+        # Handled one at a time, in the order the messages were published.
+        assert [i for i in limited.received if i < 10] == list(range(10))
+
+    # Other instances of the limited type have their own mailbox.
+    other = await runtime.try_get_underlying_agent_instance(AgentId("limited", "other"), ConcurrencyTrackingAgent)
+    assert other.max_running == 0
+
+
+@dataclass
+class Forward:
+    targets: List[str]
+
+
+class ForwardingAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that sends a message on to the next agent type of the message.")
+
+    @message_handler
+    async def on_forward(self, message: Forward, ctx: MessageContext) -> int:
+        if len(message.targets) == 0:
+            return 0
+        result = await self.send_message(Forward(message.targets[1:]), AgentId(message.targets[0], "default"))
+        assert isinstance(result, int)
+        return 1 + result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "targets",
+    [
+        # The agent sends to itself.
+        ["a", "a"],
+        # The agent calls another agent that calls back.
+        ["a", "b", "a"],
+    ],
+)
+async def test_reentrant_send_with_max_concurrency_fails(targets: List[str]) -> None:
+    runtime = SingleThreadedAgentRuntime(max_concurrency_per_agent={"a": 1})
+    await ForwardingAgent.register(runtime, "a", ForwardingAgent)
+    await ForwardingAgent.register(runtime, "b", ForwardingAgent)
+    runtime.start()
+    # The handler of "a" holds its only slot while it waits, so the request would wait forever.
+    with pytest.raises(RuntimeError, match="own handler"):
+        await asyncio.wait_for(runtime.send_message(Forward(targets[1:]), AgentId(targets[0], "default")), timeout=5)
+    # Other agents and agents with free slots can still be called back.
+    assert await runtime.send_message(Forward(["b", "b", "b"]), AgentId("b", "default")) == 3
+    await runtime.stop()
+
+    runtime = SingleThreadedAgentRuntime(max_concurrency_per_agent={"a": 2})
+    await ForwardingAgent.register(runtime, "a", ForwardingAgent)
+    await ForwardingAgent.register(runtime, "b", ForwardingAgent)
+    runtime.start()
+    assert await runtime.send_message(Forward(targets[1:]), AgentId(targets[0], "default")) == len(targets) - 1
+    await runtime.stop()
@@ -1,14 +1,24 @@
+import math
 from dataclasses import dataclass
-from typing import Union
+from datetime import datetime
+from typing import Any, Callable, List, Union
 
 import pytest
+from autogen_core.application.protos import agent_worker_pb2
 from autogen_core.base import (
     JSON_DATA_CONTENT_TYPE,
+    MSGPACK_DATA_CONTENT_TYPE,
+    PROTOBUF_DATA_CONTENT_TYPE,
     MessageSerializer,
     SerializationRegistry,
     try_get_known_serializers_for_type,
 )
-from autogen_core.base._serialization import DataclassJsonMessageSerializer, PydanticJsonMessageSerializer
+from autogen_core.base._serialization import (
+    DataclassJsonMessageSerializer,
+    DataclassMsgpackMessageSerializer,
+    PydanticJsonMessageSerializer,
+    PydanticMsgpackMessageSerializer,
+)
 from autogen_core.components import Image
 from PIL import Image as PILImage
 from pydantic import BaseModel
@@ -72,7 +82,7 @@ def test_dataclass() -> None:
     message = DataclassMessage(message="hello")
     name = serde.type_name(message)
     json = serde.serialize(message, type_name=name, data_content_type=JSON_DATA_CONTENT_TYPE)
-    assert json == b'{"message": "hello"}'
+    assert json == b'{"message":"hello"}'
     deserialized = serde.deserialize(json, type_name=name, data_content_type=JSON_DATA_CONTENT_TYPE)
     assert deserialized == message
 
@@ -142,6 +152,188 @@ def serialize(self, message: str) -> bytes:
     assert deserialized == message
 
 
+@pytest.mark.parametrize(
+    "message",
+    [
+        DataclassMessage(message="hello"),
+        NestingPydanticMessage(message="hello", nested=PydanticMessage(message="world")),
+    ],
+)
+def test_msgpack(message: DataclassMessage | NestingPydanticMessage) -> None:
+    pytest.importorskip("msgpack")
+    serde = SerializationRegistry()
+    serde.add_serializer(try_get_known_serializers_for_type(type(message)))
+    if isinstance(message, BaseModel):
+        serde.add_serializer(PydanticMsgpackMessageSerializer(type(message)))
+    else:
+        serde.add_serializer(DataclassMsgpackMessageSerializer(type(message)))
+    name = serde.type_name(message)
+    assert serde.select_content_type(name) == MSGPACK_DATA_CONTENT_TYPE
+
+    data = serde.serialize(message, type_name=name, data_content_type=MSGPACK_DATA_CONTENT_TYPE)
+    json = serde.serialize(message, type_name=name, data_content_type=JSON_DATA_CONTENT_TYPE)
+    assert len(data) < len(json)
+    assert serde.deserialize(data, type_name=name, data_content_type=MSGPACK_DATA_CONTENT_TYPE) == message
+
+
+def test_msgpack_is_not_known() -> None:
+    # Peers without the msgpack package could not read it, so it is only used when added explicitly.
+    serde = SerializationRegistry()
+    serde.add_serializer(try_get_known_serializers_for_type(DataclassMessage))
+    assert serde.select_content_type("DataclassMessage") == JSON_DATA_CONTENT_TYPE
+
+
+@dataclass
+class TimestampedMessage:
+    message: str
+    when: datetime
+
+
+def test_msgpack_dataclass_with_datetime() -> None:
+    pytest.importorskip("msgpack")
+    message = TimestampedMessage(message="hello", when=datetime(2024, 1, 2, 3, 4, 5))
+    json_serializer = DataclassJsonMessageSerializer(TimestampedMessage)
+    msgpack_serializer = DataclassMsgpackMessageSerializer(TimestampedMessage)
+    # The datetime is converted as it is for JSON, and is read back as the same string.
+    assert msgpack_serializer.deserialize(msgpack_serializer.serialize(message)) == json_serializer.deserialize(
+        json_serializer.serialize(message)
+    )
+    assert msgpack_serializer.deserialize(msgpack_serializer.serialize(message)).when == "2024-01-02T03:04:05"
+
+
+def test_msgpack_dataclass_fields_by_name() -> None:
+    pytest.importorskip("msgpack")
+
+    @dataclass
+    class Before:
+        message: str
+        source: str
+
+    @dataclass
+    class After:
+        source: str
+        message: str
+        count: int = 0
+
+    payload = DataclassMsgpackMessageSerializer(Before).serialize(Before(message="hello", source="user"))
+    # A peer that declares the fields in another order, or has added one, reads each field by its name.
+    assert DataclassMsgpackMessageSerializer(After).deserialize(payload) == After(source="user", message="hello")
+
+
+def test_protobuf() -> None:
+    serde = SerializationRegistry()
+    serde.add_serializer(try_get_known_serializers_for_type(agent_worker_pb2.AgentId))
+    message = agent_worker_pb2.AgentId(type="type", key="key")
+    name = serde.type_name(message)
+    assert serde.select_content_type(name) == PROTOBUF_DATA_CONTENT_TYPE
+
+    data = serde.serialize(message, type_name=name, data_content_type=PROTOBUF_DATA_CONTENT_TYPE)
+    assert data == message.SerializeToString()
+    assert serde.deserialize(data, type_name=name, data_content_type=PROTOBUF_DATA_CONTENT_TYPE) == message
+
+
+def test_protobuf_for_older_workers() -> None:
+    serde = SerializationRegistry()
+    serde.add_serializer(try_get_known_serializers_for_type(agent_worker_pb2.AgentId))
+    message = agent_worker_pb2.AgentId(type="type", key="key")
+    name = serde.type_name(message)
+    # Workers that do not announce the content types they accept label protobuf payloads as JSON.
+    assert serde.select_content_type(name, {JSON_DATA_CONTENT_TYPE}) == JSON_DATA_CONTENT_TYPE
+    data = serde.serialize(message, type_name=name, data_content_type=JSON_DATA_CONTENT_TYPE)
+    assert data == message.SerializeToString()
+    assert serde.deserialize(data, type_name=name, data_content_type=JSON_DATA_CONTENT_TYPE) == message
+
+
+def test_select_content_type() -> None:
+    pytest.importorskip("msgpack")
+    serde = SerializationRegistry()
+    serde.add_serializer(try_get_known_serializers_for_type(DataclassMessage))
+    serde.add_serializer(DataclassMsgpackMessageSerializer(DataclassMessage))
+    name = "DataclassMessage"
+    # The fastest content type that the receivers accept is selected.
+    assert (
+        serde.select_content_type(name, {JSON_DATA_CONTENT_TYPE, MSGPACK_DATA_CONTENT_TYPE})
+        == MSGPACK_DATA_CONTENT_TYPE
+    )
+    assert serde.select_content_type(name, {JSON_DATA_CONTENT_TYPE}) == JSON_DATA_CONTENT_TYPE
+    # Without a common content type, JSON is used.
+    assert serde.select_content_type(name, {PROTOBUF_DATA_CONTENT_TYPE}) == JSON_DATA_CONTENT_TYPE
+    with pytest.raises(ValueError):
+        serde.select_content_type("Unknown")
+    # A selection that was cached is reconsidered when another content type is registered.
+    serde = SerializationRegistry()
+    serde.add_serializer(DataclassJsonMessageSerializer(DataclassMessage))
+    assert serde.select_content_type(name, frozenset([MSGPACK_DATA_CONTENT_TYPE])) == JSON_DATA_CONTENT_TYPE
+    serde.add_serializer(DataclassMsgpackMessageSerializer(DataclassMessage))
+    assert serde.select_content_type(name, frozenset([MSGPACK_DATA_CONTENT_TYPE])) == MSGPACK_DATA_CONTENT_TYPE
+
+
+def test_known_serializers_are_cached() -> None:
+    serializers = try_get_known_serializers_for_type(DataclassMessage)
+    assert [id(s) for s in serializers] == [id(s) for s in try_get_known_serializers_for_type(DataclassMessage)]
+    # Every call returns its own list.
+    serializers.clear()
+    assert len(try_get_known_serializers_for_type(DataclassMessage)) > 0
+
+
+@pytest.mark.parametrize("serializer_type", [DataclassJsonMessageSerializer, DataclassMsgpackMessageSerializer])
+def test_dataclass_with_list_of_dataclasses(serializer_type: Callable[[type[Any]], MessageSerializer[Any]]) -> None:
+    if serializer_type is DataclassMsgpackMessageSerializer:
+        pytest.importorskip("msgpack")
+
+    @dataclass
+    class Item:
+        name: str
+
+    @dataclass
+    class Order:
+        items: List[Item]
+
+    serializer = serializer_type(Order)
+    payload = serializer.serialize(Order(items=[Item("a"), Item("b")]))
+    # The dataclasses in the list are serialized as objects, and are rebuilt when deserialized.
+    assert serializer.deserialize(payload) == Order(items=[Item("a"), Item("b")])
+
+
+@dataclass
+class FloatMessage:
+    values: List[float]
+
+
+def test_dataclass_non_finite_floats() -> None:
+    serializer = DataclassJsonMessageSerializer(FloatMessage)
+    payload = serializer.serialize(FloatMessage(values=[float("nan"), float("inf"), float("-inf")]))
+    assert payload == b'{"values":[NaN,Infinity,-Infinity]}'
+    nan, inf, negative_inf = serializer.deserialize(payload).values
+    assert math.isnan(nan)
+    assert inf == float("inf")
+    assert negative_inf == float("-inf")
+
+
+class OpaqueValue:
+    pass
+
+
+@pytest.mark.parametrize("serializer_type", [DataclassJsonMessageSerializer, DataclassMsgpackMessageSerializer])
+def test_dataclass_with_list_of_dataclasses_and_unsupported_field(
+    serializer_type: Callable[[type[Any]], MessageSerializer[Any]],
+) -> None:
+    if serializer_type is DataclassMsgpackMessageSerializer:
+        pytest.importorskip("msgpack")
+
+    @dataclass
+    class Item:
+        name: str
+
+    @dataclass
+    class Order:
+        items: List[Item]
+        opaque: OpaqueValue
+
+    with pytest.raises(ValueError, match="not supported"):
+        serializer_type(Order)
+
+
 def test_image_type() -> None:
     pil_image = PILImage.new("RGB", (100, 100))
 
@@ -1,7 +1,10 @@
+import asyncio
+from pathlib import Path
 from typing import Any, Mapping
 
 import pytest
 from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application.state import FileStateStore, InMemoryStateStore, SQLiteStateStore, StateStore
 from autogen_core.base import AgentId, BaseAgent, MessageContext
 
 
@@ -20,6 +23,25 @@ async def load_state(self, state: Mapping[str, Any]) -> None:
         self.state = state["state"]
 
 
+class CountingAgent(BaseAgent):
+    def __init__(self, release: asyncio.Event | None = None) -> None:
+        super().__init__("An agent that counts its messages")
+        self.state = 0
+        self._release = release
+
+    async def save_state(self) -> Mapping[str, Any]:
+        return {"state": self.state}
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        self.state = state["state"]
+
+    async def on_message(self, message: Any, ctx: MessageContext) -> int:
+        if self._release is not None:
+            await self._release.wait()
+        self.state += 1
+        return self.state
+
+
 @pytest.mark.asyncio
 async def test_agent_can_save_state() -> None:
     runtime = SingleThreadedAgentRuntime()
@@ -60,3 +82,147 @@ async def test_runtime_can_save_state() -> None:
 
     await runtime2.load_state(runtime_state)
     assert agent2.state == 1
+
+
+@pytest.mark.asyncio
+async def test_max_agent_instances_passivates_least_recently_used() -> None:
+    store = InMemoryStateStore()
+    runtime = SingleThreadedAgentRuntime(max_agent_instances=2, agent_state_store=store)
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    for key in ["a", "b", "a", "c"]:
+        await runtime.send_message("inc", AgentId("counter", key))
+    # "b" was the least recently used agent when "c" was activated.
+    assert runtime.agent_lifecycle_metrics.num_instances == 2
+    assert runtime.agent_lifecycle_metrics.num_passivations == 1
+    assert await store.get(AgentId("counter", "b")) == {"state": 1}
+
+    # Addressing "b" reactivates it with its saved state and passivates "a".
+    assert await runtime.send_message("inc", AgentId("counter", "b")) == 2
+    assert await store.get(AgentId("counter", "a")) == {"state": 2}
+    assert await runtime.send_message("inc", AgentId("counter", "a")) == 3
+
+    metrics = runtime.agent_lifecycle_metrics
+    assert metrics.num_instances == 2
+    assert metrics.num_activations == 5
+    assert metrics.num_reactivations == 2
+    assert metrics.num_passivations == 3
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+async def test_agent_idle_timeout_passivates_idle_agents() -> None:
+    runtime = SingleThreadedAgentRuntime(agent_idle_timeout=0.05)
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    await runtime.send_message("inc", AgentId("counter", "a"))
+    await asyncio.sleep(0.2)
+    assert runtime.agent_lifecycle_metrics.num_instances == 0
+    assert runtime.agent_lifecycle_metrics.num_passivations == 1
+
+    assert await runtime.send_message("inc", AgentId("counter", "a")) == 2
+    assert runtime.agent_lifecycle_metrics.num_reactivations == 1
+    await runtime.stop()
+
+
+@pytest.mark.asyncio
+async def test_agents_handling_messages_are_not_passivated() -> None:
+    release = asyncio.Event()
+    runtime = SingleThreadedAgentRuntime(max_agent_instances=1)
+    await CountingAgent.register(runtime, "blocking", lambda: CountingAgent(release))
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    blocked = asyncio.create_task(runtime.send_message("inc", AgentId("blocking", "default")))
+    while runtime.agent_lifecycle_metrics.num_instances == 0:
+        await asyncio.sleep(0)
+    await runtime.send_message("inc", AgentId("counter", "default"))
+    # The blocked agent is in use, so it stays in memory beyond the limit.
+    assert runtime.agent_lifecycle_metrics.num_instances == 2
+    assert runtime.agent_lifecycle_metrics.num_passivations == 0
+
+    release.set()
+    assert await blocked == 1
+    await runtime.send_message("inc", AgentId("counter", "other"))
+    assert runtime.agent_lifecycle_metrics.num_instances == 1
+    await runtime.stop()
+
+
+def _create_store(kind: str, tmp_path: Path) -> StateStore:
+    match kind:
+        case "memory":
+            return InMemoryStateStore()
+        case "sqlite":
+            return SQLiteStateStore(tmp_path / "state.db")
+        case "json":
+            return FileStateStore(tmp_path / "state")
+        case _:
+            pytest.importorskip("msgpack")
+            return FileStateStore(tmp_path / "state", format="msgpack")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "json", "msgpack"])
+async def test_state_store(kind: str, tmp_path: Path) -> None:
+    store = _create_store(kind, tmp_path)
+    agent_a = AgentId("counter", "a")
+    # Keys may contain characters that are not valid in file names.
+    agent_b = AgentId("counter", "../b/c")
+
+    assert await store.get(agent_a) is None
+    await store.put(agent_a, {"state": 1, "nested": {"items": [1, 2]}})
+    assert await store.get(agent_a) == {"state": 1, "nested": {"items": [1, 2]}}
+
+    await store.put_many({agent_a: {"state": 2}, agent_b: {"state": 3}})
+    assert await store.get(agent_a) == {"state": 2}
+    assert await store.get(agent_b) == {"state": 3}
+
+    await store.delete(agent_a)
+    await store.delete(agent_a)
+    assert await store.get(agent_a) is None
+    assert await store.get(agent_b) == {"state": 3}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "json", "msgpack"])
+async def test_state_store_concurrent_puts(kind: str, tmp_path: Path) -> None:
+    store = _create_store(kind, tmp_path)
+    agent_id = AgentId("a", "k")
+    await asyncio.gather(*[store.put(agent_id, {"state": i}) for i in range(200)])
+    state = await store.get(agent_id)
+    assert state is not None and 0 <= state["state"] < 200
+
+
+@pytest.mark.asyncio
+async def test_runtime_checkpoint_is_incremental(tmp_path: Path) -> None:
+    store = SQLiteStateStore(tmp_path / "state.db")
+    runtime = SingleThreadedAgentRuntime(agent_state_store=store)
+    await CountingAgent.register(runtime, "counter", CountingAgent)
+    runtime.start()
+
+    for key in ["a", "b", "c"]:
+        await runtime.send_message("inc", AgentId("counter", key))
+    assert await runtime.checkpoint(batch_size=2) == 3
+    # Only agents that handled a message since the last checkpoint are written.
+    assert await runtime.checkpoint() == 0
+    await runtime.send_message("inc", AgentId("counter", "b"))
+    assert await runtime.checkpoint() == 1
+    await runtime.stop()
+
+    # A runtime using the same store restores agents from their latest checkpoint.
+    runtime2 = SingleThreadedAgentRuntime(agent_state_store=store)
+    await CountingAgent.register(runtime2, "counter", CountingAgent)
+    runtime2.start()
+    assert await runtime2.send_message("inc", AgentId("counter", "a")) == 2
+    assert await runtime2.send_message("inc", AgentId("counter", "b")) == 3
+    await runtime2.stop()
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_runtime_checkpoint_requires_state_store() -> None:
+    runtime = SingleThreadedAgentRuntime()
+    with pytest.raises(RuntimeError):
+        await runtime.checkpoint()
@@ -1,8 +1,11 @@
+import asyncio
+
 import pytest
 from autogen_core.application import SingleThreadedAgentRuntime
+from autogen_core.application._helpers import SubscriptionManager
 from autogen_core.base import AgentId, TopicId
 from autogen_core.base.exceptions import CantHandleException
-from autogen_core.components import DefaultSubscription, DefaultTopicId, TypeSubscription
+from autogen_core.components import DefaultSubscription, DefaultTopicId, TypePrefixSubscription, TypeSubscription
 from test_utils import LoopbackAgent, MessageType
 
 
@@ -23,6 +26,48 @@ def test_type_subscription_map() -> None:
         _agent_id = sub.map_to_agent(TopicId(type="t0", source="s1"))
 
 
+def test_type_prefix_subscription_match() -> None:
+    sub = TypePrefixSubscription(topic_type_prefix="t1", agent_type="a1")
+
+    assert sub.is_match(TopicId(type="t0", source="s1")) is False
+    assert sub.is_match(TopicId(type="t1", source="s1")) is True
+    assert sub.is_match(TopicId(type="t1-sub", source="s2")) is True
+    assert sub.map_to_agent(TopicId(type="t1-sub", source="s2")) == AgentId(type="a1", key="s2")
+
+    with pytest.raises(CantHandleException):
+        _agent_id = sub.map_to_agent(TopicId(type="t0", source="s1"))
+
+
+@pytest.mark.asyncio
+async def test_subscription_manager_incremental_updates() -> None:
+    manager = SubscriptionManager()
+    topic = TopicId(type="t1-sub", source="s1")
+    other_topic = TopicId(type="t2", source="s1")
+    assert await manager.get_subscribed_recipients(topic) == []
+    assert await manager.get_subscribed_recipients(other_topic) == []
+
+    # Subscriptions added after a topic was seen update its recipients.
+    type_subscription = TypeSubscription(topic_type="t1-sub", agent_type="a1")
+    prefix_subscription = TypePrefixSubscription(topic_type_prefix="t1", agent_type="a2")
+    await manager.add_subscription(type_subscription)
+    await manager.add_subscription(prefix_subscription)
+    assert await manager.get_subscribed_recipients(topic) == [AgentId("a1", "s1"), AgentId("a2", "s1")]
+    assert await manager.get_subscribed_recipients(other_topic) == []
+    assert await manager.get_subscribed_recipients(TopicId(type="t1", source="s2")) == [AgentId("a2", "s2")]
+
+    with pytest.raises(ValueError, match="Subscription already exists"):
+        await manager.add_subscription(TypePrefixSubscription(topic_type_prefix="t1", agent_type="a2"))
+
+    await manager.remove_subscription(type_subscription.id)
+    assert await manager.get_subscribed_recipients(topic) == [AgentId("a2", "s1")]
+    await manager.remove_subscription(prefix_subscription.id)
+    assert await manager.get_subscribed_recipients(topic) == []
+    assert manager.subscriptions == []
+
+    with pytest.raises(ValueError, match="Subscription does not exist"):
+        await manager.remove_subscription(prefix_subscription.id)
+
+
 @pytest.mark.asyncio
 async def test_non_default_default_subscription() -> None:
     runtime = SingleThreadedAgentRuntime()
@@ -115,3 +160,38 @@ async def test_subscription_deduplication() -> None:
     default_subscription = DefaultSubscription(agent_type=agent_type)
     with pytest.raises(ValueError, match="Subscription already exists"):
         await runtime.add_subscription(default_subscription)
+
+
+@pytest.mark.asyncio
+async def test_subscription_manager_lru_cache() -> None:
+    manager = SubscriptionManager(max_cached_topics=2)
+    await manager.add_subscription(TypeSubscription(topic_type="t", agent_type="a"))
+
+    for source in ["s1", "s2", "s1", "s3"]:
+        assert await manager.get_subscribed_recipients(TopicId("t", source)) == [AgentId("a", source)]
+
+    # s2 was the least recently used topic when s3 was added.
+    metrics = manager.cache_metrics
+    assert metrics.size == 2
+    assert metrics.hits == 1
+    assert metrics.misses == 3
+    assert metrics.evictions == 1
+
+    # Evicted topics are recomputed, and still pick up subscriptions added while they were evicted.
+    await manager.add_subscription(TypeSubscription(topic_type="t", agent_type="b"))
+    assert await manager.get_subscribed_recipients(TopicId("t", "s2")) == [AgentId("a", "s2"), AgentId("b", "s2")]
+    assert manager.cache_metrics.evictions == 2
+
+
+@pytest.mark.asyncio
+async def test_subscription_manager_ttl_cache() -> None:
+    manager = SubscriptionManager(cached_topic_ttl=0.05)
+    await manager.add_subscription(TypeSubscription(topic_type="t", agent_type="a"))
+
+    await manager.get_subscribed_recipients(TopicId("t", "s1"))
+    await asyncio.sleep(0.1)
+    await manager.get_subscribed_recipients(TopicId("t", "s2"))
+
+    metrics = manager.cache_metrics
+    assert metrics.size == 1
+    assert metrics.evictions == 1
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from typing import Any, AsyncGenerator, Dict
+
+import pytest
+from autogen_core.base import AgentId, MessageHandlerContext
+from autogen_core.components.models import (
+    CreateResult,
+    OpenAIChatCompletionClient,
+    RequestUsage,
+    UsageMeter,
+    UserMessage,
+)
+from openai.resources.chat.completions import AsyncCompletions
+from openai.types.chat.chat_completion import ChatCompletion, Choice
+from openai.types.chat.chat_completion_chunk import ChatCompletionChunk, ChoiceDelta
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.completion_usage import CompletionUsage
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+USAGE = CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+
+
+async def _mock_create(*args: Any, **kwargs: Any) -> ChatCompletion | AsyncGenerator[ChatCompletionChunk, None]:
+    if kwargs.get("stream"):
+        return _mock_stream()
+    await asyncio.sleep(0.01)
+    return ChatCompletion(
+        id="id",
+        choices=[
+            Choice(finish_reason="stop", index=0, message=ChatCompletionMessage(content="Hello", role="assistant"))
+        ],
+        created=0,
+        model="gpt-4o-2024-08-06",
+        object="chat.completion",
+        usage=USAGE,
+    )
+
+
+async def _mock_stream() -> AsyncGenerator[ChatCompletionChunk, None]:
+    deltas = [ChoiceDelta(role="assistant", content=""), ChoiceDelta(content="Hello"), ChoiceDelta(content=" there")]
+    for index, delta in enumerate(deltas + [ChoiceDelta()]):
+        # The first token comes after a delay, and the rest follow quickly.
+        await asyncio.sleep(0.05 if index == 1 else 0.001)
+        yield ChatCompletionChunk(
+            id="id",
+            choices=[ChunkChoice(finish_reason="stop" if index == len(deltas) else None, index=0, delta=delta)],
+            created=0,
+            model="gpt-4o-2024-08-06",
+            object="chat.completion.chunk",
+        )
+    yield ChatCompletionChunk(
+        id="id", choices=[], created=0, model="gpt-4o-2024-08-06", object="chat.completion.chunk", usage=USAGE
+    )
+
+
+@pytest.mark.asyncio
+async def test_openai_client_usage(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(AsyncCompletions, "create", _mock_create)
+    reader = InMemoryMetricReader()
+    meter = UsageMeter(meter_provider=MeterProvider(metric_readers=[reader]))
+    client = OpenAIChatCompletionClient(model="gpt-4o-2024-08-06", api_key="api_key", usage_meter=meter)
+    messages = [UserMessage(content="Hello", source="user")]
+
+    await client.create(messages)
+    with UsageMeter.run("run-1"), MessageHandlerContext.populate_context(AgentId("assistant", "default")):
+        await client.create(messages)
+        items = [item async for item in client.create_stream(messages)]
+    assert items[:2] == ["Hello", " there"]
+    assert isinstance(items[-1], CreateResult)
+
+    # The usage of every request adds up.
+    assert client.total_usage() == RequestUsage(prompt_tokens=30, completion_tokens=15)
+    assert client.actual_usage() == RequestUsage(prompt_tokens=30, completion_tokens=15)
+
+    total = meter.total()
+    assert total.usage == RequestUsage(prompt_tokens=30, completion_tokens=15)
+    assert total.num_requests == 3
+    assert total.latency_p50 >= 0.01
+    assert total.latency_p95 >= 0.05
+    assert total.tokens_per_second > 0
+    # Only the stream has a time to first token, which is the delay before its first content.
+    assert total.time_to_first_token_p50 is not None and 0.05 <= total.time_to_first_token_p50 < total.latency_p95
+    assert set(meter.by_model()) == {"gpt-4o-2024-08-06"}
+    assert meter.by_agent()["assistant/default"].num_requests == 2
+    run = meter.by_run()["run-1"]
+    assert run.usage == RequestUsage(prompt_tokens=20, completion_tokens=10)
+    assert run.time_to_first_token_p50 == total.time_to_first_token_p50
+
+    metrics_data = reader.get_metrics_data()
+    assert metrics_data is not None
+    points: Dict[str, Any] = {
+        metric.name: metric.data.data_points
+        for resource_metrics in metrics_data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    assert sum(point.value for point in points["autogen.model.requests"]) == 3
+    prompt_tokens = [point for point in points["autogen.model.tokens"] if point.attributes["token.type"] == "prompt"]
+    assert sum(point.value for point in prompt_tokens) == 30
+    assert {point.attributes.get("run") for point in points["autogen.model.latency"]} == {None, "run-1"}
+    assert sum(point.count for point in points["autogen.model.time_to_first_token"]) == 1
+
+
+def test_usage_meter_threads() -> None:
+    meter = UsageMeter(max_samples=100)
+    usage = RequestUsage(prompt_tokens=2, completion_tokens=1)
+
+    def record(index: int) -> None:
+        for _ in range(1000):
+            meter.record(f"model-{index % 2}", usage, 0.5)
+
+    threads = [threading.Thread(target=record, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = meter.total()
+    assert total.num_requests == 4000
+    assert total.usage == RequestUsage(prompt_tokens=8000, completion_tokens=4000)
+    assert total.latency_p50 == total.latency_p95 == 0.5
+    assert total.tokens_per_second == 2.0
+    assert total.time_to_first_token_p50 is None
+    assert {model: stats.num_requests for model, stats in meter.by_model().items()} == {
+        "model-0": 2000,
+        "model-1": 2000,
+    }
@@ -3,18 +3,33 @@
 import os
 from typing import List
 
+import grpc
 import pytest
 from autogen_core.application import WorkerAgentRuntime, WorkerAgentRuntimeHost
+from autogen_core.application._flow_control import CreditQueue
+from autogen_core.application._hash_ring import HashRing
+from autogen_core.application._message_batcher import EncodedMessageBatcher, MessageBatcher, end_stream, unbatch
+from autogen_core.application._wire_format import encode_batch_message, encode_event_message
+from autogen_core.application._worker_runtime_host_servicer import WorkerAgentRuntimeHostServicer
+from autogen_core.application.protos import agent_worker_pb2, agent_worker_pb2_grpc
 from autogen_core.base import (
+    JSON_DATA_CONTENT_TYPE,
+    MSGPACK_DATA_CONTENT_TYPE,
     AgentId,
     AgentType,
+    CancellationToken,
+    MessageContext,
     TopicId,
     try_get_known_serializers_for_type,
 )
+from autogen_core.base._serialization import DataclassMsgpackMessageSerializer
 from autogen_core.base._subscription import Subscription
 from autogen_core.components import (
     DefaultTopicId,
+    RoutedAgent,
+    TypePrefixSubscription,
     TypeSubscription,
+    message_handler,
     type_subscription,
 )
 from test_utils import (
@@ -51,7 +66,7 @@ async def test_agent_types_must_be_unique_single_worker() -> None:
 
 
 @pytest.mark.asyncio
-async def test_agent_types_must_be_unique_multiple_workers() -> None:
+async def test_agent_types_can_be_shared_by_multiple_workers() -> None:
     host_address = "localhost:50052"
     host = WorkerAgentRuntimeHost(address=host_address)
     host.start()
@@ -62,8 +77,9 @@ async def test_agent_types_must_be_unique_multiple_workers() -> None:
     worker2.start()
 
     await worker1.register_factory(type=AgentType("name1"), agent_factory=lambda: NoopAgent(), expected_class=NoopAgent)
+    await worker2.register_factory(type=AgentType("name1"), agent_factory=lambda: NoopAgent(), expected_class=NoopAgent)
 
-    with pytest.raises(RuntimeError):
+    with pytest.raises(ValueError):
         await worker2.register_factory(
             type=AgentType("name1"), agent_factory=lambda: NoopAgent(), expected_class=NoopAgent
         )
@@ -318,9 +334,8 @@ async def test_duplicate_subscription() -> None:
 
         worker1_2.start()
 
-        # Note: This passes because worker1 is still running
-        with pytest.raises(RuntimeError, match="Agent type worker1 already registered"):
-            await NoopAgent.register(worker1_2, "worker1", lambda: NoopAgent())
+        # Another worker can host the same agent type.
+        await NoopAgent.register(worker1_2, "worker1", lambda: NoopAgent())
 
         # This is somehow covered in test_disconnected_agent as well as a stop will also disconnect the agent.
         #  Will keep them both for now as we might replace the way we simulate a disconnect
@@ -348,7 +363,7 @@ async def test_disconnected_agent() -> None:
     # to some private properties. This needs to be updated once they are available publicly
 
     def get_current_subscriptions() -> List[Subscription]:
-        return host._servicer._subscription_manager._subscriptions  # type: ignore[reportPrivateUsage]
+        return list(host._servicer._subscription_manager.subscriptions)  # type: ignore[reportPrivateUsage]
 
     async def get_subscribed_recipients() -> List[AgentId]:
         return await host._servicer._subscription_manager.get_subscribed_recipients(DefaultTopicId())  # type: ignore[reportPrivateUsage]
@@ -460,9 +475,834 @@ async def test_grpc_max_message_size() -> None:
         await host.stop()
 
 
+@pytest.mark.asyncio
+async def test_bounded_send_queue() -> None:
+    host_address = "localhost:50062"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+
+    worker = WorkerAgentRuntime(host_address=host_address, max_send_queue_size=1)
+    worker.start()
+    worker.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await LoopbackAgentWithDefaultSubscription.register(worker, "name", lambda: LoopbackAgentWithDefaultSubscription())
+
+    for _ in range(10):
+        await worker.publish_message(MessageType(), topic_id=DefaultTopicId())
+    await asyncio.sleep(1)
+
+    agent = await worker.try_get_underlying_agent_instance(AgentId("name", "default"), LoopbackAgent)
+    assert agent.num_calls == 10
+    metrics = worker.queue_metrics
+    assert metrics.capacity == 1
+    assert metrics.num_dropped == 0
+
+    await worker.stop()
+    await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_host_get_and_save_state() -> None:
+    host_address = "localhost:50063"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+
+    async with grpc.aio.insecure_channel(host_address) as channel:
+        stub = agent_worker_pb2_grpc.AgentRpcStub(channel)  # type: ignore
+        agent_id = agent_worker_pb2.AgentId(type="name", key="default")
+
+        response = await stub.GetState(agent_id)
+        assert not response.success
+
+        save = await stub.SaveState(agent_worker_pb2.AgentState(agent_id=agent_id, text_data='{"count": 1}'))
+        assert save.success
+        response = await stub.GetState(agent_id)
+        assert response.success
+        assert response.agent_state.text_data == '{"count": 1}'
+        etag = response.agent_state.eTag
+
+        # A save with the current eTag succeeds, and changes the eTag.
+        save = await stub.SaveState(
+            agent_worker_pb2.AgentState(agent_id=agent_id, eTag=etag, binary_data=b'{"count": 2}')
+        )
+        assert save.success
+        # A save with a stale eTag is rejected.
+        save = await stub.SaveState(agent_worker_pb2.AgentState(agent_id=agent_id, eTag=etag, text_data='{"count": 3}'))
+        assert not save.success
+        response = await stub.GetState(agent_id)
+        assert response.agent_state.text_data == '{"count": 2}'
+
+        save = await stub.SaveState(agent_worker_pb2.AgentState(agent_id=agent_id, text_data="not json"))
+        assert not save.success
+
+    await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_load_balanced_agent_type() -> None:
+    host_address = "localhost:50064"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    workers = [WorkerAgentRuntime(host_address=host_address) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+        worker.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+        await LoopbackAgentWithDefaultSubscription.register(
+            worker, "name", lambda: LoopbackAgentWithDefaultSubscription()
+        )
+    publisher = workers[0]
+    keys = [f"key{i}" for i in range(30)]
+
+    async def num_calls(worker: WorkerAgentRuntime, key: str) -> int:
+        agent = await worker.try_get_underlying_agent_instance(AgentId("name", key), type=LoopbackAgent)
+        return agent.num_calls
+
+    async def owners(key: str) -> List[WorkerAgentRuntime]:
+        return [worker for worker in workers if await num_calls(worker, key) > 0]
+
+    try:
+        # Each key is handled by exactly one worker, and the keys are spread across the workers.
+        for key in keys:
+            await publisher.send_message(MessageType(), AgentId("name", key))
+        key_owners = {key: await owners(key) for key in keys}
+        assert all(len(key_owners[key]) == 1 for key in keys)
+        assert len({id(key_owners[key][0]) for key in keys}) == 3
+
+        # Messages for a key keep going to the same worker, and events are delivered once.
+        for key in keys:
+            await publisher.send_message(MessageType(), AgentId("name", key))
+            await publisher.publish_message(MessageType(), TopicId("default", key))
+        await asyncio.sleep(1)
+        for key in keys:
+            assert await num_calls(key_owners[key][0], key) == 3
+
+        # When a worker leaves, only its keys move to the remaining workers.
+        await workers[2].stop()
+        await asyncio.sleep(1)
+        for key in keys:
+            await publisher.send_message(MessageType(), AgentId("name", key))
+        for key in keys:
+            if key_owners[key][0] is not workers[2]:
+                assert await num_calls(key_owners[key][0], key) == 4
+    finally:
+        await workers[0].stop()
+        await workers[1].stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_direct_requests() -> None:
+    host_address = "localhost:50066"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    # Count the requests relayed by the host.
+    relayed: List[agent_worker_pb2.RpcRequest] = []
+    process_request = host._servicer._process_request  # type: ignore[reportPrivateUsage]
+
+    async def counting_process_request(request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
+        relayed.append(request)
+        await process_request(request, client_id)
+
+    host._servicer._process_request = counting_process_request  # type: ignore
+    worker = WorkerAgentRuntime(host_address=host_address, direct_address="localhost:50067")
+    sender = WorkerAgentRuntime(host_address=host_address, direct_address="localhost:50068")
+    relaying_sender = WorkerAgentRuntime(host_address=host_address)
+    runtimes = [worker, sender, relaying_sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await LoopbackAgent.register(worker, "name", lambda: LoopbackAgent())
+
+    try:
+        # Requests between workers with direct addresses bypass the host, including requests to the sender itself.
+        for _ in range(10):
+            assert isinstance(await sender.send_message(MessageType(), AgentId("name", "default")), MessageType)
+        await LoopbackAgent.register(sender, "local", lambda: LoopbackAgent())
+        await sender.send_message(MessageType(), AgentId("local", "default"))
+        agent = await worker.try_get_underlying_agent_instance(AgentId("name", "default"), type=LoopbackAgent)
+        assert agent.num_calls == 10
+        assert len(relayed) == 0
+
+        # Workers without a direct address relay their requests through the host.
+        await relaying_sender.send_message(MessageType(), AgentId("name", "default"))
+        assert agent.num_calls == 11
+        assert len(relayed) == 1
+
+        # Registering agent types tells workers to resolve addresses again.
+        assert len(sender._resolved_addresses) > 0  # type: ignore[reportPrivateUsage]
+        await LoopbackAgent.register(relaying_sender, "other", lambda: LoopbackAgent())
+        await asyncio.sleep(0.1)
+        assert len(sender._resolved_addresses) == 0  # type: ignore[reportPrivateUsage]
+
+        # When the worker cannot be reached directly, the request is relayed through the host.
+        await worker._direct_server.stop(grace=None)  # type: ignore
+        await sender.send_message(MessageType(), AgentId("name", "default"))
+        assert agent.num_calls == 12
+        assert len(relayed) == 2
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_content_type_negotiation(monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("msgpack")
+    host_address = "localhost:50069"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    relayed: List[agent_worker_pb2.RpcRequest] = []
+    process_request = host._servicer._process_request  # type: ignore[reportPrivateUsage]
+
+    async def recording_process_request(request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
+        relayed.append(request)
+        await process_request(request, client_id)
+
+    host._servicer._process_request = recording_process_request  # type: ignore
+    runtimes: List[WorkerAgentRuntime] = []
+
+    async def start_worker() -> WorkerAgentRuntime:
+        runtime = WorkerAgentRuntime(host_address=host_address)
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+        runtime.add_message_serializer(DataclassMsgpackMessageSerializer(MessageType))
+        runtimes.append(runtime)
+        await asyncio.sleep(0.2)
+        return runtime
+
+    try:
+        worker = await start_worker()
+        await LoopbackAgent.register(worker, "name", lambda: LoopbackAgent())
+        sender = await start_worker()
+        # Every worker accepts msgpack, so the dataclass is sent as msgpack.
+        assert isinstance(await sender.send_message(MessageType(), AgentId("name", "default")), MessageType)
+        assert relayed[-1].payload.data_content_type == MSGPACK_DATA_CONTENT_TYPE
+
+        # A worker that does not accept msgpack joins, so all workers fall back to JSON.
+        monkeypatch.setattr("autogen_core.application._worker_runtime.is_msgpack_available", lambda: False)
+        await start_worker()
+        assert isinstance(await sender.send_message(MessageType(), AgentId("name", "default")), MessageType)
+        assert relayed[-1].payload.data_content_type == JSON_DATA_CONTENT_TYPE
+
+        # When it leaves, msgpack is used again.
+        await runtimes.pop().stop()
+        await asyncio.sleep(0.2)
+        await sender.send_message(MessageType(), AgentId("name", "default"))
+        assert relayed[-1].payload.data_content_type == MSGPACK_DATA_CONTENT_TYPE
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+class SlowAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that responds when its handler is cancelled.")
+        self.started = asyncio.Event()
+        self.cancelled = asyncio.Event()
+
+    @message_handler
+    async def on_message_type(self, message: MessageType, ctx: MessageContext) -> MessageType:
+        self.started.set()
+        sleep = asyncio.ensure_future(asyncio.sleep(100))
+        ctx.cancellation_token.link_future(sleep)
+        try:
+            await sleep
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return message
+
+
+class ForwardingAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("An agent that forwards requests without passing on its cancellation token.")
+
+    @message_handler
+    async def on_message_type(self, message: MessageType, ctx: MessageContext) -> MessageType:
+        response = await self.send_message(message, AgentId("slow", "default"))
+        assert isinstance(response, MessageType)
+        return response
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("direct", [False, True])
+async def test_remote_cancellation(direct: bool) -> None:
+    host_address = "localhost:50070"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    worker = WorkerAgentRuntime(host_address=host_address, direct_address="localhost:50071" if direct else None)
+    sender = WorkerAgentRuntime(host_address=host_address, direct_address="localhost:50072" if direct else None)
+    timed_sender = WorkerAgentRuntime(
+        host_address=host_address, direct_address="localhost:50073" if direct else None, request_timeout=0.5
+    )
+    runtimes = [worker, sender, timed_sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await SlowAgent.register(worker, "slow", lambda: SlowAgent())
+    await ForwardingAgent.register(worker, "forwarding", lambda: ForwardingAgent())
+    slow = await worker.try_get_underlying_agent_instance(AgentId("slow", "default"), type=SlowAgent)
+
+    try:
+        # Cancelling the token of the sender cancels the token of the handler.
+        token = CancellationToken()
+        response = asyncio.ensure_future(
+            sender.send_message(MessageType(), AgentId("slow", "default"), cancellation_token=token)
+        )
+        await asyncio.wait_for(slow.started.wait(), 5)
+        token.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await response
+        await asyncio.wait_for(slow.cancelled.wait(), 0.5)
+        assert len(worker._running_requests) == 0  # type: ignore[reportPrivateUsage]
+
+        # So does the deadline of the request passing.
+        slow.started.clear()
+        slow.cancelled.clear()
+        with pytest.raises(asyncio.TimeoutError):
+            await timed_sender.send_message(MessageType(), AgentId("slow", "default"))
+        await asyncio.wait_for(slow.cancelled.wait(), 0.5)
+
+        # Requests sent by a handler inherit its deadline.
+        slow.cancelled.clear()
+        with pytest.raises(asyncio.TimeoutError):
+            await timed_sender.send_message(MessageType(), AgentId("forwarding", "default"))
+        await asyncio.wait_for(slow.cancelled.wait(), 0.5)
+        assert len(worker._running_requests) == 0  # type: ignore[reportPrivateUsage]
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+class GatedAgent(RoutedAgent):
+    def __init__(self, gate: asyncio.Event | None = None) -> None:
+        super().__init__("An agent that responds when its gate opens.")
+        self.started = asyncio.Event()
+        self.gate = gate if gate is not None else asyncio.Event()
+        self.num_calls = 0
+
+    @message_handler
+    async def on_message_type(self, message: MessageType, ctx: MessageContext) -> MessageType:
+        self.num_calls += 1
+        self.started.set()
+        await self.gate.wait()
+        return message
+
+
+class BreakableProxy:
+    """Forwards TCP connections to a port, and breaks them on request to simulate network failures."""
+
+    def __init__(self, port: int, target_port: int) -> None:
+        self._port = port
+        self._target_port = target_port
+        self._server: asyncio.Server | None = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._forward, "localhost", self._port)
+
+    async def _forward(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        target_reader, target_writer = await asyncio.open_connection("localhost", self._target_port)
+        self._writers += [writer, target_writer]
+
+        async def pipe(source: asyncio.StreamReader, destination: asyncio.StreamWriter) -> None:
+            try:
+                while data := await source.read(65536):
+                    destination.write(data)
+                    await destination.drain()
+            except ConnectionError:
+                pass
+            finally:
+                destination.close()
+
+        await asyncio.gather(pipe(reader, target_writer), pipe(target_reader, writer))
+
+    def break_connections(self) -> None:
+        for writer in self._writers:
+            writer.transport.abort()
+        self._writers.clear()
+
+    async def stop(self) -> None:
+        assert self._server is not None
+        self._server.close()
+        self.break_connections()
+        await self._server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resumes_session() -> None:
+    host_address = "localhost:50074"
+    proxy = BreakableProxy(50075, 50074)
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    await proxy.start()
+    worker = WorkerAgentRuntime(host_address="localhost:50075")
+    sender = WorkerAgentRuntime(host_address="localhost:50075")
+    runtimes = [worker, sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await GatedAgent.register(worker, "gated", lambda: GatedAgent())
+    await LoopbackAgent.register(worker, "loopback", lambda: LoopbackAgent())
+    await worker.add_subscription(TypeSubscription("default", "loopback"))
+    gated = await worker.try_get_underlying_agent_instance(AgentId("gated", "default"), type=GatedAgent)
+
+    try:
+        response = asyncio.ensure_future(sender.send_message(MessageType(), AgentId("gated", "default")))
+        await asyncio.wait_for(gated.started.wait(), 5)
+
+        # The response is sent while both workers are disconnected, and arrives when they reconnect.
+        proxy.break_connections()
+        gated.gate.set()
+        assert isinstance(await asyncio.wait_for(response, 10), MessageType)
+        assert gated.num_calls == 1
+
+        # The host resumed the sessions, so the workers kept their client ids and registrations.
+        servicer = host._servicer  # type: ignore[reportPrivateUsage]
+        assert sorted(servicer._send_queues) == [1, 2]  # type: ignore[reportPrivateUsage]
+        assert len(servicer._session_timers) == 0  # type: ignore[reportPrivateUsage]
+        await sender.publish_message(MessageType(), DefaultTopicId())
+        await sender.send_message(MessageType(), AgentId("gated", "default"))
+        loopback = await worker.try_get_underlying_agent_instance(AgentId("loopback", "default"), type=LoopbackAgent)
+        await asyncio.sleep(0.1)
+        assert loopback.num_calls == 1
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await proxy.stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_after_host_restart() -> None:
+    host_address = "localhost:50076"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    worker = WorkerAgentRuntime(host_address=host_address)
+    sender = WorkerAgentRuntime(host_address=host_address)
+    runtimes = [worker, sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await GatedAgent.register(worker, "gated", lambda: GatedAgent())
+    await LoopbackAgent.register(worker, "loopback", lambda: LoopbackAgent())
+    await worker.add_subscription(TypeSubscription("default", "loopback"))
+    gated = await worker.try_get_underlying_agent_instance(AgentId("gated", "default"), type=GatedAgent)
+
+    try:
+        response = asyncio.ensure_future(sender.send_message(MessageType(), AgentId("gated", "default")))
+        await asyncio.wait_for(gated.started.wait(), 5)
+
+        # The new host does not know the workers, which register their agent types and subscriptions again. The
+        # pending request is sent again, and the response of the handler that was running reaches the sender.
+        await host.stop(grace=0)
+        host = WorkerAgentRuntimeHost(address=host_address)
+        host.start()
+        gated.gate.set()
+        assert isinstance(await asyncio.wait_for(response, 10), MessageType)
+        assert gated.num_calls == 1
+
+        await sender.publish_message(MessageType(), DefaultTopicId())
+        await sender.send_message(MessageType(), AgentId("gated", "default"))
+        loopback = await worker.try_get_underlying_agent_instance(AgentId("loopback", "default"), type=LoopbackAgent)
+        await asyncio.sleep(0.1)
+        assert loopback.num_calls == 1
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_flow_control() -> None:
+    host_address = "localhost:50077"
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    worker = WorkerAgentRuntime(host_address=host_address, max_in_flight_messages=4)
+    sender = WorkerAgentRuntime(host_address=host_address)
+    runtimes = [worker, sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    gate = asyncio.Event()
+    await GatedAgent.register(worker, "gated", lambda: GatedAgent(gate))
+
+    try:
+        # Each agent handles its request concurrently, but the worker is only sent as many as it has credits for.
+        responses = [
+            asyncio.ensure_future(sender.send_message(MessageType(), AgentId("gated", str(i)))) for i in range(9)
+        ]
+        token = CancellationToken()
+        cancelled = asyncio.ensure_future(
+            sender.send_message(MessageType(), AgentId("gated", "cancelled"), cancellation_token=token)
+        )
+        await asyncio.sleep(0.5)
+        assert worker.in_flight_metrics.in_flight == 4
+        metrics = next(metrics for metrics in host.flow_control_metrics.values() if metrics.credits is not None)
+        assert metrics.credits == 0
+        assert metrics.num_waiting == 6
+        assert metrics.num_credit_stalls == 1
+
+        # A request that waits for credits is cancelled without the worker receiving it.
+        token.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.sleep(0.1)
+        metrics = next(metrics for metrics in host.flow_control_metrics.values() if metrics.credits is not None)
+        assert metrics.num_waiting == 5
+
+        # The worker returns credits as it handles requests, until all are handled.
+        gate.set()
+        for response in responses:
+            assert isinstance(await asyncio.wait_for(response, 5), MessageType)
+        in_flight_metrics = worker.in_flight_metrics
+        assert in_flight_metrics.in_flight == 0
+        assert in_flight_metrics.peak_in_flight == 4
+        assert in_flight_metrics.num_credits_returned == 9
+        metrics = next(metrics for metrics in host.flow_control_metrics.values() if metrics.credits is not None)
+        assert metrics.credits == 4
+        assert metrics.credit_stall_time > 0
+        agent = await worker.try_get_underlying_agent_instance(AgentId("gated", "cancelled"), type=GatedAgent)
+        assert agent.num_calls == 0
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_sharded_hosts() -> None:
+    host_addresses = ["localhost:50078", "localhost:50079", "localhost:50080"]
+    hosts = [WorkerAgentRuntimeHost(address=address, hosts=host_addresses) for address in host_addresses]
+    for host in hosts:
+        host.start()
+    ring = HashRing[str]()
+    for address in host_addresses:
+        ring.add(address)
+    # Agent types owned by the next host, so that the registrations and requests of every worker are forwarded.
+    agent_types = [
+        next(f"type{n}" for n in range(100) if ring.get(f"type{n}") == host_addresses[(i + 1) % 3]) for i in range(3)
+    ]
+    workers = [WorkerAgentRuntime(host_address=address) for address in host_addresses]
+    # A second worker of the first agent type, on another host.
+    workers.append(WorkerAgentRuntime(host_address=host_addresses[1]))
+    for worker in workers:
+        worker.start()
+        worker.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    for worker, agent_type in zip(workers, [*agent_types, agent_types[0]], strict=True):
+        await LoopbackAgentWithDefaultSubscription.register(
+            worker, agent_type, lambda: LoopbackAgentWithDefaultSubscription()
+        )
+    sender = workers[2]
+    keys = [f"key{i}" for i in range(20)]
+
+    async def num_calls(agent_id: AgentId) -> int:
+        total = 0
+        for worker in workers:
+            if agent_id.type in worker._known_agent_names:  # type: ignore[reportPrivateUsage]
+                agent = await worker.try_get_underlying_agent_instance(agent_id, type=LoopbackAgent)
+                total += agent.num_calls
+        return total
+
+    try:
+        # Requests reach agent types registered behind other hosts, and each key is handled by one worker.
+        for agent_type in agent_types:
+            for key in keys:
+                assert isinstance(await sender.send_message(MessageType(), AgentId(agent_type, key)), MessageType)
+        for agent_type in agent_types:
+            owner = hosts[(agent_types.index(agent_type) + 1) % 3]
+            assert agent_type in owner._servicer._agent_type_to_client_ids  # type: ignore[reportPrivateUsage]
+        for key in keys:
+            assert await num_calls(AgentId(agent_types[0], key)) == 1
+
+        # Events published on any host are delivered once to the subscribed agents on every host.
+        for key in keys:
+            await sender.publish_message(MessageType(), TopicId("default", key))
+        await asyncio.sleep(1)
+        for agent_type in agent_types:
+            for key in keys:
+                assert await num_calls(AgentId(agent_type, key)) == 2
+
+        # When the last worker of an agent type behind a host leaves, the owner no longer routes to that host.
+        await workers[1].stop()
+        await asyncio.sleep(0.5)
+        servicer = hosts[2]._servicer  # type: ignore[reportPrivateUsage]
+        assert agent_types[1] not in servicer._agent_type_to_client_ids  # type: ignore[reportPrivateUsage]
+        assert all(key[1] != agent_types[1] for key in servicer._subscription_ids)  # type: ignore[reportPrivateUsage]
+    finally:
+        for worker in [workers[0], *workers[2:]]:
+            await worker.stop()
+        # The hosts close their links to each other before they wait for their streams to end.
+        await asyncio.gather(*[host.stop() for host in hosts])
+
+
+@pytest.mark.asyncio
+async def test_sharded_hosts_owner_restart() -> None:
+    host_addresses = ["localhost:50081", "localhost:50082"]
+    hosts = [WorkerAgentRuntimeHost(address=address, hosts=host_addresses) for address in host_addresses]
+    for host in hosts:
+        host.start()
+    ring = HashRing[str]()
+    for address in host_addresses:
+        ring.add(address)
+    agent_type = next(f"type{n}" for n in range(100) if ring.get(f"type{n}") == host_addresses[1])
+    worker = WorkerAgentRuntime(host_address=host_addresses[0])
+    sender = WorkerAgentRuntime(host_address=host_addresses[0])
+    runtimes = [worker, sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await LoopbackAgentWithDefaultSubscription.register(
+        worker, agent_type, lambda: LoopbackAgentWithDefaultSubscription()
+    )
+
+    try:
+        await sender.send_message(MessageType(), AgentId(agent_type, "default"))
+
+        # The restarted owner learns the registration and subscription again from the other host.
+        await hosts[1].stop(grace=0)
+        hosts[1] = WorkerAgentRuntimeHost(address=host_addresses[1], hosts=host_addresses)
+        hosts[1].start()
+        response = await asyncio.wait_for(sender.send_message(MessageType(), AgentId(agent_type, "default")), 10)
+        assert isinstance(response, MessageType)
+        await sender.publish_message(MessageType(), DefaultTopicId())
+        await asyncio.sleep(0.5)
+        agent = await worker.try_get_underlying_agent_instance(AgentId(agent_type, "default"), type=LoopbackAgent)
+        assert agent.num_calls == 3
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await asyncio.gather(*[host.stop() for host in hosts])
+
+
+def test_hash_ring() -> None:
+    ring = HashRing[int]()
+    with pytest.raises(LookupError):
+        ring.get("key")
+    for node in range(4):
+        ring.add(node)
+    keys = [f"key{i}" for i in range(1000)]
+    before = {key: ring.get(key) for key in keys}
+    assert set(before.values()) == {0, 1, 2, 3}
+
+    # Only the keys of the removed node move, and they move back when it is added again.
+    ring.remove(3)
+    after = {key: ring.get(key) for key in keys}
+    assert all(after[key] == before[key] for key in keys if before[key] != 3)
+    ring.add(3)
+    assert {key: ring.get(key) for key in keys} == before
+
+
+@pytest.mark.asyncio
+async def test_batched_messages() -> None:
+    host_address = "localhost:50065"
+    host = WorkerAgentRuntimeHost(address=host_address, max_send_batch_size=16, send_batch_interval=0.01)
+    host.start()
+    publisher = WorkerAgentRuntime(host_address=host_address, max_send_batch_size=16, send_batch_interval=0.01)
+    publisher.start()
+    publisher.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    worker = WorkerAgentRuntime(host_address=host_address, max_send_batch_size=16)
+    worker.start()
+    worker.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    await LoopbackAgentWithDefaultSubscription.register(worker, "name", lambda: LoopbackAgentWithDefaultSubscription())
+
+    await asyncio.gather(*[publisher.publish_message(MessageType(), DefaultTopicId()) for _ in range(100)])
+    await asyncio.gather(*[publisher.send_message(MessageType(), AgentId("name", "default")) for _ in range(100)])
+    await asyncio.sleep(1)
+    agent = await worker.try_get_underlying_agent_instance(AgentId("name", "default"), LoopbackAgent)
+    assert agent.num_calls == 200
+
+    await publisher.stop()
+    await worker.stop()
+    await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_message_batcher() -> None:
+    def event(size: int) -> agent_worker_pb2.Message:
+        return agent_worker_pb2.Message(
+            event=agent_worker_pb2.Event(payload=agent_worker_pb2.Payload(data=b"x" * size))
+        )
+
+    queue: asyncio.Queue[agent_worker_pb2.Message] = asyncio.Queue()
+    batcher = MessageBatcher(queue, max_batch_size=3, max_batch_bytes=1000)
+    for _ in range(4):
+        queue.put_nowait(event(10))
+    # A batch is flushed when it is full, and whatever is queued after it goes in the next one.
+    assert len(list(unbatch(await batcher.__anext__()))) == 3
+    assert (await batcher.__anext__()).WhichOneof("message") == "event"
+
+    # A message that would take a batch over the size limit starts the next batch.
+    for size in [400, 400, 400]:
+        queue.put_nowait(event(size))
+    assert len(list(unbatch(await batcher.__anext__()))) == 2
+    assert len(list(unbatch(await batcher.__anext__()))) == 1
+
+    # With an interval, a batch waits for messages that arrive shortly after the first one.
+    batcher = MessageBatcher(queue, max_batch_size=3, batch_interval=0.5)
+    queue.put_nowait(event(10))
+    asyncio.get_running_loop().call_later(0.05, queue.put_nowait, event(10))
+    assert len(list(unbatch(await batcher.__anext__()))) == 2
+
+    # Encoded messages are batched without being decoded.
+    encoded_queue: asyncio.Queue[bytes] = asyncio.Queue()
+    encoded_batcher = EncodedMessageBatcher(encoded_queue, max_batch_size=3)
+    for size in [1, 2, 3]:
+        encoded_queue.put_nowait(event(size).SerializeToString())
+    batch = agent_worker_pb2.Message.FromString(await encoded_batcher.__anext__())
+    assert list(unbatch(batch)) == [event(1), event(2), event(3)]
+
+    # Cancelling the task that waits for a batch to fill keeps the messages taken so far in the batch.
+    queue.put_nowait(event(1))
+    waiting = asyncio.ensure_future(batcher.__anext__())
+    await asyncio.sleep(0.05)
+    waiting.cancel()
+    queue.put_nowait(event(2))
+    assert list(unbatch(await batcher.__anext__())) == [event(1), event(2)]
+
+    # A batcher stops at the end of the stream, after the messages queued before it.
+    queue.put_nowait(event(1))
+    end_stream(queue)
+    queue.put_nowait(event(2))
+    assert [message async for message in batcher] == [event(1)]
+
+
+@pytest.mark.asyncio
+async def test_credit_queue() -> None:
+    queue = CreditQueue[str](credits=2)
+    for item in ["a", "b", "c"]:
+        queue.put_credited(item)
+    queue.put_nowait("response")
+    # Items that do not use credits go first, and flow controlled items stop when the credits run out.
+    assert [await queue.get() for _ in range(3)] == ["response", "a", "b"]
+    with pytest.raises(asyncio.QueueEmpty):
+        queue.get_nowait()
+    assert queue.metrics.credits == 0
+    assert queue.metrics.num_waiting == 1
+    assert queue.metrics.num_credit_stalls == 1
+
+    # Granting credits wakes up a waiting consumer.
+    waiting = asyncio.ensure_future(queue.get())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    queue.add_credits(1)
+    assert await waiting == "c"
+    assert queue.metrics.credit_stall_time > 0
+
+    # Flow controlled items can be removed before they are sent.
+    item = "d" * 10
+    queue.put_credited(item)
+    assert queue.remove(item)
+    assert not queue.remove(item)
+    assert len(queue) == 0
+
+    # Without credits, flow controlled items are not limited.
+    unlimited = CreditQueue[str]()
+    for item in ["a", "b", "c"]:
+        unlimited.put_credited(item)
+    unlimited.add_credits(1)
+    assert [unlimited.get_nowait() for _ in range(3)] == ["a", "b", "c"]
+    assert unlimited.metrics.credits is None
+
+
+def test_wire_format() -> None:
+    event = agent_worker_pb2.Event(
+        topic_type="type",
+        topic_source="source",
+        payload=agent_worker_pb2.Payload(data_type="data", data=b"x" * 1000),
+    )
+    recipients = [agent_worker_pb2.AgentId(type="name", key=str(i)) for i in range(3)]
+    encoded_recipients = agent_worker_pb2.Event(recipients=recipients).SerializeToString()
+
+    message = agent_worker_pb2.Message.FromString(encode_event_message(event.SerializeToString()))
+    assert message == agent_worker_pb2.Message(event=event)
+    message = agent_worker_pb2.Message.FromString(encode_event_message(event.SerializeToString() + encoded_recipients))
+    expected = agent_worker_pb2.Event()
+    expected.CopyFrom(event)
+    expected.recipients.extend(recipients)
+    assert message == agent_worker_pb2.Message(event=expected)
+
+    messages = [agent_worker_pb2.Message(event=event), agent_worker_pb2.Message(event=expected)]
+    batch = agent_worker_pb2.Message.FromString(encode_batch_message(m.SerializeToString() for m in messages))
+    assert list(unbatch(batch)) == messages
+
+
 if __name__ == "__main__":
     os.environ["GRPC_VERBOSITY"] = "DEBUG"
     os.environ["GRPC_TRACE"] = "all"
 
     asyncio.run(test_disconnected_agent())
     asyncio.run(test_grpc_max_message_size())
+
+
+@pytest.mark.asyncio
+async def test_servicer_with_generated_registration() -> None:
+    # The servicer still works when it is registered with the generated function, which serializes Message objects.
+    host_address = "localhost:50083"
+    server = grpc.aio.server()
+    agent_worker_pb2_grpc.add_AgentRpcServicer_to_server(WorkerAgentRuntimeHostServicer(), server)
+    server.add_insecure_port(host_address)
+    await server.start()
+    worker = WorkerAgentRuntime(host_address=host_address)
+    sender = WorkerAgentRuntime(host_address=host_address)
+    try:
+        with pytest.warns(RuntimeWarning, match="add_servicer_to_server"):
+            worker.start()
+            sender.start()
+            await LoopbackAgent.register(worker, "name", lambda: LoopbackAgent())
+        sender.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+        assert isinstance(await sender.send_message(MessageType(), AgentId("name", "default")), MessageType)
+    finally:
+        await worker.stop()
+        await sender.stop()
+        await server.stop(grace=None)
+
+
+@pytest.mark.asyncio
+async def test_direct_requests_with_advertised_address() -> None:
+    host_address = "localhost:50084"
+    # A wildcard bind cannot be dialed by other workers, so it needs an address to advertise.
+    with pytest.raises(ValueError, match="advertised_address"):
+        WorkerAgentRuntime(host_address=host_address, direct_address="0.0.0.0:50085")
+    with pytest.raises(ValueError, match="advertised_address"):
+        WorkerAgentRuntime(host_address=host_address, direct_address="[::]:50085")
+    with pytest.raises(ValueError):
+        WorkerAgentRuntime(host_address=host_address, advertised_address="localhost:50085")
+
+    host = WorkerAgentRuntimeHost(address=host_address)
+    host.start()
+    relayed: List[agent_worker_pb2.RpcRequest] = []
+    process_request = host._servicer._process_request  # type: ignore[reportPrivateUsage]
+
+    async def counting_process_request(request: agent_worker_pb2.RpcRequest, client_id: int) -> None:
+        relayed.append(request)
+        await process_request(request, client_id)
+
+    host._servicer._process_request = counting_process_request  # type: ignore
+    worker = WorkerAgentRuntime(
+        host_address=host_address, direct_address="0.0.0.0:50085", advertised_address="localhost:50085"
+    )
+    sender = WorkerAgentRuntime(host_address=host_address, direct_address="localhost:50086")
+    runtimes = [worker, sender]
+    for runtime in runtimes:
+        runtime.start()
+        runtime.add_message_serializer(try_get_known_serializers_for_type(MessageType))
+    try:
+        await LoopbackAgent.register(worker, "name", lambda: LoopbackAgent())
+        # The sender dials the advertised address, and the worker recognizes its own agents by it.
+        assert isinstance(await sender.send_message(MessageType(), AgentId("name", "default")), MessageType)
+        assert isinstance(await worker.send_message(MessageType(), AgentId("name", "default")), MessageType)
+        assert len(relayed) == 0
+        assert await sender._resolve_direct_address(AgentId("name", "default")) == "localhost:50085"  # type: ignore[reportPrivateUsage]
+    finally:
+        for runtime in runtimes:
+            await runtime.stop()
+        await host.stop()
+
+
+@pytest.mark.asyncio
+async def test_type_prefix_subscription_not_supported() -> None:
+    worker = WorkerAgentRuntime(host_address="localhost:50087")
+    with pytest.raises(ValueError, match="TypePrefixSubscription is not supported"):
+        await worker.add_subscription(TypePrefixSubscription(topic_type_prefix="t", agent_type="a"))
@@ -1,20 +1,26 @@
 import asyncio
+import functools
 import inspect
 import json
 import logging
 import math
 import re
+import time
 import warnings
 from asyncio import Task
+from collections import OrderedDict
 from typing import (
     Any,
     AsyncGenerator,
+    Callable,
     Dict,
+    Hashable,
     List,
     Mapping,
     Optional,
     Sequence,
     Set,
+    Tuple,
     Type,
     Union,
     cast,
@@ -36,9 +42,11 @@
     FunctionExecutionResultMessage,
     LLMMessage,
     ModelCapabilities,
+    RateLimiter,
     RequestUsage,
     SystemMessage,
     TopLogprob,
+    UsageMeter,
     UserMessage,
 )
 from autogen_core.components.tools import Tool, ToolSchema
@@ -272,6 +280,143 @@ def _add_usage(usage1: RequestUsage, usage2: RequestUsage) -> RequestUsage:
     )
 
 
+# The number of messages and of tool sets whose token counts a client keeps.
+_TOKEN_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding_for_model(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _message_key(message: LLMMessage) -> Hashable:
+    """A key of the content of a message that determines its token count.
+
+    The key is cheap to build and to hash, as it holds the strings of the message and Python caches the hashes of
+    strings. Images are counted by their size alone."""
+    if isinstance(message, SystemMessage):
+        return ("system", message.content)
+    if isinstance(message, UserMessage):
+        if isinstance(message.content, str):
+            return ("user", message.source, message.content)
+        parts = tuple(part if isinstance(part, str) else part.image.size for part in message.content)
+        return ("user", message.source, parts)
+    if isinstance(message, AssistantMessage):
+        if isinstance(message.content, str):
+            return ("assistant", message.source, message.content)
+        calls = tuple((call.id, call.name, call.arguments) for call in message.content)
+        return ("assistant", message.source, calls)
+    return ("tool", tuple((result.call_id, result.content) for result in message.content))
+
+
+def _tools_key(tools: Sequence[Tool | ToolSchema]) -> Tuple[Hashable, ...] | None:
+    """A key of a tool set, or None if a tool cannot be hashed."""
+    key = tuple(tool if isinstance(tool, Tool) else json.dumps(tool, sort_keys=True) for tool in tools)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _cached_tokens(cache: "OrderedDict[Hashable, int]", key: Hashable, count: Callable[..., int], *args: Any) -> int:
+    """Look up a token count in a least recently used cache, and count the tokens with the args on a miss."""
+    tokens = cache.get(key)
+    if tokens is None:
+        tokens = count(*args)
+        cache[key] = tokens
+        if len(cache) > _TOKEN_CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return tokens
+
+
+def _count_message_tokens(message: LLMMessage, encoding: tiktoken.Encoding) -> int:
+    tokens_per_message = 3
+    tokens_per_name = 1
+    num_tokens = tokens_per_message
+    oai_message = to_oai_type(message)
+    for oai_message_part in oai_message:
+        for key, value in oai_message_part.items():
+            if value is None:
+                continue
+
+            if isinstance(message, UserMessage) and isinstance(value, list):
+                typed_message_value = cast(List[ChatCompletionContentPartParam], value)
+
+                assert len(typed_message_value) == len(
+                    message.content
+                ), "Mismatch in message content and typed message value"
+
+                # We need image properties that are only in the original message
+                for part, content_part in zip(typed_message_value, message.content, strict=False):
+                    if isinstance(content_part, Image):
+                        # TODO: add detail parameter
+                        num_tokens += calculate_vision_tokens(content_part)
+                    elif isinstance(part, str):
+                        num_tokens += len(encoding.encode(part))
+                    else:
+                        try:
+                            serialized_part = json.dumps(part)
+                            num_tokens += len(encoding.encode(serialized_part))
+                        except TypeError:
+                            trace_logger.warning(f"Could not convert {part} to string, skipping.")
+            else:
+                if not isinstance(value, str):
+                    try:
+                        value = json.dumps(value)
+                    except TypeError:
+                        trace_logger.warning(f"Could not convert {value} to string, skipping.")
+                        continue
+                num_tokens += len(encoding.encode(value))
+                if key == "name":
+                    num_tokens += tokens_per_name
+    return num_tokens
+
+
+def _count_tool_tokens(tools: Sequence[Tool | ToolSchema], encoding: tiktoken.Encoding) -> int:
+    num_tokens = 0
+    oai_tools = convert_tools(tools)
+    for tool in oai_tools:
+        function = tool["function"]
+        tool_tokens = len(encoding.encode(function["name"]))
+        if "description" in function:
+            tool_tokens += len(encoding.encode(function["description"]))
+        tool_tokens -= 2
+        if "parameters" in function:
+            parameters = function["parameters"]
+            if "properties" in parameters:
+                assert isinstance(parameters["properties"], dict)
+                for propertiesKey in parameters["properties"]:  # pyright: ignore
+                    assert isinstance(propertiesKey, str)
+                    tool_tokens += len(encoding.encode(propertiesKey))
+                    v = parameters["properties"][propertiesKey]  # pyright: ignore
+                    for field in v:  # pyright: ignore
+                        if field == "type":
+                            tool_tokens += 2
+                            tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
+                        elif field == "description":
+                            tool_tokens += 2
+                            tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
+                        elif field == "enum":
+                            tool_tokens -= 3
+                            for o in v["enum"]:  # pyright: ignore
+                                tool_tokens += 3
+                                tool_tokens += len(encoding.encode(o))  # pyright: ignore
+                        else:
+                            trace_logger.warning(f"Not supported field {field}")
+                tool_tokens += 11
+                if len(parameters["properties"]) == 0:  # pyright: ignore
+                    tool_tokens -= 2
+        num_tokens += tool_tokens
+    return num_tokens
+
+
 def convert_tools(
     tools: Sequence[Tool | ToolSchema],
 ) -> List[ChatCompletionToolParam]:
@@ -329,8 +474,14 @@ def __init__(
         client: Union[AsyncOpenAI, AsyncAzureOpenAI],
         create_args: Dict[str, Any],
         model_capabilities: Optional[ModelCapabilities] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        usage_meter: Optional[UsageMeter] = None,
     ):
         self._client = client
+        self._rate_limiter = rate_limiter
+        self._usage_meter = usage_meter if usage_meter is not None else UsageMeter()
+        self._message_tokens: OrderedDict[Hashable, int] = OrderedDict()
+        self._tool_tokens: OrderedDict[Hashable, int] = OrderedDict()
         if model_capabilities is None and isinstance(client, AsyncAzureOpenAI):
             raise ValueError("AzureOpenAIChatCompletionClient requires explicit model capabilities")
         elif model_capabilities is None:
@@ -357,6 +508,29 @@ def __init__(
     def create_from_config(cls, config: Dict[str, Any]) -> ChatCompletionClient:
         return OpenAIChatCompletionClient(**config)
 
+    @property
+    def usage_meter(self) -> UsageMeter:
+        """The meter of the usage, latency and time to first token of the requests of the client."""
+        return self._usage_meter
+
+    async def _acquire_rate_limit(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        create_args: Mapping[str, Any],
+        cancellation_token: Optional[CancellationToken],
+    ) -> int:
+        """Wait until the rate limiter lets the request through, and return the tokens it was charged."""
+        assert self._rate_limiter is not None
+        estimated_tokens = 0
+        if self._rate_limiter.limits_tokens:
+            # The completion is charged up front at its maximum length, like the API does.
+            estimated_tokens = self.count_tokens(messages, tools) + (create_args.get("max_tokens") or 0)
+        acquire_future = asyncio.ensure_future(self._rate_limiter.acquire(estimated_tokens))
+        if cancellation_token is not None:
+            cancellation_token.link_future(acquire_future)
+        return await acquire_future
+
     async def create(
         self,
         messages: Sequence[LLMMessage],
@@ -417,66 +591,78 @@ async def create(
 
         if self.capabilities["function_calling"] is False and len(tools) > 0:
             raise ValueError("Model does not support function calling")
-        future: Union[Task[ParsedChatCompletion[BaseModel]], Task[ChatCompletion]]
-        if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            if use_beta_client:
-                # Pass response_format_value if it's not None
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            tools=converted_tools,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
+        charged_tokens = 0
+        if self._rate_limiter is not None:
+            charged_tokens = await self._acquire_rate_limit(messages, tools, create_args, cancellation_token)
+        used_tokens: Optional[int] = None
+        try:
+            start = time.perf_counter()
+            future: Union[Task[ParsedChatCompletion[BaseModel]], Task[ChatCompletion]]
+            if len(tools) > 0:
+                converted_tools = convert_tools(tools)
+                if use_beta_client:
+                    # Pass response_format_value if it's not None
+                    if response_format_value is not None:
+                        future = asyncio.ensure_future(
+                            self._client.beta.chat.completions.parse(
+                                messages=oai_messages,
+                                tools=converted_tools,
+                                response_format=response_format_value,
+                                **create_args_no_response_format,
+                            )
+                        )
+                    else:
+                        future = asyncio.ensure_future(
+                            self._client.beta.chat.completions.parse(
+                                messages=oai_messages,
+                                tools=converted_tools,
+                                **create_args_no_response_format,
+                            )
                         )
-                    )
                 else:
                     future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
+                        self._client.chat.completions.create(
                             messages=oai_messages,
+                            stream=False,
                             tools=converted_tools,
-                            **create_args_no_response_format,
+                            **create_args,
                         )
                     )
             else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        tools=converted_tools,
-                        **create_args,
-                    )
-                )
-        else:
-            if use_beta_client:
-                if response_format_value is not None:
-                    future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
-                            messages=oai_messages,
-                            response_format=response_format_value,
-                            **create_args_no_response_format,
+                if use_beta_client:
+                    if response_format_value is not None:
+                        future = asyncio.ensure_future(
+                            self._client.beta.chat.completions.parse(
+                                messages=oai_messages,
+                                response_format=response_format_value,
+                                **create_args_no_response_format,
+                            )
+                        )
+                    else:
+                        future = asyncio.ensure_future(
+                            self._client.beta.chat.completions.parse(
+                                messages=oai_messages,
+                                **create_args_no_response_format,
+                            )
                         )
-                    )
                 else:
                     future = asyncio.ensure_future(
-                        self._client.beta.chat.completions.parse(
+                        self._client.chat.completions.create(
                             messages=oai_messages,
-                            **create_args_no_response_format,
+                            stream=False,
+                            **create_args,
                         )
                     )
-            else:
-                future = asyncio.ensure_future(
-                    self._client.chat.completions.create(
-                        messages=oai_messages,
-                        stream=False,
-                        **create_args,
-                    )
-                )
 
-        if cancellation_token is not None:
-            cancellation_token.link_future(future)
-        result: Union[ParsedChatCompletion[BaseModel], ChatCompletion] = await future
+            if cancellation_token is not None:
+                cancellation_token.link_future(future)
+            result: Union[ParsedChatCompletion[BaseModel], ChatCompletion] = await future
+            latency = time.perf_counter() - start
+            if result.usage is not None:
+                used_tokens = result.usage.prompt_tokens + result.usage.completion_tokens
+        finally:
+            if self._rate_limiter is not None:
+                self._rate_limiter.release(charged_tokens, used_tokens)
         if use_beta_client:
             result = cast(ParsedChatCompletion[Any], result)
 
@@ -543,8 +729,9 @@ async def create(
             logprobs=logprobs,
         )
 
-        _add_usage(self._actual_usage, usage)
-        _add_usage(self._total_usage, usage)
+        self._actual_usage = _add_usage(self._actual_usage, usage)
+        self._total_usage = _add_usage(self._total_usage, usage)
+        self._usage_meter.record(create_args["model"], usage, latency)
 
         # TODO - why is this cast needed?
         return response
@@ -611,91 +798,108 @@ async def create_stream(
             else:
                 create_args["response_format"] = {"type": "text"}
 
-        if len(tools) > 0:
-            converted_tools = convert_tools(tools)
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(
-                    messages=oai_messages,
-                    stream=True,
-                    tools=converted_tools,
-                    **create_args,
+        charged_tokens = 0
+        if self._rate_limiter is not None:
+            charged_tokens = await self._acquire_rate_limit(messages, tools, create_args, cancellation_token)
+        used_tokens: Optional[int] = None
+        try:
+            start = time.perf_counter()
+            time_to_first_token: Optional[float] = None
+            if len(tools) > 0:
+                converted_tools = convert_tools(tools)
+                stream_future = asyncio.ensure_future(
+                    self._client.chat.completions.create(
+                        messages=oai_messages,
+                        stream=True,
+                        tools=converted_tools,
+                        **create_args,
+                    )
                 )
-            )
-        else:
-            stream_future = asyncio.ensure_future(
-                self._client.chat.completions.create(messages=oai_messages, stream=True, **create_args)
-            )
-        if cancellation_token is not None:
-            cancellation_token.link_future(stream_future)
-        stream = await stream_future
-        choice: Union[ParsedChoice[Any], ParsedChoice[BaseModel], ChunkChoice] = cast(ChunkChoice, None)
-        chunk = None
-        stop_reason = None
-        maybe_model = None
-        content_deltas: List[str] = []
-        full_tool_calls: Dict[int, FunctionCall] = {}
-        completion_tokens = 0
-        logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
-        while True:
-            try:
-                chunk_future = asyncio.ensure_future(anext(stream))
-                if cancellation_token is not None:
-                    cancellation_token.link_future(chunk_future)
-                chunk = await chunk_future
-
-                # to process usage chunk in streaming situations
-                # add    stream_options={"include_usage": True} in the initialization of OpenAIChatCompletionClient(...)
-                # However the different api's
-                # OPENAI api usage chunk produces no choices so need to check if there is a choice
-                # liteLLM api usage chunk does produce choices
-                choice = (
-                    chunk.choices[0]
-                    if len(chunk.choices) > 0
-                    else choice
-                    if chunk.usage is not None and stop_reason is not None
-                    else cast(ChunkChoice, None)
+            else:
+                stream_future = asyncio.ensure_future(
+                    self._client.chat.completions.create(messages=oai_messages, stream=True, **create_args)
                 )
+            if cancellation_token is not None:
+                cancellation_token.link_future(stream_future)
+            stream = await stream_future
+            choice: Union[ParsedChoice[Any], ParsedChoice[BaseModel], ChunkChoice] = cast(ChunkChoice, None)
+            chunk = None
+            stop_reason = None
+            maybe_model = None
+            content_deltas: List[str] = []
+            full_tool_calls: Dict[int, FunctionCall] = {}
+            completion_tokens = 0
+            logprobs: Optional[List[ChatCompletionTokenLogprob]] = None
+            while True:
+                try:
+                    chunk_future = asyncio.ensure_future(anext(stream))
+                    if cancellation_token is not None:
+                        cancellation_token.link_future(chunk_future)
+                    chunk = await chunk_future
+                    if time_to_first_token is None and any(
+                        c.delta.content or c.delta.tool_calls for c in chunk.choices
+                    ):
+                        time_to_first_token = time.perf_counter() - start
+
+                    # to process usage chunk in streaming situations
+                    # add    stream_options={"include_usage": True} in the initialization of OpenAIChatCompletionClient(...)
+                    # However the different api's
+                    # OPENAI api usage chunk produces no choices so need to check if there is a choice
+                    # liteLLM api usage chunk does produce choices
+                    choice = (
+                        chunk.choices[0]
+                        if len(chunk.choices) > 0
+                        else choice
+                        if chunk.usage is not None and stop_reason is not None
+                        else cast(ChunkChoice, None)
+                    )
 
-                # for liteLLM chunk usage, do the following hack keeping the pervious chunk.stop_reason (if set).
-                # set the stop_reason for the usage chunk to the prior stop_reason
-                stop_reason = choice.finish_reason if chunk.usage is None and stop_reason is None else stop_reason
-                maybe_model = chunk.model
-                # First try get content
-                if choice.delta.content is not None:
-                    content_deltas.append(choice.delta.content)
-                    if len(choice.delta.content) > 0:
-                        yield choice.delta.content
-                    continue
-
-                # Otherwise, get tool calls
-                if choice.delta.tool_calls is not None:
-                    for tool_call_chunk in choice.delta.tool_calls:
-                        idx = tool_call_chunk.index
-                        if idx not in full_tool_calls:
-                            # We ignore the type hint here because we want to fill in type when the delta provides it
-                            full_tool_calls[idx] = FunctionCall(id="", arguments="", name="")
-
-                        if tool_call_chunk.id is not None:
-                            full_tool_calls[idx].id += tool_call_chunk.id
-
-                        if tool_call_chunk.function is not None:
-                            if tool_call_chunk.function.name is not None:
-                                full_tool_calls[idx].name += tool_call_chunk.function.name
-                            if tool_call_chunk.function.arguments is not None:
-                                full_tool_calls[idx].arguments += tool_call_chunk.function.arguments
-                if choice.logprobs and choice.logprobs.content:
-                    logprobs = [
-                        ChatCompletionTokenLogprob(
-                            token=x.token,
-                            logprob=x.logprob,
-                            top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
-                            bytes=x.bytes,
-                        )
-                        for x in choice.logprobs.content
-                    ]
+                    # for liteLLM chunk usage, do the following hack keeping the pervious chunk.stop_reason (if set).
+                    # set the stop_reason for the usage chunk to the prior stop_reason
+                    stop_reason = choice.finish_reason if chunk.usage is None and stop_reason is None else stop_reason
+                    maybe_model = chunk.model
+                    # First try get content
+                    if choice.delta.content is not None:
+                        content_deltas.append(choice.delta.content)
+                        if len(choice.delta.content) > 0:
+                            yield choice.delta.content
+                        continue
 
-            except StopAsyncIteration:
-                break
+                    # Otherwise, get tool calls
+                    if choice.delta.tool_calls is not None:
+                        for tool_call_chunk in choice.delta.tool_calls:
+                            idx = tool_call_chunk.index
+                            if idx not in full_tool_calls:
+                                # We ignore the type hint here because we want to fill in type when the delta provides it
+                                full_tool_calls[idx] = FunctionCall(id="", arguments="", name="")
+
+                            if tool_call_chunk.id is not None:
+                                full_tool_calls[idx].id += tool_call_chunk.id
+
+                            if tool_call_chunk.function is not None:
+                                if tool_call_chunk.function.name is not None:
+                                    full_tool_calls[idx].name += tool_call_chunk.function.name
+                                if tool_call_chunk.function.arguments is not None:
+                                    full_tool_calls[idx].arguments += tool_call_chunk.function.arguments
+                    if choice.logprobs and choice.logprobs.content:
+                        logprobs = [
+                            ChatCompletionTokenLogprob(
+                                token=x.token,
+                                logprob=x.logprob,
+                                top_logprobs=[TopLogprob(logprob=y.logprob, bytes=y.bytes) for y in x.top_logprobs],
+                                bytes=x.bytes,
+                            )
+                            for x in choice.logprobs.content
+                        ]
+
+                except StopAsyncIteration:
+                    break
+            latency = time.perf_counter() - start
+            if chunk and chunk.usage:
+                used_tokens = chunk.usage.prompt_tokens + chunk.usage.completion_tokens
+        finally:
+            if self._rate_limiter is not None:
+                self._rate_limiter.release(charged_tokens, used_tokens)
 
         model = maybe_model or create_args["model"]
         model = model.replace("gpt-35", "gpt-3.5")  # hack for Azure API
@@ -741,8 +945,9 @@ async def create_stream(
             logprobs=logprobs,
         )
 
-        _add_usage(self._actual_usage, usage)
-        _add_usage(self._total_usage, usage)
+        self._actual_usage = _add_usage(self._actual_usage, usage)
+        self._total_usage = _add_usage(self._total_usage, usage)
+        self._usage_meter.record(create_args["model"], usage, latency, time_to_first_token)
 
         yield result
 
@@ -753,91 +958,23 @@ def total_usage(self) -> RequestUsage:
         return self._total_usage
 
     def count_tokens(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
-        model = self._create_args["model"]
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            trace_logger.warning(f"Model {model} not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-        tokens_per_message = 3
-        tokens_per_name = 1
+        encoding = _encoding_for_model(self._create_args["model"])
         num_tokens = 0
 
-        # Message tokens.
+        # Message tokens, counted once per distinct message, so that counting a growing history only encodes the
+        # messages that were appended.
         for message in messages:
-            num_tokens += tokens_per_message
-            oai_message = to_oai_type(message)
-            for oai_message_part in oai_message:
-                for key, value in oai_message_part.items():
-                    if value is None:
-                        continue
-
-                    if isinstance(message, UserMessage) and isinstance(value, list):
-                        typed_message_value = cast(List[ChatCompletionContentPartParam], value)
-
-                        assert len(typed_message_value) == len(
-                            message.content
-                        ), "Mismatch in message content and typed message value"
-
-                        # We need image properties that are only in the original message
-                        for part, content_part in zip(typed_message_value, message.content, strict=False):
-                            if isinstance(content_part, Image):
-                                # TODO: add detail parameter
-                                num_tokens += calculate_vision_tokens(content_part)
-                            elif isinstance(part, str):
-                                num_tokens += len(encoding.encode(part))
-                            else:
-                                try:
-                                    serialized_part = json.dumps(part)
-                                    num_tokens += len(encoding.encode(serialized_part))
-                                except TypeError:
-                                    trace_logger.warning(f"Could not convert {part} to string, skipping.")
-                    else:
-                        if not isinstance(value, str):
-                            try:
-                                value = json.dumps(value)
-                            except TypeError:
-                                trace_logger.warning(f"Could not convert {value} to string, skipping.")
-                                continue
-                        num_tokens += len(encoding.encode(value))
-                        if key == "name":
-                            num_tokens += tokens_per_name
+            num_tokens += _cached_tokens(
+                self._message_tokens, _message_key(message), _count_message_tokens, message, encoding
+            )
         num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
 
-        # Tool tokens.
-        oai_tools = convert_tools(tools)
-        for tool in oai_tools:
-            function = tool["function"]
-            tool_tokens = len(encoding.encode(function["name"]))
-            if "description" in function:
-                tool_tokens += len(encoding.encode(function["description"]))
-            tool_tokens -= 2
-            if "parameters" in function:
-                parameters = function["parameters"]
-                if "properties" in parameters:
-                    assert isinstance(parameters["properties"], dict)
-                    for propertiesKey in parameters["properties"]:  # pyright: ignore
-                        assert isinstance(propertiesKey, str)
-                        tool_tokens += len(encoding.encode(propertiesKey))
-                        v = parameters["properties"][propertiesKey]  # pyright: ignore
-                        for field in v:  # pyright: ignore
-                            if field == "type":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["type"]))  # pyright: ignore
-                            elif field == "description":
-                                tool_tokens += 2
-                                tool_tokens += len(encoding.encode(v["description"]))  # pyright: ignore
-                            elif field == "enum":
-                                tool_tokens -= 3
-                                for o in v["enum"]:  # pyright: ignore
-                                    tool_tokens += 3
-                                    tool_tokens += len(encoding.encode(o))  # pyright: ignore
-                            else:
-                                trace_logger.warning(f"Not supported field {field}")
-                    tool_tokens += 11
-                    if len(parameters["properties"]) == 0:  # pyright: ignore
-                        tool_tokens -= 2
-            num_tokens += tool_tokens
+        # Tool tokens, counted once per tool set.
+        tools_key = _tools_key(tools)
+        if tools_key is None:
+            num_tokens += _count_tool_tokens(tools, encoding)
+        else:
+            num_tokens += _cached_tokens(self._tool_tokens, tools_key, _count_tool_tokens, tools, encoding)
         num_tokens += 12
         return num_tokens
 
@@ -860,20 +997,33 @@ def __init__(self, **kwargs: Unpack[OpenAIClientConfiguration]):
         if "model_capabilities" in kwargs:
             model_capabilities = kwargs["model_capabilities"]
             del copied_args["model_capabilities"]
+        rate_limiter: Optional[RateLimiter] = None
+        if "rate_limiter" in kwargs:
+            rate_limiter = kwargs["rate_limiter"]
+            del copied_args["rate_limiter"]
+        usage_meter: Optional[UsageMeter] = None
+        if "usage_meter" in kwargs:
+            usage_meter = kwargs["usage_meter"]
+            del copied_args["usage_meter"]
 
         client = _openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, rate_limiter, usage_meter)
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        # The meter holds a lock and OpenTelemetry instruments, so a copy starts a meter of its own.
+        state["_usage_meter"] = None
+        # The keys of the tool token counts hold the tools, which may not be picklable.
+        state["_tool_tokens"] = OrderedDict()
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
         self.__dict__.update(state)
         self._client = _openai_client_from_config(state["_raw_config"])
+        self._usage_meter = UsageMeter()
 
 
 class AzureOpenAIChatCompletionClient(BaseOpenAIChatCompletionClient):
@@ -886,17 +1036,30 @@ def __init__(self, **kwargs: Unpack[AzureOpenAIClientConfiguration]):
         if "model_capabilities" in kwargs:
             model_capabilities = kwargs["model_capabilities"]
             del copied_args["model_capabilities"]
+        rate_limiter: Optional[RateLimiter] = None
+        if "rate_limiter" in kwargs:
+            rate_limiter = kwargs["rate_limiter"]
+            del copied_args["rate_limiter"]
+        usage_meter: Optional[UsageMeter] = None
+        if "usage_meter" in kwargs:
+            usage_meter = kwargs["usage_meter"]
+            del copied_args["usage_meter"]
 
         client = _azure_openai_client_from_config(copied_args)
         create_args = _create_args_from_config(copied_args)
         self._raw_config = copied_args
-        super().__init__(client, create_args, model_capabilities)
+        super().__init__(client, create_args, model_capabilities, rate_limiter, usage_meter)
 
     def __getstate__(self) -> Dict[str, Any]:
         state = self.__dict__.copy()
         state["_client"] = None
+        # The meter holds a lock and OpenTelemetry instruments, so a copy starts a meter of its own.
+        state["_usage_meter"] = None
+        # The keys of the tool token counts hold the tools, which may not be picklable.
+        state["_tool_tokens"] = OrderedDict()
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
         self.__dict__.update(state)
         self._client = _azure_openai_client_from_config(state["_raw_config"])
+        self._usage_meter = UsageMeter()
@@ -1,6 +1,6 @@
 from typing import Awaitable, Callable, Dict, List, Literal, Optional, Union
 
-from autogen_core.components.models import ModelCapabilities
+from autogen_core.components.models import ModelCapabilities, RateLimiter, UsageMeter
 from typing_extensions import Required, TypedDict
 
 
@@ -30,6 +30,10 @@ class BaseOpenAIClientConfiguration(CreateArguments, total=False):
     api_key: str
     timeout: Union[float, None]
     max_retries: int
+    # Not passed to the API, shared by the clients that use the same deployment
+    rate_limiter: RateLimiter
+    # Not passed to the API, records the usage, latency and time to first token of the requests
+    usage_meter: UsageMeter
 
 
 # See OpenAI docs for explanation of these parameters
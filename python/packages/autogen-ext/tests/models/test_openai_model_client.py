@@ -1,10 +1,10 @@
 import asyncio
-from typing import Any, AsyncGenerator, List, Tuple
+from typing import Any, AsyncGenerator, Callable, List, Tuple
 from unittest.mock import MagicMock
 
 import pytest
 from autogen_core.base import CancellationToken
-from autogen_core.components import Image
+from autogen_core.components import FunctionCall, Image
 from autogen_core.components.models import (
     AssistantMessage,
     CreateResult,
@@ -17,6 +17,7 @@
 )
 from autogen_core.components.tools import FunctionTool
 from autogen_ext.models import AzureOpenAIChatCompletionClient, OpenAIChatCompletionClient
+from autogen_ext.models._openai import _openai_client
 from autogen_ext.models._openai._model_info import resolve_model
 from autogen_ext.models._openai._openai_client import calculate_vision_tokens
 from openai.resources.chat.completions import AsyncCompletions
@@ -281,6 +282,57 @@ def tool2(test1: int, test2: List[int]) -> str:
     assert remaining_tokens
 
 
+def test_openai_chat_completion_client_count_tokens_incremental(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key")
+
+    def tool1(test: str, test2: str) -> str:
+        return test + test2
+
+    tools = [FunctionTool(tool1, description="example tool 1")]
+    history: List[LLMMessage] = [SystemMessage(content="Hello")]
+    for turn in range(10):
+        history.append(UserMessage(content=f"Question {turn}", source="user"))
+        history.append(AssistantMessage(content=[FunctionCall(id=str(turn), arguments="{}", name="tool1")], source="a"))
+        history.append(
+            FunctionExecutionResultMessage(content=[FunctionExecutionResult(content="42", call_id=str(turn))])
+        )
+
+    # The counts are the same as those of a client that has not counted any of the messages.
+    expected = [
+        OpenAIChatCompletionClient(model="gpt-4o", api_key="api_key").count_tokens(history[:length], tools=tools)
+        for length in range(1, len(history) + 1)
+    ]
+
+    message_counts: List[LLMMessage] = []
+    tool_counts: List[int] = []
+    count_message_tokens: Callable[[LLMMessage, Any], int] = _openai_client._count_message_tokens  # pyright: ignore[reportPrivateUsage]
+    count_tool_tokens: Callable[[Any, Any], int] = _openai_client._count_tool_tokens  # pyright: ignore[reportPrivateUsage]
+
+    def spy_count_message_tokens(message: LLMMessage, encoding: Any) -> int:
+        message_counts.append(message)
+        return count_message_tokens(message, encoding)
+
+    def spy_count_tool_tokens(tools: Any, encoding: Any) -> int:
+        tool_counts.append(len(tools))
+        return count_tool_tokens(tools, encoding)
+
+    monkeypatch.setattr(_openai_client, "_count_message_tokens", spy_count_message_tokens)
+    monkeypatch.setattr(_openai_client, "_count_tool_tokens", spy_count_tool_tokens)
+
+    # Counting a growing history only counts the messages that were appended, and the tools once.
+    counts = [client.count_tokens(history[:length], tools=tools) for length in range(1, len(history) + 1)]
+    assert counts == expected
+    assert message_counts == history
+    assert tool_counts == [1]
+
+    # A message with the same content is not counted again, but a changed message is.
+    client.count_tokens([UserMessage(content="Question 0", source="user")], tools=tools)
+    assert len(message_counts) == len(history)
+    client.count_tokens([UserMessage(content="Question 0", source="other")])
+    assert len(message_counts) == len(history) + 1
+    assert tool_counts == [1, 0]
+
+
 @pytest.mark.parametrize(
     "mock_size, expected_num_tokens",
     [